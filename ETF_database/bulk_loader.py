@@ -0,0 +1,468 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ETF行情批量写入器
+1. 按代码CSV整列转换（日期解析、数值转换均为向量化），不再逐行 strptime/float
+2. 转换后的行以CSV文本经 COPY FROM STDIN 流式写入会话私有的暂存表
+   （临时表不写WAL，与UNLOGGED表相同，且各连接互不干扰）
+3. 暂存行数达到阈值或调用 flush 时，用一条 INSERT ... SELECT ... ON CONFLICT 合并进目标表
+4. 每次合并后输出累计行数和 行/秒；提交事务由调用方负责
+   同一事务内把各ETF已导入的最新日期合并到 {schema}.import_watermarks（水位只前进不后退），
+   增量导入据此只读取CSV开头比水位更新的行
+5. 嵌入式后端（DuckDB/SQLite）使用 EmbeddedBulkLoader：DuckDB 直接读取CSV文件或注册内存DataFrame合并，
+   SQLite 批量执行 upsert；create_loader 按连接的后端选择
+
+可对本机临时PostgreSQL单独测试（连接参数同 db_connection 的 DB_* 环境变量）：
+    python ETF_database/bulk_loader.py ETF日更/0_ETF日K(前复权) basic_info_daily.forward_adjusted
+"""
+
+import io
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from config.etf_store import has_tail
+
+STAGING_TABLE = "etf_import_staging"
+WATERMARK_TABLE = "import_watermarks"  # 每个schema一张：(表名, ETF代码) -> 已导入的最新交易日
+DEFAULT_FLUSH_ROWS = 200000  # 暂存行数达到该值时合并一次
+
+# 按代码CSV列名 -> 数据库列名（顺序即COPY和合并的列顺序）
+CSV_COLUMNS = {
+    '代码': 'etf_code',
+    '日期': 'trade_date',
+    '开盘价': 'open_price',
+    '最高价': 'high_price',
+    '最低价': 'low_price',
+    '收盘价': 'close_price',
+    '成交量(手数)': 'volume',
+    '成交额(千元)': 'amount',
+    '上日收盘': 'prev_close',
+    '涨跌': 'change_amount',
+    '涨幅%': 'change_percent',
+}
+COLUMNS = list(CSV_COLUMNS.values())
+VALUE_COLUMNS = COLUMNS[2:]
+
+
+def prepare_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    把按代码CSV的数据转成导入列
+
+    Args:
+        df: 按代码CSV数据（日期为YYYYMMDD）
+
+    Returns:
+        列为 COLUMNS 的DataFrame，日期为 YYYY-MM-DD 文本，数值列为浮点；日期无法解析的行被丢弃
+    """
+    dates = pd.to_datetime(df['日期'].astype(str).str.replace(r'\.0$', '', regex=True),
+                           format='%Y%m%d', errors='coerce')
+    valid = dates.notna().to_numpy()
+    frame = pd.DataFrame({
+        'etf_code': df['代码'].astype(str).to_numpy()[valid],
+        'trade_date': dates[valid].dt.strftime('%Y-%m-%d').to_numpy(),
+    })
+    for csv_column, column in list(CSV_COLUMNS.items())[2:]:
+        frame[column] = pd.to_numeric(df[csv_column], errors='coerce').to_numpy()[valid]
+    return frame
+
+
+def _conflict_clause() -> str:
+    """按代码+日期冲突时更新全部数值列"""
+    updates = ",\n            ".join(f"{column} = EXCLUDED.{column}" for column in VALUE_COLUMNS)
+    return f"""ON CONFLICT (etf_code, trade_date)
+        DO UPDATE SET
+            {updates},
+            created_at = CURRENT_TIMESTAMP"""
+
+
+def upsert_sql(table_name: str) -> str:
+    """从暂存表合并到目标表的SQL（同一代码+日期以最后写入暂存表的行为准）"""
+    columns = ", ".join(COLUMNS)
+    return f"""
+        INSERT INTO {table_name} ({columns})
+        SELECT DISTINCT ON (etf_code, trade_date) {columns}
+        FROM {STAGING_TABLE}
+        ORDER BY etf_code, trade_date, row_id DESC
+        {_conflict_clause()}
+    """
+
+
+def latest_rows_sql(source: str, date_expr: str = "trade_date") -> str:
+    """source（表或已注册的DataFrame）中各ETF最新日期的查询，列为 etf_code、last_trade_date"""
+    return f"SELECT etf_code, MAX({date_expr}) AS last_trade_date FROM {source} GROUP BY etf_code"
+
+
+def watermark_upsert_sql(table_name: str, rows_sql: str) -> str:
+    """
+    把各ETF的最新日期合并到水位表的SQL（已有水位更新时不后退）
+
+    Args:
+        table_name: 行情表（schema.table）
+        rows_sql: 返回 etf_code、last_trade_date 列的查询
+    """
+    schema, table = table_name.split('.')
+    return f"""
+        INSERT INTO {schema}.{WATERMARK_TABLE} (table_name, etf_code, last_trade_date)
+        SELECT '{table}', etf_code, last_trade_date FROM ({rows_sql}) AS latest WHERE true
+        ON CONFLICT (table_name, etf_code) DO UPDATE SET
+            last_trade_date = CASE WHEN EXCLUDED.last_trade_date > {WATERMARK_TABLE}.last_trade_date
+                                   THEN EXCLUDED.last_trade_date ELSE {WATERMARK_TABLE}.last_trade_date END,
+            updated_at = CURRENT_TIMESTAMP
+    """
+
+
+def ensure_watermarks(db_manager, table_name: str):
+    """
+    确保水位表存在；行情表已有数据而水位表中还没有该表的记录时（首次启用），按已有数据初始化
+
+    Args:
+        db_manager: 已连接的 ETFDatabaseManager（事务由调用方提交）
+        table_name: 行情表（schema.table）
+    """
+    schema, table = table_name.split('.')
+    cursor = db_manager.cursor
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {schema}.{WATERMARK_TABLE} (
+            table_name VARCHAR(64) NOT NULL,
+            etf_code VARCHAR(10) NOT NULL,
+            last_trade_date DATE NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (table_name, etf_code)
+        )
+    """)
+    cursor.execute(f"SELECT COUNT(*) FROM {schema}.{WATERMARK_TABLE} WHERE table_name = %s", (table,))
+    if cursor.fetchone()[0] == 0:
+        cursor.execute(watermark_upsert_sql(table_name, latest_rows_sql(table_name)))
+
+
+def normalize_etf_code(etf_code: str) -> str:
+    """
+    标准化ETF代码：移除.SZ/.SH后缀（按代码CSV的文件名不带后缀，代码列和数据库中带后缀）
+
+    Args:
+        etf_code: 代码列或数据库中的代码（如 159001.SZ），或文件名（如 159001）
+
+    Returns:
+        6位数字代码（如 159001）
+    """
+    return str(etf_code).split('.')[0]
+
+
+def load_watermarks(db_manager, table_name: str) -> Dict[str, int]:
+    """
+    读取行情表各ETF的水位
+
+    Returns:
+        {标准化ETF代码（与文件名一致）: 已导入的最新交易日 YYYYMMDD 整数}
+    """
+    schema, table = table_name.split('.')
+    db_manager.cursor.execute(
+        f"SELECT etf_code, last_trade_date FROM {schema}.{WATERMARK_TABLE} WHERE table_name = %s", (table,))
+    watermarks = {}
+    for code, last_date in db_manager.cursor.fetchall():
+        code, last_date = normalize_etf_code(code), int(str(last_date)[:10].replace('-', ''))
+        # 同一文件名对应多个代码时取较早的水位（宁可多读几行）
+        watermarks[code] = min(last_date, watermarks.get(code, last_date))
+    return watermarks
+
+
+class BulkLoader:
+    """单个目标表的 COPY + 合并写入器"""
+
+    def __init__(self, connection, table_name: str, flush_rows: int = DEFAULT_FLUSH_ROWS,
+                 label: Optional[str] = None, verbose: bool = True):
+        """
+        初始化批量写入器
+
+        Args:
+            connection: psycopg2 连接（事务由调用方提交或回滚）
+            table_name: 目标表（schema.table，需有 UNIQUE(etf_code, trade_date)，同schema下需有水位表，
+                见 ensure_watermarks）
+            flush_rows: 暂存行数达到该值时自动合并
+            label: 进度输出中的名称，默认为目标表名
+            verbose: 每次合并后输出进度
+        """
+        self.connection = connection
+        self.cursor = connection.cursor()
+        self.table_name = table_name
+        self.flush_rows = max(1, flush_rows)
+        self.label = label or table_name
+        self.verbose = verbose
+        self.buffer = io.StringIO()
+        self.buffered_rows = 0
+        self.rows_merged = 0
+        self.started = time.perf_counter()
+        self._staging_ready = False
+
+    def _ensure_staging(self):
+        """创建会话私有的暂存表（同一连接上的多个写入器共用，合并后清空）"""
+        if self._staging_ready:
+            return
+        # 暂存列与目标表同为 NUMERIC：COPY 文本是浮点数的最短还原表示（与逐行插入时 psycopg2 传入的相同），
+        # 直接解析为 NUMERIC 不丢位数；经 DOUBLE PRECISION 再转 NUMERIC 只保留15位有效数字
+        numeric_columns = ",\n                ".join(f"{column} NUMERIC" for column in VALUE_COLUMNS)
+        self.cursor.execute(f"""
+            CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} (
+                row_id BIGSERIAL,
+                etf_code VARCHAR(10),
+                trade_date DATE,
+                {numeric_columns}
+            )
+        """)
+        self._staging_ready = True
+
+    def add_frame(self, df: pd.DataFrame) -> int:
+        """
+        加入一个按代码CSV的数据，暂存行数达到阈值时自动合并
+
+        Args:
+            df: 按代码CSV数据
+
+        Returns:
+            加入的有效行数
+        """
+        frame = prepare_frame(df)
+        return self.add_prepared(frame)
+
+    def add_records(self, records: Iterable[tuple]) -> int:
+        """加入按 COLUMNS 顺序排列的记录元组（兼容旧的批量插入接口）"""
+        frame = pd.DataFrame(list(records), columns=COLUMNS)
+        frame['trade_date'] = pd.to_datetime(frame['trade_date']).dt.strftime('%Y-%m-%d')
+        return self.add_prepared(frame)
+
+    def add_prepared(self, frame: pd.DataFrame) -> int:
+        """加入已是 COLUMNS 列的数据"""
+        if frame.empty:
+            return 0
+        # CSV格式中未加引号的空字段即为NULL
+        frame[COLUMNS].to_csv(self.buffer, header=False, index=False)
+        self.buffered_rows += len(frame)
+        if self.buffered_rows >= self.flush_rows:
+            self.flush()
+        return len(frame)
+
+    def flush(self) -> int:
+        """
+        把缓冲的行 COPY 进暂存表并合并到目标表
+
+        Returns:
+            本次合并写入（插入或更新）的行数
+        """
+        if not self.buffered_rows:
+            return 0
+        self._ensure_staging()
+        self.buffer.seek(0)
+        self.cursor.copy_expert(
+            f"COPY {STAGING_TABLE} ({', '.join(COLUMNS)}) FROM STDIN WITH (FORMAT csv)", self.buffer)
+        self.cursor.execute(upsert_sql(self.table_name))
+        merged = self.cursor.rowcount
+        self.cursor.execute(watermark_upsert_sql(self.table_name, latest_rows_sql(STAGING_TABLE)))
+        self.cursor.execute(f"TRUNCATE {STAGING_TABLE}")
+
+        self.buffer = io.StringIO()
+        self.buffered_rows = 0
+        self.rows_merged += merged
+        if self.verbose:
+            self.report()
+        return merged
+
+    def ingest_files(self, csv_files: List[str]) -> List[str]:
+        """
+        由数据库直接读取整个CSV文件（不经过pandas）
+
+        Returns:
+            已加入的文件；不支持的后端返回空列表，由调用方逐个读取后 add_frame
+        """
+        return []
+
+    def discard(self):
+        """丢弃尚未合并的缓冲行（调用方回滚事务时使用）"""
+        self.buffer = io.StringIO()
+        self.buffered_rows = 0
+        self._staging_ready = False  # 回滚会撤销本事务中创建的暂存表
+
+    @property
+    def rate(self) -> float:
+        """自创建以来的合并速度（行/秒）"""
+        elapsed = time.perf_counter() - self.started
+        return self.rows_merged / elapsed if elapsed > 0 else 0.0
+
+    def report(self):
+        """输出累计合并行数和速度"""
+        print(f"  ⚡ {self.label}: 已写入 {self.rows_merged:,} 行 ({self.rate:,.0f} 行/秒)")
+
+    def close(self) -> int:
+        """合并剩余缓冲行并关闭游标，返回累计合并行数"""
+        self.flush()
+        self.cursor.close()
+        return self.rows_merged
+
+
+class EmbeddedBulkLoader(BulkLoader):
+    """嵌入式后端（DuckDB/SQLite）的合并写入器，接口与 BulkLoader 相同"""
+
+    FRAME_NAME = "etf_import_frame"
+
+    def __init__(self, connection, table_name: str, flush_rows: int = DEFAULT_FLUSH_ROWS,
+                 label: Optional[str] = None, verbose: bool = True):
+        super().__init__(connection, table_name, flush_rows, label, verbose)
+        self.frames = []
+
+    def add_prepared(self, frame: pd.DataFrame) -> int:
+        """加入已是 COLUMNS 列的数据"""
+        if frame.empty:
+            return 0
+        self.frames.append(frame[COLUMNS])
+        self.buffered_rows += len(frame)
+        if self.buffered_rows >= self.flush_rows:
+            self.flush()
+        return len(frame)
+
+    def flush(self) -> int:
+        """合并缓冲的行到目标表"""
+        if not self.buffered_rows:
+            return 0
+        frame = pd.concat(self.frames, ignore_index=True).drop_duplicates(['etf_code', 'trade_date'], keep='last')
+        columns = ", ".join(COLUMNS)
+        if self.connection.backend == 'duckdb':
+            from embedded_db import translate_sql
+            raw = self.connection.raw
+            raw.register(self.FRAME_NAME, frame)
+            try:
+                select_columns = columns.replace("trade_date", "CAST(trade_date AS DATE)")
+                self.connection.execute(translate_sql(f"""
+                    INSERT INTO {self.table_name} ({columns})
+                    SELECT {select_columns} FROM {self.FRAME_NAME}
+                    {_conflict_clause()}
+                """, 'duckdb'))
+                self.connection.execute(translate_sql(watermark_upsert_sql(
+                    self.table_name, latest_rows_sql(self.FRAME_NAME, "CAST(trade_date AS DATE)")), 'duckdb'))
+            finally:
+                raw.unregister(self.FRAME_NAME)
+        else:
+            from embedded_db import sqlite_rows
+            placeholders = ", ".join("?" for _ in COLUMNS)
+            self.connection.raw.executemany(f"""
+                INSERT INTO {self.table_name} ({columns}) VALUES ({placeholders})
+                {_conflict_clause()}
+            """, sqlite_rows(frame))
+            latest = frame.groupby('etf_code')['trade_date'].max()
+            self.connection.raw.executemany(
+                watermark_upsert_sql(self.table_name, "SELECT ? AS etf_code, ? AS last_trade_date"),
+                list(latest.items()))
+
+        self.frames = []
+        self.buffered_rows = 0
+        self.rows_merged += len(frame)
+        if self.verbose:
+            self.report()
+        return len(frame)
+
+    def ingest_files(self, csv_files: List[str]) -> List[str]:
+        """
+        DuckDB：按表头分组，每组用一次 read_csv 直接读取并合并（有未压实尾段的文件除外）
+
+        Returns:
+            已合并的文件（SQLite返回空列表）
+        """
+        if self.connection.backend != 'duckdb':
+            return []
+        from embedded_db import group_by_header, translate_sql
+
+        self.flush()  # 保持写入顺序：先合并已缓冲的行
+        ingested = []
+        columns = ", ".join(COLUMNS)
+        values = ", ".join(f'TRY_CAST("{csv_column}" AS DOUBLE) AS {column}'
+                           for csv_column, column in list(CSV_COLUMNS.items())[2:])
+        groups = group_by_header([f for f in csv_files if not has_tail(f)], list(CSV_COLUMNS))
+        for header, group in groups.items():
+            types = ", ".join(f"'{name}': 'VARCHAR'" for name in header)
+            # 先读入临时表，合并行情和水位各用一次
+            self.connection.execute(f"""
+                CREATE OR REPLACE TEMP TABLE {self.FRAME_NAME} AS
+                SELECT DISTINCT ON (etf_code, trade_date) * FROM (
+                    SELECT "代码" AS etf_code,
+                           CAST(try_strptime(regexp_replace("日期", '\\.0$', ''), '%Y%m%d') AS DATE) AS trade_date,
+                           {values}
+                    FROM read_csv(?, header = true, auto_detect = false, columns = {{{types}}})
+                ) WHERE trade_date IS NOT NULL
+            """, [group])
+            merged = self.connection.execute(translate_sql(f"""
+                INSERT INTO {self.table_name} ({columns})
+                SELECT {columns} FROM {self.FRAME_NAME}
+                {_conflict_clause()}
+            """, 'duckdb')).fetchone()[0]
+            self.connection.execute(translate_sql(
+                watermark_upsert_sql(self.table_name, latest_rows_sql(self.FRAME_NAME)), 'duckdb'))
+            self.connection.execute(f"DROP TABLE {self.FRAME_NAME}")
+            self.rows_merged += merged
+            ingested.extend(group)
+        if ingested and self.verbose:
+            self.report()
+        return ingested
+
+    def discard(self):
+        """丢弃尚未合并的缓冲行"""
+        self.frames = []
+        self.buffered_rows = 0
+
+    def close(self) -> int:
+        """合并剩余缓冲行，返回累计合并行数"""
+        self.flush()
+        return self.rows_merged
+
+
+def create_loader(db_manager, table_name: str, **kwargs) -> BulkLoader:
+    """
+    按数据库后端创建写入器
+
+    Args:
+        db_manager: 已连接的 ETFDatabaseManager
+        table_name: 目标表
+        **kwargs: 透传给写入器（flush_rows、label、verbose）
+    """
+    loader_class = BulkLoader if db_manager.backend == 'postgresql' else EmbeddedBulkLoader
+    return loader_class(db_manager.connection, table_name, **kwargs)
+
+
+def main():
+    """把一个复权目录的全部按代码CSV批量写入指定表"""
+    if len(sys.argv) != 3:
+        print("用法: python bulk_loader.py <复权目录> <schema.table>")
+        return False
+
+    from db_connection import ETFDatabaseManager
+    from config.etf_store import read_etf_csv
+
+    category_dir, table_name = Path(sys.argv[1]), sys.argv[2]
+    db_manager = ETFDatabaseManager()
+    if not db_manager.connect():
+        return False
+    try:
+        ensure_watermarks(db_manager, table_name)
+        loader = create_loader(db_manager, table_name)
+        csv_files = sorted(category_dir.glob("*.csv"))
+        ingested = set(loader.ingest_files([str(f) for f in csv_files]))
+        for csv_file in csv_files:
+            if str(csv_file) not in ingested:
+                loader.add_frame(read_etf_csv(csv_file, encoding='utf-8'))
+        loader.close()
+        db_manager.connection.commit()
+        print(f"✅ {len(csv_files)} 个文件写入 {table_name}: {loader.rows_merged:,} 行")
+        return True
+    except Exception as e:
+        print(f"❌ 批量写入失败: {e}")
+        db_manager.connection.rollback()
+        return False
+    finally:
+        db_manager.disconnect()
+
+
+if __name__ == "__main__":
+    if not main():
+        sys.exit(1)
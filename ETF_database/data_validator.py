@@ -2,373 +2,384 @@
 # -*- coding: utf-8 -*-
 """
 ETF数据验证工具
-随机抽样验证数据库中的数据与原始CSV文件是否一致
+全量比对数据库与原始CSV文件是否一致（不再随机抽样）：
+1. 两侧都按 (ETF, 月份) 分桶聚合：行数、最早/最晚日期、各数值列乘以取整倍数后四舍五入的和（整数校验和）
+   数据库侧每个表一次 GROUP BY 全表扫描，CSV侧每个文件读取一次（优先列式副本，含追加模式的尾段）
+   校验精度为 0.5/取整倍数：除权表按CSV保存的小数位数取整（完全精确）；前/后复权价格是复权因子计算出的
+   全精度浮点数，按 1e-8 取整，小于约 5e-9 的价格差异不会被发现
+2. 分桶整体比对：数据库缺少的桶、CSV中没有的桶、统计不一致的桶
+3. 只对统计不一致的桶逐行比对（按代码+日期范围查询，走唯一索引），输出缺少/多余的日期和字段差异
 """
 
-import random
-import pandas as pd
-import psycopg2
-import os
-from typing import List, Dict, Any, Tuple
-from decimal import Decimal
+import argparse
 import logging
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from db_connection import ETFDatabaseManager
+from bulk_loader import VALUE_COLUMNS, prepare_frame
+from import_pool import PARALLEL_MIN_FILES, get_import_settings
+from config.columnar_store import read_etf_frame
 
 # 设置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+BUCKET_KEYS = ['etf_code', 'month']
+# 参与校验和的数值列 -> 取整倍数（按除权CSV保存的小数位数，取整前 x*倍数 与整数只差浮点误差，两侧取整一致）
+CHECKSUM_SCALES = {
+    'open_price': 1000,
+    'high_price': 1000,
+    'low_price': 1000,
+    'close_price': 1000,
+    'prev_close': 1000,
+    'change_amount': 1000,
+    'change_percent': 100,
+    'volume': 1,
+    'amount': 100,
+}
+# 前/后复权表的价格列不是CSV原样的小数，而是全精度浮点数（如 0.8602290750774405）
+ADJUSTED_TABLES = ['forward_adjusted', 'backward_adjusted']
+ADJUSTED_PRICE_COLUMNS = ['open_price', 'high_price', 'low_price', 'close_price', 'prev_close']
+ADJUSTED_PRICE_SCALE = 10 ** 8  # 价格 < 1e5 时每行 < 1e13，月度和远小于 BIGINT 上限，且在双精度的有效位数内
+STAT_COLUMNS = ['row_count', 'first_date', 'last_date'] + [f"sum_{column}" for column in CHECKSUM_SCALES]
+SOURCE_FILE = 'csv_file'  # CSV侧分桶统计中记录来源文件的列（代码列带交易所后缀，文件名不带）
+DEFAULT_MAX_DETAILS = 20  # 最多逐行比对并输出的不一致分桶数
+
+# 复权目录 -> 表名（日更、周更相同）
+CATEGORY_TABLES = {
+    '0_ETF日K(前复权)': 'forward_adjusted',
+    '0_ETF日K(后复权)': 'backward_adjusted',
+    '0_ETF日K(除权)': 'ex_rights',
+}
+
+
+def checksum_scales(table: str) -> Dict[str, int]:
+    """
+    表的各数值列取整倍数
+
+    全精度的复权价格按 1e-8 取整时，x*倍数 恰好落在 .5 上的概率可以忽略；若两侧取整因此不同，
+    该桶会被判为不一致，逐行比对（两侧用同一取整）显示 0 处差异
+    """
+    scales = dict(CHECKSUM_SCALES)
+    if table in ADJUSTED_TABLES:
+        scales.update({column: ADJUSTED_PRICE_SCALE for column in ADJUSTED_PRICE_COLUMNS})
+    return scales
+
+
+def scaled_values(values: pd.Series, scale: int) -> np.ndarray:
+    """按倍数取整（四舍五入、远离零，与数据库 ROUND 一致），缺失值记为0"""
+    values = values.to_numpy(dtype=float) * scale
+    rounded = np.sign(values) * np.floor(np.abs(values) + 0.5)
+    return np.nan_to_num(rounded).astype('int64')
+
+
+def read_csv_rows(csv_file: str) -> pd.DataFrame:
+    """读取CSV并转换为导入列（同一代码+日期保留最后一行，与导入时的合并规则一致）"""
+    frame = prepare_frame(read_etf_frame(csv_file))
+    return frame.drop_duplicates(['etf_code', 'trade_date'], keep='last')
+
+
+def bucket_stats(frame: pd.DataFrame, scales: Dict[str, int]) -> pd.DataFrame:
+    """按 (ETF, 月份) 聚合，列为 BUCKET_KEYS + STAT_COLUMNS"""
+    work = pd.DataFrame({
+        'etf_code': frame['etf_code'],
+        'month': frame['trade_date'].str[:7],
+        'trade_date': frame['trade_date'],
+    })
+    for column, scale in scales.items():
+        work[f"sum_{column}"] = scaled_values(frame[column], scale)
+    aggregations = {f"sum_{column}": (f"sum_{column}", 'sum') for column in scales}
+    return work.groupby(BUCKET_KEYS).agg(
+        row_count=('trade_date', 'size'),
+        first_date=('trade_date', 'min'),
+        last_date=('trade_date', 'max'),
+        **aggregations,
+    ).reset_index()
+
+
+def csv_bucket_stats(scales: Dict[str, int], csv_file: str) -> Tuple[str, Optional[pd.DataFrame]]:
+    """一个CSV文件的分桶聚合（进程池工作函数），多一列来源文件；无法读取时返回None"""
+    try:
+        stats = bucket_stats(read_csv_rows(csv_file), scales)
+    except Exception:
+        return csv_file, None
+    stats[SOURCE_FILE] = csv_file
+    return csv_file, stats
+
+
+def db_stats_sql(table_name: str, scales: Dict[str, int]) -> str:
+    """数据库侧分桶聚合SQL（PostgreSQL、DuckDB、SQLite 通用写法）"""
+    date_text = "CAST(trade_date AS VARCHAR(10))"
+    sums = ",\n               ".join(
+        f"CAST(SUM(CAST(ROUND({column} * {scale}) AS BIGINT)) AS BIGINT) AS sum_{column}"
+        for column, scale in scales.items())
+    return f"""
+        SELECT etf_code, SUBSTR({date_text}, 1, 7) AS month,
+               COUNT(*) AS row_count, MIN({date_text}) AS first_date, MAX({date_text}) AS last_date,
+               {sums}
+        FROM {table_name}
+        GROUP BY 1, 2
+    """
+
+
+def _next_month(month: str) -> str:
+    """YYYY-MM 的下一个月第一天 YYYY-MM-DD"""
+    year, month_number = int(month[:4]), int(month[5:7])
+    year, month_number = (year + 1, 1) if month_number == 12 else (year, month_number + 1)
+    return f"{year:04d}-{month_number:02d}-01"
+
+
 class ETFDataValidator:
-    def __init__(self):
+    """按 (ETF, 月份) 聚合全量比对数据库与CSV"""
+
+    def __init__(self, base_dir: Optional[str] = None, schema: str = 'basic_info_daily',
+                 max_details: int = DEFAULT_MAX_DETAILS, workers: Optional[int] = None):
+        """
+        初始化验证器
+
+        Args:
+            base_dir: CSV数据目录（三个复权目录所在目录），默认日更为 ETF日更，周更为 ETF周更
+            schema: basic_info_daily 或 basic_info_weekly
+            max_details: 每个表最多逐行比对并输出的不一致分桶数
+            workers: 读取CSV的进程数，None表示使用 database_import.workers 配置
+        """
         self.connection = None
         self.cursor = None
-        
-        # 数据库连接参数
-        self.db_config = {
-            'host': 'localhost',
-            'port': 5432,
-            'database': 'etf',
-            'user': 'postgres',
-            'password': os.getenv('DB_PASSWORD', '')
-        }
-        
-        # CSV目录路径
-        self.csv_dirs = {
-            'forward_adjusted': '../ETF日更/0_ETF日K(前复权)',
-            'backward_adjusted': '../ETF日更/0_ETF日K(后复权)', 
-            'ex_rights': '../ETF日更/0_ETF日K(除权)'
-        }
-        
-        # 数据库表名
-        self.db_tables = {
-            'forward_adjusted': 'basic_info_daily.forward_adjusted',
-            'backward_adjusted': 'basic_info_daily.backward_adjusted',
-            'ex_rights': 'basic_info_daily.ex_rights'
-        }
-        
-        # CSV字段到数据库字段的映射
-        self.field_mapping = {
-            '代码': 'etf_code',
-            '日期': 'trade_date',
-            '开盘价': 'open_price',
-            '最高价': 'high_price', 
-            '最低价': 'low_price',
-            '收盘价': 'close_price',
-            '上日收盘': 'prev_close',
-            '涨跌': 'change_amount',
-            '涨幅%': 'change_percent',
-            '成交量(手数)': 'volume',
-            '成交额(千元)': 'turnover'
-        }
-    
+
+        # 数据库连接（后端和参数来自环境变量，见 db_connection.py）
+        self.db_manager = ETFDatabaseManager()
+
+        default_dir = 'ETF周更' if schema == 'basic_info_weekly' else 'ETF日更'
+        self.base_dir = Path(base_dir) if base_dir else Path(__file__).parent.parent / default_dir
+        self.schema = schema
+        self.max_details = max_details
+        self.workers = workers or get_import_settings()[0]
+
     def connect(self) -> bool:
         """连接数据库"""
-        try:
-            self.connection = psycopg2.connect(**self.db_config)
-            self.cursor = self.connection.cursor()
-            logger.info("✅ 已连接到数据库")
-            return True
-        except Exception as e:
-            logger.error(f"❌ 数据库连接失败: {e}")
+        if not self.db_manager.connect():
+            logger.error(f"❌ 数据库连接失败: {self.db_manager.describe()}")
             return False
-    
+        self.connection = self.db_manager.connection
+        self.cursor = self.db_manager.cursor
+        return True
+
     def disconnect(self):
         """断开数据库连接"""
-        if self.cursor:
-            self.cursor.close()
-        if self.connection:
-            self.connection.close()
-        logger.info("🔌 数据库连接已断开")
-    
-    def get_random_etfs(self, count: int = 5) -> List[str]:
-        """获取随机ETF代码"""
-        try:
-            self.cursor.execute("""
-                SELECT DISTINCT etf_code 
-                FROM basic_info_daily.forward_adjusted 
-                ORDER BY RANDOM() 
-                LIMIT %s
-            """, (count,))
-            
-            etfs = [row[0] for row in self.cursor.fetchall()]
-            logger.info(f"📋 随机选择了 {len(etfs)} 个ETF: {', '.join(etfs)}")
-            return etfs
-            
-        except Exception as e:
-            logger.error(f"❌ 获取随机ETF失败: {e}")
-            return []
-    
-    def get_db_sample_data(self, etf_code: str, table_type: str, sample_size: int = 50) -> List[Dict]:
-        """从数据库获取样本数据"""
-        try:
-            table_name = self.db_tables[table_type]
-            
-            query = f"""
-                SELECT etf_code, trade_date, open_price, high_price, low_price, 
-                       close_price, prev_close, change_amount, change_percent, 
-                       volume, turnover
-                FROM {table_name}
-                WHERE etf_code = %s
-                ORDER BY RANDOM()
-                LIMIT %s
-            """
-            
-            self.cursor.execute(query, (etf_code, sample_size))
-            rows = self.cursor.fetchall()
-            
-            columns = ['etf_code', 'trade_date', 'open_price', 'high_price', 'low_price',
-                      'close_price', 'prev_close', 'change_amount', 'change_percent', 
-                      'volume', 'turnover']
-            
-            data = []
-            for row in rows:
-                record = {}
-                for i, col in enumerate(columns):
-                    value = row[i]
-                    # 转换日期格式
-                    if col == 'trade_date':
-                        value = value.strftime('%Y-%m-%d')
-                    # 转换Decimal为float
-                    elif isinstance(value, Decimal):
-                        value = float(value)
-                    record[col] = value
-                data.append(record)
-            
-            logger.info(f"📊 从数据库获取 {etf_code} ({table_type}) 数据: {len(data)} 条记录")
-            return data
-            
-        except Exception as e:
-            logger.error(f"❌ 获取数据库数据失败: {e}")
-            return []
-    
-    def get_csv_data(self, etf_code: str, table_type: str, target_dates: List[str]) -> List[Dict]:
-        """从CSV文件获取对应日期的数据"""
-        try:
-            csv_dir = self.csv_dirs[table_type]
-            csv_file = os.path.join(csv_dir, f"{etf_code}.csv")
-            
-            if not os.path.exists(csv_file):
-                logger.warning(f"⚠️ CSV文件不存在: {csv_file}")
-                return []
-            
-            # 读取CSV文件
-            df = pd.read_csv(csv_file, encoding='utf-8-sig')
-            
-            # 过滤目标日期
-            df['日期'] = pd.to_datetime(df['日期']).dt.strftime('%Y-%m-%d')
-            filtered_df = df[df['日期'].isin(target_dates)]
-            
-            # 转换为字典列表
-            data = []
-            for _, row in filtered_df.iterrows():
-                record = {}
-                for csv_field, db_field in self.field_mapping.items():
-                    value = row[csv_field]
-                    
-                    # 数据类型转换
-                    if db_field == 'etf_code':
-                        # 确保ETF代码格式一致
-                        if '.' not in str(value):
-                            # 根据代码前缀添加后缀
-                            code_str = str(value)
-                            if code_str.startswith('1'):
-                                value = f"{code_str}.SZ"
-                            elif code_str.startswith(('5', '6')):
-                                value = f"{code_str}.SH"
-                    elif db_field == 'trade_date':
-                        value = str(value)
-                    elif db_field in ['volume', 'turnover']:
-                        value = int(value) if pd.notna(value) else 0
-                    else:
-                        value = float(value) if pd.notna(value) else 0.0
-                    
-                    record[db_field] = value
-                data.append(record)
-            
-            logger.info(f"📁 从CSV获取 {etf_code} ({table_type}) 数据: {len(data)} 条记录")
-            return data
-            
-        except Exception as e:
-            logger.error(f"❌ 读取CSV数据失败: {e}")
-            return []
-    
-    def compare_records(self, db_record: Dict, csv_record: Dict) -> Tuple[bool, List[str]]:
-        """比较单条记录的一致性"""
-        differences = []
-        
-        for field in self.field_mapping.values():
-            db_value = db_record.get(field)
-            csv_value = csv_record.get(field)
-            
-            # 数值比较（允许小的浮点数误差）
-            if field in ['open_price', 'high_price', 'low_price', 'close_price', 
-                        'prev_close', 'change_amount', 'change_percent']:
-                if abs(float(db_value or 0) - float(csv_value or 0)) > 0.001:
-                    differences.append(f"{field}: DB={db_value}, CSV={csv_value}")
-            
-            # 整数比较
-            elif field in ['volume', 'turnover']:
-                if int(db_value or 0) != int(csv_value or 0):
-                    differences.append(f"{field}: DB={db_value}, CSV={csv_value}")
-            
-            # 字符串比较
-            else:
-                if str(db_value) != str(csv_value):
-                    differences.append(f"{field}: DB={db_value}, CSV={csv_value}")
-        
-        return len(differences) == 0, differences
-    
-    def validate_etf_data(self, etf_code: str, table_type: str, sample_size: int = 50):
-        """验证单个ETF的数据一致性"""
-        logger.info(f"\n🔍 验证 {etf_code} ({table_type}) 数据一致性...")
-        
-        # 获取数据库样本数据
-        db_data = self.get_db_sample_data(etf_code, table_type, sample_size)
-        if not db_data:
-            logger.warning(f"⚠️ 数据库中没有 {etf_code} 的数据")
-            return False, 0, 0
-        
-        # 提取日期列表
-        target_dates = [record['trade_date'] for record in db_data]
-        
-        # 获取CSV对应数据
-        csv_data = self.get_csv_data(etf_code, table_type, target_dates)
-        if not csv_data:
-            logger.warning(f"⚠️ CSV文件中没有找到对应数据")
-            return False, 0, 0
-        
-        # 创建CSV数据索引（按日期）
-        csv_index = {record['trade_date']: record for record in csv_data}
-        
-        # 逐条对比
-        total_compared = 0
-        total_matched = 0
-        
-        for db_record in db_data:
-            trade_date = db_record['trade_date']
-            csv_record = csv_index.get(trade_date)
-            
-            if csv_record:
-                total_compared += 1
-                is_match, differences = self.compare_records(db_record, csv_record)
-                
-                if is_match:
-                    total_matched += 1
-                    logger.info(f"✅ {trade_date}: 数据一致")
-                else:
-                    logger.warning(f"❌ {trade_date}: 数据不一致")
-                    for diff in differences[:3]:  # 只显示前3个差异
-                        logger.warning(f"   - {diff}")
+        self.db_manager.disconnect()
+        self.connection = None
+        self.cursor = None
+
+    def get_csv_stats(self, category_dir: Path, scales: Dict[str, int]) -> Tuple[pd.DataFrame, List[str]]:
+        """
+        一个复权目录全部CSV的分桶聚合
+
+        Returns:
+            (分桶统计（含来源文件列）, 无法读取的文件列表)
+        """
+        csv_files = [str(path) for path in sorted(category_dir.glob("*.csv"))]
+        worker = partial(csv_bucket_stats, scales)
+        if self.workers > 1 and len(csv_files) >= PARALLEL_MIN_FILES:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                results = list(executor.map(worker, csv_files, chunksize=32))
+        else:
+            results = [worker(csv_file) for csv_file in csv_files]
+
+        frames = [stats for _, stats in results if stats is not None and not stats.empty]
+        unreadable = [csv_file for csv_file, stats in results if stats is None]
+        if not frames:
+            return pd.DataFrame(columns=BUCKET_KEYS + STAT_COLUMNS + [SOURCE_FILE]), unreadable
+        return pd.concat(frames, ignore_index=True), unreadable
+
+    def get_db_stats(self, table_name: str, scales: Dict[str, int]) -> pd.DataFrame:
+        """数据库表的分桶聚合（一次全表扫描）"""
+        stats = self.db_manager.query_frame(db_stats_sql(table_name, scales))
+        for column in STAT_COLUMNS:
+            if column.startswith('sum_') or column == 'row_count':
+                stats[column] = pd.to_numeric(stats[column]).fillna(0).astype('int64')
             else:
-                logger.warning(f"⚠️ {trade_date}: CSV中未找到对应数据")
-        
-        match_rate = (total_matched / total_compared * 100) if total_compared > 0 else 0
-        logger.info(f"📊 {etf_code} ({table_type}) 匹配率: {match_rate:.1f}% ({total_matched}/{total_compared})")
-        
-        return True, total_matched, total_compared
-    
-    def run_validation(self, etf_count: int = 5, sample_size: int = 50):
-        """运行完整的数据验证"""
-        logger.info("🚀 开始ETF数据验证...")
-        
+                stats[column] = stats[column].astype(str)
+        return stats
+
+    def compare_buckets(self, csv_stats: pd.DataFrame, db_stats: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+        """
+        分桶比对
+
+        Returns:
+            {'missing': 数据库缺少的桶, 'extra': CSV中没有的桶, 'mismatched': 统计不一致的桶（两侧统计）,
+             'matched': 一致的桶}
+        """
+        merged = csv_stats.merge(db_stats, on=BUCKET_KEYS, how='outer', suffixes=('_csv', '_db'), indicator=True)
+        both = merged[merged['_merge'] == 'both']
+        differs = np.zeros(len(both), dtype=bool)
+        for column in STAT_COLUMNS:
+            # 只在一侧出现的桶会让整数列变为浮点，直接比较数值而不是文本
+            differs |= (both[f"{column}_csv"] != both[f"{column}_db"]).to_numpy()
+        return {
+            'missing': merged[merged['_merge'] == 'left_only'],
+            'extra': merged[merged['_merge'] == 'right_only'],
+            'mismatched': both[differs],
+            'matched': both[~differs],
+        }
+
+    def drill_down(self, table_name: str, csv_file: Path, etf_code: str, month: str,
+                   csv_cache: Dict[str, pd.DataFrame], scales: Dict[str, int]) -> List[str]:
+        """逐行比对一个不一致的分桶（csv_file 为分桶统计记录的来源文件），返回差异描述"""
+        db_rows = self.db_manager.query_frame(f"""
+            SELECT etf_code, CAST(trade_date AS VARCHAR(10)) AS trade_date, {', '.join(VALUE_COLUMNS)}
+            FROM {table_name}
+            WHERE etf_code = %s AND trade_date >= %s AND trade_date < %s
+        """, [etf_code, f"{month}-01", _next_month(month)])
+
+        if str(csv_file) not in csv_cache:
+            csv_cache[str(csv_file)] = read_csv_rows(str(csv_file)) if csv_file.exists() else pd.DataFrame(
+                columns=['etf_code', 'trade_date'] + VALUE_COLUMNS)
+        csv_rows = csv_cache[str(csv_file)]
+        csv_rows = csv_rows[(csv_rows['etf_code'] == etf_code) & (csv_rows['trade_date'].str[:7] == month)]
+
+        merged = csv_rows.merge(db_rows, on=['etf_code', 'trade_date'], how='outer',
+                                suffixes=('_csv', '_db'), indicator=True)
+        differences = []
+        for trade_date in sorted(merged.loc[merged['_merge'] == 'left_only', 'trade_date']):
+            differences.append(f"{trade_date}: 数据库缺少该行")
+        for trade_date in sorted(merged.loc[merged['_merge'] == 'right_only', 'trade_date']):
+            differences.append(f"{trade_date}: CSV中没有该行")
+
+        both = merged[merged['_merge'] == 'both'].sort_values('trade_date')
+        for column, scale in scales.items():
+            csv_values = scaled_values(both[f"{column}_csv"], scale)
+            db_values = scaled_values(both[f"{column}_db"], scale)
+            for index in np.flatnonzero(csv_values != db_values):
+                row = both.iloc[index]
+                differences.append(f"{row['trade_date']}: {column} CSV={row[f'{column}_csv']}, "
+                                   f"DB={row[f'{column}_db']}")
+        return differences
+
+    def validate_table(self, category: str, table: str) -> Dict:
+        """校验一个复权目录与对应的表"""
+        table_name = f"{self.schema}.{table}"
+        category_dir = self.base_dir / category
+        scales = checksum_scales(table)
+        started = time.perf_counter()
+
+        csv_stats, unreadable = self.get_csv_stats(category_dir, scales)
+        db_stats = self.get_db_stats(table_name, scales)
+        buckets = self.compare_buckets(csv_stats, db_stats)
+
+        result = {
+            'buckets': len(buckets['matched']) + len(buckets['mismatched'])
+                       + len(buckets['missing']) + len(buckets['extra']),
+            'matched': len(buckets['matched']),
+            'mismatched': len(buckets['mismatched']),
+            'missing': len(buckets['missing']),
+            'extra': len(buckets['extra']),
+            'csv_rows': int(csv_stats['row_count'].sum()),
+            'db_rows': int(db_stats['row_count'].sum()),
+            'unreadable': unreadable,
+        }
+
+        logger.info(f"📊 {table_name}: {result['buckets']:,} 个(ETF, 月份)分桶，CSV {result['csv_rows']:,} 行，"
+                    f"数据库 {result['db_rows']:,} 行，耗时 {time.perf_counter() - started:.2f} 秒")
+        for csv_file in unreadable:
+            logger.warning(f"⚠️ CSV文件无法读取: {csv_file}")
+
+        for _, bucket in buckets['missing'].head(self.max_details).iterrows():
+            logger.warning(f"❌ {bucket['etf_code']} {bucket['month']}: 数据库缺少 {int(bucket['row_count_csv'])} 行"
+                           f"（{bucket['first_date_csv']} ~ {bucket['last_date_csv']}）")
+        for _, bucket in buckets['extra'].head(self.max_details).iterrows():
+            logger.warning(f"❌ {bucket['etf_code']} {bucket['month']}: CSV中没有数据库的 {int(bucket['row_count_db'])} 行"
+                           f"（{bucket['first_date_db']} ~ {bucket['last_date_db']}）")
+
+        # 只对统计不一致的桶逐行比对
+        csv_cache = {}
+        for _, bucket in buckets['mismatched'].head(self.max_details).iterrows():
+            csv_file = Path(bucket[SOURCE_FILE])
+            differences = self.drill_down(table_name, csv_file, bucket['etf_code'], bucket['month'], csv_cache, scales)
+            logger.warning(f"❌ {bucket['etf_code']} {bucket['month']}: {len(differences)} 处差异")
+            for difference in differences[:5]:  # 每个桶只显示前5处差异
+                logger.warning(f"   - {difference}")
+
+        shown = min(self.max_details, len(buckets['mismatched']))
+        if len(buckets['mismatched']) > shown:
+            logger.warning(f"   ... 另有 {len(buckets['mismatched']) - shown} 个不一致的分桶未逐行比对")
+        return result
+
+    def run_validation(self) -> Dict[str, Dict]:
+        """运行完整的数据验证，返回 {表名: 校验结果}"""
+        logger.info(f"🚀 开始ETF数据全量验证: {self.schema} <-> {self.base_dir}")
+        started = time.perf_counter()
+        results = {}
+
         if not self.connect():
-            return
-        
+            return results
+
         try:
-            # 获取随机ETF样本
-            random_etfs = self.get_random_etfs(etf_count)
-            if not random_etfs:
-                logger.error("❌ 无法获取随机ETF样本")
-                return
-            
-            # 验证每种复权类型
-            table_types = ['forward_adjusted', 'backward_adjusted', 'ex_rights']
-            type_names = ['前复权', '后复权', '除权']
-            
-            overall_stats = {
-                'total_compared': 0,
-                'total_matched': 0,
-                'etf_results': {}
-            }
-            
-            for table_type, type_name in zip(table_types, type_names):
-                logger.info(f"\n{'='*60}")
-                logger.info(f"🔍 验证 {type_name} 数据")
-                logger.info(f"{'='*60}")
-                
-                type_matched = 0
-                type_compared = 0
-                
-                for etf_code in random_etfs:
-                    success, matched, compared = self.validate_etf_data(etf_code, table_type, sample_size)
-                    
-                    if success:
-                        type_matched += matched
-                        type_compared += compared
-                        overall_stats['total_matched'] += matched
-                        overall_stats['total_compared'] += compared
-                        
-                        if etf_code not in overall_stats['etf_results']:
-                            overall_stats['etf_results'][etf_code] = {}
-                        overall_stats['etf_results'][etf_code][table_type] = {
-                            'matched': matched,
-                            'compared': compared,
-                            'rate': (matched/compared*100) if compared > 0 else 0
-                        }
-                
-                type_rate = (type_matched / type_compared * 100) if type_compared > 0 else 0
-                logger.info(f"\n📊 {type_name} 整体匹配率: {type_rate:.1f}% ({type_matched}/{type_compared})")
-            
-            # 总结报告
-            self.print_validation_summary(overall_stats, random_etfs)
-            
+            for category, table in CATEGORY_TABLES.items():
+                if not (self.base_dir / category).exists():
+                    logger.warning(f"⚠️ 目录不存在: {self.base_dir / category}")
+                    continue
+                results[table] = self.validate_table(category, table)
+
+            self.print_validation_summary(results, time.perf_counter() - started)
+
         finally:
             self.disconnect()
-    
-    def print_validation_summary(self, stats: Dict, etfs: List[str]):
+
+        return results
+
+    def print_validation_summary(self, results: Dict[str, Dict], elapsed: float):
         """打印验证总结报告"""
         logger.info(f"\n{'='*80}")
         logger.info("📋 数据验证总结报告")
         logger.info(f"{'='*80}")
-        
-        overall_rate = (stats['total_matched'] / stats['total_compared'] * 100) if stats['total_compared'] > 0 else 0
-        
-        logger.info(f"🎯 总体验证结果:")
-        logger.info(f"   📊 总匹配率: {overall_rate:.1f}%")
-        logger.info(f"   ✅ 匹配记录: {stats['total_matched']:,}")
-        logger.info(f"   📈 总验证数: {stats['total_compared']:,}")
-        
-        logger.info(f"\n📋 各ETF详细结果:")
-        for etf_code in etfs:
-            if etf_code in stats['etf_results']:
-                logger.info(f"\n  🏢 {etf_code}:")
-                etf_data = stats['etf_results'][etf_code]
-                
-                for table_type in ['forward_adjusted', 'backward_adjusted', 'ex_rights']:
-                    type_names = {'forward_adjusted': '前复权', 'backward_adjusted': '后复权', 'ex_rights': '除权'}
-                    if table_type in etf_data:
-                        result = etf_data[table_type]
-                        logger.info(f"    📊 {type_names[table_type]}: {result['rate']:.1f}% ({result['matched']}/{result['compared']})")
-        
-        if overall_rate >= 99.0:
-            logger.info(f"\n🎉 数据验证通过！数据库与CSV文件数据高度一致！")
-        elif overall_rate >= 95.0:
-            logger.info(f"\n✅ 数据验证基本通过，存在少量差异，建议进一步检查")
+
+        type_names = {'forward_adjusted': '前复权', 'backward_adjusted': '后复权', 'ex_rights': '除权'}
+        for table, result in results.items():
+            status = "✅" if is_consistent(result) else "❌"
+            logger.info(f"  {status} {type_names[table]}: {result['matched']:,}/{result['buckets']:,} 个分桶一致，"
+                        f"不一致 {result['mismatched']}，数据库缺少 {result['missing']}，CSV中没有 {result['extra']}")
+
+        total_rows = sum(result['db_rows'] for result in results.values())
+        logger.info(f"⏱️ 全量校验 {total_rows:,} 行，耗时 {elapsed:.2f} 秒")
+        if results and all(is_consistent(result) for result in results.values()):
+            logger.info("🎉 数据验证通过！数据库与CSV文件完全一致！")
         else:
-            logger.info(f"\n⚠️ 数据验证发现较多差异，建议详细检查导入过程")
+            logger.info("⚠️ 数据验证发现差异，建议按上面的分桶检查导入过程")
+
+
+def is_consistent(result: Dict) -> bool:
+    """一个表的校验结果是否完全一致"""
+    return not (result['mismatched'] or result['missing'] or result['extra'] or result['unreadable'])
 
 
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description='ETF数据验证工具（按ETF+月份聚合，全量比对数据库与CSV）')
+    parser.add_argument('--weekly', action='store_true', help='校验周更数据（默认校验日更数据）')
+    parser.add_argument('--base-dir', help='CSV数据目录（默认 ETF日更 或 ETF周更）')
+    parser.add_argument('--details', type=int, default=DEFAULT_MAX_DETAILS,
+                        help=f'每个表最多逐行比对的不一致分桶数 (默认: {DEFAULT_MAX_DETAILS})')
+    args = parser.parse_args()
+
     print("🔍 ETF数据验证工具")
-    print("随机抽样验证数据库与CSV文件数据一致性")
+    print("按(ETF, 月份)聚合全量比对数据库与CSV文件，只逐行比对不一致的分桶")
     print("="*80)
-    
-    # 创建验证器
-    validator = ETFDataValidator()
-    
-    # 运行验证 (5个随机ETF，每个50条记录样本)
-    validator.run_validation(etf_count=5, sample_size=50)
+
+    validator = ETFDataValidator(base_dir=args.base_dir,
+                                 schema='basic_info_weekly' if args.weekly else 'basic_info_daily',
+                                 max_details=args.details)
+    results = validator.run_validation()
+    return bool(results) and all(is_consistent(result) for result in results.values())
 
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    sys.exit(0 if main() else 1)
@@ -3,6 +3,7 @@
 """
 ETF数据库检查工具
 显示数据库连接信息、表结构、字段信息和数据样本
+支持 PostgreSQL 和嵌入式后端（DB_BACKEND=duckdb/sqlite），可做横截面查询（某日全部ETF）
 """
 
 import sys
@@ -32,6 +33,11 @@ class DatabaseChecker:
         print("=" * 60)
         
         config = self.db_manager.config
+        if self.db_manager.is_embedded:
+            print(f"🗄️  嵌入式数据库: {self.db_manager.backend}")
+            print(f"📁 数据库文件: {self.db_manager.path}")
+            print()
+            return self._show_server_info()
         print(f"📍 服务器地址: {config['host']}")
         print(f"🔌 端口号: {config['port']}")
         print(f"🗄️  数据库名: {config['database']}")
@@ -39,25 +45,26 @@ class DatabaseChecker:
         print(f"🔒 密码: {'*' * len(str(config['password']))}")
         print(f"📊 连接字符串: postgresql://{config['user']}:{'*' * len(str(config['password']))}@{config['host']}:{config['port']}/{config['database']}")
         print()
-        
-        # 测试连接
+        return self._show_server_info()
+    
+    def _show_server_info(self):
+        """测试连接并显示数据库版本和基本信息"""
         if self.db_manager.connect():
             print("✅ 数据库连接正常")
             
             # 获取数据库版本和基本信息
             try:
-                self.db_manager.cursor.execute("SELECT version();")
-                version = self.db_manager.cursor.fetchone()[0]
-                print(f"🐘 PostgreSQL版本: {version.split(',')[0]}")
+                print(f"🐘 数据库版本: {self.db_manager.server_version()}")
                 
-                self.db_manager.cursor.execute("SELECT NOW();")
+                self.db_manager.cursor.execute("SELECT CAST(CURRENT_TIMESTAMP AS VARCHAR);")
                 server_time = self.db_manager.cursor.fetchone()[0]
                 print(f"⏰ 服务器时间: {server_time}")
                 
-                self.db_manager.cursor.execute("SELECT current_database(), current_user;")
-                db_name, user_name = self.db_manager.cursor.fetchone()
-                print(f"📋 当前数据库: {db_name}")
-                print(f"👨‍💻 当前用户: {user_name}")
+                if not self.db_manager.is_embedded:
+                    self.db_manager.cursor.execute("SELECT current_database(), current_user;")
+                    db_name, user_name = self.db_manager.cursor.fetchone()
+                    print(f"📋 当前数据库: {db_name}")
+                    print(f"👨‍💻 当前用户: {user_name}")
                 
             except Exception as e:
                 print(f"⚠️ 获取数据库信息失败: {e}")
@@ -79,13 +86,7 @@ class DatabaseChecker:
         
         try:
             # 获取所有schema
-            self.db_manager.cursor.execute("""
-                SELECT schema_name 
-                FROM information_schema.schemata 
-                WHERE schema_name NOT IN ('information_schema', 'pg_catalog', 'pg_toast', 'pg_temp_1')
-                ORDER BY schema_name
-            """)
-            schemas = [row[0] for row in self.db_manager.cursor.fetchall()]
+            schemas = self.db_manager.list_schemas()
             
             print(f"📁 发现 {len(schemas)} 个Schema:")
             
@@ -97,13 +98,7 @@ class DatabaseChecker:
                 print("-" * 50)
                 
                 # 获取schema下的所有表
-                self.db_manager.cursor.execute("""
-                    SELECT table_name 
-                    FROM information_schema.tables 
-                    WHERE table_schema = %s 
-                    ORDER BY table_name
-                """, (schema,))
-                tables = [row[0] for row in self.db_manager.cursor.fetchall()]
+                tables = self.db_manager.list_tables(schema)
                 
                 if not tables:
                     print("  📋 无表")
@@ -126,13 +121,7 @@ class DatabaseChecker:
                         continue
                     
                     # 获取表结构
-                    self.db_manager.cursor.execute("""
-                        SELECT column_name, data_type, is_nullable, column_default, character_maximum_length
-                        FROM information_schema.columns 
-                        WHERE table_schema = %s AND table_name = %s 
-                        ORDER BY ordinal_position
-                    """, (schema, table))
-                    columns = self.db_manager.cursor.fetchall()
+                    columns = self.db_manager.table_columns(schema, table)
                     
                     print(f"       🏗️  字段结构 ({len(columns)}个字段):")
                     for col_name, col_type, nullable, default, max_length in columns:
@@ -198,13 +187,7 @@ class DatabaseChecker:
         
         try:
             # 检查表是否存在
-            self.db_manager.cursor.execute("""
-                SELECT COUNT(*) 
-                FROM information_schema.tables 
-                WHERE table_schema = %s AND table_name = %s
-            """, (schema_name, table_name))
-            
-            if self.db_manager.cursor.fetchone()[0] == 0:
+            if table_name not in self.db_manager.list_tables(schema_name):
                 print(f"❌ 表不存在: {schema_name}.{table_name}")
                 return False
             
@@ -214,13 +197,7 @@ class DatabaseChecker:
             print(f"📊 总记录数: {total_count:,}")
             
             # 获取表结构
-            self.db_manager.cursor.execute("""
-                SELECT column_name, data_type, is_nullable, column_default, character_maximum_length
-                FROM information_schema.columns 
-                WHERE table_schema = %s AND table_name = %s 
-                ORDER BY ordinal_position
-            """, (schema_name, table_name))
-            columns = self.db_manager.cursor.fetchall()
+            columns = self.db_manager.table_columns(schema_name, table_name)
             
             print(f"🏗️  表结构 ({len(columns)}个字段):")
             for col_name, col_type, nullable, default, max_length in columns:
@@ -261,6 +238,29 @@ class DatabaseChecker:
         finally:
             self.db_manager.disconnect()
     
+    def show_cross_section(self, table_name, trade_date, limit=5):
+        """显示某个交易日全部ETF的行情（横截面查询）"""
+        if not self.db_manager.connect():
+            return False
+        
+        print(f"\n📅 横截面查询: {table_name} @ {trade_date}")
+        print("=" * 60)
+        
+        try:
+            started = datetime.now()
+            frame = self.db_manager.cross_section(table_name, trade_date)
+            elapsed = (datetime.now() - started).total_seconds()
+            print(f"📊 {len(frame)} 只ETF，耗时 {elapsed:.3f} 秒")
+            if not frame.empty:
+                print(frame.head(limit).to_string(index=False))
+            return True
+            
+        except Exception as e:
+            print(f"❌ 横截面查询失败: {e}")
+            return False
+        finally:
+            self.db_manager.disconnect()
+    
     def run_complete_check(self):
         """运行完整的数据库检查"""
         print("🚀 ETF数据库完整检查工具")
@@ -286,6 +286,8 @@ def main():
     parser = argparse.ArgumentParser(description='ETF数据库检查工具')
     parser.add_argument('--table', nargs=2, metavar=('SCHEMA', 'TABLE'),
                         help='查看指定表的详细信息 (格式: schema table)')
+    parser.add_argument('--cross-section', nargs=2, metavar=('TABLE', 'DATE'),
+                        help='查看某日全部ETF的行情 (格式: schema.table YYYY-MM-DD)')
     parser.add_argument('--limit', type=int, default=5,
                         help='数据样本显示条数 (默认: 5)')
     
@@ -293,7 +295,11 @@ def main():
     
     checker = DatabaseChecker()
     
-    if args.table:
+    if args.cross_section:
+        # 横截面查询
+        table_name, trade_date = args.cross_section
+        checker.show_cross_section(table_name, trade_date, args.limit)
+    elif args.table:
         # 查看指定表
         schema_name, table_name = args.table
         checker.show_connection_info()
@@ -3,24 +3,42 @@
 """
 ETF数据库连接管理器
 提供数据库连接、配置管理和数据库初始化功能
+
+后端由 DB_BACKEND 环境变量选择：
+- postgresql（默认）：连接参数来自 DB_HOST/DB_PORT/DB_NAME/DB_USER/DB_PASSWORD，需要 psycopg2
+- duckdb / sqlite：嵌入式数据库文件（DB_PATH，默认 ETF_database/etf.duckdb 或 etf.sqlite），无需数据库服务
 """
 
 import os
 import sys
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pandas as pd
 
 try:
     import psycopg2
     from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
 except ImportError:
-    print("❌ 缺少psycopg2依赖，请安装: pip install psycopg2-binary")
-    sys.exit(1)
+    psycopg2 = None  # 只有PostgreSQL后端需要，嵌入式后端不依赖
+
+import embedded_db
+
+BACKENDS = ['postgresql'] + embedded_db.EMBEDDED_BACKENDS
+DEFAULT_DB_FILES = {'duckdb': 'etf.duckdb', 'sqlite': 'etf.sqlite'}
 
 
 class ETFDatabaseManager:
     """ETF数据库管理器"""
     
-    def __init__(self):
-        """初始化数据库配置"""
+    def __init__(self, backend: Optional[str] = None, path: Optional[str] = None):
+        """
+        初始化数据库配置
+        
+        Args:
+            backend: postgresql / duckdb / sqlite，None表示使用 DB_BACKEND 环境变量（默认postgresql）
+            path: 嵌入式数据库文件，None表示使用 DB_PATH 环境变量或默认文件
+        """
         self.config = {
             'host': os.getenv('DB_HOST', 'localhost'),
             'port': int(os.getenv('DB_PORT', 5432)),
@@ -28,15 +46,59 @@ class ETFDatabaseManager:
             'user': os.getenv('DB_USER', 'postgres'),
             'password': os.getenv('DB_PASSWORD', 'password')
         }
+        self.backend = (backend or os.getenv('DB_BACKEND') or 'postgresql').lower()
+        if self.backend not in BACKENDS:
+            raise ValueError(f"不支持的数据库后端: {self.backend}（可选: {', '.join(BACKENDS)}）")
+        default_path = Path(__file__).parent / DEFAULT_DB_FILES.get(self.backend, '')
+        self.path = path or os.getenv('DB_PATH') or str(default_path)
         self.connection = None
         self.cursor = None
     
+    @property
+    def is_embedded(self) -> bool:
+        """是否为嵌入式后端"""
+        return self.backend in embedded_db.EMBEDDED_BACKENDS
+    
+    @property
+    def settings(self) -> Dict:
+        """重建同一连接所需的参数（可跨进程传递）"""
+        return {'backend': self.backend, 'path': self.path, 'config': dict(self.config)}
+    
+    @classmethod
+    def from_settings(cls, settings: Dict) -> 'ETFDatabaseManager':
+        """按 settings 创建管理器"""
+        manager = cls(settings['backend'], settings['path'])
+        manager.config = dict(settings['config'])
+        return manager
+    
+    def describe(self) -> str:
+        """连接目标描述"""
+        if self.is_embedded:
+            return f"{self.backend}:{self.path}"
+        return f"{self.config['host']}:{self.config['port']}/{self.config['database']}"
+    
     def connect(self):
         """连接到数据库"""
+        if self.is_embedded:
+            try:
+                self.connection = embedded_db.connect(self.backend, self.path)
+            except ImportError:
+                print(f"❌ 缺少{self.backend}依赖，请安装: pip install {self.backend}")
+                return False
+            except Exception as e:
+                print(f"❌ 数据库连接失败: {e}")
+                return False
+            self.cursor = self.connection.cursor()
+            print(f"✅ 已连接到数据库: {self.describe()}")
+            return True
+        
+        if psycopg2 is None:
+            print("❌ 缺少psycopg2依赖，请安装: pip install psycopg2-binary（或设置 DB_BACKEND=duckdb/sqlite 使用嵌入式数据库）")
+            return False
         try:
             self.connection = psycopg2.connect(**self.config)
             self.cursor = self.connection.cursor()
-            print(f"✅ 已连接到数据库: {self.config['host']}:{self.config['port']}/{self.config['database']}")
+            print(f"✅ 已连接到数据库: {self.describe()}")
             return True
         except psycopg2.OperationalError as e:
             print(f"❌ 数据库连接失败: {e}")
@@ -48,12 +110,87 @@ class ETFDatabaseManager:
             self.cursor.close()
         if self.connection:
             self.connection.close()
+        self.cursor = None
+        self.connection = None
         print("🔌 数据库连接已断开")
     
+    def server_version(self) -> str:
+        """数据库版本（需已连接）"""
+        if self.is_embedded:
+            return self.connection.version()
+        self.cursor.execute("SELECT version();")
+        return self.cursor.fetchone()[0]
+    
+    def list_schemas(self) -> List[str]:
+        """用户schema列表（需已连接）"""
+        if self.is_embedded:
+            return self.connection.list_schemas()
+        self.cursor.execute("""
+            SELECT schema_name 
+            FROM information_schema.schemata 
+            WHERE schema_name NOT IN ('information_schema', 'pg_catalog', 'pg_toast')
+              AND schema_name NOT LIKE 'pg_temp%' AND schema_name NOT LIKE 'pg_toast_temp%'
+            ORDER BY schema_name
+        """)
+        return [row[0] for row in self.cursor.fetchall()]
+    
+    def list_tables(self, schema: str) -> List[str]:
+        """schema 下的表（需已连接）"""
+        if self.is_embedded:
+            return self.connection.list_tables(schema)
+        self.cursor.execute("""
+            SELECT table_name 
+            FROM information_schema.tables 
+            WHERE table_schema = %s 
+            ORDER BY table_name
+        """, (schema,))
+        return [row[0] for row in self.cursor.fetchall()]
+    
+    def table_columns(self, schema: str, table: str) -> List[tuple]:
+        """表字段 [(名称, 类型, 是否可空 YES/NO, 默认值, 最大长度)]（需已连接）"""
+        if self.is_embedded:
+            return self.connection.table_columns(schema, table)
+        self.cursor.execute("""
+            SELECT column_name, data_type, is_nullable, column_default, character_maximum_length
+            FROM information_schema.columns 
+            WHERE table_schema = %s AND table_name = %s 
+            ORDER BY ordinal_position
+        """, (schema, table))
+        return self.cursor.fetchall()
+    
+    def ensure_date_index(self, table_name: str):
+        """为横截面查询准备日期索引（SQLite按行存储时需要；DuckDB按列分块统计、PostgreSQL保持原表结构不变）"""
+        if self.is_embedded:
+            embedded_db.ensure_date_index(self.connection, table_name)
+    
+    def query_frame(self, sql: str, params: Optional[list] = None) -> pd.DataFrame:
+        """执行查询并返回DataFrame（需已连接，占位符使用 %s）"""
+        if self.is_embedded:
+            return embedded_db.query_frame(self.connection, sql, params)
+        self.cursor.execute(sql, params)
+        columns = [column[0] for column in self.cursor.description]
+        return pd.DataFrame(self.cursor.fetchall(), columns=columns)
+    
+    def cross_section(self, table_name: str, trade_date: str) -> pd.DataFrame:
+        """
+        横截面查询：某个交易日全部ETF的行情
+        
+        Args:
+            table_name: 行情表（如 basic_info_daily.forward_adjusted）
+            trade_date: YYYY-MM-DD
+        """
+        return self.query_frame(f"""
+            SELECT etf_code, trade_date, open_price, high_price, low_price, close_price,
+                   volume, amount, prev_close, change_amount, change_percent
+            FROM {table_name}
+            WHERE trade_date = %s
+            ORDER BY etf_code
+        """, [trade_date])
+    
     def test_connection(self):
         """测试数据库连接"""
-        print("🔗 测试PostgreSQL数据库连接...")
-        print(f"连接信息: {self.config['host']}:{self.config['port']}/{self.config['database']}")
+        print(f"🔗 测试{self.backend}数据库连接...")
+        print(f"连接信息: {self.describe()}")
         print("-" * 50)
         
         if not self.connect():
@@ -61,11 +198,10 @@ class ETFDatabaseManager:
         
         try:
             # 执行简单查询测试
-            self.cursor.execute("SELECT version();")
-            version = self.cursor.fetchone()[0]
+            version = self.server_version()
             print(f"📊 数据库版本: {version[:50]}...")
             
-            self.cursor.execute("SELECT NOW();")
+            self.cursor.execute("SELECT CAST(CURRENT_TIMESTAMP AS VARCHAR);")
             current_time = self.cursor.fetchone()[0]
             print(f"⏰ 服务器时间: {current_time}")
             
@@ -80,6 +216,13 @@ class ETFDatabaseManager:
     
     def create_database(self, db_name='etf'):
         """创建数据库"""
+        if self.is_embedded:
+            print(f"📋 嵌入式数据库文件在首次连接时创建: {self.path}")
+            return True
+        if psycopg2 is None:
+            print("❌ 缺少psycopg2依赖，请安装: pip install psycopg2-binary")
+            return False
+        
         # 连接到默认的postgres数据库来创建新数据库
         temp_config = self.config.copy()
         temp_config['database'] = 'postgres'
@@ -117,26 +260,14 @@ class ETFDatabaseManager:
             print("🔍 检查数据库现有结构...")
             
             # 检查所有schema
-            self.cursor.execute("""
-                SELECT schema_name 
-                FROM information_schema.schemata 
-                WHERE schema_name NOT IN ('information_schema', 'pg_catalog', 'pg_toast', 'pg_temp_1', 'pg_toast_temp_1')
-                ORDER BY schema_name
-            """)
-            schemas = [row[0] for row in self.cursor.fetchall()]
+            schemas = self.list_schemas()
             
             print(f"\n📊 发现 {len(schemas)} 个Schema:")
             for schema in schemas:
                 print(f"  📁 {schema}")
                 
                 # 检查每个schema下的表
-                self.cursor.execute("""
-                    SELECT table_name 
-                    FROM information_schema.tables 
-                    WHERE table_schema = %s 
-                    ORDER BY table_name
-                """, (schema,))
-                tables = [row[0] for row in self.cursor.fetchall()]
+                tables = self.list_tables(schema)
                 
                 if tables:
                     print(f"    📋 表 ({len(tables)}个):")
@@ -144,16 +275,10 @@ class ETFDatabaseManager:
                         print(f"      📄 {table}")
                         
                         # 检查表字段
-                        self.cursor.execute("""
-                            SELECT column_name, data_type, is_nullable, column_default
-                            FROM information_schema.columns 
-                            WHERE table_schema = %s AND table_name = %s 
-                            ORDER BY ordinal_position
-                        """, (schema, table))
-                        columns = self.cursor.fetchall()
+                        columns = self.table_columns(schema, table)
                         
                         if columns:
-                            for col_name, col_type, nullable, default in columns:
+                            for col_name, col_type, nullable, default, _ in columns:
                                 nullable_str = "NULL" if nullable == "YES" else "NOT NULL"
                                 default_str = f" DEFAULT {default}" if default else ""
                                 print(f"        🔹 {col_name}: {col_type} {nullable_str}{default_str}")
@@ -191,6 +316,10 @@ class ETFDatabaseManager:
     def show_config(self):
         """显示当前配置"""
         print("\n📋 当前数据库配置:")
+        print(f"  backend: {self.backend}")
+        if self.is_embedded:
+            print(f"  path: {self.path}")
+            return
         for key, value in self.config.items():
             if key == 'password':
                 print(f"  {key}: {'*' * len(str(value))}")
@@ -211,6 +340,8 @@ def main():
     print("  DB_NAME     - 数据库名称 (默认: etf)")
     print("  DB_USER     - 用户名 (默认: postgres)")
     print("  DB_PASSWORD - 密码 (默认: password)")
+    print("  DB_BACKEND  - 数据库后端 postgresql/duckdb/sqlite (默认: postgresql)")
+    print("  DB_PATH     - 嵌入式数据库文件 (默认: ETF_database/etf.duckdb 或 etf.sqlite)")
     print()
     
     # 创建数据库管理器实例
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+嵌入式数据库后端（DuckDB / SQLite）
+无需数据库服务即可运行导入、校验和分析查询（笔记本、CI）：
+1. DuckDB 为列式引擎，横截面查询（某日全部ETF）只扫描日期列的分块统计，优先使用
+2. SQLite 为标准库自带的回退方案；schema 以附加数据库实现（{文件名}.{schema}.sqlite），
+   原有 schema.table 形式的SQL无需修改
+3. 连接和游标封装为 DB-API 形式，执行前把 PostgreSQL 写法转换为对应方言：
+   %s 占位符、SERIAL 自增主键（嵌入式表以 etf_code+trade_date 为键，不再保留）、
+   DuckDB 中默认精度只有3位小数的 NUMERIC、赋值语句中的 CURRENT_TIMESTAMP
+"""
+
+import csv
+import re
+import sqlite3
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+EMBEDDED_BACKENDS = ['duckdb', 'sqlite']
+
+_SERIAL_COLUMN = re.compile(r'\bid\s+SERIAL\s+PRIMARY\s+KEY\s*,\s*', re.IGNORECASE)
+_NUMERIC_TYPE = re.compile(r'\bNUMERIC\b(?!\s*\()', re.IGNORECASE)
+_ASSIGN_TIMESTAMP = re.compile(r'=\s*CURRENT_TIMESTAMP\b', re.IGNORECASE)
+_CREATE_SCHEMA = re.compile(r'^\s*CREATE\s+SCHEMA\s+IF\s+NOT\s+EXISTS\s+"?(\w+)"?\s*;?\s*$', re.IGNORECASE)
+
+
+def translate_sql(sql: str, backend: str) -> str:
+    """把 PostgreSQL 写法的SQL转换为嵌入式后端的方言"""
+    sql = _SERIAL_COLUMN.sub('', sql).replace('%s', '?')
+    if backend == 'duckdb':
+        sql = _NUMERIC_TYPE.sub('DOUBLE', sql)
+        # DuckDB 在 UPDATE SET 中把 CURRENT_TIMESTAMP 当作列名解析
+        sql = _ASSIGN_TIMESTAMP.sub('= now()', sql)
+    return sql
+
+
+class EmbeddedCursor:
+    """DB-API 游标封装（执行前转换SQL方言）"""
+
+    def __init__(self, connection: 'EmbeddedConnection'):
+        self.connection = connection
+        self._cursor = None if connection.backend == 'duckdb' else connection.raw.cursor()
+        self._result = None
+        self.rowcount = -1
+
+    def execute(self, sql: str, params=None):
+        """执行一条SQL"""
+        if self.connection.backend == 'sqlite':
+            match = _CREATE_SCHEMA.match(sql)
+            if match:
+                self.connection.attach_schema(match.group(1))
+                return self
+        sql = translate_sql(sql, self.connection.backend)
+        if self._cursor is None:
+            # DuckDB 的 cursor() 是独立连接（独立事务），语句直接在共享连接上执行
+            self._result = self.connection.execute(sql, params)
+        else:
+            self._cursor.execute(sql, tuple(params) if params is not None else ())
+            self.rowcount = self._cursor.rowcount
+        return self
+
+    def executemany(self, sql: str, seq_of_params):
+        """批量执行同一条SQL"""
+        sql = translate_sql(sql, self.connection.backend)
+        if self._cursor is None:
+            self.connection.begin()
+            self.connection.raw.executemany(sql, [list(params) for params in seq_of_params])
+        else:
+            self._cursor.executemany(sql, seq_of_params)
+            self.rowcount = self._cursor.rowcount
+        return self
+
+    def fetchone(self):
+        return (self._result or self._cursor).fetchone()
+
+    def fetchall(self):
+        return (self._result or self._cursor).fetchall()
+
+    @property
+    def description(self):
+        return (self._result or self._cursor).description
+
+    def close(self):
+        if self._cursor is not None:
+            self._cursor.close()
+
+
+class EmbeddedConnection:
+    """DB-API 连接封装"""
+
+    def __init__(self, backend: str, path: str):
+        """
+        打开嵌入式数据库
+
+        Args:
+            backend: duckdb 或 sqlite
+            path: 数据库文件路径（SQLite 的各 schema 保存在同目录的 {文件名}.{schema}.sqlite）
+        """
+        self.backend = backend
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._in_transaction = False
+        if backend == 'duckdb':
+            import duckdb  # 可选依赖，只在使用DuckDB后端时需要
+            self.raw = duckdb.connect(str(self.path))
+        else:
+            self.raw = sqlite3.connect(str(self.path), detect_types=sqlite3.PARSE_DECLTYPES)
+            self.raw.execute("PRAGMA journal_mode=WAL")
+            self.raw.execute("PRAGMA synchronous=NORMAL")
+            for schema_file in sorted(self.path.parent.glob(f"{self.path.stem}.*{self.path.suffix}")):
+                self.attach_schema(schema_file.name[len(self.path.stem) + 1:-len(self.path.suffix) or None])
+
+    def schema_path(self, schema: str) -> Path:
+        """SQLite schema 对应的附加数据库文件"""
+        return self.path.with_name(f"{self.path.stem}.{schema}{self.path.suffix}")
+
+    def attach_schema(self, schema: str):
+        """SQLite：把 schema 附加为独立数据库文件（已附加时跳过）"""
+        attached = {row[1] for row in self.raw.execute("PRAGMA database_list")}
+        if schema in attached:
+            return
+        self.raw.execute("ATTACH DATABASE ? AS " + schema, (str(self.schema_path(schema)),))
+        self.raw.execute(f"PRAGMA {schema}.journal_mode=WAL")
+
+    def begin(self):
+        """DuckDB：在首条语句前开启事务（默认自动提交，与 psycopg2 的行为不同）"""
+        if self.backend == 'duckdb' and not self._in_transaction:
+            self.raw.execute("BEGIN TRANSACTION")
+            self._in_transaction = True
+
+    def execute(self, sql: str, params=None):
+        """在事务中执行（已转换方言的）SQL，返回DuckDB结果或SQLite游标"""
+        self.begin()
+        return self.raw.execute(sql, list(params) if params is not None else [])
+
+    def cursor(self) -> EmbeddedCursor:
+        return EmbeddedCursor(self)
+
+    def commit(self):
+        if self.backend == 'duckdb':
+            if self._in_transaction:
+                self.raw.commit()
+                self._in_transaction = False
+        else:
+            self.raw.commit()
+
+    def rollback(self):
+        if self.backend == 'duckdb':
+            if self._in_transaction:
+                self.raw.rollback()
+                self._in_transaction = False
+        else:
+            self.raw.rollback()
+
+    def close(self):
+        self.raw.close()
+
+    def list_schemas(self) -> List[str]:
+        """用户schema列表"""
+        if self.backend == 'sqlite':
+            return sorted(row[1] for row in self.raw.execute("PRAGMA database_list")
+                          if row[1] not in ('main', 'temp'))
+        rows = self.raw.execute("""
+            SELECT DISTINCT schema_name FROM information_schema.schemata
+            WHERE schema_name NOT IN ('information_schema', 'pg_catalog', 'main')
+              AND catalog_name = current_database()
+            ORDER BY schema_name
+        """).fetchall()
+        return [row[0] for row in rows]
+
+    def list_tables(self, schema: str) -> List[str]:
+        """schema 下的表"""
+        if self.backend == 'sqlite':
+            rows = self.raw.execute(
+                f"SELECT name FROM {schema}.sqlite_master WHERE type = 'table' ORDER BY name").fetchall()
+        else:
+            rows = self.raw.execute("""
+                SELECT table_name FROM information_schema.tables
+                WHERE table_schema = ? AND table_catalog = current_database()
+                ORDER BY table_name
+            """, [schema]).fetchall()
+        return [row[0] for row in rows]
+
+    def table_columns(self, schema: str, table: str) -> List[tuple]:
+        """表字段：[(名称, 类型, 是否可空 YES/NO, 默认值, 最大长度)]"""
+        if self.backend == 'sqlite':
+            rows = self.raw.execute(f"PRAGMA {schema}.table_info({table})").fetchall()
+            return [(name, col_type, "NO" if not_null else "YES", default, None)
+                    for _, name, col_type, not_null, default, _ in rows]
+        return self.raw.execute("""
+            SELECT column_name, data_type, is_nullable, column_default, character_maximum_length
+            FROM information_schema.columns
+            WHERE table_schema = ? AND table_name = ? AND table_catalog = current_database()
+            ORDER BY ordinal_position
+        """, [schema, table]).fetchall()
+
+    def version(self) -> str:
+        """引擎版本"""
+        if self.backend == 'sqlite':
+            return f"SQLite {sqlite3.sqlite_version}"
+        return f"DuckDB {self.raw.execute('SELECT version()').fetchone()[0]}"
+
+
+def connect(backend: str, path: str) -> EmbeddedConnection:
+    """打开嵌入式数据库连接"""
+    if backend not in EMBEDDED_BACKENDS:
+        raise ValueError(f"不支持的嵌入式后端: {backend}")
+    return EmbeddedConnection(backend, path)
+
+
+def read_header(csv_file: str) -> List[str]:
+    """CSV表头"""
+    with open(csv_file, 'r', encoding='utf-8-sig') as f:
+        return next(csv.reader([f.readline()]), [])
+
+
+def group_by_header(files: List[str], required: List[str]) -> Dict[tuple, List[str]]:
+    """按表头分组（只保留包含全部必需列的文件），同组文件可由 DuckDB 一次读取"""
+    groups = {}
+    for csv_file in files:
+        header = tuple(read_header(csv_file))
+        if set(required) <= set(header):
+            groups.setdefault(header, []).append(csv_file)
+    return groups
+
+
+def sqlite_rows(frame: pd.DataFrame) -> List[tuple]:
+    """DataFrame 转为 SQLite 参数元组（缺失值为None）"""
+    return list(frame.astype(object).where(frame.notna(), None).itertuples(index=False, name=None))
+
+
+def ensure_date_index(connection: EmbeddedConnection, table_name: str):
+    """SQLite：为横截面查询（按日期取全部ETF）建立日期索引；DuckDB 按列分块统计，无需索引"""
+    if connection.backend != 'sqlite':
+        return
+    schema, table = table_name.split('.')
+    connection.raw.execute(f"CREATE INDEX IF NOT EXISTS {schema}.{table}_trade_date_idx ON {table} (trade_date)")
+
+
+def query_frame(connection: EmbeddedConnection, sql: str, params: Optional[list] = None) -> pd.DataFrame:
+    """执行查询并返回DataFrame"""
+    sql = translate_sql(sql, connection.backend)
+    if connection.backend == 'duckdb':
+        return connection.execute(sql, params).df()
+    return pd.read_sql_query(sql, connection.raw, params=params)
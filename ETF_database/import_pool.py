@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ETF行情并行导入
+1. 每个表的待导入文件按顺序切成多个分片，三个复权表的分片一起交给进程池，表之间、表内分片之间并发导入
+2. 进程池即连接池：每个工作进程初始化时建立一条持久连接，池大小 = 进程数 = 连接数
+   （psycopg2 连接不能跨进程共享，CSV解析和转换也需要多核）
+3. 分片内每导入 commit_files 个文件合并并提交一次；某个分片失败只回滚该分片尚未提交的批次，
+   其他分片和该分片已提交的批次不受影响
+4. 进程数和提交批次来自 config/config.json 的 database_import.workers / commit_files
+5. 嵌入式后端（DuckDB/SQLite）只允许单个写入进程，在主进程顺序导入；DuckDB 整文件导入直接由 read_csv 读取，
+   其余情况优先读取列式副本（config/columnar_store.py），缺失或过期时回退CSV
+6. 按水位增量导入时只读取CSV开头比水位更新的行（文件按日期降序），不解析其余部分
+"""
+
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from db_connection import ETFDatabaseManager
+from bulk_loader import BulkLoader, create_loader, prepare_frame
+from config.columnar_store import read_etf_frame
+from config.etf_store import read_frame_since
+
+DEFAULT_WORKERS = 4
+DEFAULT_COMMIT_FILES = 50  # 每个分片导入多少个文件提交一次
+PARALLEL_MIN_FILES = 100  # 待导入文件少于该数量时直接在主进程顺序导入
+SHARDS_PER_WORKER = 2  # 每个表分给每个进程的分片数（分片越多负载越均衡）
+
+# 文件的导入范围：只导入的日期YYYYMMDD列表、水位日期YYYYMMDD整数（只导入更新的行）或None表示全部
+ImportTarget = Optional[Union[List[str], int]]
+# 导入任务：(名称, 目标表, [(CSV路径, 导入范围)])
+ImportJob = Tuple[str, str, List[Tuple[str, ImportTarget]]]
+
+_worker_db = None  # 工作进程的持久连接
+
+
+def get_import_settings() -> Tuple[int, int]:
+    """
+    从 config/config.json 的 database_import 配置读取并行导入参数
+
+    Returns:
+        (进程数, 每多少个文件提交一次)；进程数为0或null时使用CPU核数
+    """
+    config_path = Path(__file__).parent.parent / "config" / "config.json"
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            import_config = json.load(f).get('database_import', {})
+    except (IOError, json.JSONDecodeError):
+        import_config = {}
+
+    workers = import_config.get('workers', DEFAULT_WORKERS) or os.cpu_count() or 1
+    commit_files = import_config.get('commit_files', DEFAULT_COMMIT_FILES) or DEFAULT_COMMIT_FILES
+    return max(1, int(workers)), max(1, int(commit_files))
+
+
+def shard_files(files: List, workers: int) -> List[List]:
+    """把一个表的文件按顺序切成 workers * SHARDS_PER_WORKER 个分片"""
+    n_shards = max(1, min(len(files), workers * SHARDS_PER_WORKER))
+    size = -(-len(files) // n_shards)
+    return [files[i:i + size] for i in range(0, len(files), size)]
+
+
+def _init_worker(db_settings: Dict):
+    """工作进程初始化：建立持久连接"""
+    global _worker_db
+    _worker_db = ETFDatabaseManager.from_settings(db_settings)
+    if not _worker_db.connect():
+        raise ConnectionError(f"无法连接数据库: {_worker_db.describe()}")
+
+
+def _close_worker():
+    """关闭当前进程的持久连接"""
+    global _worker_db
+    if _worker_db is not None:
+        _worker_db.disconnect()
+        _worker_db = None
+
+
+def _add_file(loader: BulkLoader, csv_file: str, target: ImportTarget) -> bool:
+    """读取一个文件（优先列式副本，CSV含尾段）加入写入器，返回是否有数据需要导入"""
+    try:
+        if isinstance(target, int):
+            df = read_frame_since(csv_file, target + 1)
+            if df.empty:
+                return False
+        else:
+            df = read_etf_frame(csv_file)
+        if isinstance(target, list):
+            df = df[df['日期'].astype(str).isin(target)]
+        frame = prepare_frame(df)
+    except Exception:
+        return False  # 文件无法读取或缺少字段
+    loader.add_prepared(frame)
+    return target is None or not frame.empty
+
+
+def _import_shard(label: str, table_name: str, files: List[Tuple[str, ImportTarget]],
+                  commit_files: int) -> Dict:
+    """
+    导入一个分片（进程池工作函数）
+
+    Returns:
+        {'label', 'files', 'imported': 已提交且有数据的文件, 'rows': 已提交的行数,
+         'error': 失败原因或None, 'uncommitted': 因失败而回滚的文件数, 'seconds'}
+    """
+    started = time.perf_counter()
+    connection = _worker_db.connection
+    loader = create_loader(_worker_db, table_name, verbose=False)
+    result = {"label": label, "files": len(files), "imported": [], "rows": 0,
+              "error": None, "uncommitted": 0}
+    committed = 0
+    try:
+        for start in range(0, len(files), commit_files):
+            batch = files[start:start + commit_files]
+            # 整文件导入时先交给数据库直接读取（DuckDB），其余逐个读取
+            pending = loader.ingest_files([csv_file for csv_file, target_dates in batch if target_dates is None])
+            ingested = set(pending)
+            for csv_file, target_dates in batch:
+                if csv_file not in ingested and _add_file(loader, csv_file, target_dates):
+                    pending.append(csv_file)
+            loader.flush()
+            connection.commit()
+            result["imported"].extend(pending)
+            result["rows"] = loader.rows_merged
+            committed = start + len(batch)
+    except Exception as e:
+        connection.rollback()
+        loader.discard()
+        result["error"] = str(e).strip()
+        result["uncommitted"] = len(files) - committed
+    result["seconds"] = time.perf_counter() - started
+    return result
+
+
+def _run_shards(db_settings: Dict, tasks: List[Tuple], workers: int) -> Iterator[Dict]:
+    """执行分片任务，进程数大于1且文件足够多时使用进程池"""
+    total_files = sum(len(task[2]) for task in tasks)
+    if workers <= 1 or total_files < PARALLEL_MIN_FILES:
+        _init_worker(db_settings)
+        try:
+            for task in tasks:
+                yield _import_shard(*task)
+        finally:
+            _close_worker()
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(db_settings,)) as executor:
+        futures = [executor.submit(_import_shard, *task) for task in tasks]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def run_import(db_settings: Dict, jobs: List[ImportJob], workers: int,
+               commit_files: int) -> Dict[str, Dict]:
+    """
+    并行导入多个表
+
+    Args:
+        db_settings: 数据库连接参数（ETFDatabaseManager.settings）
+        jobs: 导入任务列表
+        workers: 进程数（= 连接数），嵌入式后端固定为1
+        commit_files: 每个分片每导入多少个文件提交一次
+
+    Returns:
+        {名称: {'files', 'imported': 已提交且有数据的文件列表, 'rows', 'failed_shards', 'uncommitted'}}
+    """
+    if db_settings['backend'] != 'postgresql':
+        workers = 1  # 嵌入式数据库只允许单个写入进程
+    summary = {label: {"files": len(files), "imported": [], "rows": 0, "failed_shards": 0, "uncommitted": 0}
+               for label, _, files in jobs}
+    tasks = [(label, table_name, shard, commit_files)
+             for label, table_name, files in jobs if files
+             for shard in shard_files(files, workers)]
+    if not tasks:
+        return summary
+
+    started = time.perf_counter()
+    total_rows = 0
+    for done, result in enumerate(_run_shards(db_settings, tasks, workers), 1):
+        stats = summary[result["label"]]
+        stats["imported"].extend(result["imported"])
+        stats["rows"] += result["rows"]
+        total_rows += result["rows"]
+        if result["error"]:
+            stats["failed_shards"] += 1
+            stats["uncommitted"] += result["uncommitted"]
+            print(f"  ❌ {result['label']}分片导入失败（{result['uncommitted']}个文件未提交）: {result['error']}")
+        elapsed = time.perf_counter() - started
+        rate = total_rows / elapsed if elapsed > 0 else 0.0
+        print(f"  ⚡ 分片 {done}/{len(tasks)}: 累计 {total_rows:,} 行 ({rate:,.0f} 行/秒)")
+
+    for label, stats in summary.items():
+        status = "✅" if not stats["failed_shards"] else "⚠️"
+        print(f"{status} {label}: {len(stats['imported'])}/{stats['files']} 个文件，{stats['rows']:,} 行"
+              + (f"，{stats['failed_shards']} 个分片失败" if stats["failed_shards"] else ""))
+    return summary
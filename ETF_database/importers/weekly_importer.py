@@ -3,6 +3,7 @@
 """
 ETF周更数据导入器
 专门处理周更新数据的数据库导入功能
+增量导入按数据库中每个(表, ETF)的水位（已导入的最新交易日）只读取CSV开头更新的行
 """
 
 import os
@@ -10,21 +11,34 @@ import sys
 import pandas as pd
 from datetime import datetime
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 # 添加父目录到路径以导入db_connection
 sys.path.insert(0, str(Path(__file__).parent.parent))
 from db_connection import ETFDatabaseManager
+from bulk_loader import BulkLoader, create_loader, ensure_watermarks, load_watermarks, normalize_etf_code, prepare_frame
+from import_pool import ImportJob, get_import_settings, run_import
 
-# 导入hash管理器
-from config.hash_manager import HashManager
+from config.change_manifest import ChangeLog
+from config.latest_dates import LatestDateCache
+
+CHANGE_CONSUMER = "database_weekly"  # 在周更变更清单中的消费者名称
 
 class WeeklyDataImporter:
     """ETF周更数据导入器"""
     
-    def __init__(self):
-        """初始化导入器"""
+    def __init__(self, workers: Optional[int] = None, commit_files: Optional[int] = None):
+        """
+        初始化导入器
+        
+        Args:
+            workers: 并行导入的进程数（= 数据库连接数），None表示使用 database_import.workers 配置
+            commit_files: 每个分片每导入多少个文件提交一次，None表示使用 database_import.commit_files 配置
+        """
         self.db_manager = ETFDatabaseManager()
+        default_workers, default_commit_files = get_import_settings()
+        self.workers = workers or default_workers
+        self.commit_files = commit_files or default_commit_files
         self.schema_map = {
             '前复权': 'basic_info_weekly',
             '后复权': 'basic_info_weekly', 
@@ -35,8 +49,6 @@ class WeeklyDataImporter:
             '后复权': 'backward_adjusted',
             '除权': 'ex_rights'
         }
-        # 初始化hash管理器
-        self.hash_manager = HashManager()
         
     def connect(self):
         """连接数据库"""
@@ -51,6 +63,14 @@ class WeeklyDataImporter:
         """获取数据库游标"""
         return self.db_manager.cursor
     
+    def _table_name(self, adj_type: str) -> str:
+        """复权类型对应的目标表"""
+        return f"{self.schema_map[adj_type]}.{self.table_map[adj_type]}"
+    
+    def _run_jobs(self, jobs: List[ImportJob]) -> Dict[str, Dict]:
+        """用进程池（每个进程一条连接）并行导入，各分片独立提交；嵌入式后端在主进程顺序导入"""
+        return run_import(self.db_manager.settings, jobs, self.workers, self.commit_files)
+    
     def import_weekly_directories(self, base_dir: str) -> Dict[str, bool]:
         """导入周更新目录下的所有数据"""
         if not os.path.exists(base_dir):
@@ -75,18 +95,20 @@ class WeeklyDataImporter:
             # 确保表结构存在
             self._ensure_tables_exist()
             
+            jobs = []
             for adj_type, dir_name in directories.items():
                 dir_path = os.path.join(base_dir, dir_name)
                 if os.path.exists(dir_path):
-                    print(f"\n📂 导入{adj_type}数据: {dir_name}")
-                    success = self._import_directory(dir_path, adj_type)
-                    results[adj_type] = success
+                    csv_files = sorted(Path(dir_path).glob("*.csv"))
+                    print(f"📂 {adj_type}数据: {dir_name}，{len(csv_files)} 个CSV文件")
+                    jobs.append((adj_type, self._table_name(adj_type), [(str(f), None) for f in csv_files]))
                 else:
                     print(f"⚠️ 目录不存在: {dir_name}")
                     results[adj_type] = False
             
-            # 提交所有更改
-            self.db_manager.connection.commit()
+            print(f"🚀 {self.workers} 个进程并行导入，每 {self.commit_files} 个文件提交一次")
+            for adj_type, stats in self._run_jobs(jobs).items():
+                results[adj_type] = len(stats["imported"]) > 0
             print("\n🎉 周更数据导入完成!")
             
             # 显示导入汇总
@@ -102,8 +124,11 @@ class WeeklyDataImporter:
         return results
     
     def import_latest_weekly_data(self, base_dir: str, weeks_back: int = 1) -> Dict[str, bool]:
-        """只导入最近几周的新数据（增量导入）"""
-        print(f"🔄 执行周更增量导入：最近{weeks_back}周的数据")
+        """只导入水位之后的新数据（增量导入，逐个复权目录执行）
+        
+        weeks_back 为兼容旧调用保留：比水位更新的行全部导入，不再按最近周数筛选
+        """
+        print("🔄 执行周更增量导入：水位之后的新数据")
         
         if not os.path.exists(base_dir):
             print(f"❌ 基础目录不存在: {base_dir}")
@@ -124,15 +149,11 @@ class WeeklyDataImporter:
             # 确保表结构存在
             self._ensure_tables_exist()
             
-            # 获取需要更新的日期范围（最近几周）
-            target_dates = self._get_recent_week_dates(weeks_back)
-            print(f"📅 目标日期范围: {len(target_dates)} 天")
-            
             for adj_type, dir_name in directories.items():
                 dir_path = os.path.join(base_dir, dir_name)
                 if os.path.exists(dir_path):
                     print(f"\n📂 周更增量导入{adj_type}数据")
-                    success = self._import_recent_data(dir_path, adj_type, target_dates)
+                    success = self._import_recent_data_by_watermark(dir_path, adj_type)
                     results[adj_type] = success
                 else:
                     print(f"⚠️ 目录不存在: {dir_name}")
@@ -151,34 +172,6 @@ class WeeklyDataImporter:
         
         return results
     
-    def _import_recent_data(self, dir_path: str, adj_type: str, target_dates: List[str]) -> bool:
-        """导入最近数据（增量）"""
-        try:
-            schema = self.schema_map[adj_type]
-            table = self.table_map[adj_type]
-            table_name = f"{schema}.{table}"
-            
-            # 获取所有CSV文件
-            csv_files = list(Path(dir_path).glob("*.csv"))
-            print(f"📄 找到 {len(csv_files)} 个CSV文件")
-            
-            updated_count = 0
-            
-            for i, csv_file in enumerate(csv_files, 1):
-                if i % 100 == 0:
-                    print(f"  📈 进度: {i}/{len(csv_files)}")
-                
-                # 读取CSV并过滤最近的数据
-                if self._import_recent_records_from_csv(str(csv_file), table_name, target_dates):
-                    updated_count += 1
-            
-            print(f"✅ {adj_type}周更增量更新: {updated_count}个文件有更新")
-            return updated_count > 0
-            
-        except Exception as e:
-            print(f"❌ {adj_type}周更增量导入失败: {e}")
-            return False
-    
     def _ensure_tables_exist(self):
         """确保周更数据表存在"""
         try:
@@ -208,6 +201,8 @@ class WeeklyDataImporter:
             # 创建三个复权表
             for table_name in ['forward_adjusted', 'backward_adjusted', 'ex_rights']:
                 self.cursor.execute(create_table_sql.format(table_name=table_name))
+                self.db_manager.ensure_date_index(f"basic_info_weekly.{table_name}")
+                ensure_watermarks(self.db_manager, f"basic_info_weekly.{table_name}")
             
             self.db_manager.connection.commit()
             print("✅ 周更数据表结构检查完成")
@@ -217,120 +212,40 @@ class WeeklyDataImporter:
             raise e
     
     def _import_directory(self, dir_path: str, adj_type: str) -> bool:
-        """导入指定目录的所有CSV文件"""
+        """导入指定目录的所有CSV文件（按分片并行，各分片独立提交）"""
         try:
-            csv_files = list(Path(dir_path).glob("*.csv"))
+            csv_files = sorted(Path(dir_path).glob("*.csv"))
             print(f"📄 找到 {len(csv_files)} 个CSV文件")
             
-            schema = self.schema_map[adj_type]
-            table = self.table_map[adj_type]
-            table_name = f"{schema}.{table}"
-            
-            success_count = 0
-            
-            for i, csv_file in enumerate(csv_files, 1):
-                if i % 100 == 0:
-                    print(f"  📈 进度: {i}/{len(csv_files)}")
-                
-                if self._import_csv_file(str(csv_file), table_name):
-                    success_count += 1
-                
-                # 每50个文件提交一次
-                if i % 50 == 0:
-                    self.db_manager.connection.commit()
-            
-            print(f"✅ {adj_type}数据导入完成: {success_count}/{len(csv_files)}")
-            return success_count > 0
+            job = (adj_type, self._table_name(adj_type), [(str(f), None) for f in csv_files])
+            stats = self._run_jobs([job])[adj_type]
+            return len(stats["imported"]) > 0
             
         except Exception as e:
             print(f"❌ 导入{adj_type}数据失败: {e}")
             return False
     
-    def _import_csv_file(self, csv_file_path: str, table_name: str) -> bool:
-        """导入单个CSV文件"""
-        try:
-            df = pd.read_csv(csv_file_path, encoding='utf-8')
-            if df.empty:
-                return True
-            
-            insert_sql = f"""
-                INSERT INTO {table_name} 
-                (etf_code, trade_date, open_price, high_price, low_price, close_price,
-                 volume, amount, prev_close, change_amount, change_percent)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                ON CONFLICT (etf_code, trade_date) 
-                DO UPDATE SET
-                    open_price = EXCLUDED.open_price,
-                    high_price = EXCLUDED.high_price,
-                    low_price = EXCLUDED.low_price,
-                    close_price = EXCLUDED.close_price,
-                    volume = EXCLUDED.volume,
-                    amount = EXCLUDED.amount,
-                    prev_close = EXCLUDED.prev_close,
-                    change_amount = EXCLUDED.change_amount,
-                    change_percent = EXCLUDED.change_percent,
-                    created_at = CURRENT_TIMESTAMP
-            """
-            
-            for _, row in df.iterrows():
-                try:
-                    trade_date = datetime.strptime(str(row['日期']), '%Y%m%d').date()
-                    
-                    self.cursor.execute(insert_sql, (
-                        row['代码'],
-                        trade_date,
-                        float(row['开盘价']) if pd.notnull(row['开盘价']) else None,
-                        float(row['最高价']) if pd.notnull(row['最高价']) else None,
-                        float(row['最低价']) if pd.notnull(row['最低价']) else None,
-                        float(row['收盘价']) if pd.notnull(row['收盘价']) else None,
-                        float(row['成交量(手数)']) if pd.notnull(row['成交量(手数)']) else None,
-                        float(row['成交额(千元)']) if pd.notnull(row['成交额(千元)']) else None,
-                        float(row['上日收盘']) if pd.notnull(row['上日收盘']) else None,
-                        float(row['涨跌']) if pd.notnull(row['涨跌']) else None,
-                        float(row['涨幅%']) if pd.notnull(row['涨幅%']) else None
-                    ))
-                except Exception as e:
-                    continue  # 跳过有问题的行
-            
-            return True
-            
-        except Exception as e:
-            return False
-    
-    def _import_recent_records_from_csv(self, csv_file_path: str, table_name: str, target_dates: List[str]) -> bool:
-        """从CSV文件导入最近的记录"""
+    def _import_csv_file(self, csv_file_path: str, table_name: str, loader: Optional[BulkLoader] = None) -> bool:
+        """导入单个CSV文件
+        
+        传入 loader 时加入其缓冲，由调用方决定合并时机；否则立即 COPY 并合并
+        """
         try:
-            df = pd.read_csv(csv_file_path, encoding='utf-8')
-            if df.empty:
-                return False
-            
-            # 过滤最近的数据
-            df['日期'] = df['日期'].astype(str)
-            recent_df = df[df['日期'].isin(target_dates)]
-            
-            if recent_df.empty:
-                return False
-            
-            # 如果有新数据，则重新导入整个文件
-            return self._import_csv_file(csv_file_path, table_name)
-            
+            frame = prepare_frame(pd.read_csv(csv_file_path, encoding='utf-8'))
         except Exception as e:
-            return False
-    
-    def _get_recent_week_dates(self, weeks_back: int) -> List[str]:
-        """获取最近几周的日期字符串列表"""
-        from datetime import datetime, timedelta
+            return False  # 文件无法读取或缺少字段
         
-        dates = []
-        today = datetime.now()
-        
-        # 获取最近weeks_back周的所有日期
-        for week in range(weeks_back):
-            for day in range(7):
-                date = today - timedelta(weeks=week, days=day)
-                dates.append(date.strftime('%Y%m%d'))
-        
-        return dates
+        self._write_frame(frame, table_name, loader)
+        return True
+    
+    def _write_frame(self, frame: pd.DataFrame, table_name: str, loader: Optional[BulkLoader] = None) -> None:
+        """把已转换的数据写入目标表"""
+        if loader is not None:
+            loader.add_prepared(frame)
+            return
+        single_loader = create_loader(self.db_manager, table_name, verbose=False)
+        single_loader.add_prepared(frame)
+        single_loader.close()
     
     def _show_import_summary(self):
         """显示导入汇总信息"""
@@ -358,108 +273,65 @@ class WeeklyDataImporter:
             print(f"❌ 汇总信息获取失败: {e}")
 
     def _execute_batch_insert_weekly(self, table_name: str, batch_data: List[tuple]) -> None:
-        """执行批量插入（周更版本）"""
+        """执行批量插入（周更版本，COPY进暂存表后一次合并）"""
         if not batch_data:
             return
-            
-        insert_sql = f"""
-            INSERT INTO {table_name} 
-            (etf_code, trade_date, open_price, high_price, low_price, close_price,
-             volume, amount, prev_close, change_amount, change_percent)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            ON CONFLICT (etf_code, trade_date) 
-            DO UPDATE SET
-                open_price = EXCLUDED.open_price,
-                high_price = EXCLUDED.high_price,
-                low_price = EXCLUDED.low_price,
-                close_price = EXCLUDED.close_price,
-                volume = EXCLUDED.volume,
-                amount = EXCLUDED.amount,
-                prev_close = EXCLUDED.prev_close,
-                change_amount = EXCLUDED.change_amount,
-                change_percent = EXCLUDED.change_percent,
-                updated_at = CURRENT_TIMESTAMP
-        """
         
         try:
-            # 使用executemany进行批量插入
-            self.cursor.executemany(insert_sql, batch_data)
+            loader = create_loader(self.db_manager, table_name, verbose=False)
+            loader.add_records(batch_data)
+            loader.close()
         except Exception as e:
             print(f"❌ 批量插入失败: {e}")
             raise e
 
-    def _import_recent_data_optimized(self, dir_path: str, adj_type: str, target_dates: List[str]) -> bool:
-        """优化版本的周更增量导入 - 只处理有变化的文件，批量导入"""
+    def _detect_new_rows(self, dir_path: str, adj_type: str) -> List[tuple]:
+        """按水位找出有新数据的文件，返回 [(CSV路径, 水位YYYYMMDD整数，尚未导入过的ETF为None)]
+        
+        文件最新日期取自 LatestDateCache：未改动的文件只比较大小和修改时间，改动的文件只读开头两行
+        """
+        dir_path = Path(dir_path)
+        watermarks = load_watermarks(self.db_manager, self._table_name(adj_type))
+        latest_dates = LatestDateCache(dir_path.parent).latest_dates(dir_path.name)
+        print(f"📄 扫描 {len(latest_dates)} 个CSV文件...")
+        
+        pending = []
+        for code, latest_date in sorted(latest_dates.items()):
+            watermark = watermarks.get(normalize_etf_code(code))  # 文件名不带交易所后缀，水位按代码列记录
+            if latest_date is None or (watermark is not None and latest_date <= watermark):
+                continue  # 空文件或已导入到最新日期
+            pending.append((str(dir_path / f"{code}.csv"), watermark))
+        
+        print(f"📊 {adj_type}水位检查: {len(pending)} 个有新数据，{len(latest_dates) - len(pending)} 个已是最新")
+        return pending
+    
+    def _import_new_rows(self, pending: Dict[str, List[tuple]]) -> Dict[str, bool]:
+        """并行导入各文件水位之后的行（水位随数据在同一事务中前进）"""
+        jobs = [(adj_type, self._table_name(adj_type), files) for adj_type, files in pending.items() if files]
+        if not jobs:
+            return {adj_type: False for adj_type in pending}
+        
+        print(f"🚀 {self.workers} 个进程并行导入 {sum(len(job[2]) for job in jobs)} 个有新数据的文件...")
+        summary = self._run_jobs(jobs)
+        return {adj_type: adj_type in summary and len(summary[adj_type]["imported"]) > 0
+                for adj_type in pending}
+    
+    def _import_recent_data_by_watermark(self, dir_path: str, adj_type: str) -> bool:
+        """按水位增量导入一个复权目录 - 只读取有新数据的文件开头，批量并行导入"""
         try:
-            schema = self.schema_map[adj_type]
-            table = self.table_map[adj_type]
-            table_name = f"{schema}.{table}"
-            
-            # 获取所有CSV文件
-            csv_files = list(Path(dir_path).glob("*.csv"))
-            print(f"📄 扫描 {len(csv_files)} 个CSV文件...")
-            
-            # 检查有变化的文件（优化版本）
-            changed_files = []
-            unchanged_count = 0
-            
-            # 批量检查hash，每100个文件显示一次进度
-            for i, csv_file in enumerate(csv_files):
-                if i % 100 == 0 and i > 0:
-                    print(f"  🔍 检查进度: {i}/{len(csv_files)}")
-                
-                file_path = str(csv_file)
-                filename = csv_file.name
-                
-                # 计算当前文件hash
-                current_hash = self.hash_manager.calculate_file_hash(file_path)
-                
-                # 检查文件是否有变化
-                stored_hash_key = f"weekly_{adj_type}_{filename}"
-                
-                if stored_hash_key in self.hash_manager.hash_data:
-                    stored_hash = self.hash_manager.hash_data[stored_hash_key]
-                    if current_hash == stored_hash:
-                        unchanged_count += 1
-                        continue  # 文件没有变化，跳过
-                
-                # 文件有变化或是新文件，加入处理列表
-                changed_files.append((csv_file, current_hash, stored_hash_key))
-            
-            print(f"📊 文件变化统计: {len(changed_files)} 个有变化，{unchanged_count} 个无变化")
-            
-            if not changed_files:
-                print(f"✅ {adj_type}数据无变化，跳过导入")
-                return False  # 没有变化就返回False
-            
-            # 批量处理有变化的文件
-            print(f"🚀 开始批量导入 {len(changed_files)} 个变化的文件...")
-            updated_count = 0
-            
-            for i, (csv_file, current_hash, hash_key) in enumerate(changed_files, 1):
-                if i % 20 == 0:  # 每20个文件显示一次进度
-                    print(f"  📈 导入进度: {i}/{len(changed_files)} ({i/len(changed_files)*100:.1f}%)")
-                
-                # 使用批量导入
-                if self._import_recent_records_from_csv_batch(str(csv_file), table_name, target_dates):
-                    updated_count += 1
-                    # 更新hash记录
-                    self.hash_manager.hash_data[hash_key] = current_hash
-            
-            # 保存hash文件
-            if updated_count > 0:
-                self.hash_manager._save_hash_file()
-                print(f"✅ {adj_type}批量导入完成: {updated_count}个文件更新")
-                return True
-            else:
-                print(f"ℹ️ {adj_type}: 文件有变化，但没有目标日期范围内的新数据")
+            pending = self._detect_new_rows(dir_path, adj_type)
+            if not pending:
+                print(f"✅ {adj_type}数据已是最新，跳过导入")
                 return False
+            
+            return self._import_new_rows({adj_type: pending})[adj_type]
                 
         except Exception as e:
-            print(f"❌ {adj_type}优化导入失败: {e}")
+            print(f"❌ {adj_type}水位增量导入失败: {e}")
             return False
 
-    def _import_recent_records_from_csv_batch(self, csv_file_path: str, table_name: str, target_dates: List[str]) -> bool:
+    def _import_recent_records_from_csv_batch(self, csv_file_path: str, table_name: str, target_dates: List[str],
+                                              loader: Optional[BulkLoader] = None) -> bool:
         """批量导入CSV文件中的最近记录（周更版本）"""
         try:
             df = pd.read_csv(csv_file_path, encoding='utf-8')
@@ -469,49 +341,26 @@ class WeeklyDataImporter:
             # 过滤最近的数据
             df['日期'] = df['日期'].astype(str)
             recent_df = df[df['日期'].isin(target_dates)]
-            
             if recent_df.empty:
                 return False
             
-            # 准备批量插入的数据
-            batch_data = []
-            
-            for _, row in recent_df.iterrows():
-                try:
-                    trade_date = datetime.strptime(str(row['日期']), '%Y%m%d').date()
-                    
-                    record = (
-                        row['代码'],
-                        trade_date,
-                        float(row['开盘价']) if pd.notnull(row['开盘价']) else None,
-                        float(row['最高价']) if pd.notnull(row['最高价']) else None,
-                        float(row['最低价']) if pd.notnull(row['最低价']) else None,
-                        float(row['收盘价']) if pd.notnull(row['收盘价']) else None,
-                        float(row['成交量(手数)']) if pd.notnull(row['成交量(手数)']) else None,
-                        float(row['成交额(千元)']) if pd.notnull(row['成交额(千元)']) else None,
-                        float(row['上日收盘']) if pd.notnull(row['上日收盘']) else None,
-                        float(row['涨跌']) if pd.notnull(row['涨跌']) else None,
-                        float(row['涨幅%']) if pd.notnull(row['涨幅%']) else None
-                    )
-                    batch_data.append(record)
-                        
-                except Exception as e:
-                    continue  # 跳过有问题的行
-            
-            # 执行批量插入
-            if batch_data:
-                self._execute_batch_insert_weekly(table_name, batch_data)
-                return True
-            
-            return False
+            frame = prepare_frame(recent_df)
+            if frame.empty:
+                return False
             
         except Exception as e:
             print(f"❌ 批量导入最近记录失败: {e}")
             return False
+        
+        self._write_frame(frame, table_name, loader)
+        return True
 
     def import_latest_weekly_data_optimized(self, base_dir: str, weeks_back: int = 1) -> Dict[str, bool]:
-        """优化版本的周更增量导入 - 高性能批量处理"""
-        print(f"🚀 执行高性能周更增量导入：最近{weeks_back}周的数据")
+        """优化版本的周更增量导入 - 按水位只读取新数据，三个复权表批量并行处理
+        
+        weeks_back 为兼容旧调用保留：比水位更新的行全部导入，不再按最近周数筛选
+        """
+        print("🚀 执行高性能周更增量导入：水位之后的新数据")
         
         if not os.path.exists(base_dir):
             print(f"❌ 基础目录不存在: {base_dir}")
@@ -532,31 +381,20 @@ class WeeklyDataImporter:
             # 确保表结构存在
             self._ensure_tables_exist()
             
-            # 获取需要更新的日期范围（最近几周）
-            target_dates = self._get_recent_week_dates(weeks_back)
-            print(f"📅 目标日期范围: {len(target_dates)} 天")
-            
             total_start_time = datetime.now()
             
+            # 三个复权表有新数据的文件一起交给进程池
+            pending = {}
             for adj_type, dir_name in directories.items():
                 dir_path = os.path.join(base_dir, dir_name)
                 if os.path.exists(dir_path):
-                    print(f"\n📂 高性能导入{adj_type}数据...")
-                    start_time = datetime.now()
-                    
-                    success = self._import_recent_data_optimized(dir_path, adj_type, target_dates)
-                    
-                    end_time = datetime.now()
-                    duration = (end_time - start_time).total_seconds()
-                    print(f"⏱️ {adj_type}导入耗时: {duration:.2f}秒")
-                    
-                    results[adj_type] = success
+                    print(f"\n📂 检查{adj_type}数据...")
+                    pending[adj_type] = self._detect_new_rows(dir_path, adj_type)
                 else:
                     print(f"⚠️ 目录不存在: {dir_name}")
                     results[adj_type] = False
             
-            # 提交更改
-            self.db_manager.connection.commit()
+            results.update(self._import_new_rows(pending))
             
             total_end_time = datetime.now()
             total_duration = (total_end_time - total_start_time).total_seconds()
@@ -571,6 +409,66 @@ class WeeklyDataImporter:
         
         return results
 
+    def import_changes(self, base_dir: str, weeks_back: int = 1) -> Dict[str, bool]:
+        """按变更清单增量导入 - 只读取周更变更的ETF文件，只写入清单中的日期
+        
+        消费者首次运行或清单已失效时回退到 import_latest_weekly_data_optimized，完成后从最新清单开始跟踪
+        """
+        change_log = ChangeLog(base_dir)
+        changes = change_log.pending(CHANGE_CONSUMER)
+        if changes.full_scan:
+            print("📋 没有可用的变更清单，执行水位增量导入")
+            results = self.import_latest_weekly_data_optimized(base_dir, weeks_back)
+            if results:
+                change_log.acknowledge(CHANGE_CONSUMER, changes)
+            return results
+        
+        directories = {
+            '前复权': '0_ETF日K(前复权)',
+            '后复权': '0_ETF日K(后复权)', 
+            '除权': '0_ETF日K(除权)'
+        }
+        results = {adj_type: False for adj_type in directories}
+        if changes.is_empty():
+            print("✅ 变更清单中没有新数据，跳过导入")
+            change_log.acknowledge(CHANGE_CONSUMER, changes)
+            return results
+        
+        print(f"🚀 按变更清单导入: {len(changes)} 个ETF")
+        try:
+            if not self.connect():
+                return results
+            
+            self._ensure_tables_exist()
+            
+            jobs = []
+            for adj_type, dir_name in directories.items():
+                files = []
+                for code in sorted(changes.codes(dir_name)):
+                    csv_file = os.path.join(base_dir, dir_name, f"{code}.csv")
+                    if os.path.exists(csv_file):
+                        files.append((csv_file, [str(date) for date in changes.dates(dir_name, code)]))
+                jobs.append((adj_type, self._table_name(adj_type), files))
+            
+            summary = self._run_jobs(jobs)
+            for adj_type, stats in summary.items():
+                results[adj_type] = len(stats["imported"]) > 0
+            
+            # 有分片失败时不确认清单，下次重新导入（按代码+日期合并，重复导入无副作用）
+            if any(stats["failed_shards"] for stats in summary.values()):
+                print("⚠️ 部分分片导入失败，变更清单保留到下次导入")
+            else:
+                change_log.acknowledge(CHANGE_CONSUMER, changes)
+            
+        except Exception as e:
+            print(f"❌ 按变更清单导入失败: {e}")
+            if hasattr(self, 'db_manager') and self.db_manager.connection:
+                self.db_manager.connection.rollback()
+        finally:
+            self.disconnect()
+        
+        return results
+
 
 def main():
     """独立运行测试"""
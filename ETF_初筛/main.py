@@ -14,6 +14,7 @@ from typing import List, Optional
 sys.path.insert(0, str(Path(__file__).parent / "src"))
 
 from src import ETFDataLoader, ETFDataProcessor, OutputManager
+from src.processors.result_cache import FilterResultCache
 from src.utils.config import get_config
 from src.utils.logger import get_logger, ProcessTimer
 
@@ -29,6 +30,7 @@ def main():
   python main.py --mode specific --codes 159001 159003  # 筛选指定ETF
   python main.py --mode test                   # 测试系统
   python main.py --mode config                 # 显示配置信息
+  python main.py --changed-only                # 只重新筛选日更变更的ETF
         """
     )
     
@@ -76,6 +78,12 @@ def main():
         help="仅输出结果，不保存文件"
     )
     
+    parser.add_argument(
+        "--changed-only",
+        action="store_true",
+        help="双门槛模式下只重新加载和筛选日更变更清单中的ETF，其余沿用上次的筛选结果"
+    )
+    
     args = parser.parse_args()
     
     # 执行对应模式
@@ -200,6 +208,12 @@ def run_dual_threshold_filter(args):
             data_loader = ETFDataLoader()
             output_manager = OutputManager()
             
+            # 变更清单在加载前读取，处理期间新发布的变更留到下次
+            change_log = data_loader.get_change_log()
+            change_consumer = f"etf_screening_{args.fuquan_type}_{args.days_back or 'all'}"
+            changes = change_log.pending(change_consumer)
+            result_cache = FilterResultCache(args.fuquan_type, args.days_back)
+            
             # 第一步：加载数据（只加载一次）
             logger.info(f"\n📊 加载ETF数据...")
             etf_codes = data_loader.get_available_etf_codes(args.fuquan_type)
@@ -208,11 +222,30 @@ def run_dual_threshold_filter(args):
                 logger.error(f"❌ 未发现可用的ETF数据")
                 return False
             
+            cached = None
+            codes_to_load = etf_codes
+            if args.changed_only:
+                cached = None if changes.full_scan else result_cache.load()
+                if cached is None:
+                    logger.info("📋 没有可用的变更清单或筛选缓存，全量筛选")
+                else:
+                    # 变更的ETF和缓存中没有的ETF重新筛选，已删除的ETF从结果中移除
+                    available = set(etf_codes)
+                    cached_codes = set().union(*[results.keys() for threshold in cached.values()
+                                                 for results in threshold.values()])
+                    stale = (changes.codes(args.fuquan_type) | (available - cached_codes)) & available
+                    cached = {threshold: {name: {code: result for code, result in results.items()
+                                                 if code in available and code not in stale}
+                                          for name, results in filters.items()}
+                              for threshold, filters in cached.items()}
+                    codes_to_load = sorted(stale)
+                    logger.info(f"📋 增量筛选: {len(codes_to_load)}/{len(etf_codes)} 个ETF有变更，其余沿用上次结果")
+            
             # 根据快速模式选择加载方式
             if args.fast_mode:
                 # 并行加载数据
                 etf_data = data_loader.load_multiple_etfs(
-                    etf_codes, 
+                    codes_to_load, 
                     args.fuquan_type, 
                     args.days_back, 
                     max_workers=args.max_workers
@@ -220,22 +253,23 @@ def run_dual_threshold_filter(args):
             else:
                 # 传统串行加载（兼容模式）
                 etf_data = data_loader.load_multiple_etfs(
-                    etf_codes, 
+                    codes_to_load, 
                     args.fuquan_type, 
                     args.days_back, 
                     max_workers=1
                 )
             
-            if not etf_data:
+            if not etf_data and cached is None:
                 logger.error(f"❌ 数据加载失败")
                 return False
             
-            logger.info(f"✅ 数据加载完成：{len(etf_data)}/{len(etf_codes)} 个ETF")
+            logger.info(f"✅ 数据加载完成：{len(etf_data)}/{len(codes_to_load)} 个ETF")
             
             # 第二步：分别用两个门槛筛选（复用数据）
             logger.info("\n🔸 执行5000万门槛筛选...")
             processor_5000w = ETFDataProcessor(threshold_name="5000万门槛")
-            results_5000w = processor_5000w.process_loaded_etfs(etf_data, args.fuquan_type)
+            results_5000w = processor_5000w.process_loaded_etfs(
+                etf_data, args.fuquan_type, cached.get("5000万门槛") if cached else None)
             
             if "error" in results_5000w:
                 logger.error(f"❌ 5000万门槛筛选失败: {results_5000w['error']}")
@@ -243,7 +277,8 @@ def run_dual_threshold_filter(args):
             
             logger.info("\n🔹 执行3000万门槛筛选...")
             processor_3000w = ETFDataProcessor(threshold_name="3000万门槛")
-            results_3000w = processor_3000w.process_loaded_etfs(etf_data, args.fuquan_type)
+            results_3000w = processor_3000w.process_loaded_etfs(
+                etf_data, args.fuquan_type, cached.get("3000万门槛") if cached else None)
             
             if "error" in results_3000w:
                 logger.error(f"❌ 3000万门槛筛选失败: {results_3000w['error']}")
@@ -256,6 +291,8 @@ def run_dual_threshold_filter(args):
             if not args.output_only:
                 logger.info(f"💾 保存双门槛筛选结果到 data 目录...")
                 output_manager.save_dual_threshold_results(results_5000w, results_3000w)
+                result_cache.save({"5000万门槛": results_5000w, "3000万门槛": results_3000w})
+                change_log.acknowledge(change_consumer, changes)
             
             return True
             
@@ -16,6 +16,15 @@ import multiprocessing as mp
 from .utils.config import get_config
 from .utils.logger import get_logger
 
+# 通过项目根目录 config/columnar_store.py 读取日更数据
+# （优先使用列式副本，缺失或过期时回退CSV，兼容追加模式下未压实的尾段）
+import sys
+_project_root = str(Path(__file__).resolve().parent.parent.parent)
+if _project_root not in sys.path:
+    sys.path.insert(0, _project_root)
+from config.columnar_store import read_etf_frame
+from config.change_manifest import ChangeLog
+
 
 class ETFDataLoader:
     """
@@ -66,6 +75,10 @@ class ETFDataLoader:
             self.logger.error(f"获取ETF代码失败: {e}")
             return []
     
+    def get_change_log(self):
+        """日更数据源的变更清单（日更每次写入后发布，记录变更的ETF）"""
+        return ChangeLog(self.daily_source)
+    
     def _is_valid_etf_code(self, code: str) -> bool:
         """
         验证ETF代码有效性
@@ -113,7 +126,7 @@ class ETFDataLoader:
                 return None
             
             # 只读方式加载数据
-            df = pd.read_csv(csv_file, encoding='utf-8')
+            df = read_etf_frame(csv_file)
             
             # 验证数据格式
             if not self._validate_dataframe(df):
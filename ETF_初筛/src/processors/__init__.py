@@ -6,5 +6,6 @@ ETF数据处理器模块
 
 from .data_processor import ETFDataProcessor
 from .output_manager import OutputManager
+from .result_cache import FilterResultCache
 
-__all__ = ['ETFDataProcessor', 'OutputManager'] 
\ No newline at end of file
+__all__ = ['ETFDataProcessor', 'OutputManager', 'FilterResultCache'] 
\ No newline at end of file
@@ -91,7 +91,7 @@ class ETFDataProcessor:
             final_results = self._generate_final_results(filter_results)
             
             # 4. 统计摘要
-            process_summary = self._generate_process_summary(etf_codes, etf_data, filter_results, final_results)
+            process_summary = self._generate_process_summary(etf_codes, len(etf_data), filter_results, final_results)
             
             return {
                 "复权类型": fuquan_type,
@@ -242,7 +242,7 @@ class ETFDataProcessor:
         return sorted(candidate_etfs)
     
     def _generate_process_summary(self, all_etf_codes: List[str], 
-                                etf_data: Dict[str, pd.DataFrame],
+                                loaded_count: int,
                                 filter_results: Dict[str, Dict[str, FilterResult]],
                                 final_results: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -250,7 +250,7 @@ class ETFDataProcessor:
         
         Args:
             all_etf_codes: 所有ETF代码
-            etf_data: 加载的ETF数据
+            loaded_count: 成功加载（含沿用缓存结果）的ETF数
             filter_results: 筛选结果
             final_results: 最终结果
         
@@ -260,8 +260,8 @@ class ETFDataProcessor:
         return {
             "数据加载": {
                 "发现ETF总数": len(all_etf_codes),
-                "成功加载数": len(etf_data),
-                "加载成功率": len(etf_data) / len(all_etf_codes) * 100 if all_etf_codes else 0
+                "成功加载数": loaded_count,
+                "加载成功率": loaded_count / len(all_etf_codes) * 100 if all_etf_codes else 0
             },
             "筛选器执行": {
                 "筛选器总数": len(self.filters),
@@ -270,7 +270,7 @@ class ETFDataProcessor:
             },
             "筛选结果": final_results["筛选统计"],
             "数据质量": {
-                "数据完整性": "良好" if len(etf_data) / len(all_etf_codes) > 0.9 else "一般",
+                "数据完整性": "良好" if all_etf_codes and loaded_count / len(all_etf_codes) > 0.9 else "一般",
                 "数据时效性": "当日" if datetime.now().hour < 16 else "最新"
             }
         }
@@ -318,7 +318,7 @@ class ETFDataProcessor:
         # 执行筛选
         filter_results = self._run_filter_chain(etf_data)
         final_results = self._generate_final_results(filter_results)
-        process_summary = self._generate_process_summary(etf_codes, etf_data, filter_results, final_results)
+        process_summary = self._generate_process_summary(etf_codes, len(etf_data), filter_results, final_results)
         
         return {
             "复权类型": fuquan_type,
@@ -330,33 +330,42 @@ class ETFDataProcessor:
         }
     
     def process_loaded_etfs(self, etf_data: Dict[str, pd.DataFrame], 
-                           fuquan_type: str = "0_ETF日K(前复权)") -> Dict[str, Any]:
+                           fuquan_type: str = "0_ETF日K(前复权)",
+                           cached_results: Dict[str, Dict[str, FilterResult]] = None) -> Dict[str, Any]:
         """
         处理已加载的ETF数据（优化版，避免重复加载）
         
         Args:
             etf_data: 已加载的ETF数据字典
             fuquan_type: 复权类型（仅用于结果记录）
+            cached_results: 未变更ETF沿用的上次筛选结果 {筛选器名称: {ETF代码: FilterResult}}，
+                            只筛选 etf_data 中的ETF
         
         Returns:
             完整的处理结果
         """
         with ProcessTimer("ETF初筛处理", self.logger):
-            if not etf_data:
+            if not etf_data and not cached_results:
                 self.logger.error(f"❌ 传入的ETF数据为空")
                 return {"error": "ETF数据为空"}
             
             self.logger.info(f"📊 开始处理已加载的 {len(etf_data)} 个ETF数据...")
             
-            # 1. 执行筛选
-            filter_results = self._run_filter_chain(etf_data)
+            # 1. 执行筛选（变更的ETF重新筛选，其余沿用缓存结果）
+            filter_results = self._run_filter_chain(etf_data) if etf_data else {name: {} for name in self.filters}
+            if cached_results:
+                for filter_name, results in filter_results.items():
+                    merged = dict(cached_results.get(filter_name, {}))
+                    merged.update(results)
+                    filter_results[filter_name] = merged
             
             # 2. 生成最终结果
             final_results = self._generate_final_results(filter_results)
             
             # 3. 统计摘要
-            all_etf_codes = list(etf_data.keys())
-            process_summary = self._generate_process_summary(all_etf_codes, etf_data, filter_results, final_results)
+            all_etf_codes = sorted(set().union(*[results.keys() for results in filter_results.values()]))
+            process_summary = self._generate_process_summary(all_etf_codes, len(all_etf_codes),
+                                                             filter_results, final_results)
             
             return {
                 "复权类型": fuquan_type,
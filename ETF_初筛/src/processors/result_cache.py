@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+筛选结果缓存
+筛选器对每个ETF的判断只取决于该ETF自身的数据和筛选配置，
+保存上次各门槛、各筛选器的逐ETF结果，只有变更的ETF需要重新加载和筛选
+"""
+
+import hashlib
+import json
+import os
+import pickle
+from typing import Any, Dict, Optional
+
+from ..filters import FilterResult
+from ..utils.config import get_config
+from ..utils.logger import get_logger
+
+CACHE_DIR_NAME = "_cache"
+
+
+class FilterResultCache:
+    """按复权类型和加载天数保存的逐ETF筛选结果"""
+
+    def __init__(self, fuquan_type: str, days_back: Optional[int] = None):
+        self.config = get_config()
+        self.logger = get_logger()
+        self.cache_file = (self.config.get_output_base() / CACHE_DIR_NAME /
+                           f"filter_results_{fuquan_type}_{days_back or 'all'}.pkl")
+        # 筛选配置变化后缓存的结果全部失效
+        config_text = json.dumps(self.config.config, sort_keys=True, ensure_ascii=False)
+        self.signature = hashlib.md5(config_text.encode('utf-8')).hexdigest()
+
+    def load(self) -> Optional[Dict[str, Dict[str, Dict[str, FilterResult]]]]:
+        """
+        读取缓存
+
+        Returns:
+            {门槛名称: {筛选器名称: {ETF代码: FilterResult}}}；不存在、损坏或配置已变化时返回 None
+        """
+        try:
+            with open(self.cache_file, 'rb') as f:
+                data = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            self.logger.warning(f"⚠️ 筛选结果缓存无法读取，将全量筛选: {e}")
+            return None
+
+        if data.get("signature") != self.signature:
+            self.logger.info("🔄 筛选配置已变化，缓存失效")
+            return None
+        return data.get("results")
+
+    def save(self, results: Dict[str, Dict[str, Any]]):
+        """
+        保存各门槛的处理结果中的逐ETF筛选结果
+
+        Args:
+            results: {门槛名称: process_loaded_etfs 的返回值}
+        """
+        data = {
+            "signature": self.signature,
+            "results": {threshold: result["筛选结果"] for threshold, result in results.items()}
+        }
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        temp_file = self.cache_file.with_name(self.cache_file.name + '.tmp')
+        with open(temp_file, 'wb') as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_file, self.cache_file)
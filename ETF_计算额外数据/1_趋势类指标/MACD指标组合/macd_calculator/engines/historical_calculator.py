@@ -15,6 +15,14 @@ from datetime import datetime
 from typing import Dict, List, Optional, Any
 from ..infrastructure.config import MACDConfig
 
+# 通过项目根目录 config/etf_store.py 读取日更数据（兼容追加模式下未压实的尾段）
+import sys
+from pathlib import Path
+_project_root = str(Path(__file__).resolve().parents[5])
+if _project_root not in sys.path:
+    sys.path.insert(0, _project_root)
+from config.etf_store import read_etf_csv
+
 
 class MACDHistoricalCalculator:
     """MACD历史数据计算器 - 超高性能向量化版本"""
@@ -201,7 +209,7 @@ class MACDHistoricalCalculator:
             # 读取数据文件
             if etf_code in etf_files_dict:
                 try:
-                    df = pd.read_csv(etf_files_dict[etf_code])
+                    df = read_etf_csv(etf_files_dict[etf_code])
                     
                     # 超高性能计算
                     result_df = self.calculate_full_historical_macd_optimized(df, etf_code)
@@ -13,6 +13,14 @@ import glob
 from typing import List, Optional, Dict, Any
 from .config import MACDConfig
 
+# 通过项目根目录 config/etf_store.py 读取日更数据（兼容追加模式下未压实的尾段）
+import sys
+from pathlib import Path
+_project_root = str(Path(__file__).resolve().parents[5])
+if _project_root not in sys.path:
+    sys.path.insert(0, _project_root)
+from config.etf_store import read_etf_csv
+
 
 class MACDDataReader:
     """MACD数据读取器 - 重构版"""
@@ -79,7 +87,7 @@ class MACDDataReader:
             file_path = matching_files[0]
             
             # 读取CSV数据
-            df = pd.read_csv(file_path, encoding='utf-8')
+            df = read_etf_csv(file_path, encoding='utf-8')
             
             # 数据验证和清理
             if df.empty:
@@ -13,6 +13,16 @@ import time
 import subprocess
 from pathlib import Path
 
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+from config.change_manifest import ChangeGate
+from config.perf_telemetry import record_indicator_perf, run_measured
+
+# 日更数据（变更清单）和初筛结果都没有变化时跳过指标系统，--full 强制重新计算
+DAILY_DIR = PROJECT_ROOT / "ETF日更"
+SCREENING_LISTS = [PROJECT_ROOT / "ETF_初筛" / "data" / threshold / "通过筛选ETF.txt"
+                   for threshold in ("3000万门槛", "5000万门槛")]
+
 
 def run_indicator(name: str, script_path: str, working_dir: str) -> bool:
     """运行单个指标系统"""
@@ -23,25 +33,21 @@ def run_indicator(name: str, script_path: str, working_dir: str) -> bool:
     
     try:
         # 运行指标脚本
-        result = subprocess.run(
-            [sys.executable, script_path],
-            cwd=working_dir,
-            timeout=1800,  # 30分钟超时
-            capture_output=False,  # 让输出直接显示
-            text=True
-        )
+        returncode, metrics = run_measured([sys.executable, script_path], cwd=working_dir, timeout=1800)  # 30分钟超时
         
         duration = time.time() - start_time
         
-        if result.returncode == 0:
+        record_indicator_perf(working_dir, 'success' if returncode == 0 else 'failed', metrics)
+        if returncode == 0:
             print(f"\n✅ {name} 完成 ({duration:.2f}秒)")
             return True
         else:
-            print(f"\n❌ {name} 失败 (返回码: {result.returncode})")
+            print(f"\n❌ {name} 失败 (返回码: {returncode})")
             return False
             
     except subprocess.TimeoutExpired:
         duration = time.time() - start_time
+        record_indicator_perf(working_dir, 'timeout', {'wall_time': round(duration, 3)})
         print(f"\n⏰ {name} 执行超时 ({duration:.2f}秒)")
         return False
     except Exception as e:
@@ -114,6 +120,12 @@ def main():
             failed_indicators.append(indicator['name'])
             continue
         
+        gate = ChangeGate(DAILY_DIR, f"indicator_{base_dir.name}_{indicator['dir']}", SCREENING_LISTS)
+        if "--full" not in sys.argv and not gate.needs_update():
+            print(f"⏭️ {indicator['name']}: 日更数据和初筛结果无变化，跳过")
+            success_count += 1
+            continue
+        
         # 运行指标
         success = run_indicator(
             indicator['name'],
@@ -123,6 +135,7 @@ def main():
         
         if success:
             success_count += 1
+            gate.acknowledge()
         else:
             failed_indicators.append(indicator['name'])
     
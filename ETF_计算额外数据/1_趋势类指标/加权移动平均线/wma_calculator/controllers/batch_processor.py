@@ -15,6 +15,14 @@ from ..infrastructure.config import WMAConfig
 from ..infrastructure.cache_manager import WMACacheManager
 from .etf_processor import WMAETFProcessor
 
+# 通过项目根目录 config/etf_store.py 读取日更数据（兼容追加模式下未压实的尾段）
+import sys
+from pathlib import Path
+_project_root = str(Path(__file__).resolve().parents[5])
+if _project_root not in sys.path:
+    sys.path.insert(0, _project_root)
+from config.etf_store import read_etf_csv
+
 
 class WMABatchProcessor:
     """WMA批量处理器 - 支持智能缓存的高性能批量处理"""
@@ -370,7 +378,7 @@ class WMABatchProcessor:
             
             # 2. 读取原始ETF数据
             source_file_path = self.config.get_file_path(etf_code)
-            etf_df = pd.read_csv(source_file_path, encoding='utf-8')
+            etf_df = read_etf_csv(source_file_path, encoding='utf-8')
             
             if etf_df.empty:
                 return None
@@ -503,7 +511,7 @@ class WMABatchProcessor:
             # 读取源文件的第一行来获取最新日期
             try:
                 # 只读取前几行以提高性能
-                source_df = pd.read_csv(source_file_path, encoding='utf-8', nrows=2)
+                source_df = read_etf_csv(source_file_path, encoding='utf-8', nrows=2)
                 if source_df.empty:
                     return None
                 
@@ -583,7 +591,7 @@ class WMABatchProcessor:
             # 尝试从源文件获取最新价格信息
             try:
                 source_file_path = self.config.get_file_path(etf_code)
-                source_df = pd.read_csv(source_file_path, encoding='utf-8', nrows=1)
+                source_df = read_etf_csv(source_file_path, encoding='utf-8', nrows=1)
                 if not source_df.empty:
                     latest_price['close'] = float(source_df.iloc[0]['收盘价']) if '收盘价' in source_df.columns else 0.0
                     latest_price['change_pct'] = float(source_df.iloc[0]['涨幅%']) if '涨幅%' in source_df.columns else 0.0
@@ -16,6 +16,14 @@ from typing import Dict, Optional, List, Any, Set
 from .config import WMAConfig
 from .utils import normalize_date_format, compare_dates_safely
 
+# 通过项目根目录 config/etf_store.py 读取日更数据（兼容追加模式下未压实的尾段）
+import sys
+from pathlib import Path
+_project_root = str(Path(__file__).resolve().parents[5])
+if _project_root not in sys.path:
+    sys.path.insert(0, _project_root)
+from config.etf_store import read_etf_csv, get_etf_mtime
+
 
 class WMACacheManager:
     """WMA智能缓存管理器 - 参考SMA项目架构"""
@@ -278,7 +286,7 @@ class WMACacheManager:
                     return False
                 
                 # 检查源文件的最新日期
-                source_df = pd.read_csv(source_file_path, nrows=2)  # 只读取前2行提高性能
+                source_df = read_etf_csv(source_file_path, nrows=2)  # 只读取前2行提高性能
                 if source_df.empty:
                     return False
                     
@@ -316,7 +324,7 @@ class WMACacheManager:
                     return False
                 
                 cache_mtime = os.path.getmtime(cache_file_path)
-                source_mtime = os.path.getmtime(source_file_path)
+                source_mtime = get_etf_mtime(source_file_path)
                 
                 if source_mtime > cache_mtime:
                     return False
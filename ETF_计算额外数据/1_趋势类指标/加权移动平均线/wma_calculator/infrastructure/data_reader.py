@@ -12,6 +12,14 @@ import os
 from typing import List, Optional, Dict, Tuple
 from .config import WMAConfig
 
+# 通过项目根目录 config/etf_store.py 读取日更数据（兼容追加模式下未压实的尾段）
+import sys
+from pathlib import Path
+_project_root = str(Path(__file__).resolve().parents[5])
+if _project_root not in sys.path:
+    sys.path.insert(0, _project_root)
+from config.etf_store import read_etf_csv
+
 
 class WMADataReader:
     """WMA数据读取器 - 重构版（功能完全一致）"""
@@ -63,7 +71,7 @@ class WMADataReader:
         
         try:
             # 读取CSV文件 - 保持原有读取方式
-            df = pd.read_csv(file_path, encoding='utf-8')
+            df = read_etf_csv(file_path, encoding='utf-8')
             total_rows = len(df)
             
             # 数据验证 - 保持原有验证逻辑
@@ -17,6 +17,14 @@ from datetime import datetime
 from typing import List, Dict, Any, Optional
 from ..infrastructure.config import WMAConfig
 
+# 通过项目根目录 config/etf_store.py 读取日更数据（兼容追加模式下未压实的尾段）
+import sys
+from pathlib import Path
+_project_root = str(Path(__file__).resolve().parents[5])
+if _project_root not in sys.path:
+    sys.path.insert(0, _project_root)
+from config.etf_store import get_etf_mtime
+
 
 def convert_numpy_types(obj):
     """
@@ -463,7 +471,7 @@ class WMAResultProcessor:
                     data_reader = WMADataReader(self.config)
                     source_file_path = data_reader.get_etf_file_path(etf_code)
                     if source_file_path and os.path.exists(source_file_path):
-                        source_mtime = os.path.getmtime(source_file_path)
+                        source_mtime = get_etf_mtime(source_file_path)
                         if cache_mtime >= source_mtime:
                             # 缓存有效，直接返回
                             if not (self.config and self.config.performance_mode):
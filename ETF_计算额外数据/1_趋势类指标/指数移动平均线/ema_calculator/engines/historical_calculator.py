@@ -16,6 +16,14 @@ from typing import Dict, List, Optional, Any
 from ..infrastructure.config import EMAConfig
 from .ema_engine import EMAEngine
 
+# 通过项目根目录 config/etf_store.py 读取日更数据（兼容追加模式下未压实的尾段）
+import sys
+from pathlib import Path
+_project_root = str(Path(__file__).resolve().parents[5])
+if _project_root not in sys.path:
+    sys.path.insert(0, _project_root)
+from config.etf_store import read_etf_csv
+
 
 class EMAHistoricalCalculator:
     """EMA历史数据计算器 - 重构版（与WMA/SMA保持一致）"""
@@ -97,7 +105,7 @@ class EMAHistoricalCalculator:
         """
         try:
             # 读取完整历史数据
-            df = pd.read_csv(file_path, encoding='utf-8')
+            df = read_etf_csv(file_path, encoding='utf-8')
             
             if df.empty:
                 return None
@@ -17,6 +17,14 @@ from typing import Dict, Optional, List, Any, Set
 from .config import EMAConfig
 from .utils import normalize_date_format, compare_dates_safely
 
+# 通过项目根目录 config/etf_store.py 读取日更数据（兼容追加模式下未压实的尾段）
+import sys
+from pathlib import Path
+_project_root = str(Path(__file__).resolve().parents[5])
+if _project_root not in sys.path:
+    sys.path.insert(0, _project_root)
+from config.etf_store import read_etf_csv
+
 
 class EMACacheManager:
     """EMA智能缓存管理器 - 重构版（与WMA/SMA保持一致）"""
@@ -293,7 +301,7 @@ class EMACacheManager:
                     return False
                 
                 # 检查源文件的最新日期
-                source_df = pd.read_csv(source_file_path, nrows=2)  # 只读取前2行提高性能
+                source_df = read_etf_csv(source_file_path, nrows=2)  # 只读取前2行提高性能
                 if source_df.empty:
                     return False
                     
@@ -13,6 +13,14 @@ import pandas as pd
 from typing import List, Optional, Tuple, Dict
 from .config import EMAConfig
 
+# 通过项目根目录 config/etf_store.py 读取日更数据（兼容追加模式下未压实的尾段）
+import sys
+from pathlib import Path
+_project_root = str(Path(__file__).resolve().parents[5])
+if _project_root not in sys.path:
+    sys.path.insert(0, _project_root)
+from config.etf_store import read_etf_csv
+
 
 class EMADataReader:
     """EMA数据读取器 - 重构版（与WMA/SMA保持一致）"""
@@ -110,7 +118,7 @@ class EMADataReader:
                 return None
             
             # 读取CSV数据
-            df = pd.read_csv(file_path, encoding='utf-8')
+            df = read_etf_csv(file_path, encoding='utf-8')
             
             if df.empty:
                 if not self.config.performance_mode:
@@ -14,6 +14,14 @@ import pandas as pd
 from typing import Optional
 from ..infrastructure.config import SMAConfig
 
+# 通过项目根目录 config/etf_store.py 读取日更数据（兼容追加模式下未压实的尾段）
+import sys
+from pathlib import Path
+_project_root = str(Path(__file__).resolve().parents[5])
+if _project_root not in sys.path:
+    sys.path.insert(0, _project_root)
+from config.etf_store import read_etf_csv
+
 
 class SMAHistoricalCalculator:
     """SMA历史数据计算引擎 - 超高性能版本"""
@@ -167,7 +175,7 @@ class SMAHistoricalCalculator:
             # 读取数据文件
             if etf_code in etf_files_dict:
                 try:
-                    df = pd.read_csv(etf_files_dict[etf_code])
+                    df = read_etf_csv(etf_files_dict[etf_code])
                     
                     # 超高性能计算
                     result_df = self.calculate_full_historical_sma_optimized(df, etf_code)
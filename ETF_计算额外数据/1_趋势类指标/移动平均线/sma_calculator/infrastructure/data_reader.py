@@ -12,6 +12,14 @@ import os
 from typing import Optional, Tuple, List, Dict
 from .config import SMAConfig
 
+# 通过项目根目录 config/etf_store.py 读取日更数据（兼容追加模式下未压实的尾段）
+import sys
+from pathlib import Path
+_project_root = str(Path(__file__).resolve().parents[5])
+if _project_root not in sys.path:
+    sys.path.insert(0, _project_root)
+from config.etf_store import read_etf_csv
+
 
 class ETFDataReader:
     """ETF数据读取器 - 重构版"""
@@ -63,7 +71,7 @@ class ETFDataReader:
             try:
                 # 优化读取：只读取必要列
                 print(f"   🔍 尝试读取CSV文件，列: ['日期', '收盘价']")
-                df = pd.read_csv(
+                df = read_etf_csv(
                     file_path, 
                     encoding='utf-8',
                     usecols=['日期', '收盘价'],
@@ -95,7 +103,7 @@ class ETFDataReader:
                 print(f"   ❌ 列名错误: {str(e)}")
                 # 尝试读取全部列以查看实际列名
                 try:
-                    all_df = pd.read_csv(file_path, encoding='utf-8', nrows=1)
+                    all_df = read_etf_csv(file_path, encoding='utf-8', nrows=1)
                     print(f"   📊 实际列名: {all_df.columns.tolist()}")
                 except Exception as inner_e:
                     print(f"   ❌ 尝试读取全部列失败: {str(inner_e)}")
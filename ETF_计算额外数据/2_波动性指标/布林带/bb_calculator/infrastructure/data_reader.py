@@ -14,6 +14,14 @@ from typing import Optional, Dict, List, Tuple
 from .config import BBConfig
 from .utils import BBUtils
 
+# 通过项目根目录 config/etf_store.py 读取日更数据（兼容追加模式下未压实的尾段）
+import sys
+from pathlib import Path
+_project_root = str(Path(__file__).resolve().parents[5])
+if _project_root not in sys.path:
+    sys.path.insert(0, _project_root)
+from config.etf_store import read_etf_csv
+
 
 class BBDataReader:
     """布林带数据读取器"""
@@ -40,7 +48,7 @@ class BBDataReader:
         
         try:
             # 读取CSV文件
-            df = pd.read_csv(file_path, encoding='utf-8')
+            df = read_etf_csv(file_path, encoding='utf-8')
             
             # 数据预处理
             processed_df = self._preprocess_data(df, etf_code)
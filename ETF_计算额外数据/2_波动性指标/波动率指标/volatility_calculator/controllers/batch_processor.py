@@ -15,6 +15,14 @@ from ..infrastructure.config import VolatilityConfig
 from ..infrastructure.cache_manager import VolatilityCacheManager
 from .etf_processor import VolatilityETFProcessor
 
+# 通过项目根目录 config/etf_store.py 读取日更数据（兼容追加模式下未压实的尾段）
+import sys
+from pathlib import Path
+_project_root = str(Path(__file__).resolve().parents[5])
+if _project_root not in sys.path:
+    sys.path.insert(0, _project_root)
+from config.etf_store import read_etf_csv
+
 
 class VolatilityBatchProcessor:
     """波动率批处理器"""
@@ -171,7 +179,7 @@ class VolatilityBatchProcessor:
             
             # 优化：一次读取源文件，避免重复读取
             try:
-                source_df = pd.read_csv(source_file_path, encoding='utf-8')
+                source_df = read_etf_csv(source_file_path, encoding='utf-8')
             except Exception:
                 source_df = None
             
@@ -212,7 +220,7 @@ class VolatilityBatchProcessor:
         try:
             # 优化：使用传入的source_df，避免重复读取
             if source_df is None:
-                source_df = pd.read_csv(source_file_path, encoding='utf-8')
+                source_df = read_etf_csv(source_file_path, encoding='utf-8')
             
             if source_df.empty:
                 return False
@@ -17,6 +17,14 @@ from typing import Dict, List, Optional, Any, Tuple
 from ..infrastructure.config import VolatilityConfig
 from .volatility_engine import VolatilityEngine
 
+# 通过项目根目录 config/etf_store.py 读取日更数据（兼容追加模式下未压实的尾段）
+import sys
+from pathlib import Path
+_project_root = str(Path(__file__).resolve().parents[5])
+if _project_root not in sys.path:
+    sys.path.insert(0, _project_root)
+from config.etf_store import read_etf_csv
+
 
 class VolatilityHistoricalCalculator:
     """波动率历史计算器"""
@@ -370,7 +378,7 @@ class VolatilityHistoricalCalculator:
                 # 如果缓存未命中，进行全量计算
                 if historical_df is None:
                     # 读取数据
-                    df = pd.read_csv(file_path, encoding='utf-8')
+                    df = read_etf_csv(file_path, encoding='utf-8')
                     
                     if df.empty:
                         print(f"   ❌ {etf_code}: 数据为空")
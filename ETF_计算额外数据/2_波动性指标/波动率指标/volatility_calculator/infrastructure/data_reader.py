@@ -16,6 +16,14 @@ import numpy as np
 from typing import Dict, List, Optional, Tuple, Any
 from .config import VolatilityConfig
 
+# 通过项目根目录 config/etf_store.py 读取日更数据（兼容追加模式下未压实的尾段）
+import sys
+from pathlib import Path
+_project_root = str(Path(__file__).resolve().parents[5])
+if _project_root not in sys.path:
+    sys.path.insert(0, _project_root)
+from config.etf_store import read_etf_csv
+
 
 class VolatilityDataReader:
     """波动率数据读取器"""
@@ -139,7 +147,7 @@ class VolatilityDataReader:
         
         try:
             # 读取CSV文件
-            df = pd.read_csv(file_path, encoding='utf-8')
+            df = read_etf_csv(file_path, encoding='utf-8')
             
             # 数据清洗和验证
             df = self._clean_and_validate_data(df, etf_code)
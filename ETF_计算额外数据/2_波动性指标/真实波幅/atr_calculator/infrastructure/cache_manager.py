@@ -20,6 +20,14 @@ from datetime import datetime
 from typing import Dict, List, Optional, Any, Tuple
 from .config import ATRConfig
 
+# 通过项目根目录 config/etf_store.py 读取日更数据（兼容追加模式下未压实的尾段）
+import sys
+from pathlib import Path
+_project_root = str(Path(__file__).resolve().parents[5])
+if _project_root not in sys.path:
+    sys.path.insert(0, _project_root)
+from config.etf_store import get_etf_mtime
+
 
 class ATRCacheManager:
     """ATR缓存管理器"""
@@ -83,7 +91,7 @@ class ATRCacheManager:
             if not os.path.exists(source_file_path):
                 return False, None
             
-            source_mtime = os.path.getmtime(source_file_path)
+            source_mtime = get_etf_mtime(source_file_path)
             cached_mtime = meta_data.get('source_file_mtime', 0)
             
             # 检查配置是否变化
@@ -160,7 +168,7 @@ class ATRCacheManager:
             )
             
             # 创建元数据
-            source_mtime = os.path.getmtime(source_file_path) if os.path.exists(source_file_path) else 0
+            source_mtime = get_etf_mtime(source_file_path) if os.path.exists(source_file_path) else 0
             
             meta_data = {
                 'etf_code': etf_code,
@@ -24,6 +24,13 @@ from typing import Dict, List, Optional, Tuple, Any
 import logging
 import warnings
 
+# 通过项目根目录 config/etf_store.py 读取日更数据（兼容追加模式下未压实的尾段）
+import sys
+_project_root = str(Path(__file__).resolve().parents[5])
+if _project_root not in sys.path:
+    sys.path.insert(0, _project_root)
+from config.etf_store import read_etf_csv
+
 # 抑制pandas警告
 warnings.filterwarnings('ignore', category=pd.errors.DtypeWarning)
 
@@ -177,7 +184,7 @@ class ATRDataReader:
             
             for encoding in encodings:
                 try:
-                    df = pd.read_csv(file_path, encoding=encoding)
+                    df = read_etf_csv(file_path, encoding=encoding)
                     break
                 except UnicodeDecodeError:
                     continue
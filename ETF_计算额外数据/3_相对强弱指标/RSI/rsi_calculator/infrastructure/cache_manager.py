@@ -15,6 +15,14 @@ import pandas as pd
 from datetime import datetime, timedelta
 import traceback
 
+# 通过项目根目录 config/etf_store.py 读取日更数据（兼容追加模式下未压实的尾段）
+import sys
+from pathlib import Path
+_project_root = str(Path(__file__).resolve().parents[5])
+if _project_root not in sys.path:
+    sys.path.insert(0, _project_root)
+from config.etf_store import get_etf_mtime
+
 
 class RSICacheManager:
     """RSI指标缓存管理器"""
@@ -90,7 +98,7 @@ class RSICacheManager:
             
             # 比较文件修改时间
             cache_mtime = os.path.getmtime(cache_file_path)
-            source_mtime = os.path.getmtime(source_file_path)
+            source_mtime = get_etf_mtime(source_file_path)
             
             # 如果源文件更新，缓存无效
             if source_mtime > cache_mtime:
@@ -15,6 +15,14 @@ import numpy as np
 from datetime import datetime
 import traceback
 
+# 通过项目根目录 config/etf_store.py 读取日更数据（兼容追加模式下未压实的尾段）
+import sys
+from pathlib import Path
+_project_root = str(Path(__file__).resolve().parents[5])
+if _project_root not in sys.path:
+    sys.path.insert(0, _project_root)
+from config.etf_store import read_etf_csv
+
 
 class RSIDataReaderOptimized:
     """RSI指标优化数据读取器"""
@@ -67,10 +75,10 @@ class RSIDataReaderOptimized:
             
             # 读取CSV数据
             try:
-                df = pd.read_csv(file_path, encoding='utf-8')
+                df = read_etf_csv(file_path, encoding='utf-8')
             except UnicodeDecodeError:
                 # 备用编码
-                df = pd.read_csv(file_path, encoding='gbk')
+                df = read_etf_csv(file_path, encoding='gbk')
             
             if df.empty:
                 print(f"⚠️ ETF数据文件为空: {etf_code}")
@@ -397,7 +405,7 @@ class RSIDataReaderOptimized:
             for filename in all_files[:10]:  # 只验证前10个文件以节省时间
                 file_path = os.path.join(self.data_source_path, filename)
                 try:
-                    df = pd.read_csv(file_path, nrows=5)  # 只读取前5行
+                    df = read_etf_csv(file_path, nrows=5)  # 只读取前5行
                     required_columns = ['日期', '收盘价']
                     if all(col in df.columns for col in required_columns):
                         result['valid_files'] += 1
@@ -19,6 +19,13 @@ import hashlib
 import warnings
 from pathlib import Path
 
+# 通过项目根目录 config/etf_store.py 读取日更数据（兼容追加模式下未压实的尾段）
+import sys
+_project_root = str(Path(__file__).resolve().parents[5])
+if _project_root not in sys.path:
+    sys.path.insert(0, _project_root)
+from config.etf_store import get_etf_mtime
+
 # 忽略pandas的链式赋值警告
 warnings.filterwarnings('ignore', category=pd.errors.PerformanceWarning)
 
@@ -190,7 +197,7 @@ class WilliamsCacheManager:
         try:
             # 获取文件修改时间
             cache_mtime = os.path.getmtime(cache_file_path)
-            source_mtime = os.path.getmtime(source_file_path)
+            source_mtime = get_etf_mtime(source_file_path)
             
             # 计算时间差（秒）
             time_diff = source_mtime - cache_mtime
@@ -17,6 +17,14 @@ from datetime import datetime
 import glob
 import warnings
 
+# 通过项目根目录 config/etf_store.py 读取日更数据（兼容追加模式下未压实的尾段）
+import sys
+from pathlib import Path
+_project_root = str(Path(__file__).resolve().parents[5])
+if _project_root not in sys.path:
+    sys.path.insert(0, _project_root)
+from config.etf_store import read_etf_csv
+
 # 忽略pandas的链式赋值警告
 warnings.filterwarnings('ignore', category=pd.errors.PerformanceWarning)
 warnings.filterwarnings('ignore', category=FutureWarning)
@@ -117,7 +125,7 @@ class WilliamsDataReaderOptimized:
             
             for encoding in encodings:
                 try:
-                    df = pd.read_csv(
+                    df = read_etf_csv(
                         file_path, 
                         encoding=encoding,
                         parse_dates=False,  # 先不解析日期，后续统一处理
@@ -15,6 +15,13 @@ from datetime import datetime
 
 from .config import PVConfig
 
+# 通过项目根目录 config/etf_store.py 读取日更数据（兼容追加模式下未压实的尾段）
+import sys
+_project_root = str(Path(__file__).resolve().parents[5])
+if _project_root not in sys.path:
+    sys.path.insert(0, _project_root)
+from config.etf_store import read_etf_csv
+
 class PVDataReader:
     """价量配合度数据读取器"""
 
@@ -49,7 +56,7 @@ class PVDataReader:
                 return None
 
             # 读取CSV文件
-            df = pd.read_csv(file_path, encoding='utf-8')
+            df = read_etf_csv(file_path, encoding='utf-8')
 
             if df.empty:
                 self.logger.warning(f"数据文件为空: {file_path}")
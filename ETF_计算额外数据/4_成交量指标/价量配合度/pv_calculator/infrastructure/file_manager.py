@@ -15,6 +15,13 @@ from datetime import datetime
 
 from .config import PVConfig
 
+# 通过项目根目录 config/etf_store.py 读取日更数据（兼容追加模式下未压实的尾段）
+import sys
+_project_root = str(Path(__file__).resolve().parents[5])
+if _project_root not in sys.path:
+    sys.path.insert(0, _project_root)
+from config.etf_store import read_etf_csv
+
 class PVFileManager:
     """PV价量配合度系统文件管理器"""
 
@@ -304,7 +311,7 @@ class PVFileManager:
 
             if results['source_exists']:
                 try:
-                    pd.read_csv(source_path, nrows=1)
+                    read_etf_csv(source_path, nrows=1)
                     results['source_readable'] = True
                 except Exception:
                     results['source_readable'] = False
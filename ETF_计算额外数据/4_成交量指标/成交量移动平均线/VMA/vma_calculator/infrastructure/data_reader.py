@@ -14,6 +14,13 @@ from datetime import datetime
 
 from .config import VMAConfig
 
+# 通过项目根目录 config/etf_store.py 读取日更数据（兼容追加模式下未压实的尾段）
+import sys
+_project_root = str(Path(__file__).resolve().parents[6])
+if _project_root not in sys.path:
+    sys.path.insert(0, _project_root)
+from config.etf_store import read_etf_csv
+
 class VMADataReader:
     """VMA数据读取器"""
 
@@ -47,7 +54,7 @@ class VMADataReader:
                 return None
 
             # 读取CSV文件
-            df = pd.read_csv(file_path, encoding='utf-8')
+            df = read_etf_csv(file_path, encoding='utf-8')
 
             if df.empty:
                 self.logger.warning(f"文件为空: {file_path}")
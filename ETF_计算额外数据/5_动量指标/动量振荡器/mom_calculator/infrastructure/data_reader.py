@@ -30,6 +30,13 @@ import warnings
 
 from .config import MomentumConfig
 
+# 通过项目根目录 config/etf_store.py 读取日更数据（兼容追加模式下未压实的尾段）
+import sys
+_project_root = str(Path(__file__).resolve().parents[5])
+if _project_root not in sys.path:
+    sys.path.insert(0, _project_root)
+from config.etf_store import read_etf_csv
+
 warnings.filterwarnings('ignore', category=pd.errors.ParserWarning)
 warnings.filterwarnings('ignore', category=pd.errors.DtypeWarning)
 
@@ -345,7 +352,7 @@ class MomentumDataReader:
         
         for encoding in encodings:
             try:
-                df = pd.read_csv(file_path, encoding=encoding)
+                df = read_etf_csv(file_path, encoding=encoding)
                 
                 # 基本验证
                 if df.empty:
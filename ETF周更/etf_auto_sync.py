@@ -2,7 +2,8 @@
 """
 ETF 周更新数据自动同步脚本
 1. 从百度网盘下载新增月份 RAR 文件
-2. 解压并自动合并到本地历史目录
+2. 流水线处理：下载第N+1个压缩包的同时流式解压第N个，解出的成员直接合并到本地历史目录，
+   三个复权类别并行处理，压缩包成员不落盘解压
 3. 清理临时文件
 4. 自动管理文件哈希，避免重复下载
 5. 适用于按月份打包的大量历史数据更新
@@ -16,41 +17,90 @@ import re
 import subprocess
 import json
 import hashlib
+import argparse
+import queue
+import threading
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
 from pathlib import Path
 
 # 添加当前目录到 Python 路径以导入 etf_data_merger
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-from etf_data_merger import merge_two_folders
+from etf_data_merger import merge_csv_content, publish_merge_changes
+from config.columnar_store import columnar_enabled  # etf_data_merger 已将项目根目录加入路径
 
 # 添加config目录到路径
 config_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'config')
 sys.path.insert(0, config_dir)
 
 try:
-    import sys
-    import importlib.util
-    hash_manager_path = os.path.join(config_dir, 'hash_manager.py')
-    spec = importlib.util.spec_from_file_location("hash_manager", hash_manager_path)
-    hash_manager_module = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(hash_manager_module)
-    HashManager = hash_manager_module.HashManager
+    from config.hash_manager import get_hash_manager  # 进程内共用一个实例
 except ImportError:
     print("警告：无法导入哈希管理器，将跳过哈希验证功能")
-    HashManager = None
+    get_hash_manager = None
 
 try:
     from bypy import ByPy
 except ImportError:
-    print("错误：未安装 bypy，请运行: pip install bypy")
-    sys.exit(1)
+    ByPy = None  # 使用 --remote-dir 本地目录时不需要 bypy
 
 
 # 配置项
 BAIDU_REMOTE_BASE = "/ETF"  # 百度网盘中 ETF 数据根目录
 LOCAL_ETF_DIR = os.path.dirname(os.path.abspath(__file__))  # 本地 ETF周更 目录
 CATEGORIES = ["0_ETF日K(前复权)", "0_ETF日K(后复权)", "0_ETF日K(除权)"]
+ARCHIVE_QUEUE_SIZE = 2   # 每个类别已下载待处理的压缩包上限（控制临时磁盘占用）
+MEMBER_QUEUE_SIZE = 64   # 已解出待合并的成员上限（控制内存占用）
+
+
+class LocalDirectoryRemote:
+    """
+    以本地目录代替百度网盘，接口与 ByPy 的 list/downfile/info 一致
+    用于没有网盘连接时测试同步流水线: python etf_auto_sync.py --remote-dir <目录>
+    """
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+
+    def _local_path(self, remote_path: str) -> str:
+        if remote_path.startswith(BAIDU_REMOTE_BASE):
+            remote_path = remote_path[len(BAIDU_REMOTE_BASE):]
+        return os.path.join(self.root, remote_path.lstrip('/'))
+
+    def info(self):
+        if not os.path.isdir(self.root):
+            raise FileNotFoundError(f"本地远程目录不存在: {self.root}")
+
+    def list(self, remote_path: str):
+        """按 bypy list 的格式输出: F 文件名 大小 日期 时间 md5"""
+        directory = self._local_path(remote_path)
+        for name in sorted(os.listdir(directory)):
+            path = os.path.join(directory, name)
+            if not os.path.isfile(path):
+                continue
+            hash_md5 = hashlib.md5()
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    hash_md5.update(chunk)
+            stat = os.stat(path)
+            modified = datetime.fromtimestamp(stat.st_mtime).strftime('%Y-%m-%d %H:%M:%S')
+            print(f"F {name} {stat.st_size} {modified} {hash_md5.hexdigest()}")
+
+    def downfile(self, remote_path: str, local_path: str):
+        shutil.copyfile(self._local_path(remote_path), local_path)
+
+
+def get_remote(remote_dir: Optional[str] = None):
+    """获取远程存储：指定本地目录时使用 LocalDirectoryRemote，否则使用百度网盘"""
+    if remote_dir:
+        return LocalDirectoryRemote(remote_dir)
+    if ByPy is None:
+        print("错误：未安装 bypy，请运行: pip install bypy")
+        sys.exit(1)
+    return ByPy()
 
 
 def list_remote_files_with_info(bp: ByPy, remote_path: str) -> List[Tuple[str, str, str, str]]:
@@ -237,6 +287,273 @@ def extract_rar(rar_path: str, extract_to: str) -> bool:
         return False
 
 
+def _is_category_member(member_name: str, category: str) -> bool:
+    """成员是否为 {类别目录}/{代码}.csv（与解压后按类别目录合并的范围一致）"""
+    parts = member_name.replace('\\', '/').split('/')
+    return len(parts) == 2 and category in parts[0] and parts[1].lower().endswith('.csv')
+
+
+def _iter_zip_members(archive_path: str, category: str) -> Iterator[Tuple[str, bytes]]:
+    """逐个读取 zip 压缩包成员"""
+    with zipfile.ZipFile(archive_path) as zf:
+        for info in zf.infolist():
+            member_name = info.filename
+            if not info.flag_bits & 0x800:
+                # 未标记UTF-8的文件名（Windows打包）按GBK还原中文目录名
+                try:
+                    member_name = member_name.encode('cp437').decode('gbk')
+                except (UnicodeEncodeError, UnicodeDecodeError):
+                    pass
+            if _is_category_member(member_name, category):
+                yield os.path.basename(member_name), zf.read(info)
+
+
+def _list_rar_members(archive_path: str) -> List[Tuple[str, int, Optional[int]]]:
+    """用 unrar v 列出压缩包成员、大小及CRC32: [(成员路径, 字节数, CRC32或None), ...]"""
+    listing = subprocess.run(['unrar', 'v', archive_path], capture_output=True, text=True)
+    if listing.returncode != 0:
+        raise RuntimeError(f"列出压缩包成员失败: {listing.stderr.strip()}")
+
+    # 成员位于两条分隔线之间，每行为: 属性 大小 压缩后大小 压缩率 日期 时间 校验值 名称
+    # 校验值不是8位十六进制（如 -htb 打包的 BLAKE2）时记为 None
+    members = []
+    in_table = False
+    for line in listing.stdout.splitlines():
+        if line.strip().startswith('-----'):
+            if in_table:
+                break
+            in_table = True
+            continue
+        if in_table:
+            parts = line.split(None, 7)
+            if len(parts) == 8 and parts[1].isdigit():
+                checksum = parts[6]
+                crc = int(checksum, 16) if re.fullmatch(r'[0-9A-Fa-f]{8}', checksum) else None
+                members.append((parts[7], int(parts[1]), crc))
+    return members
+
+
+def _iter_unrar_members(archive_path: str, category: str) -> Iterator[Tuple[str, bytes]]:
+    """
+    用 unrar p 把成员输出到管道，边解压边产出，不写临时文件
+    unrar 一次调用按归档顺序连续输出所有成员，按 unrar v 列出的字节数切分；
+    每个成员读完后核对字节数和CRC32，一致即产出，不一致时中止且不产出该成员及之后的成员。
+    列表中没有CRC32的成员等到 unrar 正常退出（含其自身的CRC校验）且输出没有多余字节后才产出
+    """
+    # 空文件不产生输出，无需合并
+    members = [(name, size, crc) for name, size, crc in _list_rar_members(archive_path)
+               if size > 0 and _is_category_member(name, category)]
+    if not members:
+        return
+
+    proc = subprocess.Popen(['unrar', 'p', '-inul', archive_path] + [name for name, _, _ in members],
+                            stdout=subprocess.PIPE)
+    unverified = []
+    try:
+        for name, size, crc in members:
+            content = proc.stdout.read(size)
+            if len(content) != size:
+                raise RuntimeError(f"成员 {name} 应为 {size} 字节，实际输出 {len(content)} 字节")
+            if crc is None:
+                unverified.append((name, content))
+                continue
+            if zlib.crc32(content) != crc:
+                raise RuntimeError(f"成员 {name} CRC32 校验失败")
+            yield os.path.basename(name), content
+        extra = len(proc.stdout.read())
+        if proc.wait() != 0:
+            raise RuntimeError(f"unrar 返回错误码 {proc.returncode}")
+        if extra:
+            raise RuntimeError(f"压缩包输出比成员列表多 {extra} 字节")
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+
+    for name, content in unverified:
+        yield os.path.basename(name), content
+
+
+def _iter_extracted_members(archive_path: str, category: str, temp_dir: str) -> Iterator[Tuple[str, bytes]]:
+    """没有 unrar 时（如 macOS 只装了 unar）先解压到临时目录，再逐个读取"""
+    extract_dir = tempfile.mkdtemp(prefix="extract_", dir=temp_dir)
+    try:
+        if not extract_rar(archive_path, extract_dir):
+            raise RuntimeError("解压失败")
+        for dir_name in sorted(os.listdir(extract_dir)):
+            data_dir = os.path.join(extract_dir, dir_name)
+            if not os.path.isdir(data_dir) or category not in dir_name:
+                continue
+            for name in sorted(os.listdir(data_dir)):
+                if name.lower().endswith('.csv'):
+                    with open(os.path.join(data_dir, name), 'rb') as f:
+                        yield name, f.read()
+    finally:
+        shutil.rmtree(extract_dir, ignore_errors=True)
+
+
+def iter_archive_members(archive_path: str, category: str, temp_dir: Optional[str] = None) -> Iterator[Tuple[str, bytes]]:
+    """
+    逐个产出压缩包中属于该类别目录的 csv 成员
+
+    Args:
+        archive_path: 压缩包路径（RAR，或内容为zip格式）
+        category: 类别目录名
+        temp_dir: 只能整包解压时使用的临时目录
+
+    Yields:
+        (csv文件名, 文件内容)
+    """
+    if zipfile.is_zipfile(archive_path):
+        yield from _iter_zip_members(archive_path, category)
+    elif shutil.which('unrar'):
+        yield from _iter_unrar_members(archive_path, category)
+    else:
+        yield from _iter_extracted_members(archive_path, category, temp_dir or os.path.dirname(archive_path))
+
+
+def _download_stage(bp, files_to_download: List[Tuple], temp_dir: str, archive_queues: Dict[str, queue.Queue]):
+    """下载阶段：依次下载压缩包，交给对应类别的处理队列"""
+    for entry in files_to_download:
+        file_name, category = entry[0], entry[1]
+        local_path = os.path.join(temp_dir, file_name)
+        print(f"📥 下载中: {file_name}")
+        try:
+            bp.downfile(f"{BAIDU_REMOTE_BASE}/{file_name}", local_path)
+            print(f"✓ 下载完成: {file_name}")
+        except Exception as e:
+            print(f"✗ 下载失败 {file_name}: {e}")
+            local_path = None
+        archive_queues[category].put((entry, local_path))
+
+    for archive_queue in archive_queues.values():
+        archive_queue.put(None)
+
+
+def _extract_stage(archive_path: str, category: str, temp_dir: str, member_queue: queue.Queue, errors: List[str]):
+    """解压阶段：流式读取压缩包成员，交给合并阶段"""
+    try:
+        for member in iter_archive_members(archive_path, category, temp_dir):
+            member_queue.put(member)
+    except Exception as e:
+        errors.append(f"解压失败: {e}")
+    finally:
+        member_queue.put(None)
+
+
+def _category_stage(category: str, archive_queue: queue.Queue, temp_dir: str, local_dir: str,
+                    hash_manager, hash_lock: threading.Lock, results: List[Dict]):
+    """合并阶段：按顺序处理一个类别的压缩包，成员边解压边合并到历史目录"""
+    hist_dir = os.path.join(local_dir, category)
+    columnar = columnar_enabled()
+
+    while True:
+        item = archive_queue.get()
+        if item is None:
+            break
+        entry, archive_path = item
+        file_name = entry[0]
+        result = {'file': file_name, 'category': category, 'members': 0, 'skipped': 0, 'rows_added': {},
+                  'changed_dates': {}, 'error': None}
+        results.append(result)
+
+        try:
+            if archive_path is None:
+                result['error'] = "下载失败"
+                continue
+            if not os.path.isdir(hist_dir):
+                result['error'] = f"历史目录不存在: {hist_dir}"
+                print(f"✗ {result['error']}")
+                continue
+
+            errors = []
+            member_queue = queue.Queue(maxsize=MEMBER_QUEUE_SIZE)
+            extractor = threading.Thread(target=_extract_stage, daemon=True,
+                                         args=(archive_path, category, temp_dir, member_queue, errors))
+            extractor.start()
+            while True:
+                member = member_queue.get()
+                if member is None:
+                    break
+                name, content = member
+                try:
+                    rows_added, written, changed_dates = merge_csv_content(hist_dir, name, content, columnar)
+                    result['members'] += 1
+                    result['rows_added'][name] = rows_added
+                    if changed_dates:
+                        result['changed_dates'][name] = changed_dates
+                    if not written:
+                        result['skipped'] += 1
+                except Exception as e:
+                    errors.append(f"合并失败 {name}: {e}")
+            extractor.join()
+
+            if errors:
+                result['error'] = "; ".join(errors[:3])
+                print(f"✗ {file_name}: {result['error']}")
+            else:
+                # 合并成功后才记录哈希，失败的压缩包下次会重新下载
+                if hash_manager:
+                    with hash_lock:
+                        hash_manager.update_file_hash(file_name, archive_path)
+                print(f"✓ 合并完成: {file_name} → {category} ({result['members']} 个文件，"
+                      f"跳过 {result['skipped']} 个无变化文件，新增 {sum(result['rows_added'].values())} 行)")
+        except Exception as e:
+            result['error'] = str(e)
+            print(f"✗ 处理 {file_name} 出错: {e}")
+        finally:
+            if archive_path and os.path.exists(archive_path):
+                os.remove(archive_path)
+
+
+def run_sync_pipeline(bp, files_to_download: List[Tuple], temp_dir: str, hash_manager=None,
+                      local_dir: str = LOCAL_ETF_DIR) -> Dict:
+    """
+    流水线同步：下载、流式解压、合并三个阶段重叠执行，各类别并行合并
+
+    Args:
+        bp: 远程存储（ByPy 或 LocalDirectoryRemote）
+        files_to_download: [(文件名, 类别, 年份, 月份, 大小, 修改时间, MD5), ...]
+        temp_dir: 临时下载目录
+        hash_manager: 哈希管理器（可选）
+        local_dir: 本地历史数据根目录
+
+    Returns:
+        {'success': 成功数, 'total': 总数, 'run_id': 发布的变更清单编号,
+         'archives': [{'file', 'category', 'members', 'skipped', 'rows_added': {文件名: 新增行数},
+                       'changed_dates': {文件名: 变更日期}, 'error'}, ...]}
+    """
+    categories = list(dict.fromkeys(entry[1] for entry in files_to_download))
+    archive_queues = {category: queue.Queue(maxsize=ARCHIVE_QUEUE_SIZE) for category in categories}
+    results = []
+    hash_lock = threading.Lock()
+
+    downloader = threading.Thread(target=_download_stage, daemon=True,
+                                  args=(bp, files_to_download, temp_dir, archive_queues))
+    downloader.start()
+    with ThreadPoolExecutor(max_workers=len(categories)) as executor:
+        futures = [executor.submit(_category_stage, category, archive_queues[category], temp_dir,
+                                   local_dir, hash_manager, hash_lock, results)
+                   for category in categories]
+        for future in futures:
+            future.result()
+    downloader.join()
+
+    # 失败的压缩包中已合并的成员同样写入了历史文件，一并发布
+    changed = {}
+    for result in results:
+        for name, dates in result['changed_dates'].items():
+            changed.setdefault(result['category'], {}).setdefault(name, []).extend(dates)
+    run_id = publish_merge_changes(local_dir, changed)
+
+    return {
+        'success': sum(1 for result in results if result['error'] is None),
+        'total': len(results),
+        'run_id': run_id,
+        'archives': results
+    }
+
+
 def get_current_month_files(files: List[str]) -> List[Tuple[str, str, int, int]]:
     """
     查找当前月份的 RAR 文件（向后兼容版本，支持新旧两种命名格式）
@@ -287,17 +604,31 @@ def get_current_month_files(files: List[str]) -> List[Tuple[str, str, int, int]]
     return current_month_files
 
 
-def sync_current_month_data():
-    """同步当前月份的数据（专注于当月压缩包的周更新）"""
+def sync_current_month_data(remote_dir: Optional[str] = None, local_dir: str = LOCAL_ETF_DIR,
+                            interactive: bool = True) -> Dict:
+    """
+    同步当前月份的数据（专注于当月压缩包的周更新）
+
+    Args:
+        remote_dir: 以本地目录代替百度网盘（离线测试），None 表示使用百度网盘
+        local_dir: 本地历史数据根目录
+        interactive: 无法判断远程是否更新的文件是否询问用户，False 时直接跳过（由调度器调用时）
+
+    Returns:
+        {'status': 'no_files' | 'no_current_month' | 'up_to_date' | 'synced',
+         'success': 成功处理的压缩包数, 'total': 需要处理的压缩包数,
+         'run_id': 发布的变更清单编号, 'archives': 流水线明细}
+    """
+    summary = {'status': 'no_files', 'success': 0, 'total': 0, 'run_id': None, 'archives': []}
     now = datetime.now()
     print(f"开始同步当前月份({now.year}年{now.month}月)的 ETF 数据...")
     print("📅 只检查当前月份的压缩包更新，忽略历史数据")
     
     # 初始化哈希管理器
     hash_manager = None
-    if HashManager:
+    if get_hash_manager:
         try:
-            hash_manager = HashManager()
+            hash_manager = get_hash_manager()
             print("✓ 哈希管理器初始化成功")
             hash_manager.print_status()
             
@@ -307,24 +638,25 @@ def sync_current_month_data():
             print(f"⚠️ 哈希管理器初始化失败: {e}")
             hash_manager = None
     
-    # 初始化 bypy
-    bp = ByPy()
+    # 初始化远程存储
+    bp = get_remote(remote_dir)
     
     # 获取远程文件列表
     print("获取百度网盘文件列表...")
-    remote_files = list_remote_files(bp, BAIDU_REMOTE_BASE)
-    if not remote_files:
+    remote_files_info = list_remote_files_with_info(bp, BAIDU_REMOTE_BASE)
+    if not remote_files_info:
         print("未找到任何文件")
-        return
+        return summary
     
     # 查找当前月份文件
-    current_month_files = get_current_month_files_with_info(list_remote_files_with_info(bp, BAIDU_REMOTE_BASE))
+    current_month_files = get_current_month_files_with_info(remote_files_info)
     if not current_month_files:
         print(f"未找到 {now.year}年{now.month}月 的 RAR 文件")
         print("可能原因：")
         print("1. 当月数据尚未上传到百度网盘")
         print("2. 文件命名格式不匹配")
-        return
+        summary['status'] = 'no_current_month'
+        return summary
     
     print(f"找到当前月份的 {len(current_month_files)} 个文件:")
     for file_name, category, year, month, file_size, file_time, file_md5 in current_month_files:
@@ -369,7 +701,7 @@ def sync_current_month_data():
             print(f"    远程MD5: {file_md5[:16]}..." if file_md5 else "    远程MD5: 未提供")
         
         print(f"\n这些{now.month}月文件已有本地记录，但无法确定远程是否有更新。")
-        response = input("是否要重新下载这些文件？(y/n/s=跳过): ").lower().strip()
+        response = input("是否要重新下载这些文件？(y/n/s=跳过): ").lower().strip() if interactive else 's'
         
         if response == 'y':
             files_to_download.extend(files_need_manual_check)
@@ -382,7 +714,8 @@ def sync_current_month_data():
     if not files_to_download:
         now = datetime.now()
         print(f"🎉 当前月份({now.month}月)所有文件都已是最新，无需下载！")
-        return
+        summary['status'] = 'up_to_date'
+        return summary
 
     # 检查是否有完整的三个类别
     found_categories = set(category for _, category, _, _, _, _, _ in files_to_download)
@@ -398,54 +731,9 @@ def sync_current_month_data():
     print(f"临时目录: {temp_dir}")
     
     try:
-        success_count = 0
-        # 下载并处理每个文件
-        for file_name, category, year, month, file_size, file_time, file_md5 in files_to_download:
-            print(f"\n处理 {file_name}...")
-            
-            # 下载文件
-            remote_file_path = f"{BAIDU_REMOTE_BASE}/{file_name}"
-            local_rar_path = os.path.join(temp_dir, file_name)
-            
-            print(f"下载中...")
-            try:
-                bp.downfile(remote_file_path, local_rar_path)
-                print(f"✓ 下载完成")
-                
-                # 更新哈希
-                if hash_manager:
-                    hash_manager.update_file_hash(file_name, local_rar_path)
-                    
-            except Exception as e:
-                print(f"✗ 下载失败: {e}")
-                continue
-            
-            # 解压文件
-            extract_dir = os.path.join(temp_dir, f"extract_{category}_{year}_{month}")
-            os.makedirs(extract_dir, exist_ok=True)
-            
-            if not extract_rar(local_rar_path, extract_dir):
-                continue
-            
-            # 查找解压后的目录
-            extracted_dirs = [d for d in os.listdir(extract_dir) 
-                            if os.path.isdir(os.path.join(extract_dir, d)) and category in d]
-            
-            if not extracted_dirs:
-                print(f"✗ 未找到解压后的目录")
-                continue
-            
-            extracted_data_dir = os.path.join(extract_dir, extracted_dirs[0])
-            
-            # 合并到对应的历史目录
-            hist_dir = os.path.join(LOCAL_ETF_DIR, category)
-            if os.path.isdir(hist_dir):
-                print(f"合并到 {category}...")
-                merge_two_folders(hist_dir, extracted_data_dir)
-                print(f"✓ 合并完成")
-                success_count += 1
-            else:
-                print(f"✗ 历史目录不存在: {hist_dir}")
+        result = run_sync_pipeline(bp, files_to_download, temp_dir, hash_manager, local_dir)
+        success_count = result['success']
+        summary.update(result, status='synced', total=len(files_to_download))
         
         # 汇总结果
         now = datetime.now()
@@ -453,7 +741,7 @@ def sync_current_month_data():
         print(f"成功处理: {success_count}/{len(files_to_download)} 个文件")
         
         if success_count > 0:
-            print(f"数据已更新到: {LOCAL_ETF_DIR}")
+            print(f"数据已更新到: {local_dir}")
             
         # 显示哈希管理器最终状态
         if hash_manager:
@@ -461,15 +749,19 @@ def sync_current_month_data():
             hash_manager.print_status()
         
     finally:
+        if hash_manager:
+            hash_manager.export_if_pending()
         # 清理临时目录
         print(f"清理临时目录...")
         shutil.rmtree(temp_dir, ignore_errors=True)
 
+    return summary
 
-def test_connection():
+
+def test_connection(remote_dir: Optional[str] = None):
     """测试百度网盘连接和列出文件"""
     print("测试百度网盘连接...")
-    bp = ByPy()
+    bp = get_remote(remote_dir)
     
     # 测试基本连接
     try:
@@ -498,8 +790,8 @@ def test_connection():
                     print(f"  - {file_name} ({category})")
                     
                 # 测试哈希管理
-                if HashManager:
-                    hash_manager = HashManager()
+                if get_hash_manager:
+                    hash_manager = get_hash_manager()
                     print(f"\n📊 哈希管理器状态:")
                     hash_manager.print_status()
             else:
@@ -514,9 +806,14 @@ def test_connection():
 
 
 if __name__ == "__main__":
-    import sys
-    
-    if len(sys.argv) > 1 and sys.argv[1] == "test":
-        test_connection()
+    parser = argparse.ArgumentParser(description='ETF周更数据同步')
+    parser.add_argument('command', nargs='?', choices=['sync', 'test'], default='sync',
+                        help='sync: 同步当月数据（默认）; test: 测试连接')
+    parser.add_argument('--remote-dir', help='以本地目录代替百度网盘（离线测试流水线）')
+    parser.add_argument('--local-dir', default=LOCAL_ETF_DIR, help='本地历史数据根目录（默认本脚本所在目录）')
+    args = parser.parse_args()
+
+    if args.command == "test":
+        test_connection(args.remote_dir)
     else:
-        sync_current_month_data() 
\ No newline at end of file
+        sync_current_month_data(args.remote_dir, args.local_dir)
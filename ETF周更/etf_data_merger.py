@@ -1,7 +1,25 @@
+import io
 import os
+import sys
+import numpy as np
 import pandas as pd
 import shutil
-from typing import List, Set
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Set, Tuple
+
+# 添加项目根目录到路径以导入config模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.columnar_store import columnar_enabled, is_columnar_fresh, read_columnar, refresh_columnar, write_columnar
+from config.change_manifest import ChangeLog, ChangeSet
+from config.digest_index import sync_digest_index
+from config.etf_store import write_bytes_atomic, write_csv_atomic
+
+DATE_KEY = '日期'
+CATEGORIES = [
+    '0_ETF日K(前复权)',
+    '0_ETF日K(后复权)',
+    '0_ETF日K(除权)',
+]
 
 
 def _collect_csv(directory: str) -> Set[str]:
@@ -36,71 +54,304 @@ def _merge(df_old: pd.DataFrame, df_new: pd.DataFrame) -> pd.DataFrame:
     return combined
 
 
-def merge_two_folders(hist_dir: str, new_dir: str) -> None:
-    """合并两个文件夹下的 csv 文件，结果写回 hist_dir。"""
+def _prepare_run(df: pd.DataFrame) -> Tuple[Optional[pd.DataFrame], Optional[np.ndarray]]:
+    """
+    整理为按日期降序、日期唯一的有序序列（重复日期保留先出现的行）
+
+    Returns:
+        (DataFrame, 升序排列的负日期键)；缺少日期列或日期无法解析时返回 (None, None)
+    """
+    if DATE_KEY not in df.columns:
+        return None, None
+    dates = pd.to_numeric(df[DATE_KEY], errors='coerce')
+    if dates.isna().any():
+        return None, None
+
+    keys = -dates.to_numpy(dtype='int64')
+    if len(keys) > 1 and (np.diff(keys) < 0).any():
+        order = np.argsort(keys, kind='stable')
+        df = df.iloc[order]
+        keys = keys[order]
+    if len(keys) > 1:
+        unique = np.concatenate(([True], keys[1:] != keys[:-1]))
+        if not unique.all():
+            df = df[unique]
+            keys = keys[unique]
+    return df.reset_index(drop=True), keys
+
+
+def _frame_dates(df: pd.DataFrame) -> List[int]:
+    """数据中可解析的日期（YYYYMMDD 整数）"""
+    if DATE_KEY not in df.columns:
+        return []
+    return pd.to_numeric(df[DATE_KEY], errors='coerce').dropna().astype('int64').tolist()
+
+
+def _merge_sorted(df_old: pd.DataFrame, df_new: pd.DataFrame) -> Optional[Tuple[pd.DataFrame, int, List[int]]]:
+    """
+    按日期键对两个有序序列做归并，日期相同时新数据优先
+
+    Returns:
+        (按日期降序的合并结果, 新增行数, 新增或内容改变的日期)；无法按日期归并时返回 None
+    """
+    old, old_keys = _prepare_run(df_old)
+    new, new_keys = _prepare_run(df_new)
+    if old is None or new is None:
+        return None
+
+    # 剔除旧数据中与新数据日期相同的行
+    pos = np.searchsorted(new_keys, old_keys)
+    replaced = (pos < len(new_keys)) & (new_keys[np.minimum(pos, len(new_keys) - 1)] == old_keys)
+    kept = old[~replaced]
+    kept_keys = old_keys[~replaced]
+    rows_added = len(new_keys) - int(replaced.sum())
+
+    # 变更日期 = 新增日期 + 同日期但内容不同的日期
+    changed = np.ones(len(new_keys), dtype=bool)
+    replaced_pos = pos[replaced]
+    if list(old.columns) == list(new.columns):
+        old_values = old[replaced].fillna('').to_numpy()
+        new_values = new.iloc[replaced_pos].fillna('').to_numpy()
+        changed[replaced_pos] = (old_values != new_values).any(axis=1)
+    changed_dates = (-new_keys[changed]).tolist()
+
+    # 新行在结果中的位置 = 自身序号 + 排在它之前的旧行数
+    total = len(kept_keys) + len(new_keys)
+    new_pos = np.arange(len(new_keys)) + np.searchsorted(kept_keys, new_keys)
+    is_new = np.zeros(total, dtype=bool)
+    is_new[new_pos] = True
+    order = np.empty(total, dtype=np.int64)
+    order[new_pos] = len(kept_keys) + np.arange(len(new_keys))
+    order[~is_new] = np.arange(len(kept_keys))
+
+    combined = pd.concat([kept, new], ignore_index=True)
+    return combined.iloc[order].reset_index(drop=True), rows_added, changed_dates
+
+
+def _prepend_newer_rows(path_old: str, head: pd.DataFrame, new: pd.DataFrame, new_keys: np.ndarray,
+                        columnar: bool) -> Optional[int]:
+    """
+    新数据中与历史重叠的部分和历史文件开头完全一致、其余日期都更晚时（周更的常见情况），
+    只把更晚的新行写在历史数据前面，历史部分按原始字节保留，不解析整个文件
+
+    Args:
+        head: 历史文件开头 len(new) 行（字符串）
+
+    Returns:
+        新增行数；不满足条件时返回 None，由调用方走完整归并
+    """
+    # 列式副本在CSV改写前判断是否新鲜，新鲜时日期直接取自副本、改写后拼接数组，否则从CSV读取日期列
+    old_frame = read_columnar(path_old) if columnar and is_columnar_fresh(path_old) else None
+    if old_frame is not None:
+        old_dates = old_frame[DATE_KEY]
+    else:
+        old_dates = pd.to_numeric(pd.read_csv(path_old, dtype=str, usecols=[DATE_KEY])[DATE_KEY], errors='coerce')
+    if old_dates.empty or old_dates.isna().any() or not (old_dates.is_monotonic_decreasing and old_dates.is_unique):
+        return None
+
+    # new_keys 为升序排列的负日期，晚于历史最新日期的行排在最前
+    newer = int(np.searchsorted(new_keys, -old_dates.iloc[0]))
+    if newer == 0:
+        return None
+    overlap = new.iloc[newer:].reset_index(drop=True)
+    if not head.iloc[:len(overlap)].equals(overlap):
+        return None
+    added = new.iloc[:newer]
+
+    with open(path_old, 'rb') as f:
+        raw = f.read()
+    body = raw[raw.index(b'\n') + 1:] if b'\n' in raw else b''
+    # 先写临时文件再替换，中断时不会截断该ETF的全部历史
+    write_bytes_atomic(added.to_csv(index=False).encode('utf-8-sig') + body, path_old)
+
+    if columnar:
+        if old_frame is not None:
+            added = added.copy()
+            for column in old_frame.columns:
+                if old_frame[column].dtype.kind in 'if':
+                    added[column] = pd.to_numeric(added[column], errors='coerce')
+            write_columnar(pd.concat([added, old_frame], ignore_index=True), path_old)
+        else:
+            refresh_columnar(path_old)
+    return newer
+
+
+def _write_merged(merged: pd.DataFrame, path: str, columnar: bool) -> None:
+    """写回合并结果，并同步生成列式副本。"""
+    write_csv_atomic(merged, path)
+    if columnar:
+        write_columnar(merged, path)
+
+
+def merge_frame_into(path_old: str, df_new: pd.DataFrame, columnar: bool) -> Tuple[int, bool, List[int]]:
+    """将新数据合并进单个历史文件。
+
+    历史文件按日期降序保存；新数据已全部包含在历史文件中时不读全文件、不重写。
+
+    Returns:
+        (新增行数, 是否重写了文件, 新增或内容改变的日期)
+    """
+    if df_new.empty:
+        return 0, False, []
+
+    new, new_keys = _prepare_run(df_new)
+    if not os.path.isfile(path_old):
+        merged = new if new is not None else df_new
+        _write_merged(merged, path_old, columnar)
+        return len(merged), True, _frame_dates(merged)
+
+    if new is not None:
+        head = pd.read_csv(path_old, dtype=str, nrows=len(new))
+        if list(head.columns) == list(new.columns):
+            # 历史文件开头与新数据完全一致：新数据没有带来任何变化
+            if head.equals(new):
+                return 0, False, []
+            rows_added = _prepend_newer_rows(path_old, head, new, new_keys, columnar)
+            if rows_added is not None:
+                return rows_added, True, (-new_keys[:rows_added]).tolist()
+
+    df_old = _read(path_old)
+    result = _merge_sorted(df_old, new) if new is not None else None
+    if result is None:
+        # 日期列缺失或无法解析时退回按键去重合并
+        merged = _merge(df_old, df_new)
+        rows_added = len(merged) - len(df_old)
+        changed_dates = _frame_dates(df_new)
+    else:
+        merged, rows_added, changed_dates = result
+    _write_merged(merged, path_old, columnar)
+    return rows_added, True, changed_dates
+
+
+def merge_csv_content(hist_dir: str, name: str, content: bytes,
+                      columnar: bool = None) -> Tuple[int, bool, List[int]]:
+    """将压缩包中单个 csv 成员的内容直接合并到 hist_dir（无需先解压到磁盘）。
+
+    Returns:
+        (新增行数, 是否重写了文件, 新增或内容改变的日期)
+    """
+    if columnar is None:
+        columnar = columnar_enabled()
+    df_new = pd.read_csv(io.BytesIO(content), dtype=str)
+    return merge_frame_into(os.path.join(hist_dir, name), df_new, columnar)
+
+
+def merge_two_folders(hist_dir: str, new_dir: str) -> Dict:
+    """合并两个文件夹下的 csv 文件，结果写回 hist_dir。
+
+    Returns:
+        {'updated': 重写的文件数, 'skipped': 无变化跳过的文件数, 'rows_added': {文件名: 新增行数},
+         'changed_dates': {文件名: 新增或内容改变的日期}}
+    """
     if not os.path.isdir(hist_dir):
         raise ValueError(f"路径不存在或不是文件夹: {hist_dir}")
     if not os.path.isdir(new_dir):
         raise ValueError(f"路径不存在或不是文件夹: {new_dir}")
 
-    names = _collect_csv(hist_dir) | _collect_csv(new_dir)
+    columnar = columnar_enabled()
+    summary = {'updated': 0, 'skipped': 0, 'rows_added': {}, 'changed_dates': {}}
 
-    for name in names:
-        path_old = os.path.join(hist_dir, name)
+    # 只有新目录中存在的文件才可能变化
+    for name in sorted(_collect_csv(new_dir)):
         path_new = os.path.join(new_dir, name)
-        df_old = _read(path_old)
-        df_new = _read(path_new)
-
-        merged = _merge(df_old, df_new)
-        if not merged.empty:
-            merged.to_csv(path_old, index=False, encoding='utf-8-sig')
-        # 如果 new 文件存在且已合并，则删除
-        if os.path.exists(path_new):
-            os.remove(path_new)
-        print(f'已合并: {name}')
+        rows_added, written, changed_dates = merge_frame_into(os.path.join(hist_dir, name), _read(path_new), columnar)
+        summary['rows_added'][name] = rows_added
+        if changed_dates:
+            summary['changed_dates'][name] = changed_dates
+        if written:
+            summary['updated'] += 1
+            print(f'已合并: {name} (+{rows_added} 行)')
+        else:
+            summary['skipped'] += 1
+        # 已合并的 new 文件删除
+        os.remove(path_new)
 
     # 将 new_dir 中剩余 csv（可能是新上市）移动过来
     for name in os.listdir(new_dir):
         if not name.lower().endswith('.csv'):
             continue
         shutil.move(os.path.join(new_dir, name), os.path.join(hist_dir, name))
+        summary['changed_dates'][name] = _frame_dates(_read(os.path.join(hist_dir, name)))
+        if columnar:
+            refresh_columnar(os.path.join(hist_dir, name))
         print(f'移动新文件: {name}')
 
+    total_added = sum(summary['rows_added'].values())
+    print(f'合并完成: 更新 {summary["updated"]} 个文件，跳过 {summary["skipped"]} 个无变化文件，新增 {total_added} 行')
+    return summary
+
+
+def _merge_category_months(root_dir: str, cat: str, months: List[str]) -> Tuple[Dict[str, int], Dict[str, List[int]]]:
+    """按顺序把一个类别的各月份目录合并到历史目录，返回 ({文件名: 新增行数}, {文件名: 变更日期})。"""
+    hist_dir = os.path.join(root_dir, cat)
+    rows_added = {}
+    changed_dates = {}
+    if not os.path.isdir(hist_dir):
+        print(f'⚠️ 找不到历史目录: {hist_dir}')
+        return rows_added, changed_dates
+
+    for month in months:
+        month_dir = os.path.join(root_dir, f'{cat}_{month}')
+        if os.path.isdir(month_dir):
+            print(f'\n合并 {cat} - {month}数据...')
+            summary = merge_two_folders(hist_dir, month_dir)
+            for name, added in summary['rows_added'].items():
+                rows_added[name] = rows_added.get(name, 0) + added
+            for name, dates in summary['changed_dates'].items():
+                changed_dates.setdefault(name, []).extend(dates)
+        else:
+            print(f'未找到月份目录: {month_dir}')
+    return rows_added, changed_dates
+
+
+def publish_merge_changes(root_dir: str, changed: Dict[str, Dict[str, List[int]]]) -> Optional[str]:
+    """
+    发布周更合并的变更清单，供下游只处理变更的ETF
 
-def merge_monthly_data(root_dir: str, months: List[str] = None) -> None:
+    Args:
+        root_dir: ETF周更根目录
+        changed: {类别: {文件名: 变更日期}}
+
+    Returns:
+        运行编号（没有变更时为None）
+    """
+    changes = ChangeSet()
+    for cat, files in changed.items():
+        for name, dates in files.items():
+            if dates:
+                changes.add(cat, os.path.splitext(name)[0], dates)
+    run_id = ChangeLog(root_dir).publish('weekly', changes)
+    # 摘要索引按刚发布的清单增量更新
+    sync_digest_index(root_dir, CATEGORIES)
+    return run_id
+
+
+def merge_monthly_data(root_dir: str, months: List[str] = None) -> Dict[str, Dict[str, int]]:
     """在根目录下自动将指定月份子目录数据合并到对应历史目录。
     
     Args:
         root_dir: ETF数据根目录
         months: 要合并的月份列表，如 ['2025年5月', '2025年6月']，默认为5、6月
+
+    Returns:
+        {类别: {文件名: 新增行数}}
     """
     if months is None:
         months = ['2025年5月', '2025年6月']
     
-    categories = [
-        '0_ETF日K(前复权)',
-        '0_ETF日K(后复权)',
-        '0_ETF日K(除权)',
-    ]
-
-    for cat in categories:
-        hist_dir = os.path.join(root_dir, cat)
-        
-        if not os.path.isdir(hist_dir):
-            print(f'⚠️ 找不到历史目录: {hist_dir}')
-            continue
+    # 三个类别互不影响，并行合并；同一类别内按月份顺序合并
+    with ProcessPoolExecutor(max_workers=len(CATEGORIES)) as executor:
+        futures = {cat: executor.submit(_merge_category_months, root_dir, cat, months) for cat in CATEGORIES}
+        merged = {cat: future.result() for cat, future in futures.items()}
+    results = {cat: rows_added for cat, (rows_added, _) in merged.items()}
+    publish_merge_changes(root_dir, {cat: changed_dates for cat, (_, changed_dates) in merged.items()})
 
-        # 依次合并指定月份
-        for month in months:
-            month_dir = os.path.join(root_dir, f'{cat}_{month}')
-            
-            if os.path.isdir(month_dir):
-                print(f'\n合并 {cat} - {month}数据...')
-                merge_two_folders(hist_dir, month_dir)
-            else:
-                print(f'未找到月份目录: {month_dir}')
+    for cat, rows_added in results.items():
+        changed = sum(1 for added in rows_added.values() if added)
+        print(f'{cat}: {changed} 个ETF新增 {sum(rows_added.values())} 行')
 
     print('\n全部分类合并完成 ✅')
+    return results
 
 
 if __name__ == '__main__':
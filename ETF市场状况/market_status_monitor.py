@@ -3,13 +3,12 @@
 """
 ETF市场状况监控器
 基于日更数据科学判断ETF的在市情况和退市情况
+各ETF的最新日期只读取文件开头并按文件大小/mtime缓存（config/latest_dates.py），只有改动过的文件才重新读取
 """
 
 import sys
 import os
 import json
-import csv
-import pandas as pd
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Dict, List, Optional
@@ -20,6 +19,17 @@ project_root = script_dir.parent
 sys.path.insert(0, str(project_root))
 
 from config.logger_config import setup_system_logger
+from config.latest_dates import LatestDateCache
+
+TARGET_CATEGORY = "0_ETF日K(前复权)"  # 只扫描前复权数据作为标准
+
+
+def format_date(date: Optional[int]) -> Optional[str]:
+    """YYYYMMDD 整数转为 YYYY-MM-DD"""
+    if date is None:
+        return None
+    return f"{date // 10000:04d}-{date // 100 % 100:02d}-{date % 100:02d}"
+
 
 class ETFMarketMonitor:
     """ETF市场状况监控器"""
@@ -29,6 +39,8 @@ class ETFMarketMonitor:
         self.project_root = project_root
         self.daily_dir = self.project_root / "ETF日更"
         self.status_file = Path(__file__).parent / "etf_market_status.json"
+        self.latest_cache = LatestDateCache(self.daily_dir)
+        self.last_summary = None  # 最近一次生成报告的状态统计
         
         # 交易日判断：简单排除周末，节假日可扩展
         self.today = datetime.now()
@@ -49,66 +61,16 @@ class ETFMarketMonitor:
                 break
         return check_date
     
-    def get_etf_latest_date(self, csv_file: Path) -> Optional[str]:
-        """获取ETF文件中的最新数据日期"""
+    def get_etf_latest_date(self, csv_file: Path, refresh: bool = False) -> Optional[str]:
+        """获取ETF文件中的最新数据日期（只读取文件开头，按文件大小/mtime缓存）"""
         try:
-            # 读取CSV文件
-            df = pd.read_csv(csv_file, encoding='utf-8')
-            if df.empty:
-                return None
-            
-            # 找到日期列
-            date_column = None
-            for col in ['日期', 'date', 'Date', '交易日期']:
-                if col in df.columns:
-                    date_column = col
-                    break
-            
-            if date_column is None:
-                # 假设第二列是日期（第一列通常是代码）
-                if len(df.columns) >= 2:
-                    date_column = df.columns[1]
-                else:
-                    return None
-            
-            # 获取所有日期并找到最新的
-            dates = []
-            for date_str in df[date_column]:
-                try:
-                    # 尝试解析不同格式的日期
-                    if isinstance(date_str, str):
-                        date_str = date_str.strip()
-                        # 尝试YYYYMMDD格式
-                        if len(date_str) == 8 and date_str.isdigit():
-                            parsed_date = datetime.strptime(date_str, '%Y%m%d')
-                            dates.append(parsed_date)
-                        else:
-                            # 尝试其他格式
-                            for fmt in ['%Y-%m-%d', '%Y/%m/%d', '%Y.%m.%d']:
-                                try:
-                                    parsed_date = datetime.strptime(date_str, fmt)
-                                    dates.append(parsed_date)
-                                    break
-                                except ValueError:
-                                    continue
-                    else:
-                        # 处理数值类型的日期
-                        date_int = int(float(date_str))
-                        if len(str(date_int)) == 8:
-                            parsed_date = datetime.strptime(str(date_int), '%Y%m%d')
-                            dates.append(parsed_date)
-                except (ValueError, TypeError):
-                    continue
-            
-            if dates:
-                latest_date = max(dates)
-                return latest_date.strftime('%Y-%m-%d')
-            
-            return None
-            
+            latest, updated = self.latest_cache.latest_date(csv_file, refresh)
+            if updated:
+                self.latest_cache.save()
         except Exception as e:
             self.logger.warning(f"读取ETF文件失败 {csv_file}: {e}")
             return None
+        return format_date(latest)
     
     def determine_etf_status(self, etf_code: str, latest_date: str) -> Dict:
         """判断ETF状态（考虑18:00的数据更新时间）"""
@@ -196,53 +158,54 @@ class ETFMarketMonitor:
                 'analysis': f'状态判断异常: {e}'
             }
     
-    def scan_all_etfs(self) -> Dict:
-        """扫描所有ETF并判断状态"""
+    def scan_all_etfs(self, refresh: bool = False, latest_dates: Optional[Dict[str, Optional[int]]] = None) -> Dict:
+        """
+        扫描所有ETF并判断状态
+        
+        Args:
+            refresh: 忽略最新日期缓存，重新读取所有ETF文件的开头
+            latest_dates: 已知的各ETF最新日期 {文件名（不含.csv）: YYYYMMDD}（如守护进程常驻数据），
+                提供时不再读取ETF文件
+        """
         self.logger.info("🔍 开始扫描所有ETF的市场状况...")
         
-        # 只扫描前复权数据作为标准
-        target_dir = self.daily_dir / "0_ETF日K(前复权)"
+        target_dir = self.daily_dir / TARGET_CATEGORY
         if not target_dir.exists():
             self.logger.error(f"目录不存在: {target_dir}")
             return {}
         
-        csv_files = list(target_dir.glob("*.csv"))
-        self.logger.info(f"找到 {len(csv_files)} 个ETF文件")
+        if latest_dates is not None:
+            self.logger.info(f"找到 {len(latest_dates)} 个ETF（使用常驻数据中的最新日期）")
+        else:
+            # 各文件的最新日期并行读取，未改动的文件直接使用缓存
+            latest_dates = self.latest_cache.latest_dates(TARGET_CATEGORY, refresh=refresh)
+            self.logger.info(f"找到 {len(latest_dates)} 个ETF文件（读取 {self.latest_cache.stats['scanned']} 个，"
+                             f"缓存命中 {self.latest_cache.stats['cached']} 个）")
         
         etf_statuses = {}
-        progress_count = 0
-        
-        for csv_file in csv_files:
+        for filename, latest in latest_dates.items():
             try:
-                # 提取ETF代码
-                filename = csv_file.name
-                etf_code = filename.replace('.csv', '')
                 # 移除交易所后缀
-                if '.' in etf_code:
-                    etf_code = etf_code.split('.')[0]
-                
-                # 获取最新数据日期
-                latest_date = self.get_etf_latest_date(csv_file)
-                
-                # 判断状态
-                status_info = self.determine_etf_status(etf_code, latest_date)
-                etf_statuses[etf_code] = status_info
-                
-                progress_count += 1
-                if progress_count % 100 == 0:
-                    self.logger.info(f"已处理 {progress_count}/{len(csv_files)} 个ETF...")
-                
+                etf_code = filename.split('.')[0]
+                etf_statuses[etf_code] = self.determine_etf_status(etf_code, format_date(latest))
             except Exception as e:
-                self.logger.error(f"处理ETF文件失败 {csv_file}: {e}")
+                self.logger.error(f"处理ETF文件失败 {filename}.csv: {e}")
                 continue
         
         self.logger.info(f"✅ 完成扫描，共处理 {len(etf_statuses)} 个ETF")
         return etf_statuses
     
-    def generate_market_status_report(self) -> bool:
-        """生成市场状况报告"""
+    def generate_market_status_report(self, changed_only: bool = True,
+                                      latest_dates: Optional[Dict[str, Optional[int]]] = None) -> bool:
+        """
+        生成市场状况报告
+        
+        Args:
+            changed_only: 只重新读取改动过的ETF文件（False时忽略最新日期缓存全部重新读取）
+            latest_dates: 已知的各ETF最新日期，提供时不再读取ETF文件
+        """
         try:
-            etf_statuses = self.scan_all_etfs()
+            etf_statuses = self.scan_all_etfs(refresh=not changed_only, latest_dates=latest_dates)
             
             if not etf_statuses:
                 self.logger.error("❌ 没有获取到ETF状态数据")
@@ -278,6 +241,7 @@ class ETFMarketMonitor:
             
             # 打印摘要
             self.print_status_summary(report)
+            self.last_summary = report['status_summary']
             
             self.logger.info(f"📄 ETF市场状况报告已更新: {self.status_file}")
             return True
@@ -332,11 +296,17 @@ class ETFMarketMonitor:
 
 def main():
     """主函数"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='ETF市场状况监控')
+    parser.add_argument('--full', action='store_true', help='忽略最新日期缓存，重新读取所有ETF文件')
+    args = parser.parse_args()
+    
     monitor = ETFMarketMonitor()
     
     print("🚀 开始ETF市场状况监控...")
     
-    success = monitor.generate_market_status_report()
+    success = monitor.generate_market_status_report(changed_only=not args.full)
     
     if success:
         print("✅ ETF市场状况监控完成！")
@@ -9,25 +9,27 @@ ETF 日更新自动同步脚本 (临时处理版本)
 
 import os
 import sys
-import subprocess
 import tempfile
 import shutil
+import json
 from datetime import datetime, timedelta
 from typing import List, Set, Dict
 
 # 添加config目录到路径
 config_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'config')
 sys.path.insert(0, config_dir)
+from etf_store import read_latest_lines
+from date_manifest import DateManifest
+
+# 数据处理模块（进程内调用）
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import daily_etf_processor
 
 try:
     import sys
     import importlib.util
-    # 导入哈希管理器
-    hash_manager_path = os.path.join(config_dir, 'hash_manager.py')
-    spec = importlib.util.spec_from_file_location("hash_manager", hash_manager_path)
-    hash_manager_module = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(hash_manager_module)
-    HashManager = hash_manager_module.HashManager
+    # 导入哈希管理器（进程内共用一个实例；daily_etf_processor 已将项目根目录加入路径）
+    from config.hash_manager import get_hash_manager
     
     # 导入日志配置
     logger_config_path = os.path.join(config_dir, 'logger_config.py')
@@ -40,7 +42,7 @@ try:
     logger = setup_daily_logger()
 except ImportError as e:
     print(f"警告：无法导入配置模块: {e}")
-    HashManager = None
+    get_hash_manager = None
     logger = None
 
 try:
@@ -52,7 +54,8 @@ except ImportError:
 # 配置项
 BAIDU_REMOTE_BASE = "/ETF_按日期"  # 百度网盘中按日期数据根目录
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))  # 当前脚本目录
-PROCESSOR_SCRIPT = "daily_etf_processor.py"  # 数据处理脚本
+FILL_PROGRESS_FILE = os.path.join(CURRENT_DIR, "fill_missing_progress.json")  # 补漏进度记录
+FILL_STAGING_DIR = os.path.join(CURRENT_DIR, ".fill_missing_staging")  # 补漏下载暂存目录（失败后可续传）
 
 
 def get_today_filename() -> str:
@@ -123,38 +126,59 @@ def check_local_data_exists(date_str: str) -> bool:
         for output_dir in output_dirs:
             etf_file = os.path.join(CURRENT_DIR, output_dir, f"{etf_code}.csv")
             
-            if os.path.exists(etf_file):
-                try:
-                    # 快速检查：只读前几行
-                    with open(etf_file, 'r', encoding='utf-8') as f:
-                        f.readline()  # 跳过表头
-                        for _ in range(5):  # 只检查前5行
-                            line = f.readline().strip()
-                            if line and date_str in line:
-                                return True
-                except Exception:
-                    continue
+            try:
+                # 快速检查：只读最新的5行（包含追加模式下的尾段）
+                for line in read_latest_lines(etf_file, 5):
+                    if date_str in line:
+                        return True
+            except Exception:
+                continue
     
     return False
 
 
+def load_fill_progress() -> Dict:
+    """加载补漏进度记录"""
+    if os.path.exists(FILL_PROGRESS_FILE):
+        try:
+            with open(FILL_PROGRESS_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            print(f"⚠️ 无法加载补漏进度文件: {e}")
+    return {"downloaded": [], "last_update": None}
+
+
+def save_fill_progress(progress: Dict):
+    """保存补漏进度记录"""
+    progress["last_update"] = datetime.now().isoformat()
+    try:
+        with open(FILL_PROGRESS_FILE, 'w', encoding='utf-8') as f:
+            json.dump(progress, f, ensure_ascii=False, indent=2)
+    except IOError as e:
+        print(f"⚠️ 无法保存补漏进度文件: {e}")
+
+
 def check_local_processed_status(filenames: List[str], hash_manager) -> Dict[str, bool]:
     """检查本地文件处理状态"""
     print(f"📊 检查本地处理状态...")
     
     status = {}
+    manifest = DateManifest(CURRENT_DIR)
     
-    for filename in filenames:
-        date_str = filename[:8]  # YYYYMMDD
-        
-        # 方法1：检查hash记录
-        has_hash_record = hash_manager and hash_manager.is_file_downloaded(filename)
-        
-        # 方法2：检查本地数据完整性
-        has_local_data = check_local_data_exists(date_str)
-        
-        # 任一方法确认存在就认为已处理
-        status[filename] = has_hash_record or has_local_data
+    if not manifest.is_empty():
+        # 已处理日期清单由处理脚本在写入成功后维护，直接查表
+        for filename in filenames:
+            status[filename] = manifest.is_applied(filename)
+    else:
+        # 尚无清单（旧版本处理的数据）：回退到哈希记录和样本文件检查
+        for filename in filenames:
+            date_str = filename[:8]  # YYYYMMDD
+            
+            # 方法1：检查hash记录
+            has_hash_record = hash_manager and hash_manager.is_file_downloaded(filename)
+            
+            # 方法2：检查本地数据完整性（任一方法确认存在就认为已处理）
+            status[filename] = bool(has_hash_record or check_local_data_exists(date_str))
     
     processed_count = sum(status.values())
     print(f"💾 本地已处理 {processed_count}/{len(filenames)} 个文件")
@@ -212,6 +236,19 @@ def download_to_temp(bp: ByPy, filename: str, temp_dir: str, hash_manager=None)
 
 def should_update_data(filename: str, hash_manager) -> tuple[bool, str]:
     """判断是否需要更新数据"""
+    manifest = DateManifest(CURRENT_DIR)
+    if not manifest.is_empty():
+        if not manifest.is_applied(filename):
+            return True, "本地尚未应用"
+        
+        # 最近一次下载的文件与已应用的源文件不同，说明源文件已更新或上次处理未完成
+        applied_md5 = manifest.get_checksum(filename)
+        downloaded_md5 = hash_manager.hash_data.get(filename) if hash_manager else None
+        if applied_md5 and downloaded_md5 and applied_md5 != downloaded_md5:
+            return True, "源文件已变化"
+        
+        return False, "已是最新"
+    
     if not hash_manager:
         return True, "无哈希验证"
     
@@ -237,10 +274,9 @@ def should_update_data(filename: str, hash_manager) -> tuple[bool, str]:
                 continue  # 如果文件不存在，跳过检查
             
             try:
-                # 读取文件第一行数据，检查是否有今天的日期
-                with open(etf_file, 'r', encoding='utf-8') as f:
-                    f.readline()  # 跳过表头
-                    first_data_line = f.readline().strip()
+                # 读取最新一行数据（包含追加模式下的尾段），检查是否有今天的日期
+                latest_lines = read_latest_lines(etf_file, 1)
+                first_data_line = latest_lines[0] if latest_lines else ""
                     
                 if first_data_line and today_date not in first_data_line:
                     return True, f"本地{output_dir}数据不完整，需要重新处理"
@@ -251,49 +287,33 @@ def should_update_data(filename: str, hash_manager) -> tuple[bool, str]:
     return False, "已是最新"
 
 
-def run_processor_with_temp_data(temp_file_path: str) -> bool:
-    """使用临时数据运行处理脚本"""
-    try:
-        # 创建临时的源数据目录结构
-        temp_source_dir = tempfile.mkdtemp(prefix="etf_temp_source_")
-        temp_filename = os.path.basename(temp_file_path)
-        
-        # 复制文件到临时源目录
-        shutil.copy2(temp_file_path, os.path.join(temp_source_dir, temp_filename))
-        
-        # 修改处理脚本的源目录配置（临时）
-        date_str = temp_filename[:8]  # YYYYMMDD
-        cmd = [
-            "python", PROCESSOR_SCRIPT, 
-            "--mode", "range", 
-            "--start-date", date_str, 
-            "--end-date", date_str,
-            "--temp-source-dir", temp_source_dir  # 传递临时目录
-        ]
-        
-        print(f"🔄 运行增量处理: {' '.join(cmd)}")
-        result = subprocess.run(cmd, cwd=CURRENT_DIR, capture_output=True, text=True)
-        
-        # 清理临时源目录
-        shutil.rmtree(temp_source_dir, ignore_errors=True)
-        
-        if result.returncode == 0:
-            print("✓ 数据处理完成")
-            # 显示处理结果摘要
-            if result.stdout:
-                lines = result.stdout.strip().split('\n')
-                # 只显示重要的输出信息
-                for line in lines[-5:]:  # 显示最后5行
-                    if any(keyword in line for keyword in ['完成', '成功', '处理', '生成', '统计']):
-                        print(f"  {line}")
-            return True
-        else:
-            print(f"✗ 数据处理失败: {result.stderr}")
-            return False
-            
-    except Exception as e:
-        print(f"✗ 运行处理脚本失败: {e}")
+def apply_downloaded_file(file_path: str) -> bool:
+    """在进程内应用单个已下载的日期文件"""
+    return apply_downloaded_files([file_path])
+
+
+def apply_downloaded_files(file_paths: List[str]) -> bool:
+    """
+    在进程内调用数据处理模块应用已下载的日期文件（直接读取下载路径，不复制、不启动子进程），
+    多个日期一次合并写入，每个ETF文件只重写一次
+    """
+    print(f"🔄 运行增量处理: {', '.join(os.path.basename(path) for path in file_paths)}")
+    
+    # 处理模块只输出警告，不输出逐个ETF的合并信息，这里只打印摘要
+    result = daily_etf_processor.apply_date_files(
+        sorted(file_paths), mode='incremental',
+        workers=daily_etf_processor.DEFAULT_WRITE_WORKERS, output_dir=CURRENT_DIR, quiet=True
+    )
+    
+    if not result['success']:
+        print(f"✗ 数据处理失败: {result['error']}")
         return False
+    
+    print("✓ 数据处理完成")
+    print(f"  📊 应用 {len(result['files'])} 个日期文件，{result['etfs']} 个ETF，每个复权目录 {result['records']} 条记录")
+    if result['skipped']:
+        print(f"  ⚠️ 跳过无效文件: {', '.join(result['skipped'])}")
+    return True
 
 
 def daily_incremental_sync():
@@ -311,9 +331,9 @@ def daily_incremental_sync():
     
     # 初始化哈希管理器
     hash_manager = None
-    if HashManager:
+    if get_hash_manager:
         try:
-            hash_manager = HashManager()
+            hash_manager = get_hash_manager()
             print("✓ 哈希管理器初始化成功")
         except Exception as e:
             print(f"⚠️ 哈希管理器初始化失败: {e}")
@@ -358,7 +378,7 @@ def daily_incremental_sync():
         
         # 处理数据
         print("🔄 开始增量处理...")
-        if run_processor_with_temp_data(temp_file_path):
+        if apply_downloaded_file(temp_file_path):
             print("🎉 今日增量更新完成！")
             return True
         else:
@@ -382,7 +402,7 @@ def detect_missing_data(days_back=15) -> Dict[str, List[str]]:
     # 2. 初始化百度网盘和hash管理器
     try:
         bp = ByPy()
-        hash_manager = HashManager() if HashManager else None
+        hash_manager = get_hash_manager() if get_hash_manager else None
     except Exception as e:
         print(f"❌ 初始化失败: {e}")
         return {'missing': [], 'existing': [], 'processed': []}
@@ -448,14 +468,14 @@ def process_single_missing_file(filename: str) -> bool:
     
     try:
         bp = ByPy()
-        hash_manager = HashManager() if HashManager else None
+        hash_manager = get_hash_manager() if get_hash_manager else None
         
         # 下载到临时目录
         temp_file_path = download_to_temp(bp, filename, temp_dir, hash_manager)
         
         if temp_file_path:
             # 处理数据（复用现有函数）
-            return run_processor_with_temp_data(temp_file_path)
+            return apply_downloaded_file(temp_file_path)
         
         return False
         
@@ -470,30 +490,89 @@ def process_single_missing_file(filename: str) -> bool:
 
 
 def batch_fill_missing_files(missing_files: List[str]) -> bool:
-    """批量补齐缺失文件"""
+    """
+    批量补齐缺失文件
+    先下载全部缺失的日期文件，再一次性合并处理，每个ETF文件只重写一次。
+    已应用的日期记录在日期清单中，下载失败或处理中断后再次运行会跳过已应用日期并复用已下载文件。
+    """
     if not missing_files:
         print("✅ 无缺失文件需要补齐")
         return True
     
-    print(f"\n🔄 开始批量补齐 {len(missing_files)} 个缺失文件...")
+    progress = load_fill_progress()
+    downloaded = set(progress.get("downloaded", []))
+    manifest = DateManifest(CURRENT_DIR)
+    
+    pending = sorted(f for f in missing_files if not manifest.is_applied(f))
+    if len(pending) < len(missing_files):
+        print(f"⏭️ 跳过 {len(missing_files) - len(pending)} 个已应用的日期文件")
+    if not pending:
+        print("✅ 缺失文件均已应用")
+        return True
     
-    # 按日期排序，先处理最新的缺失数据
-    sorted_missing = sorted(missing_files, reverse=True)
+    print(f"\n🔄 开始批量补齐 {len(pending)} 个缺失文件...")
+    os.makedirs(FILL_STAGING_DIR, exist_ok=True)
     
-    success_count = 0
-    for i, filename in enumerate(sorted_missing, 1):
-        print(f"\n[{i}/{len(missing_files)}] 处理 {filename}...")
-        
-        # 使用现有的下载处理逻辑
-        if process_single_missing_file(filename):
-            success_count += 1
+    try:
+        bp = ByPy()
+        hash_manager = get_hash_manager() if get_hash_manager else None
+    except Exception as e:
+        print(f"✗ 初始化失败: {e}")
+        return False
+    
+    # 1. 先下载所有缺失文件到暂存目录
+    staged_paths = []
+    for i, filename in enumerate(pending, 1):
+        staged_path = os.path.join(FILL_STAGING_DIR, filename)
+        if filename in downloaded and os.path.exists(staged_path):
+            print(f"[{i}/{len(pending)}] ♻️ 复用已下载文件: {filename}")
+            staged_paths.append(staged_path)
+            continue
+        
+        print(f"\n[{i}/{len(pending)}] 下载 {filename}...")
+        # 哈希记录在成功应用后再写入，避免下载成功但处理失败的日期被误判为已处理
+        temp_file_path = download_to_temp(bp, filename, FILL_STAGING_DIR)
+        if temp_file_path:
+            staged_paths.append(temp_file_path)
+            downloaded.add(filename)
+            progress["downloaded"] = sorted(downloaded)
+            save_fill_progress(progress)
+    
+    if not staged_paths:
+        print("⚠️ 没有成功下载的缺失文件")
+        return False
+    
+    # 2. 一次性合并处理所有已下载的日期
+    print(f"\n🔄 一次性处理 {len(staged_paths)} 个日期文件...")
+    if not apply_downloaded_files(staged_paths):
+        print("⚠️ 批量处理失败，已下载文件保留在暂存目录，下次运行将续传")
+        return False
+    
+    # 3. 更新哈希并清理暂存文件（已应用日期由处理模块记录到日期清单）
+    applied_now = [os.path.basename(path) for path in staged_paths]
+    for filename, staged_path in zip(applied_now, staged_paths):
+        if hash_manager:
+            hash_manager.update_file_hash(filename, staged_path)
+        os.remove(staged_path)
+    
+    progress["downloaded"] = sorted(downloaded - set(applied_now))
+    save_fill_progress(progress)
     
-    print(f"\n🎉 批量补漏完成: {success_count}/{len(missing_files)}")
-    return success_count > 0
+    if not os.listdir(FILL_STAGING_DIR):
+        os.rmdir(FILL_STAGING_DIR)
+    
+    print(f"\n🎉 批量补漏完成: {len(applied_now)}/{len(pending)}")
+    return len(applied_now) > 0
+
 
+def run_smart_update(days_back=15) -> Dict:
+    """
+    智能日更新：先补漏，再更新今天
 
-def smart_daily_update(days_back=15):
-    """智能日更新：先补漏，再更新今天"""
+    Returns:
+        {'success': 是否成功, 'missing': 检测到的缺失文件, 'missing_success': 补漏是否成功,
+         'today_success': 今日更新是否成功}
+    """
     print("🚀 智能日更新模式...")
     
     # 1. 检测缺失
@@ -512,13 +591,25 @@ def smart_daily_update(days_back=15):
     # 4. 汇总结果
     if missing_success and today_success:
         print("🎉 智能更新完全成功！")
-        return True
     elif today_success:
         print("✅ 今日更新成功，但缺失数据补齐可能有问题")
-        return True
     else:
         print("⚠️ 智能更新部分失败")
-        return False
+    
+    # 共用的哈希管理器不随本函数关闭，结束时导出本次的变化（调度器和守护进程在同一进程内多次调用）
+    if get_hash_manager:
+        get_hash_manager().export_if_pending()
+    return {
+        'success': today_success,
+        'missing': result['missing'],
+        'missing_success': missing_success,
+        'today_success': today_success
+    }
+
+
+def smart_daily_update(days_back=15) -> bool:
+    """智能日更新（命令行入口），返回是否成功"""
+    return run_smart_update(days_back)['success']
 
 
 def test_connection():
@@ -544,9 +635,9 @@ def test_connection():
         print(f"❌ 百度网盘中不存在: {today_file}")
     
     # 测试哈希管理器
-    if HashManager:
+    if get_hash_manager:
         try:
-            hash_manager = HashManager()
+            hash_manager = get_hash_manager()
             print(f"\n📊 哈希管理器状态:")
             hash_manager.print_status()
             
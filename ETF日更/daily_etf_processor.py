@@ -10,13 +10,27 @@ ETF 日更新数据处理脚本
 
 import os
 import sys
+import numpy as np
 import pandas as pd
 import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime, timedelta
-from typing import Dict, List, Set, Optional
+from typing import Callable, Dict, Iterator, List, Set, Optional, Tuple
 from pathlib import Path
 import argparse
 
+# 添加项目根目录到路径以导入config模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.etf_store import (
+    DEFAULT_COMPACT_ROWS, STORE_MODES, append_rows, compact_directory, compact_etf_file,
+    get_store_settings, has_tail, merge_with_existing, remove_tail, write_csv_atomic
+)
+from config.date_manifest import DateManifest, calculate_md5
+from config.change_manifest import ChangeLog, ChangeSet
+from config.columnar_store import build_columnar_directory, columnar_enabled, refresh_columnar, write_columnar
+from config.digest_index import sync_digest_index
+
 # 配置常量
 DAILY_DATA_DIR = "./按日期_源数据"  # 按日期数据目录（默认值，已废弃）
 OUTPUT_BASE_DIR = "."  # 输出基础目录
@@ -28,14 +42,35 @@ TEMP_SOURCE_DIR = None
 # 字段映射：从按日期格式转换为按代码格式
 DATE_FORMAT_FIELDS = ["日期", "代码", "名称", "开盘价", "最高价", "最低价", "收盘价", "上日收盘", "涨跌", "涨幅%", "成交量(手数)", "成交额(千元)", "复权因子"]
 CODE_FORMAT_FIELDS = ["代码", "日期", "开盘价", "最高价", "最低价", "收盘价", "上日收盘", "涨跌", "涨幅%", "成交量(手数)", "成交额(千元)"]
+REQUIRED_FIELDS = ["日期", "代码", "开盘价", "最高价", "最低价", "收盘价", "上日收盘", "涨跌", "涨幅%", "成交量(手数)", "成交额(千元)", "复权因子"]
+
+# 列式复权计算用到的字段分组（顺序与 CODE_FORMAT_FIELDS 一致）
+IDENTITY_FIELDS = ["代码", "日期"]
+PRICE_FIELDS = ["开盘价", "最高价", "最低价", "收盘价", "上日收盘"]  # 需要复权调整的价格字段
+PASSTHROUGH_FIELDS = ["涨跌", "涨幅%", "成交量(手数)", "成交额(千元)"]  # 不需要复权调整的字段
+ADJ_TYPES = ["forward", "backward", "no_adjust"]
+
+# 全量重建的内存控制
+REBUILD_MEMORY_LIMIT_MB = 1024  # 默认内存上限（MB）
+REBUILD_MEMORY_FACTOR = 8  # 原始数据到复权拆分结果的内存放大系数（估算值）
+REBUILD_PROGRESS_INTERVAL = 500  # 合并阶段每处理多少个ETF输出一次进度
+
+# 并行写入
+DEFAULT_WRITE_WORKERS = min(4, os.cpu_count() or 1)  # 默认写入进程数
+PARALLEL_MIN_FILES = 300  # 待写文件少于该数量时直接在主进程顺序写入
+SHARDS_PER_WORKER = 4  # 每个进程分到的分片数（分片越多负载越均衡）
 
+# 写CSV时同步生成列式副本（config.json 的 columnar_store.enabled）
+COLUMNAR_ENABLED = columnar_enabled()
 
-def ensure_output_directories():
+
+def ensure_output_directories(output_dir: str = OUTPUT_BASE_DIR, quiet: bool = False):
     """确保输出目录存在"""
     for category in CATEGORIES:
-        category_dir = os.path.join(OUTPUT_BASE_DIR, category)
+        category_dir = os.path.join(output_dir, category)
         os.makedirs(category_dir, exist_ok=True)
-        print(f"✓ 确保目录存在: {category}")
+        if not quiet:
+            print(f"✓ 确保目录存在: {category}")
 
 
 def get_daily_csv_files(start_date: Optional[str] = None, end_date: Optional[str] = None) -> List[str]:
@@ -88,13 +123,13 @@ def normalize_etf_code(etf_code: str) -> str:
     return str(etf_code)
 
 
-def calculate_adjusted_prices(price: float, factor: float) -> Dict[str, float]:
+def calculate_adjusted_prices(price, factor) -> Dict[str, float]:
     """
     根据复权因子计算三种复权价格
     
     Args:
-        price: 原始价格（除权价格）
-        factor: 复权因子
+        price: 原始价格（除权价格），支持标量或 numpy 数组
+        factor: 复权因子，支持标量或可广播的 numpy 数组
     
     Returns:
         包含三种复权价格的字典
@@ -106,7 +141,193 @@ def calculate_adjusted_prices(price: float, factor: float) -> Dict[str, float]:
     }
 
 
-def process_daily_file(csv_file: str) -> Dict[str, Dict[str, List]]:
+def source_name(csv_file) -> str:
+    """获取日期数据来源的文件名（支持路径和内存缓冲区）"""
+    if isinstance(csv_file, (str, os.PathLike)):
+        return os.path.basename(csv_file)
+    return os.path.basename(getattr(csv_file, 'name', '<buffer>'))
+
+
+def read_daily_file(csv_file) -> Optional[pd.DataFrame]:
+    """
+    读取单个日期文件，完成文件内去重和必要字段校验
+    
+    Args:
+        csv_file: CSV文件路径或已打开的文件/内存缓冲区
+    
+    Returns:
+        校验通过的DataFrame，文件为空或无效时返回None
+    """
+    try:
+        df = pd.read_csv(csv_file, encoding='utf-8')
+    except Exception as e:
+        print(f"✗ 处理文件失败 {source_name(csv_file)}: {e}")
+        return None
+    
+    if df.empty:
+        print(f"⚠️ 文件为空: {source_name(csv_file)}")
+        return None
+    
+    # 验证必要字段（去重依赖代码和日期，须先校验）
+    missing_fields = [field for field in REQUIRED_FIELDS if field not in df.columns]
+    if missing_fields:
+        print(f"⚠️ 缺少必要字段 {missing_fields}: {source_name(csv_file)}")
+        return None
+    
+    # 检查并处理文件内的重复数据
+    before_count = len(df)
+    df = df.drop_duplicates(subset=['代码', '日期'], keep='last')
+    after_count = len(df)
+    
+    if before_count > after_count:
+        print(f"🧹 {source_name(csv_file)}: 文件内去重 {before_count} → {after_count} 条记录")
+    
+    return df
+
+
+def compute_adjusted_frames(df: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    """
+    按列计算三种复权数据（整列数组运算，不逐行循环）
+    
+    Args:
+        df: 按日期格式的源数据（需包含 REQUIRED_FIELDS）
+    
+    Returns:
+        {'forward': DataFrame, 'backward': DataFrame, 'no_adjust': DataFrame}，
+        每个DataFrame的列为 CODE_FORMAT_FIELDS
+    """
+    factor = df['复权因子'].to_numpy(dtype='float64')
+    prices = df[PRICE_FIELDS].to_numpy(dtype='float64')
+    adjusted = calculate_adjusted_prices(prices, factor[:, None])
+    
+    result = {}
+    for adj_type in ADJ_TYPES:
+        columns = {field: df[field] for field in IDENTITY_FIELDS}
+        for i, field in enumerate(PRICE_FIELDS):
+            columns[field] = adjusted[adj_type][:, i]
+        for field in PASSTHROUGH_FIELDS:
+            columns[field] = df[field]
+        result[adj_type] = pd.DataFrame(columns, index=df.index)
+    
+    return result
+
+
+def split_by_etf(frame: pd.DataFrame, source_ids: Optional[np.ndarray] = None,
+                 source_dtypes: Optional[List[Dict[str, np.dtype]]] = None) -> Dict[str, pd.DataFrame]:
+    """
+    将整批复权结果按ETF代码拆分
+    
+    多个日期文件拼接时，非价格列的类型可能在文件之间不同（例如某天成交量含空值变成浮点）。
+    逐行处理时每个ETF的列类型只由它自己的行决定，这里按来源文件还原，保证输出一致。
+    
+    Args:
+        frame: compute_adjusted_frames 生成的单个复权类型数据
+        source_ids: 每行对应的来源文件序号（与 frame 行对齐）
+        source_dtypes: 每个来源文件的原始列类型
+    
+    Returns:
+        {etf_code: DataFrame}，保持代码首次出现的顺序和文件内行顺序
+    """
+    mixed_fields = []
+    if source_ids is not None and source_dtypes:
+        for field in IDENTITY_FIELDS + PASSTHROUGH_FIELDS:
+            if len({dtypes[field] for dtypes in source_dtypes}) > 1:
+                mixed_fields.append(field)
+    
+    result = {}
+    for etf_code, group in frame.groupby('代码', sort=False, dropna=False):
+        if mixed_fields:
+            # 多文件拼接时 frame 使用连续整数索引，可直接定位来源文件
+            group_sources = np.unique(source_ids[group.index.to_numpy()])
+            restore = {}
+            for field in mixed_fields:
+                dtypes = {source_dtypes[i][field] for i in group_sources}
+                if len(dtypes) == 1:
+                    dtype = dtypes.pop()
+                    if group[field].dtype != dtype:
+                        restore[field] = dtype
+            if restore:
+                group = group.astype(restore)
+        
+        result[etf_code] = group
+    
+    return result
+
+
+def load_valid_daily_file(csv_file) -> Optional[pd.DataFrame]:
+    """
+    读取日期文件并提前校验价格和复权因子可转换为数值，无效文件整体跳过
+    
+    Args:
+        csv_file: CSV文件路径或内存缓冲区
+    
+    Returns:
+        可用于复权计算的DataFrame，无效时返回None
+    """
+    df = read_daily_file(csv_file)
+    if df is None:
+        return None
+    try:
+        df[PRICE_FIELDS + ['复权因子']].to_numpy(dtype='float64')
+    except Exception as e:
+        print(f"✗ 处理文件失败 {source_name(csv_file)}: {e}")
+        return None
+    return df
+
+
+def build_adjusted_data(frames: List[pd.DataFrame]) -> Dict[str, Dict[str, pd.DataFrame]]:
+    """
+    对一批已读取的日期数据整体做列式复权计算，再按ETF代码拆分
+    
+    Args:
+        frames: 日期数据列表（按日期升序）
+    
+    Returns:
+        {adj_type: {etf_code: DataFrame}}
+    """
+    if not frames:
+        return {adj_type: {} for adj_type in ADJ_TYPES}
+    
+    source_dtypes = [df.dtypes.to_dict() for df in frames]
+    if len(frames) == 1:
+        combined = frames[0]
+        source_ids = None
+    else:
+        combined = pd.concat(frames, ignore_index=True)
+        source_ids = np.repeat(np.arange(len(frames)), [len(f) for f in frames])
+    
+    adjusted = compute_adjusted_frames(combined)
+    return {
+        adj_type: split_by_etf(adjusted[adj_type], source_ids, source_dtypes)
+        for adj_type in ADJ_TYPES
+    }
+
+
+def process_daily_files(csv_files: List[str]) -> Dict[str, Dict[str, pd.DataFrame]]:
+    """
+    批量处理多个日期文件：整批做一次列式复权计算，再按ETF代码拆分
+    
+    Args:
+        csv_files: CSV文件路径列表（按日期升序）
+    
+    Returns:
+        {
+            'forward': {etf_code: DataFrame, ...},
+            'backward': {etf_code: DataFrame, ...}, 
+            'no_adjust': {etf_code: DataFrame, ...}
+        }
+    """
+    frames = []
+    for i, csv_file in enumerate(csv_files, 1):
+        print(f"[{i}/{len(csv_files)}] 处理 {source_name(csv_file)}...")
+        df = load_valid_daily_file(csv_file)
+        if df is not None:
+            frames.append(df)
+    
+    return build_adjusted_data(frames)
+
+
+def process_daily_file(csv_file: str) -> Dict[str, Dict[str, pd.DataFrame]]:
     """
     处理单个日期文件，返回按代码分组的三种复权数据
     
@@ -115,154 +336,469 @@ def process_daily_file(csv_file: str) -> Dict[str, Dict[str, List]]:
     
     Returns:
         {
-            'forward': {etf_code: [row_data], ...},
-            'backward': {etf_code: [row_data], ...}, 
-            'no_adjust': {etf_code: [row_data], ...}
+            'forward': {etf_code: DataFrame, ...},
+            'backward': {etf_code: DataFrame, ...}, 
+            'no_adjust': {etf_code: DataFrame, ...}
         }
     """
-    try:
-        # 读取CSV文件
-        df = pd.read_csv(csv_file, encoding='utf-8')
-        
-        if df.empty:
-            print(f"⚠️ 文件为空: {os.path.basename(csv_file)}")
-            return {'forward': {}, 'backward': {}, 'no_adjust': {}}
-        
-        # 检查并处理文件内的重复数据
-        before_count = len(df)
-        df = df.drop_duplicates(subset=['代码', '日期'], keep='last')
-        after_count = len(df)
-        
-        if before_count > after_count:
-            print(f"🧹 {os.path.basename(csv_file)}: 文件内去重 {before_count} → {after_count} 条记录")
-        
-        # 验证必要字段
-        required_fields = ["日期", "代码", "开盘价", "最高价", "最低价", "收盘价", "上日收盘", "涨跌", "涨幅%", "成交量(手数)", "成交额(千元)", "复权因子"]
-        missing_fields = [field for field in required_fields if field not in df.columns]
-        if missing_fields:
-            print(f"⚠️ 缺少必要字段 {missing_fields}: {os.path.basename(csv_file)}")
-            return {'forward': {}, 'backward': {}, 'no_adjust': {}}
-        
-        result = {'forward': {}, 'backward': {}, 'no_adjust': {}}
-        
-        for _, row in df.iterrows():
-            etf_code = row['代码']
-            factor = float(row['复权因子'])
+    return process_daily_files([csv_file])
+
+
+CATEGORY_MAP = {
+    'forward': "0_ETF日K(前复权)",
+    'backward': "0_ETF日K(后复权)", 
+    'no_adjust': "0_ETF日K(除权)"
+}
+
+
+def save_etf_frame(category_dir: str, etf_code: str, rows, mode: str = 'incremental',
+                   store: str = 'classic', compact_rows: int = DEFAULT_COMPACT_ROWS, quiet: bool = False):
+    """
+    保存单个ETF单个复权类型的数据
+    
+    Args:
+        category_dir: 复权类型目录
+        etf_code: ETF代码
+        rows: 该ETF的新数据（DataFrame或行列表）
+        mode: 'incremental' 增量更新, 'rebuild' 全量重建
+        store: 'classic' 读取-合并-重写经典CSV, 'append' 新行追加到尾段（开销与新增行数成正比）
+        compact_rows: 追加模式下尾段达到该行数时自动压实回经典CSV
+        quiet: 不输出逐个ETF的合并信息（读取失败等警告仍输出）
+    """
+    # 标准化ETF代码用于文件名（移除.SZ/.SH后缀）
+    normalized_code = normalize_etf_code(etf_code)
+    etf_file = os.path.join(category_dir, f"{normalized_code}.csv")
+    
+    # 创建DataFrame（列式处理结果已是DataFrame）
+    if isinstance(rows, pd.DataFrame):
+        new_df = rows[CODE_FORMAT_FIELDS]
+    else:
+        new_df = pd.DataFrame(rows, columns=CODE_FORMAT_FIELDS)
+    
+    # 对新数据进行去重（防止同一天下载的数据有重复）
+    before_count = len(new_df)
+    new_df = new_df.drop_duplicates(subset=['代码', '日期'], keep='last')
+    after_count = len(new_df)
+    
+    if before_count > after_count and not quiet:
+        print(f"🧹 {normalized_code}: 新数据去重 {before_count} → {after_count} 条记录")
+    
+    if mode == 'incremental' and store == 'append' and (os.path.exists(etf_file) or has_tail(etf_file)):
+        # 追加模式：新行写入尾段，不读取和重写历史文件
+        tail_rows = append_rows(etf_file, new_df)
+        if tail_rows >= compact_rows:
+            compact_etf_file(etf_file)
+            if COLUMNAR_ENABLED:
+                refresh_columnar(etf_file)
+            if not quiet:
+                print(f"🗜️ {normalized_code}: 尾段达到 {tail_rows} 行，已压实")
+        return
+    
+    if mode == 'incremental' and os.path.exists(etf_file):
+        # 增量模式：读取现有数据并合并
+        try:
+            existing_df = pd.read_csv(etf_file, encoding='utf-8', dtype=str)
             
-            # 需要复权调整的价格字段
-            price_fields = ['开盘价', '最高价', '最低价', '收盘价', '上日收盘']
+            # 合并数据并去重（按代码+日期组合去重，保留最新数据），按日期降序排列
+            combined_df = merge_with_existing(existing_df, new_df)
             
-            # 处理三种复权类型
-            for adj_type in ['forward', 'backward', 'no_adjust']:
-                if etf_code not in result[adj_type]:
-                    result[adj_type][etf_code] = []
-                
-                # 构建输出行数据
-                row_data = [etf_code, row['日期']]  # 代码,日期
-                
-                # 添加价格字段（根据复权类型调整）
-                for field in price_fields:
-                    original_price = float(row[field])
-                    adjusted_prices = calculate_adjusted_prices(original_price, factor)
-                    row_data.append(adjusted_prices[adj_type])
-                
-                # 添加其他字段（不需要复权调整）
-                row_data.extend([
-                    row['涨跌'],
-                    row['涨幅%'], 
-                    row['成交量(手数)'],
-                    row['成交额(千元)']
-                ])
-                
-                result[adj_type][etf_code].append(row_data)
+            if not quiet:
+                print(f"🔄 {normalized_code}: 合并后 {len(combined_df)} 条记录（去重完成）")
+            
+        except Exception as e:
+            print(f"⚠️ 读取现有文件失败 {normalized_code}.csv: {e}，使用新数据")
+            combined_df = new_df
+    else:
+        # 重建模式或文件不存在：直接使用新数据
+        combined_df = new_df
         
-        return result
+        # 即使是重建模式，也要检查并去除重复数据
+        before_count = len(combined_df)
+        combined_df = combined_df.drop_duplicates(subset=['代码', '日期'], keep='last')
+        after_count = len(combined_df)
         
-    except Exception as e:
-        print(f"✗ 处理文件失败 {os.path.basename(csv_file)}: {e}")
-        return {'forward': {}, 'backward': {}, 'no_adjust': {}}
+        if before_count > after_count and not quiet:
+            print(f"🧹 {normalized_code}: 重建模式去重 {before_count} → {after_count} 条记录")
+        
+        # 按日期排序（降序，最新日期在前）
+        combined_df['日期'] = combined_df['日期'].astype(str)
+        combined_df = combined_df.sort_values('日期', ascending=False)
+    
+    # 保存文件（临时文件+替换，中断时不会留下写了一半的CSV）
+    write_csv_atomic(combined_df, etf_file)
+    if COLUMNAR_ENABLED:
+        write_columnar(combined_df, etf_file)
+    
+    # 重建后的经典CSV已包含全部数据，旧尾段不再需要
+    if mode == 'rebuild':
+        remove_tail(etf_file)
 
 
-def merge_and_save_etf_data(all_data: Dict[str, Dict[str, List]], mode: str = 'incremental'):
+def shard_by_etf(tasks: List[Tuple], workers: int) -> List[List[Tuple]]:
+    """
+    按ETF代码将写入任务分片，同一代码的三个复权文件落在同一分片，
+    各分片的输出文件互不重叠
+    
+    Args:
+        tasks: [(category_dir, etf_code, ...), ...]
+        workers: 进程数
+    
+    Returns:
+        分片列表
+    """
+    n_shards = max(1, workers * SHARDS_PER_WORKER)
+    slots = {}
+    shards = [[] for _ in range(n_shards)]
+    for task in tasks:
+        slot = slots.setdefault(task[1], len(slots) % n_shards)
+        shards[slot].append(task)
+    return [shard for shard in shards if shard]
+
+
+def run_sharded(worker: Callable, tasks: List[Tuple], workers: int, *args) -> Iterator[int]:
+    """
+    按ETF分片执行写入任务，进程数大于1且任务足够多时使用进程池
+    
+    Args:
+        worker: 分片处理函数（模块级函数，接收分片和附加参数，返回完成的任务数）
+        tasks: 写入任务列表
+        workers: 进程数
+        *args: 透传给 worker 的附加参数
+    
+    Yields:
+        每个分片完成的任务数
+    """
+    if workers <= 1 or len(tasks) < PARALLEL_MIN_FILES:
+        yield worker(tasks, *args)
+        return
+    
+    shards = shard_by_etf(tasks, workers)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(worker, shard, *args) for shard in shards]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def _save_shard(shard: List[Tuple], mode: str, store: str, compact_rows: int, quiet: bool = False) -> int:
+    """写入一个分片的ETF数据（进程池工作函数）"""
+    for category_dir, etf_code, rows in shard:
+        save_etf_frame(category_dir, etf_code, rows, mode, store, compact_rows, quiet)
+    return len(shard)
+
+
+def merge_and_save_etf_data(all_data: Dict[str, Dict[str, List]], mode: str = 'incremental',
+                            store: str = 'classic', compact_rows: int = DEFAULT_COMPACT_ROWS,
+                            workers: int = 1, output_dir: str = OUTPUT_BASE_DIR, quiet: bool = False):
     """
     合并并保存ETF数据到对应的文件
     
     Args:
         all_data: 所有处理后的数据
         mode: 'incremental' 增量更新, 'rebuild' 全量重建
+        store: 'classic' 读取-合并-重写经典CSV, 'append' 新行追加到尾段（开销与新增行数成正比）
+        compact_rows: 追加模式下尾段达到该行数时自动压实回经典CSV
+        workers: 写入进程数，按ETF代码分片并行写入
+        output_dir: 输出基础目录
+        quiet: 只保留警告输出，不输出逐个ETF的合并信息
+    """
+    tasks = []
+    for adj_type, category in CATEGORY_MAP.items():
+        category_dir = os.path.join(output_dir, category)
+        for etf_code, rows in all_data[adj_type].items():
+            if len(rows) == 0:
+                continue
+            tasks.append((category_dir, etf_code, rows))
+    
+    for _ in run_sharded(_save_shard, tasks, workers, mode, store, compact_rows, quiet):
+        pass
+    
+    if quiet:
+        return
+    for adj_type, category in CATEGORY_MAP.items():
+        print(f"✓ 完成 {category}: {len(all_data[adj_type])} 个ETF")
+
+
+def manifest_entry(csv_file, df: pd.DataFrame) -> Dict:
     """
-    category_map = {
-        'forward': "0_ETF日K(前复权)",
-        'backward': "0_ETF日K(后复权)", 
-        'no_adjust': "0_ETF日K(除权)"
+    生成日期清单记录（日期取自文件名 YYYYMMDD.csv）
+    
+    Args:
+        csv_file: 日期文件路径或内存缓冲区
+        df: 该文件去重后的数据
+    
+    Returns:
+        DateManifest.record 的参数字典
+    """
+    name = source_name(csv_file)
+    is_path = isinstance(csv_file, (str, os.PathLike))
+    return {
+        'date_str': name[:8],
+        'source_file': name,
+        'md5': calculate_md5(csv_file) if is_path else None,
+        'rows': len(df),
+        'etfs': df['代码'].nunique()
     }
+
+
+def record_applied_files(entries: List[Dict], reset: bool = False, output_dir: str = OUTPUT_BASE_DIR):
+    """
+    将已成功写入的日期记录到清单
     
-    for adj_type, category in category_map.items():
-        category_dir = os.path.join(OUTPUT_BASE_DIR, category)
+    Args:
+        entries: manifest_entry 生成的记录列表
+        reset: 是否先清空清单（全量重建）
+        output_dir: 输出基础目录
+    """
+    manifest = DateManifest(output_dir)
+    if reset:
+        manifest.reset()
+    for entry in entries:
+        manifest.record(**entry)
+    manifest.save()
+
+
+def publish_changes(data: Dict[str, Dict[str, pd.DataFrame]], mode: str = 'incremental',
+                    output_dir: str = OUTPUT_BASE_DIR) -> Optional[str]:
+    """
+    发布本次写入的变更清单，供下游只处理变更的ETF
+    
+    Args:
+        data: build_adjusted_data 的结果
+        mode: 'rebuild' 时全部数据视为变更，作废此前的清单
+        output_dir: 输出基础目录
+    
+    Returns:
+        运行编号（没有变更时为None）
+    """
+    change_log = ChangeLog(output_dir)
+    if mode == 'rebuild':
+        run_id = change_log.invalidate('daily_rebuild')
+    else:
+        changes = ChangeSet()
+        for adj_type, category in CATEGORY_MAP.items():
+            for etf_code, rows in data[adj_type].items():
+                if len(rows) > 0:
+                    changes.add(category, normalize_etf_code(etf_code), rows['日期'])
+        run_id = change_log.publish('daily', changes)
+    
+    # 摘要索引按刚发布的清单增量更新（重建后整体重建）
+    sync_digest_index(output_dir, CATEGORIES)
+    return run_id
+
+
+def spill_adjusted_data(data: Dict[str, Dict[str, pd.DataFrame]], spill_dir: str, run_id: int,
+                        run_index: Dict[str, Dict[str, List[str]]]) -> int:
+    """
+    将一批复权结果按ETF分区溢写到磁盘，形成一个有序段（run）
+    
+    Args:
+        data: build_adjusted_data 的结果
+        spill_dir: 溢写目录
+        run_id: 段序号（按日期升序递增，合并时后段覆盖前段）
+        run_index: {adj_type: {etf_code: [段文件路径, ...]}}，原地追加
+    
+    Returns:
+        本段写出的行数
+    """
+    rows = 0
+    for adj_type in ADJ_TYPES:
+        adj_dir = os.path.join(spill_dir, adj_type)
+        os.makedirs(adj_dir, exist_ok=True)
+        for etf_code, frame in data[adj_type].items():
+            if len(frame) == 0:
+                continue
+            # pickle 保留列类型，合并后与一次性处理的结果一致
+            run_file = os.path.join(adj_dir, f"{normalize_etf_code(etf_code)}.{run_id:05d}.pkl")
+            frame.to_pickle(run_file)
+            run_index[adj_type].setdefault(etf_code, []).append(run_file)
+            rows += len(frame)
+    return rows
+
+
+def _merge_runs_shard(shard: List[Tuple]) -> int:
+    """合并一个分片内各ETF的溢写段并写出最终文件（进程池工作函数）"""
+    for category_dir, etf_code, run_files in shard:
+        # 段按日期升序排列，拼接后由重建去重规则保留最新数据
+        frames = [pd.read_pickle(run_file) for run_file in run_files]
+        combined = frames[0] if len(frames) == 1 else pd.concat(frames)
+        save_etf_frame(category_dir, etf_code, combined, mode='rebuild')
         
-        for etf_code, rows in all_data[adj_type].items():
-            if not rows:
+        for run_file in run_files:
+            os.remove(run_file)
+    return len(shard)
+
+
+def merge_spilled_runs(run_index: Dict[str, Dict[str, List[str]]], workers: int = 1,
+                       output_dir: str = OUTPUT_BASE_DIR):
+    """
+    逐个ETF合并各段溢写数据并写出最终文件，内存占用只与单个ETF的历史长度相关
+    
+    Args:
+        run_index: spill_adjusted_data 维护的段索引
+        workers: 写入进程数，按ETF代码分片并行合并
+        output_dir: 输出基础目录
+    """
+    tasks = []
+    for adj_type, category in CATEGORY_MAP.items():
+        category_dir = os.path.join(output_dir, category)
+        for etf_code, run_files in run_index[adj_type].items():
+            tasks.append((category_dir, etf_code, run_files))
+    
+    done = 0
+    next_report = REBUILD_PROGRESS_INTERVAL
+    for count in run_sharded(_merge_runs_shard, tasks, workers):
+        done += count
+        if done >= next_report and done < len(tasks):
+            print(f"🔀 合并进度 {done}/{len(tasks)}")
+            next_report = (done // REBUILD_PROGRESS_INTERVAL + 1) * REBUILD_PROGRESS_INTERVAL
+    
+    for adj_type, category in CATEGORY_MAP.items():
+        print(f"✓ 完成 {category}: {len(run_index[adj_type])} 个ETF")
+
+
+def rebuild_streaming(csv_files: List[str], memory_limit_mb: int = REBUILD_MEMORY_LIMIT_MB,
+                      workers: int = 1, output_dir: str = OUTPUT_BASE_DIR) -> Dict[str, int]:
+    """
+    内存受限的全量重建：分批读取日期文件，超过内存上限时按ETF分区溢写到磁盘，
+    最后逐个ETF合并各段写出最终文件。数据量在上限内时不溢写，与一次性处理相同
+    
+    Args:
+        csv_files: CSV文件路径列表（按日期升序）
+        memory_limit_mb: 内存上限（MB）
+        workers: 写入进程数
+        output_dir: 输出基础目录
+    
+    Returns:
+        {'etfs': ETF数量, 'records': 记录数, 'runs': 溢写段数}
+    """
+    memory_limit = memory_limit_mb * 1024 * 1024
+    frames = []
+    buffered = 0
+    run_index = {adj_type: {} for adj_type in ADJ_TYPES}
+    spill_dir = None
+    run_id = 0
+    records = 0
+    entries = []
+    
+    try:
+        for i, csv_file in enumerate(csv_files, 1):
+            print(f"[{i}/{len(csv_files)}] 处理 {source_name(csv_file)}...")
+            df = load_valid_daily_file(csv_file)
+            if df is None:
                 continue
+            frames.append(df)
+            entries.append(manifest_entry(csv_file, df))
+            # 复权计算和按ETF拆分会放大内存占用，按原始数据估算峰值
+            buffered += int(df.memory_usage(deep=True).sum()) * REBUILD_MEMORY_FACTOR
             
-            # 标准化ETF代码用于文件名（移除.SZ/.SH后缀）
-            normalized_code = normalize_etf_code(etf_code)
-            etf_file = os.path.join(category_dir, f"{normalized_code}.csv")
-            
-            # 创建DataFrame
-            new_df = pd.DataFrame(rows, columns=CODE_FORMAT_FIELDS)
-            
-            # 对新数据进行去重（防止同一天下载的数据有重复）
-            before_count = len(new_df)
-            new_df = new_df.drop_duplicates(subset=['代码', '日期'], keep='last')
-            after_count = len(new_df)
-            
-            if before_count > after_count:
-                print(f"🧹 {normalized_code}: 新数据去重 {before_count} → {after_count} 条记录")
-            
-            if mode == 'incremental' and os.path.exists(etf_file):
-                # 增量模式：读取现有数据并合并
-                try:
-                    existing_df = pd.read_csv(etf_file, encoding='utf-8', dtype=str)
-                    
-                    # 确保数据类型一致
-                    new_df = new_df.astype(str)
-                    existing_df = existing_df.astype(str)
-                    
-                    # 合并数据并去重（按代码+日期组合去重，保留最新数据）
-                    combined_df = pd.concat([existing_df, new_df], ignore_index=True)
-                    
-                    # 按代码和日期去重，保留最后一个（最新的数据覆盖旧的）
-                    combined_df = combined_df.drop_duplicates(subset=['代码', '日期'], keep='last')
-                    
-                    # 按日期排序（降序，最新日期在前）
-                    combined_df['日期'] = combined_df['日期'].astype(str)
-                    combined_df = combined_df.sort_values('日期', ascending=False)
-                    
-                    print(f"🔄 {normalized_code}: 合并后 {len(combined_df)} 条记录（去重完成）")
-                    
-                except Exception as e:
-                    print(f"⚠️ 读取现有文件失败 {normalized_code}.csv: {e}，使用新数据")
-                    combined_df = new_df
-            else:
-                # 重建模式或文件不存在：直接使用新数据
-                combined_df = new_df
-                
-                # 即使是重建模式，也要检查并去除重复数据
-                before_count = len(combined_df)
-                combined_df = combined_df.drop_duplicates(subset=['代码', '日期'], keep='last')
-                after_count = len(combined_df)
-                
-                if before_count > after_count:
-                    print(f"🧹 {normalized_code}: 重建模式去重 {before_count} → {after_count} 条记录")
-                
-                # 按日期排序（降序，最新日期在前）
-                combined_df['日期'] = combined_df['日期'].astype(str)
-                combined_df = combined_df.sort_values('日期', ascending=False)
-            
-            # 保存文件
-            combined_df.to_csv(etf_file, index=False, encoding='utf-8-sig')
-            
-        print(f"✓ 完成 {category}: {len(all_data[adj_type])} 个ETF")
+            if buffered >= memory_limit and i < len(csv_files):
+                if spill_dir is None:
+                    spill_dir = tempfile.mkdtemp(prefix='.rebuild_spill_', dir=output_dir)
+                run_id += 1
+                run_rows = spill_adjusted_data(build_adjusted_data(frames), spill_dir, run_id, run_index)
+                records += run_rows
+                print(f"💾 溢写第 {run_id} 段: {len(frames)} 个文件, {run_rows} 条记录（估算 {buffered // 1024 // 1024}MB）")
+                frames = []
+                buffered = 0
+        
+        data = build_adjusted_data(frames)
+        frames = []
+        
+        print()
+        print("💾 保存数据到文件...")
+        
+        if spill_dir is None:
+            # 全部数据在内存上限内，直接写出
+            merge_and_save_etf_data(data, 'rebuild', workers=workers, output_dir=output_dir)
+            record_applied_files(entries, reset=True, output_dir=output_dir)
+            publish_changes(data, 'rebuild', output_dir)
+            etf_codes = set().union(*[etfs.keys() for etfs in data.values()])
+            records = sum(len(rows) for etfs in data.values() for rows in etfs.values())
+            return {'etfs': len(etf_codes), 'records': records, 'runs': 0}
+        
+        run_id += 1
+        records += spill_adjusted_data(data, spill_dir, run_id, run_index)
+        print(f"🔀 合并 {run_id} 个溢写段...")
+        etf_codes = set().union(*[etfs.keys() for etfs in run_index.values()])
+        merge_spilled_runs(run_index, workers, output_dir)
+        record_applied_files(entries, reset=True, output_dir=output_dir)
+        publish_changes(data, 'rebuild', output_dir)
+        return {'etfs': len(etf_codes), 'records': records, 'runs': run_id}
+    finally:
+        if spill_dir is not None:
+            shutil.rmtree(spill_dir, ignore_errors=True)
+
+
+def apply_date_files(csv_files: List, mode: str = 'incremental', store: Optional[str] = None,
+                     compact_rows: Optional[int] = None, workers: int = 1,
+                     output_dir: Optional[str] = None, quiet: bool = False) -> Dict:
+    """
+    进程内应用日期文件（供 auto_daily_sync 等脚本直接调用，无需复制文件和启动子进程），
+    成功后将日期记录到已处理日期清单
+    
+    Args:
+        csv_files: 日期文件路径或内存缓冲区列表（按日期升序）
+        mode: 'incremental' 增量更新, 'rebuild' 全量重建
+        store: 存储模式，默认取 config.json 的 daily_store 配置
+        compact_rows: 追加模式的自动压实行数，默认取配置
+        workers: 写入进程数
+        output_dir: 输出基础目录，默认使用 OUTPUT_BASE_DIR
+        quiet: 只保留警告输出，不输出进度和逐个ETF的合并信息（常驻进程内调用时使用）
+    
+    Returns:
+        {
+            'success': 是否成功,
+            'files': 已应用的文件名列表,
+            'skipped': 无效而跳过的文件名列表,
+            'etf_rows': {etf_code: 写入行数}（每个复权目录相同）,
+            'etfs': ETF数量,
+            'records': 每个复权目录写入的总行数,
+            'run_id': 发布的变更清单编号,
+            'error': 失败原因（成功时为None）
+        }
+    """
+    output_dir = output_dir or OUTPUT_BASE_DIR
+    default_store, default_compact_rows = get_store_settings()
+    store = store or default_store
+    compact_rows = compact_rows or default_compact_rows
+    
+    result = {'success': False, 'files': [], 'skipped': [], 'etf_rows': {},
+              'etfs': 0, 'records': 0, 'run_id': None, 'error': None}
+    
+    try:
+        ensure_output_directories(output_dir, quiet)
+        
+        frames = []
+        entries = []
+        for i, csv_file in enumerate(csv_files, 1):
+            if not quiet:
+                print(f"[{i}/{len(csv_files)}] 处理 {source_name(csv_file)}...")
+            df = load_valid_daily_file(csv_file)
+            if df is None:
+                result['skipped'].append(source_name(csv_file))
+                continue
+            frames.append(df)
+            entries.append(manifest_entry(csv_file, df))
+            result['files'].append(source_name(csv_file))
+        
+        data = build_adjusted_data(frames)
+        
+        if not quiet:
+            print()
+            print("💾 保存数据到文件...")
+        merge_and_save_etf_data(data, mode, store=store, compact_rows=compact_rows, workers=workers,
+                                output_dir=output_dir, quiet=quiet)
+        record_applied_files(entries, reset=(mode == 'rebuild'), output_dir=output_dir)
+        result['run_id'] = publish_changes(data, mode, output_dir)
+    except Exception as e:
+        result['error'] = str(e)
+        return result
+    
+    result['etf_rows'] = {etf_code: len(rows) for etf_code, rows in data['forward'].items()}
+    result['etfs'] = len(result['etf_rows'])
+    result['records'] = sum(result['etf_rows'].values())
+    result['success'] = True
+    return result
 
 
 def get_latest_dates(n_days: int = 5) -> List[str]:
@@ -281,15 +817,47 @@ def main():
     global TEMP_SOURCE_DIR
     
     parser = argparse.ArgumentParser(description='ETF日更新数据处理脚本')
-    parser.add_argument('--mode', choices=['daily', 'rebuild', 'range'], default='daily',
-                        help='运行模式: daily(日更新), rebuild(全量重建), range(指定范围)')
+    parser.add_argument('--mode', choices=['daily', 'rebuild', 'range', 'compact', 'verify'], default='daily',
+                        help='运行模式: daily(日更新), rebuild(全量重建), range(指定范围), compact(尾段压实回经典CSV), verify(核对已处理日期清单)')
     parser.add_argument('--start-date', type=str, help='开始日期 (YYYYMMDD)')
     parser.add_argument('--end-date', type=str, help='结束日期 (YYYYMMDD)')
     parser.add_argument('--days', type=int, default=5, help='日更新模式下处理最近几天的数据')
     parser.add_argument('--temp-source-dir', type=str, help='临时源数据目录（用于临时处理）')
+    store_mode, compact_rows = get_store_settings()
+    parser.add_argument('--store', choices=STORE_MODES, default=store_mode,
+                        help=f'存储模式: classic(重写经典CSV), append(新行追加到尾段，定期压实)，默认取config.json: {store_mode}')
+    parser.add_argument('--compact-rows', type=int, default=compact_rows,
+                        help=f'追加模式下尾段达到该行数时自动压实（默认{compact_rows}）')
+    parser.add_argument('--memory-limit-mb', type=int, default=REBUILD_MEMORY_LIMIT_MB,
+                        help=f'全量重建的内存上限（MB），超过时分段溢写到磁盘再合并（默认{REBUILD_MEMORY_LIMIT_MB}）')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WRITE_WORKERS,
+                        help=f'写入进程数，按ETF代码分片并行写入三个复权目录（默认{DEFAULT_WRITE_WORKERS}，1为顺序写入）')
+    parser.add_argument('--fix', action='store_true', help='verify模式下按实际文件修正日期清单')
     
     args = parser.parse_args()
     
+    if args.mode == 'compact':
+        # 压实：将所有尾段合并回日期降序的经典CSV
+        print("🗜️ 压实尾段，重新生成经典CSV...")
+        for category in CATEGORIES:
+            category_dir = os.path.join(OUTPUT_BASE_DIR, category)
+            compacted = compact_directory(category_dir)
+            print(f"✓ {category}: 压实 {compacted} 个ETF")
+            if COLUMNAR_ENABLED:
+                print(f"   列式副本更新 {build_columnar_directory(category_dir)} 个")
+        return
+    
+    if args.mode == 'verify':
+        # 核对：已处理日期清单与实际输出文件交叉检查
+        manifest = DateManifest(OUTPUT_BASE_DIR)
+        report = manifest.verify(CATEGORIES, fix=args.fix)
+        manifest.print_verify_report(report)
+        if args.fix and not report['ok']:
+            print("🔧 已按实际文件修正日期清单")
+        elif not report['ok']:
+            sys.exit(1)
+        return
+    
     # 如果提供了临时目录，使用它
     if args.temp_source_dir:
         TEMP_SOURCE_DIR = args.temp_source_dir
@@ -303,9 +871,6 @@ def main():
         print(f"🔄 临时处理模式: 处理完成后将自动清理临时文件")
     print()
     
-    # 确保输出目录存在
-    ensure_output_directories()
-    
     # 根据模式获取文件列表
     if args.mode == 'daily':
         # 日更新：处理最近N天的数据
@@ -341,31 +906,24 @@ def main():
     print(f"📋 找到 {len(csv_files)} 个文件需要处理")
     print()
     
-    # 处理所有文件
-    all_data = {'forward': {}, 'backward': {}, 'no_adjust': {}}
-    
-    for i, csv_file in enumerate(csv_files, 1):
-        filename = os.path.basename(csv_file)
-        print(f"[{i}/{len(csv_files)}] 处理 {filename}...")
+    if mode == 'rebuild':
+        # 全量重建：按内存上限分批处理，必要时溢写到磁盘
+        print(f"🧮 内存上限: {args.memory_limit_mb}MB")
+        ensure_output_directories()
+        stats = rebuild_streaming(csv_files, args.memory_limit_mb, args.workers)
+        total_etfs = stats['etfs']
+        total_records = stats['records']
+    else:
+        # 处理所有文件（整批列式复权计算，再按ETF拆分），成功后记录到日期清单
+        result = apply_date_files(csv_files, mode, store=args.store, compact_rows=args.compact_rows,
+                                  workers=args.workers)
+        if not result['success']:
+            print(f"✗ 数据处理失败: {result['error']}")
+            sys.exit(1)
         
-        daily_data = process_daily_file(csv_file)
-        
-        # 合并数据
-        for adj_type in all_data:
-            for etf_code, rows in daily_data[adj_type].items():
-                if etf_code not in all_data[adj_type]:
-                    all_data[adj_type][etf_code] = []
-                all_data[adj_type][etf_code].extend(rows)
-    
-    print()
-    print("💾 保存数据到文件...")
-    
-    # 保存数据
-    merge_and_save_etf_data(all_data, mode)
-    
-    # 统计结果
-    total_etfs = len(set().union(*[data.keys() for data in all_data.values()]))
-    total_records = sum(len(rows) for data in all_data.values() for rows in data.values())
+        # 统计结果（三个复权目录合计）
+        total_etfs = result['etfs']
+        total_records = result['records'] * len(ADJ_TYPES)
     
     print()
     print("🎉 处理完成!")
@@ -378,7 +936,12 @@ def main():
     print("💡 使用说明:")
     print("   - 日更新: python daily_etf_processor.py --mode daily")
     print("   - 全量重建: python daily_etf_processor.py --mode rebuild")
+    print("   - 低内存重建: python daily_etf_processor.py --mode rebuild --memory-limit-mb 256")
+    print("   - 并行写入: python daily_etf_processor.py --mode rebuild --workers 8")
     print("   - 指定范围: python daily_etf_processor.py --mode range --start-date 20250601 --end-date 20250630")
+    print("   - 追加存储: python daily_etf_processor.py --mode daily --store append")
+    print("   - 尾段压实: python daily_etf_processor.py --mode compact")
+    print("   - 核对清单: python daily_etf_processor.py --mode verify [--fix]")
 
 
 if __name__ == "__main__":
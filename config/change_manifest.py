@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+变更清单模块
+日更、周更每次写入按代码数据后发布一份本次运行的变更清单：哪个复权目录的哪些ETF新增或改动了哪些日期。
+清单按运行保存在数据目录的 _changes/ 下，下游（初筛、市场状况、技术指标、数据库导入）各自维护消费游标，
+读取上次处理之后累计的变更，只处理被改动的ETF
+"""
+
+import os
+import json
+import hashlib
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set
+from pathlib import Path
+
+CHANGES_DIR_NAME = "_changes"
+CONSUMERS_DIR_NAME = "consumers"
+FLOOR_FILE_NAME = "floor.json"
+MAX_RUNS_KEPT = 500  # 保留的运行清单数量，更早的清单删除后落后的消费者需要全量处理
+
+
+class ChangeSet:
+    """一段运行内的变更汇总 {复权目录: {代码: 日期集合}}"""
+
+    def __init__(self, categories: Dict[str, Dict[str, Iterable]] = None, run_ids: List[str] = None,
+                 full_scan: bool = False):
+        """
+        初始化变更汇总
+
+        Args:
+            categories: {复权目录: {代码: 日期列表}}，日期为 YYYYMMDD 整数
+            run_ids: 汇总涉及的运行编号
+            full_scan: 历史清单不足以确定变更范围，消费者需要全量处理
+        """
+        self.categories: Dict[str, Dict[str, Set[int]]] = {}
+        self.run_ids: List[str] = list(run_ids or [])
+        self.full_scan = full_scan
+        for category, codes in (categories or {}).items():
+            for code, dates in codes.items():
+                self.add(category, code, dates)
+
+    def add(self, category: str, code: str, dates: Iterable):
+        """记录某个复权目录中一个ETF变更的日期"""
+        entry = self.categories.setdefault(category, {}).setdefault(code, set())
+        entry.update(int(date) for date in dates)
+
+    def update(self, other: 'ChangeSet'):
+        """合并另一份变更汇总"""
+        for category, codes in other.categories.items():
+            for code, dates in codes.items():
+                self.add(category, code, dates)
+        self.run_ids.extend(run_id for run_id in other.run_ids if run_id not in self.run_ids)
+        self.full_scan = self.full_scan or other.full_scan
+
+    def codes(self, category: str = None) -> Set[str]:
+        """变更的ETF代码；不指定复权目录时返回所有目录的并集"""
+        if category is not None:
+            return set(self.categories.get(category, {}))
+        return set().union(*[set(codes) for codes in self.categories.values()])
+
+    def dates(self, category: str, code: str) -> List[int]:
+        """某个ETF在某个复权目录中变更的日期（升序）"""
+        return sorted(self.categories.get(category, {}).get(code, ()))
+
+    def latest_date(self, code: str) -> Optional[int]:
+        """某个ETF在所有复权目录中变更的最新日期"""
+        dates = [max(codes[code]) for codes in self.categories.values() if codes.get(code)]
+        return max(dates) if dates else None
+
+    @property
+    def last_run_id(self) -> Optional[str]:
+        """汇总涉及的最新运行编号"""
+        return max(self.run_ids) if self.run_ids else None
+
+    def is_empty(self) -> bool:
+        """是否没有任何变更"""
+        return not any(self.categories.values())
+
+    def to_dict(self) -> Dict[str, Dict[str, List[int]]]:
+        """转换为可写入JSON的字典"""
+        return {category: {code: sorted(dates) for code, dates in sorted(codes.items())}
+                for category, codes in sorted(self.categories.items())}
+
+    def __len__(self) -> int:
+        return len(self.codes())
+
+
+class ChangeLog:
+    """数据目录的变更清单与消费游标"""
+
+    def __init__(self, base_dir: str):
+        """
+        初始化变更清单
+
+        Args:
+            base_dir: 数据目录（三个复权目录所在目录），清单保存在该目录的 _changes/ 下
+        """
+        self.base_dir = Path(base_dir)
+        self.changes_dir = self.base_dir / CHANGES_DIR_NAME
+        self.consumers_dir = self.changes_dir / CONSUMERS_DIR_NAME
+
+    @staticmethod
+    def _new_run_id(source: str) -> str:
+        """按时间排序的运行编号"""
+        return f"{datetime.now():%Y%m%d%H%M%S%f}_{os.getpid()}_{source}"
+
+    def _write_json(self, path: Path, data: Dict):
+        """写入JSON文件（临时文件+替换）"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(temp_path, path)
+
+    def _read_json(self, path: Path) -> Optional[Dict]:
+        """读取JSON文件，不存在或损坏时返回 None"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def runs(self) -> List[str]:
+        """全部运行编号（升序）"""
+        if not self.changes_dir.is_dir():
+            return []
+        return sorted(path.stem for path in self.changes_dir.glob("*.json") if path.name != FLOOR_FILE_NAME)
+
+    def _floor(self) -> Optional[str]:
+        """已删除或失效的最新运行编号，游标早于它的消费者需要全量处理"""
+        data = self._read_json(self.changes_dir / FLOOR_FILE_NAME)
+        return data.get("run_id") if data else None
+
+    def publish(self, source: str, changes: ChangeSet) -> Optional[str]:
+        """
+        发布一次运行的变更清单
+
+        Args:
+            source: 来源（如 daily、weekly）
+            changes: 本次运行的变更
+
+        Returns:
+            运行编号；没有变更时不发布，返回 None
+        """
+        if changes.is_empty():
+            return None
+        run_id = self._new_run_id(source)
+        self._write_json(self.changes_dir / f"{run_id}.json", {
+            "run_id": run_id,
+            "source": source,
+            "created_at": datetime.now().isoformat(timespec='seconds'),
+            "categories": changes.to_dict()
+        })
+        self._prune()
+        return run_id
+
+    def invalidate(self, source: str) -> str:
+        """
+        标记全部数据已变更（如全量重建）：此前的清单作废，所有消费者下次全量处理
+
+        Returns:
+            作为新起点的运行编号
+        """
+        run_id = self._new_run_id(source)
+        self._write_json(self.changes_dir / FLOOR_FILE_NAME, {"run_id": run_id, "source": source})
+        for old_run in self.runs():
+            (self.changes_dir / f"{old_run}.json").unlink(missing_ok=True)
+        return run_id
+
+    def _prune(self):
+        """只保留最近 MAX_RUNS_KEPT 份清单，并把删除的最新编号记为下限"""
+        runs = self.runs()
+        if len(runs) <= MAX_RUNS_KEPT:
+            return
+        removed = runs[:-MAX_RUNS_KEPT]
+        floor = self._floor()
+        if floor is None or removed[-1] > floor:
+            self._write_json(self.changes_dir / FLOOR_FILE_NAME, {"run_id": removed[-1], "source": "prune"})
+        for run_id in removed:
+            (self.changes_dir / f"{run_id}.json").unlink(missing_ok=True)
+
+    def load_run(self, run_id: str) -> Optional[ChangeSet]:
+        """读取一次运行的变更清单"""
+        data = self._read_json(self.changes_dir / f"{run_id}.json")
+        if data is None:
+            return None
+        return ChangeSet(data.get("categories", {}), run_ids=[run_id])
+
+    def cursor(self, consumer: str) -> Optional[str]:
+        """消费者已处理到的运行编号"""
+        data = self._read_json(self.consumers_dir / f"{consumer}.json")
+        return data.get("run_id") if data else None
+
+    def consumer_state(self, consumer: str) -> Dict:
+        """消费者确认时一并保存的附加状态"""
+        data = self._read_json(self.consumers_dir / f"{consumer}.json")
+        return data.get("state", {}) if data else {}
+
+    def pending(self, consumer: str) -> ChangeSet:
+        """
+        消费者上次确认之后累计的变更
+
+        Returns:
+            ChangeSet；消费者从未确认过、或其游标之后的清单已被删除/作废时 full_scan 为 True
+            （此时 run_ids 仍包含当前全部清单，确认后游标移到最新）
+        """
+        cursor = self.cursor(consumer)
+        floor = self._floor()
+        full_scan = cursor is None or (floor is not None and cursor < floor)
+        changes = ChangeSet(full_scan=full_scan)
+        if full_scan and floor is not None:
+            changes.run_ids.append(floor)  # 全量处理后游标至少移到下限
+        for run_id in self.runs():
+            if cursor is not None and run_id <= cursor:
+                continue
+            run_changes = self.load_run(run_id)
+            if run_changes is None:
+                # 清单损坏时无法确定变更范围
+                changes.full_scan = True
+                changes.run_ids.append(run_id)
+                continue
+            changes.update(run_changes)
+        return changes
+
+    def acknowledge(self, consumer: str, changes: ChangeSet, state: Dict = None):
+        """
+        确认已处理完一份变更汇总，游标移到其中最新的运行编号
+
+        Args:
+            consumer: 消费者名称
+            changes: pending() 返回的变更汇总（处理开始前读取，处理期间新发布的清单留到下次）
+            state: 附加状态（如其他输入文件的签名），由 consumer_state() 读取
+        """
+        # 游标只前进不后退；尚无任何清单时记为空字符串，表示已全量处理过
+        run_id = max(changes.last_run_id or "", self.cursor(consumer) or "")
+        self._write_json(self.consumers_dir / f"{consumer}.json", {
+            "run_id": run_id,
+            "acknowledged_at": datetime.now().isoformat(timespec='seconds'),
+            "state": state or {}
+        })
+
+
+def files_signature(paths: Iterable) -> str:
+    """一组文件的签名（路径、大小、mtime_ns），文件不存在也计入签名"""
+    hash_md5 = hashlib.md5()
+    for path in sorted(str(path) for path in paths):
+        try:
+            stat = os.stat(path)
+            hash_md5.update(f"{path}|{stat.st_size}|{stat.st_mtime_ns}\n".encode('utf-8'))
+        except OSError:
+            hash_md5.update(f"{path}|missing\n".encode('utf-8'))
+    return hash_md5.hexdigest()
+
+
+class ChangeGate:
+    """
+    派生结果的重算判断：数据目录有待处理的变更、或其他输入文件（如初筛结果列表）变化时才需要重新计算
+    """
+
+    def __init__(self, base_dir: str, consumer: str, inputs: Iterable = ()):
+        """
+        Args:
+            base_dir: 数据目录
+            consumer: 消费者名称
+            inputs: 其他输入文件路径
+        """
+        self.change_log = ChangeLog(base_dir)
+        self.consumer = consumer
+        self.inputs = list(inputs)
+        # 处理开始前读取，处理期间的新变更留到下次
+        self.changes = self.change_log.pending(consumer)
+        self.signature = files_signature(self.inputs)
+
+    def needs_update(self) -> bool:
+        """是否需要重新计算"""
+        if self.changes.full_scan or not self.changes.is_empty():
+            return True
+        return self.change_log.consumer_state(self.consumer).get("inputs") != self.signature
+
+    def acknowledge(self):
+        """计算成功后确认"""
+        self.change_log.acknowledge(self.consumer, self.changes, state={"inputs": self.signature})
+
+
+def main():
+    """命令行：查看数据目录的变更清单和各消费者的待处理变更"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='查看变更清单')
+    parser.add_argument('base_dir', help='数据目录（如 ETF日更、ETF周更）')
+    parser.add_argument('--consumer', help='只显示该消费者的待处理变更')
+    args = parser.parse_args()
+
+    log = ChangeLog(args.base_dir)
+    runs = log.runs()
+    print(f"📋 {log.changes_dir}: {len(runs)} 份运行清单" + (f"，最新 {runs[-1]}" if runs else ""))
+
+    consumers = [args.consumer] if args.consumer else sorted(
+        path.stem for path in log.consumers_dir.glob("*.json")) if log.consumers_dir.is_dir() else []
+    for consumer in consumers:
+        changes = log.pending(consumer)
+        if changes.full_scan:
+            print(f"  {consumer}: 需要全量处理")
+        else:
+            print(f"  {consumer}: {len(changes)} 个ETF待处理 "
+                  f"({', '.join(f'{cat}: {len(codes)}' for cat, codes in changes.categories.items()) or '无变更'})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+ETF列式存储模块
+在按代码的CSV之外，为每个ETF额外保存一份类型化的NumPy列式副本：
+1. 日期保存为 int32，其余数值字段保存为 float64，读取时无需文本解析和类型推断
+2. 副本保存在 {复权目录}/_columnar/{代码}.col，由日更处理脚本和周更合并在写CSV时同步生成
+   文件格式：首行JSON头（代码、行数、字段、各列类型），随后依次为 int32 日期列和各字段的 float64 列
+   （小端、按列连续），读取时整块读入后直接映射为NumPy数组
+3. 头中记录每列按CSV读取时推断的类型（整数、浮点或文本），读取时按此还原，
+   read_etf_frame 返回与 pd.read_csv 相同列、行顺序和类型的DataFrame；副本缺失或比CSV旧时自动回退读取CSV
+"""
+
+import io
+import json
+import os
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+try:
+    from config.etf_store import has_tail, read_etf_csv
+except ImportError:
+    from etf_store import has_tail, read_etf_csv  # config目录已在sys.path中
+
+COLUMNAR_DIR_NAME = "_columnar"  # 列式副本子目录名
+COLUMNAR_SUFFIX = ".col"
+COLUMNAR_VERSION = 2  # 版本2：头中记录各列类型
+CODE_FIELD = '代码'
+DATE_FIELD = '日期'
+VALUE_FIELDS = ['开盘价', '最高价', '最低价', '收盘价', '上日收盘', '涨跌', '涨幅%', '成交量(手数)', '成交额(千元)']
+# pd.read_csv 推断文本列得到的类型（pandas 3 为 str，此前为 object）
+TEXT_DTYPE = str(pd.read_csv(io.StringIO("代码\n159001.SZ"))[CODE_FIELD].dtype)
+
+PathLike = Union[str, Path]
+
+
+def columnar_enabled() -> bool:
+    """从 config/config.json 的 columnar_store 配置读取是否生成列式副本"""
+    config_path = Path(__file__).parent / "config.json"
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            return bool(json.load(f).get('columnar_store', {}).get('enabled', False))
+    except (IOError, json.JSONDecodeError):
+        return False
+
+
+def get_columnar_path(etf_file: PathLike) -> Path:
+    """获取ETF文件对应的列式副本路径"""
+    etf_file = Path(etf_file)
+    return etf_file.parent / COLUMNAR_DIR_NAME / f"{etf_file.stem}{COLUMNAR_SUFFIX}"
+
+
+def _csv_dtype(column: pd.Series) -> str:
+    """列写入CSV后被 pd.read_csv 推断出的类型：int64、float64 或 TEXT_DTYPE"""
+    if pd.api.types.is_bool_dtype(column):
+        return TEXT_DTYPE  # 写出为 True/False 文本，列式副本不支持
+    if pd.api.types.is_integer_dtype(column):
+        return 'int64'
+    if pd.api.types.is_float_dtype(column):
+        return 'float64'
+    present = column.notna() & (column.astype(str).str.strip() != '')
+    numeric = pd.to_numeric(column.where(present), errors='coerce')
+    if numeric[present].isna().any():
+        return TEXT_DTYPE
+    if present.all() and column[present].astype(str).str.strip().str.fullmatch(r'[-+]?\d+').all():
+        return 'int64'
+    return 'float64'
+
+
+def _read_version(columnar_path: Path) -> Optional[int]:
+    """列式副本的格式版本，无法读取时返回None"""
+    try:
+        with open(columnar_path, 'rb') as f:
+            return json.loads(f.readline().decode('utf-8')).get('version')
+    except (OSError, ValueError):
+        return None
+
+
+def write_columnar(df: pd.DataFrame, etf_file: PathLike) -> bool:
+    """
+    根据刚写入CSV的数据生成列式副本
+
+    Args:
+        df: 写入CSV的DataFrame（字符串或数值类型均可）
+        etf_file: 对应的CSV路径
+
+    Returns:
+        是否生成成功（缺少标准字段时跳过）
+    """
+    if df.empty or any(field not in df.columns for field in [CODE_FIELD, DATE_FIELD] + VALUE_FIELDS):
+        return False
+
+    dates = pd.to_numeric(df[DATE_FIELD], errors='coerce')
+    if dates.isna().any():
+        return False
+
+    # 日期须为整数、数值字段不能是文本，否则无法还原为与CSV读取相同的类型，由读取方回退CSV
+    dtypes = {field: _csv_dtype(df[field]) for field in [CODE_FIELD, DATE_FIELD] + VALUE_FIELDS}
+    if dtypes[DATE_FIELD] != 'int64' or any(dtypes[field] == TEXT_DTYPE for field in VALUE_FIELDS):
+        return False
+    if df[CODE_FIELD].nunique() != 1:
+        return False
+
+    header = {
+        'version': COLUMNAR_VERSION,
+        'code': str(df[CODE_FIELD].iloc[0]).strip(),
+        'rows': len(df),
+        'fields': VALUE_FIELDS,
+        'dtypes': dtypes
+    }
+    chunks = [json.dumps(header, ensure_ascii=False).encode('utf-8') + b'\n',
+              dates.to_numpy(dtype='<i4').tobytes()]
+    for field in VALUE_FIELDS:
+        chunks.append(pd.to_numeric(df[field], errors='coerce').to_numpy(dtype='<f8').tobytes())
+
+    columnar_path = get_columnar_path(etf_file)
+    columnar_path.parent.mkdir(parents=True, exist_ok=True)
+
+    # 先写临时文件再替换，避免中断时留下损坏的副本
+    temp_path = columnar_path.with_name(f"{columnar_path.name}.{os.getpid()}.tmp")
+    with open(temp_path, 'wb') as f:
+        f.write(b''.join(chunks))
+    os.replace(temp_path, columnar_path)
+    return True
+
+
+def is_columnar_fresh(etf_file: PathLike) -> bool:
+    """列式副本是否存在且不比CSV旧（追加模式下存在未压实尾段时视为过期）"""
+    etf_file = Path(etf_file)
+    columnar_path = get_columnar_path(etf_file)
+    if not columnar_path.exists() or not etf_file.exists() or has_tail(etf_file):
+        return False
+    return columnar_path.stat().st_mtime_ns >= etf_file.stat().st_mtime_ns
+
+
+def read_columnar(etf_file: PathLike) -> Optional[pd.DataFrame]:
+    """
+    读取列式副本
+
+    Args:
+        etf_file: 对应的CSV路径
+
+    Returns:
+        与 pd.read_csv 列顺序一致的DataFrame，副本缺失或过期时返回None
+    """
+    if not is_columnar_fresh(etf_file):
+        return None
+
+    columnar_path = get_columnar_path(etf_file)
+    buffer = bytearray(columnar_path.stat().st_size)  # 可写缓冲区，返回的DataFrame可原地修改
+    with open(columnar_path, 'rb') as f:
+        f.readinto(buffer)
+
+    header_end = buffer.index(b'\n')
+    header = json.loads(buffer[:header_end].decode('utf-8'))
+    if header.get('version') != COLUMNAR_VERSION:
+        return None
+    rows = header['rows']
+    offset = header_end + 1
+
+    dates = np.frombuffer(buffer, dtype='<i4', count=rows, offset=offset)
+    values = np.frombuffer(buffer, dtype='<f8', count=rows * len(header['fields']), offset=offset + 4 * rows)
+    values = values.reshape(len(header['fields']), rows)
+
+    dtypes = header['dtypes']
+    code = header['code']
+    if dtypes[CODE_FIELD] == 'int64':
+        codes = np.full(rows, int(code), dtype='int64')
+    else:
+        codes = pd.array(np.full(rows, code, dtype=object), dtype=dtypes[CODE_FIELD])
+    columns = {CODE_FIELD: codes, DATE_FIELD: dates.astype('int64')}
+    for field, column in zip(header['fields'], values):
+        columns[field] = column.astype('int64') if dtypes[field] == 'int64' else column
+    return pd.DataFrame(columns, copy=False)
+
+
+def read_etf_frame(etf_file: PathLike) -> pd.DataFrame:
+    """
+    读取ETF数据：优先使用列式副本，否则回退到CSV（包含追加模式下的尾段）
+
+    Args:
+        etf_file: CSV路径
+
+    Returns:
+        DataFrame
+    """
+    df = read_columnar(etf_file)
+    if df is not None:
+        return df
+    return read_etf_csv(etf_file, encoding='utf-8')
+
+
+def load_category(category_dir: PathLike, codes: Optional[List[str]] = None) -> Dict[str, pd.DataFrame]:
+    """
+    批量读取一个复权目录下的ETF数据
+
+    Args:
+        category_dir: 复权目录
+        codes: ETF代码列表（文件名，不含.csv），None表示全部
+
+    Returns:
+        {代码: DataFrame}
+    """
+    category_dir = Path(category_dir)
+    if codes is None:
+        codes = sorted(f.stem for f in category_dir.glob("*.csv"))
+
+    result = {}
+    for code in codes:
+        etf_file = category_dir / f"{code}.csv"
+        if etf_file.exists():
+            result[code] = read_etf_frame(etf_file)
+    return result
+
+
+def refresh_columnar(etf_file: PathLike) -> bool:
+    """
+    从CSV重新生成列式副本（CSV被其他流程改写后调用）
+
+    Args:
+        etf_file: CSV路径
+
+    Returns:
+        是否生成成功（存在未压实尾段时跳过，读取方会回退到CSV）
+    """
+    if has_tail(etf_file) or not Path(etf_file).exists():
+        return False
+    return write_columnar(pd.read_csv(etf_file, encoding='utf-8', dtype=str), etf_file)
+
+
+def build_columnar_directory(category_dir: PathLike, only_stale: bool = True) -> int:
+    """
+    为目录下的CSV生成列式副本（用于已有数据的迁移、压实或合并之后的补齐）
+
+    Args:
+        category_dir: 复权目录
+        only_stale: 只处理缺失、过期或旧格式版本的副本
+
+    Returns:
+        生成的副本数
+    """
+    built = 0
+    for etf_file in sorted(Path(category_dir).glob("*.csv")):
+        if only_stale and is_columnar_fresh(etf_file) and _read_version(get_columnar_path(etf_file)) == COLUMNAR_VERSION:
+            continue
+        try:
+            if refresh_columnar(etf_file):
+                built += 1
+        except Exception as e:
+            print(f"⚠️ 生成列式副本失败 {etf_file.name}: {e}")
+    return built
+
+
+if __name__ == "__main__":
+    # 为指定复权目录补齐列式副本: python config/columnar_store.py <复权目录> [...]
+    if len(sys.argv) < 2:
+        print("用法: python config/columnar_store.py <复权目录> [<复权目录> ...]")
+        sys.exit(1)
+
+    for directory in sys.argv[1:]:
+        count = build_columnar_directory(directory)
+        print(f"✓ {directory}: 生成 {count} 个列式副本")
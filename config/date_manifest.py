@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+已处理日期清单模块
+由日更处理脚本维护，记录每个已应用日期的源文件校验值和行数，
+缺失检测只需查表，不必再打开样本ETF文件逐行查找日期
+"""
+
+import os
+import json
+import hashlib
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+from pathlib import Path
+
+try:
+    from config.etf_store import read_etf_csv
+except ImportError:
+    from etf_store import read_etf_csv  # config目录已在sys.path中
+
+MANIFEST_FILE_NAME = "processed_dates.json"
+
+
+def calculate_md5(file_path: str) -> str:
+    """计算文件的MD5值（与 HashManager 的算法一致）"""
+    hash_md5 = hashlib.md5()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            hash_md5.update(chunk)
+    return hash_md5.hexdigest()
+
+
+class DateManifest:
+    """已处理日期清单"""
+
+    def __init__(self, base_dir: str):
+        """
+        初始化日期清单
+
+        Args:
+            base_dir: 日更输出目录（三个复权目录所在目录），清单文件保存在该目录下
+        """
+        self.base_dir = Path(base_dir)
+        self.manifest_path = self.base_dir / MANIFEST_FILE_NAME
+        self.dates = self._load_manifest()
+
+    def _load_manifest(self) -> Dict[str, Dict]:
+        """加载清单文件"""
+        if self.manifest_path.exists():
+            try:
+                with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                    return json.load(f).get("dates", {})
+            except (json.JSONDecodeError, IOError) as e:
+                print(f"警告：无法加载日期清单 {self.manifest_path}: {e}")
+        return {}
+
+    def save(self):
+        """保存清单文件（临时文件+替换）"""
+        data = {
+            "dates": dict(sorted(self.dates.items())),
+            "last_update": datetime.now().isoformat()
+        }
+        temp_path = self.manifest_path.with_name(self.manifest_path.name + '.tmp')
+        try:
+            self.base_dir.mkdir(parents=True, exist_ok=True)
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(temp_path, self.manifest_path)
+        except IOError as e:
+            print(f"错误：无法保存日期清单 {self.manifest_path}: {e}")
+
+    def is_empty(self) -> bool:
+        """清单是否为空（尚未由处理脚本维护过）"""
+        return not self.dates
+
+    def is_applied(self, date_str: str) -> bool:
+        """
+        检查日期是否已应用
+
+        Args:
+            date_str: 日期（YYYYMMDD），也可传入 YYYYMMDD.csv 文件名
+        """
+        return date_str[:8] in self.dates
+
+    def applied_dates(self) -> Set[str]:
+        """获取所有已应用日期"""
+        return set(self.dates)
+
+    def get_checksum(self, date_str: str) -> Optional[str]:
+        """获取已应用日期的源文件MD5"""
+        return self.dates.get(date_str[:8], {}).get("md5")
+
+    def record(self, date_str: str, source_file: str, md5: Optional[str], rows: int, etfs: int):
+        """
+        记录一个已应用的日期（需调用 save 写入磁盘）
+
+        Args:
+            date_str: 日期（YYYYMMDD）
+            source_file: 源文件名
+            md5: 源文件MD5（内存数据为None）
+            rows: 该日期写入每个复权目录的行数
+            etfs: 涉及的ETF数量
+        """
+        self.dates[date_str[:8]] = {
+            "file": source_file,
+            "md5": md5,
+            "rows": int(rows),
+            "etfs": int(etfs),
+            "applied_at": datetime.now().isoformat(timespec='seconds')
+        }
+
+    def reset(self):
+        """清空清单（全量重建前调用）"""
+        self.dates = {}
+
+    def scan_output_dates(self, category: str) -> Counter:
+        """
+        统计复权目录中各日期的实际行数（包含追加模式下的尾段）
+
+        Args:
+            category: 复权目录名
+
+        Returns:
+            Counter({日期: 行数})
+        """
+        counts = Counter()
+        category_dir = self.base_dir / category
+        if not category_dir.is_dir():
+            return counts
+
+        for etf_file in category_dir.glob("*.csv"):
+            try:
+                dates = read_etf_csv(etf_file, encoding='utf-8', usecols=['日期'], dtype=str)['日期']
+            except Exception as e:
+                print(f"⚠️ 读取失败 {category}/{etf_file.name}: {e}")
+                continue
+            counts.update(dates.tolist())
+        return counts
+
+    def verify(self, categories: List[str], fix: bool = False) -> Dict:
+        """
+        将清单与实际输出文件交叉核对
+
+        Args:
+            categories: 需要核对的复权目录名列表
+            fix: 是否按实际文件修正清单：删除文件中缺失或行数不一致的日期（下次缺失检测时重新处理），
+                 补录三个复权目录行数一致但清单未记录的日期
+
+        Returns:
+            {
+                'missing_in_files': 清单记录但输出文件中没有的日期,
+                'missing_in_manifest': 输出文件中有但清单未记录的日期,
+                'row_mismatch': {日期: {'expected': 清单行数, 'actual': {复权目录: 实际行数}}},
+                'ok': 是否完全一致
+            }
+        """
+        recorded = self.applied_dates()
+        per_category = {category: self.scan_output_dates(category) for category in categories}
+
+        found = set()
+        for counts in per_category.values():
+            found.update(counts)
+
+        row_mismatch = {}
+        for date_str in sorted(recorded & found):
+            expected = self.dates[date_str].get("rows")
+            actual = {category: counts.get(date_str, 0) for category, counts in per_category.items()}
+            if any(rows != expected for rows in actual.values()):
+                row_mismatch[date_str] = {'expected': expected, 'actual': actual}
+
+        report = {
+            'missing_in_files': sorted(recorded - found),
+            'missing_in_manifest': sorted(found - recorded),
+            'row_mismatch': row_mismatch,
+        }
+        report['ok'] = not any(report.values())
+
+        if fix and not report['ok']:
+            for date_str in report['missing_in_files'] + list(row_mismatch):
+                del self.dates[date_str]
+            for date_str in report['missing_in_manifest']:
+                row_counts = {counts.get(date_str, 0) for counts in per_category.values()}
+                if len(row_counts) == 1:
+                    # 每个ETF每天一行，行数即ETF数量
+                    rows = row_counts.pop()
+                    self.record(date_str, f"{date_str}.csv", None, rows, rows)
+            self.save()
+
+        return report
+
+    def print_verify_report(self, report: Dict):
+        """打印核对结果"""
+        print(f"\n📋 日期清单核对: {self.manifest_path}")
+        print(f"   清单日期数: {len(self.dates)}")
+        if report['ok']:
+            print("✅ 清单与输出文件一致")
+            return
+
+        if report['missing_in_files']:
+            print(f"❌ 清单记录但文件中缺失 {len(report['missing_in_files'])} 个日期: "
+                  f"{', '.join(report['missing_in_files'][:10])}")
+        if report['missing_in_manifest']:
+            print(f"⚠️ 文件中存在但清单未记录 {len(report['missing_in_manifest'])} 个日期: "
+                  f"{', '.join(report['missing_in_manifest'][:10])}")
+        for date_str, mismatch in list(report['row_mismatch'].items())[:10]:
+            print(f"⚠️ {date_str} 行数不一致: 清单 {mismatch['expected']}，实际 {mismatch['actual']}")
@@ -0,0 +1,583 @@
+#!/usr/bin/env python3
+"""
+摘要索引模块
+为数据目录（日更、周更）维护按 (复权目录, ETF, 月份) 的数据摘要，并逐级汇总到ETF和复权目录：
+1. 每行取日期和六个关键字段（数值转为 float32）计算64位行哈希，行哈希按 uint64 回绕相加得到月摘要，
+   月摘要相加得到ETF摘要，ETF摘要相加得到目录摘要；摘要一致即各行的 float32 值一致（相对误差在1e-7内）
+2. 最近 day_months 个月另存逐日行哈希，用于日期区间边缘的月份和逐日定位差异
+3. 索引作为变更清单的消费者（digest_index）增量维护：写入按代码数据的流程发布清单后调用 sync，
+   只重读变更ETF从最早变更月份开始的开头几行；文件签名（大小、mtime）与记录不一致的ETF整体重建
+4. 比较两个目录时自上而下比较摘要，只深入摘要不一致的ETF和月份，返回需要逐行核对的日期和月份
+索引保存在数据目录的 digest_index.db（SQLite，WAL 模式）
+"""
+
+import io
+import json
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+try:
+    from config.change_manifest import ChangeLog, files_signature
+    from config.columnar_store import read_etf_frame
+    from config.etf_store import get_tail_path, has_tail, read_lines_since
+except ImportError:
+    # config目录已在sys.path中
+    from change_manifest import ChangeLog, files_signature
+    from columnar_store import read_etf_frame
+    from etf_store import get_tail_path, has_tail, read_lines_since
+
+DIGEST_DB_NAME = "digest_index.db"
+CONSUMER_NAME = "digest_index"  # 变更清单的消费者名称
+DEFAULT_CATEGORIES = ["0_ETF日K(前复权)", "0_ETF日K(后复权)", "0_ETF日K(除权)"]
+DATE_FIELD = '日期'
+DIGEST_FIELDS = ['开盘价', '最高价', '最低价', '收盘价', '成交量(手数)', '成交额(千元)']
+DEFAULT_DAY_MONTHS = 3  # 保存逐日行哈希的最近月数
+BUSY_TIMEOUT_SECONDS = 30  # 其他进程写入时的等待时间
+DIGEST_MASK = (1 << 64) - 1
+
+PathLike = Union[str, Path]
+
+
+def get_digest_settings() -> Tuple[bool, int]:
+    """
+    从 config/config.json 的 digest_index 配置读取设置
+
+    Returns:
+        (是否启用, 保存逐日行哈希的月数)
+    """
+    config_path = Path(__file__).parent / "config.json"
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            digest_config = json.load(f).get('digest_index', {})
+    except (IOError, json.JSONDecodeError):
+        digest_config = {}
+    return bool(digest_config.get('enabled', False)), max(1, int(digest_config.get('day_months', DEFAULT_DAY_MONTHS)))
+
+
+def _signed(value: int) -> int:
+    """uint64 摘要转为 SQLite 可保存的 int64"""
+    value &= DIGEST_MASK
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def _combine(values: Iterable[int]) -> int:
+    """摘要相加（模 2^64）"""
+    return sum(values) & DIGEST_MASK
+
+
+def _month_start(month: int) -> int:
+    """月份 YYYYMM 之前的日期下界 YYYYMM00（不早于该月任何日期）"""
+    return month * 100
+
+
+def _month_end(month: int) -> int:
+    """月份 YYYYMM 的日期上界 YYYYMM31"""
+    return month * 100 + 31
+
+
+def horizon_month(day_months: int) -> int:
+    """保存逐日行哈希的最早月份 YYYYMM（含当前月共 day_months 个月）"""
+    today = datetime.now()
+    index = today.year * 12 + today.month - 1 - (day_months - 1)
+    return (index // 12) * 100 + index % 12 + 1
+
+
+def hash_rows(frame: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    计算每行的日期和64位行哈希（日期 + 关键字段的 float32 值，与文本格式无关）
+
+    Args:
+        frame: 按代码数据（字符串或数值类型均可）
+
+    Returns:
+        (int64 日期数组, uint64 行哈希数组)，日期无法解析的行忽略
+    """
+    dates = pd.to_numeric(frame[DATE_FIELD], errors='coerce')
+    valid = dates.notna().to_numpy()
+    canonical = pd.DataFrame({DATE_FIELD: dates[valid].to_numpy(dtype='int64')})
+    for field in DIGEST_FIELDS:
+        if field in frame.columns:
+            values = pd.to_numeric(frame[field], errors='coerce').to_numpy(dtype='float64')[valid]
+        else:
+            values = np.full(int(valid.sum()), np.nan)
+        canonical[field] = values.astype('float32')
+    hashes = pd.util.hash_pandas_object(canonical, index=False).to_numpy(dtype='uint64')
+    return canonical[DATE_FIELD].to_numpy(), hashes
+
+
+def _month_digests(dates: np.ndarray, hashes: np.ndarray) -> List[Tuple[int, int, int]]:
+    """按月汇总行哈希，返回 [(月份, 摘要, 行数)]"""
+    if dates.size == 0:
+        return []
+    months = dates // 100
+    order = np.argsort(months, kind='stable')
+    months, hashes = months[order], hashes[order]
+    starts = np.flatnonzero(np.r_[True, months[1:] != months[:-1]])
+    sums = np.add.reduceat(hashes, starts)  # uint64 加法自动回绕
+    counts = np.diff(np.r_[starts, months.size])
+    return [(int(month), int(digest), int(count)) for month, digest, count in zip(months[starts], sums, counts)]
+
+
+class DigestIndex:
+    """数据目录的摘要索引"""
+
+    def __init__(self, base_dir: PathLike, day_months: int = None):
+        """
+        初始化摘要索引
+
+        Args:
+            base_dir: 数据目录（三个复权目录所在目录），索引保存在该目录的 digest_index.db
+            day_months: 保存逐日行哈希的月数，None时取配置
+        """
+        if day_months is None:
+            day_months = get_digest_settings()[1]
+        self.base_dir = Path(base_dir)
+        self.db_path = self.base_dir / DIGEST_DB_NAME
+        self.change_log = ChangeLog(self.base_dir)
+
+        self.base_dir.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path), timeout=BUSY_TIMEOUT_SECONDS)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS days (
+                    category TEXT NOT NULL, code TEXT NOT NULL, date INTEGER NOT NULL, hash INTEGER NOT NULL,
+                    PRIMARY KEY (category, code, date)
+                ) WITHOUT ROWID
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS months (
+                    category TEXT NOT NULL, code TEXT NOT NULL, month INTEGER NOT NULL,
+                    digest INTEGER NOT NULL, rows INTEGER NOT NULL,
+                    PRIMARY KEY (category, code, month)
+                ) WITHOUT ROWID
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS etfs (
+                    category TEXT NOT NULL, code TEXT NOT NULL, digest INTEGER NOT NULL, rows INTEGER NOT NULL,
+                    first_date INTEGER NOT NULL, last_date INTEGER NOT NULL, signature TEXT NOT NULL,
+                    PRIMARY KEY (category, code)
+                ) WITHOUT ROWID
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS categories (
+                    category TEXT PRIMARY KEY, digest INTEGER NOT NULL, rows INTEGER NOT NULL
+                )
+            """)
+            self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+        # 逐日行哈希完整的最早月份只前进不后退：调大 day_months 后，更早月份的逐日哈希要等整体重建才补齐
+        stored = self.conn.execute("SELECT value FROM meta WHERE key = 'day_horizon'").fetchone()
+        self.day_horizon = max(horizon_month(day_months), stored[0] if stored else 0)
+
+    def close(self):
+        """关闭连接"""
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    # ---------- 读取 ----------
+
+    def category_summary(self, category: str) -> Optional[Tuple[int, int]]:
+        """复权目录的 (摘要, 行数)，未建立索引时返回 None"""
+        row = self.conn.execute("SELECT digest, rows FROM categories WHERE category = ?", (category,)).fetchone()
+        return (row[0] & DIGEST_MASK, row[1]) if row else None
+
+    def etf_summaries(self, category: str) -> Dict[str, Tuple[int, int, int, int]]:
+        """复权目录中各ETF的 {代码: (摘要, 行数, 最早日期, 最新日期)}"""
+        rows = self.conn.execute(
+            "SELECT code, digest, rows, first_date, last_date FROM etfs WHERE category = ?", (category,))
+        return {code: (digest & DIGEST_MASK, count, first, last) for code, digest, count, first, last in rows}
+
+    def signatures(self, category: str) -> Dict[str, str]:
+        """复权目录中各ETF建立索引时的文件签名"""
+        return dict(self.conn.execute("SELECT code, signature FROM etfs WHERE category = ?", (category,)))
+
+    def month_digests(self, category: str, first_month: int, last_month: int) -> Dict[str, Dict[int, Tuple[int, int]]]:
+        """月份范围内各ETF的 {代码: {月份: (摘要, 行数)}}"""
+        result = {}
+        rows = self.conn.execute(
+            "SELECT code, month, digest, rows FROM months WHERE category = ? AND month BETWEEN ? AND ?",
+            (category, first_month, last_month))
+        for code, month, digest, count in rows:
+            result.setdefault(code, {})[month] = (digest & DIGEST_MASK, count)
+        return result
+
+    def day_hashes(self, category: str, start: int, end: int) -> Dict[str, Dict[int, int]]:
+        """日期范围内各ETF的 {代码: {日期: 行哈希}}（只包含逐日哈希保存期内的日期）"""
+        result = {}
+        rows = self.conn.execute(
+            "SELECT code, date, hash FROM days WHERE category = ? AND date BETWEEN ? AND ?", (category, start, end))
+        for code, date, value in rows:
+            result.setdefault(code, {})[date] = value & DIGEST_MASK
+        return result
+
+    def latest_date(self, categories: List[str] = None) -> Optional[int]:
+        """索引中的最新日期"""
+        categories = categories or DEFAULT_CATEGORIES
+        placeholders = ','.join('?' * len(categories))
+        row = self.conn.execute(
+            f"SELECT MAX(last_date) FROM etfs WHERE category IN ({placeholders})", categories).fetchone()
+        return row[0] if row else None
+
+    # ---------- 维护 ----------
+
+    def _read_since(self, etf_file: Path, since: int) -> Optional[pd.DataFrame]:
+        """读取日期晚于 since 的行（只读文件开头几行），经典CSV不存在时返回 None"""
+        if not etf_file.exists():
+            return None
+        lines = read_lines_since(etf_file, since + 1)
+        with open(etf_file, 'r', encoding='utf-8-sig') as f:
+            header = f.readline().strip()
+        if not lines:
+            return pd.DataFrame(columns=header.split(','))
+        return pd.read_csv(io.StringIO(header + '\n' + '\n'.join(lines)), dtype=str)
+
+    def _store_etf(self, category: str, code: str, dates: np.ndarray, hashes: np.ndarray,
+                   signature: str, since_month: int = None):
+        """
+        在一个事务中写入ETF的月摘要、逐日行哈希和汇总摘要
+
+        Args:
+            since_month: 只替换该月份及之后的数据，None表示替换全部
+        """
+        old = self.conn.execute("SELECT digest, rows, first_date FROM etfs WHERE category = ? AND code = ?",
+                                (category, code)).fetchone()
+        months = _month_digests(dates, hashes)
+        day_from = self.day_horizon if since_month is None else max(self.day_horizon, since_month)
+        day_mask = dates // 100 >= day_from
+        day_rows = [(category, code, int(date), _signed(int(value)))
+                    for date, value in zip(dates[day_mask], hashes[day_mask])]
+
+        with self.conn:
+            if since_month is None:
+                self.conn.execute("DELETE FROM months WHERE category = ? AND code = ?", (category, code))
+                self.conn.execute("DELETE FROM days WHERE category = ? AND code = ?", (category, code))
+            else:
+                self.conn.execute("DELETE FROM months WHERE category = ? AND code = ? AND month >= ?",
+                                  (category, code, since_month))
+                self.conn.execute("DELETE FROM days WHERE category = ? AND code = ? AND date > ?",
+                                  (category, code, _month_start(since_month)))
+            self.conn.executemany("INSERT OR REPLACE INTO months (category, code, month, digest, rows) "
+                                  "VALUES (?, ?, ?, ?, ?)",
+                                  [(category, code, month, _signed(digest), count) for month, digest, count in months])
+            self.conn.executemany("INSERT OR REPLACE INTO days (category, code, date, hash) VALUES (?, ?, ?, ?)",
+                                  day_rows)
+
+            summary = self.conn.execute(
+                "SELECT digest, rows, month FROM months WHERE category = ? AND code = ? ORDER BY month",
+                (category, code)).fetchall()
+            old_digest, old_rows = (old[0] & DIGEST_MASK, old[1]) if old else (0, 0)
+            if summary:
+                digest = _combine(row[0] for row in summary)
+                rows = sum(row[1] for row in summary)
+                first_date = int(dates.min()) if since_month is None or old is None else old[2]
+                last_date = int(dates.max()) if dates.size else _month_end(summary[-1][2])
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO etfs (category, code, digest, rows, first_date, last_date, signature) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (category, code, _signed(digest), rows, first_date, last_date, signature))
+            else:
+                digest, rows = 0, 0
+                self.conn.execute("DELETE FROM etfs WHERE category = ? AND code = ?", (category, code))
+            self._adjust_category(category, digest - old_digest, rows - old_rows)
+
+    def _adjust_category(self, category: str, digest_delta: int, rows_delta: int):
+        """按ETF摘要的变化更新目录摘要（在调用方的事务中）"""
+        row = self.conn.execute("SELECT digest, rows FROM categories WHERE category = ?", (category,)).fetchone()
+        digest, rows = (row[0], row[1]) if row else (0, 0)
+        self.conn.execute("INSERT OR REPLACE INTO categories (category, digest, rows) VALUES (?, ?, ?)",
+                          (category, _signed(digest + digest_delta), rows + rows_delta))
+
+    def remove_etf(self, category: str, code: str):
+        """删除ETF的索引（文件已不存在）"""
+        self._store_etf(category, code, np.empty(0, dtype='int64'), np.empty(0, dtype='uint64'), '')
+
+    def index_etf(self, category: str, code: str, since: int = None) -> bool:
+        """
+        为一个ETF文件建立或更新索引
+
+        Args:
+            category: 复权目录名
+            code: ETF代码
+            since: 最早变更日期 YYYYMMDD，只重读该日期所在月份及之后的行；None或尚未建立索引时读取整个文件
+
+        Returns:
+            文件是否存在
+        """
+        etf_file = self.base_dir / category / f"{code}.csv"
+        # 读取前取签名：读取期间文件被改写时，下次核对会发现签名不一致并重建
+        signature = files_signature([etf_file, get_tail_path(etf_file)])
+        if not etf_file.exists() and not has_tail(etf_file):
+            self.remove_etf(category, code)
+            return False
+
+        if since is not None and self.conn.execute(
+                "SELECT 1 FROM etfs WHERE category = ? AND code = ?", (category, code)).fetchone():
+            since_month = since // 100
+            frame = self._read_since(etf_file, _month_start(since_month))
+            if frame is not None and not frame.empty:
+                dates, hashes = hash_rows(frame)
+                if dates.size:
+                    self._store_etf(category, code, dates, hashes, signature, since_month)
+                    return True
+
+        dates, hashes = hash_rows(read_etf_frame(etf_file))
+        self._store_etf(category, code, dates, hashes, signature)
+        return True
+
+    def rebuild(self, categories: List[str] = None) -> int:
+        """
+        重建整个索引
+
+        Returns:
+            建立索引的ETF文件数
+        """
+        categories = categories or DEFAULT_CATEGORIES
+        with self.conn:
+            for table in ('days', 'months', 'etfs', 'categories'):
+                self.conn.execute(f"DELETE FROM {table}")
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('day_horizon', ?)",
+                              (self.day_horizon,))
+
+        indexed = 0
+        for category in categories:
+            category_dir = self.base_dir / category
+            if not category_dir.is_dir():
+                continue
+            codes = {path.stem for path in category_dir.glob("*.csv")} | self._tail_codes(category_dir)
+            for code in sorted(codes):
+                try:
+                    indexed += self.index_etf(category, code)
+                except Exception as e:
+                    print(f"⚠️ 摘要索引失败 {category}/{code}.csv: {e}")
+        return indexed
+
+    @staticmethod
+    def _tail_codes(category_dir: Path) -> Set[str]:
+        """只有尾段（追加模式下的新上市ETF）的代码"""
+        tail_dir = get_tail_path(category_dir / "x.csv").parent
+        return {path.stem for path in tail_dir.glob("*.csv")} if tail_dir.is_dir() else set()
+
+    def verify(self, categories: List[str] = None) -> Dict[str, int]:
+        """
+        按文件签名核对索引：签名不一致（未经变更清单改写）的ETF整体重建，已删除的文件移出索引
+
+        Returns:
+            {'reindexed': 重建的ETF数, 'removed': 移除的ETF数}
+        """
+        stats = {'reindexed': 0, 'removed': 0}
+        for category in categories or DEFAULT_CATEGORIES:
+            category_dir = self.base_dir / category
+            recorded = self.signatures(category)
+            codes = set(recorded)
+            if category_dir.is_dir():
+                codes |= {path.stem for path in category_dir.glob("*.csv")} | self._tail_codes(category_dir)
+            for code in sorted(codes):
+                etf_file = category_dir / f"{code}.csv"
+                if recorded.get(code) == files_signature([etf_file, get_tail_path(etf_file)]):
+                    continue
+                try:
+                    if self.index_etf(category, code):
+                        stats['reindexed'] += 1
+                    else:
+                        stats['removed'] += 1
+                except Exception as e:
+                    print(f"⚠️ 摘要索引失败 {category}/{code}.csv: {e}")
+        return stats
+
+    def sync(self, categories: List[str] = None, verify: bool = False) -> Dict[str, int]:
+        """
+        按变更清单增量更新索引
+
+        Args:
+            categories: 复权目录名列表
+            verify: 更新后再按文件签名核对全部ETF（比较前调用，覆盖未发布清单的改写）
+
+        Returns:
+            {'updated': 增量更新的ETF文件数, 'rebuilt': 整体重建时建立索引的文件数, 'reindexed': ..., 'removed': ...}
+        """
+        categories = categories or DEFAULT_CATEGORIES
+        stats = {'updated': 0, 'rebuilt': 0, 'reindexed': 0, 'removed': 0}
+        # 处理开始前读取，处理期间新发布的清单留到下次
+        changes = self.change_log.pending(CONSUMER_NAME)
+
+        if changes.full_scan:
+            stats['rebuilt'] = self.rebuild(categories)
+        else:
+            for category in categories:
+                for code in sorted(changes.codes(category)):
+                    try:
+                        self.index_etf(category, code, since=changes.dates(category, code)[0])
+                        stats['updated'] += 1
+                    except Exception as e:
+                        print(f"⚠️ 摘要索引失败 {category}/{code}.csv: {e}")
+
+        if verify:
+            stats.update(self.verify(categories))
+        self.prune()
+        self.change_log.acknowledge(CONSUMER_NAME, changes)
+        return stats
+
+    def prune(self):
+        """删除保存期之前的逐日行哈希"""
+        with self.conn:
+            self.conn.execute("DELETE FROM days WHERE date < ?", (_month_start(self.day_horizon),))
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('day_horizon', ?)",
+                              (self.day_horizon,))
+
+
+def sync_digest_index(base_dir: PathLike, categories: List[str] = None) -> Optional[Dict[str, int]]:
+    """
+    写入按代码数据并发布变更清单后调用：未启用摘要索引时跳过，失败只打印警告（不影响数据写入）
+
+    Returns:
+        sync() 的统计，跳过或失败时为 None
+    """
+    if not get_digest_settings()[0]:
+        return None
+    index = None
+    try:
+        index = DigestIndex(base_dir)
+        return index.sync(categories)
+    except (sqlite3.Error, OSError) as e:
+        print(f"⚠️ 摘要索引更新失败 {base_dir}: {e}")
+        return None
+    finally:
+        if index is not None:
+            index.close()
+
+
+def diff_indexes(left: DigestIndex, right: DigestIndex, categories: List[str] = None,
+                 start: int = None, end: int = None) -> Dict:
+    """
+    自上而下比较两个目录的摘要：复权目录 → ETF → 月份 → 日期，只深入摘要不一致的部分
+    与逐行对账一致，以左侧的 (ETF, 日期) 为准：右侧缺少的日期（包括右侧完全没有的ETF）同样记为不一致，
+    只有右侧有的日期不比较
+
+    Args:
+        left, right: 两个目录的摘要索引（left 为基准，如周更）
+        categories: 复权目录名列表
+        start, end: 日期区间 YYYYMMDD，None表示不限
+
+    Returns:
+        {
+            'dates': {(复权目录, 代码): 逐日摘要不一致的日期集合},
+            'months': {(复权目录, 代码): 没有逐日摘要、需要逐行核对的月份集合},
+            'matched': {(复权目录, 代码): 摘要一致、无需读取文件的行数},
+            'etfs': 左侧在区间内有数据的ETF代码集合,
+            'skipped_categories': 目录摘要一致直接跳过的复权目录
+        }
+    """
+    categories = categories or DEFAULT_CATEGORIES
+    lower, upper = start or 0, end or 99999999
+    day_horizon = max(left.day_horizon, right.day_horizon)
+    result = {'dates': {}, 'months': {}, 'matched': {}, 'etfs': set(), 'skipped_categories': []}
+
+    for category in categories:
+        left_etfs, right_etfs = left.etf_summaries(category), right.etf_summaries(category)
+        if start is None and end is None and left_etfs:
+            left_summary, right_summary = left.category_summary(category), right.category_summary(category)
+            if left_summary == right_summary and set(left_etfs) == set(right_etfs):
+                result['skipped_categories'].append(category)
+                result['etfs'].update(left_etfs)
+                result['matched'].update({(category, code): summary[1] for code, summary in left_etfs.items()})
+                continue
+
+        # ETF层：区间收窄到左侧有数据的日期范围，两边整段历史相同且都在区间内时直接比较ETF摘要
+        windows = {}
+        for code in sorted(left_etfs):
+            left_digest, left_rows, left_first, left_last = left_etfs[code]
+            lo = max(lower, left_first)
+            hi = min(upper, left_last)
+            if lo > hi:
+                continue
+            result['etfs'].add(code)
+            if code not in right_etfs:
+                windows[code] = (lo, hi)  # 右侧没有该ETF：区间内左侧的日期全部需要核对
+                continue
+            right_digest, right_rows, right_first, right_last = right_etfs[code]
+            whole = (left_first, left_last) == (right_first, right_last) == (lo, hi)
+            if whole and left_digest == right_digest:
+                result['matched'][(category, code)] = left_rows
+                continue
+            windows[code] = (lo, hi)
+        if not windows:
+            continue
+
+        # 月份层：完整落在区间内的月份比较月摘要，边缘月份、不一致和右侧缺少的月份深入到日期
+        first_month = min(lo for lo, _ in windows.values()) // 100
+        last_month = max(hi for _, hi in windows.values()) // 100
+        left_months = left.month_digests(category, first_month, last_month)
+        right_months = right.month_digests(category, first_month, last_month)
+        day_ranges = {}
+        for code, (lo, hi) in windows.items():
+            left_code, right_code = left_months.get(code, {}), right_months.get(code, {})
+            for month in sorted(left_code):
+                if not lo // 100 <= month <= hi // 100:
+                    continue
+                inside = lo <= _month_start(month) + 1 and _month_end(month) <= hi
+                if inside and left_code[month] == right_code.get(month):
+                    result['matched'][(category, code)] = result['matched'].get((category, code), 0) + left_code[month][1]
+                elif month >= day_horizon:
+                    day_ranges.setdefault(code, []).append((max(lo, _month_start(month)), min(hi, _month_end(month))))
+                else:
+                    result['months'].setdefault((category, code), set()).add(month)
+        if not day_ranges:
+            continue
+
+        # 日期层：比较左侧的日期，右侧缺少的日期记为不一致
+        first_day = min(lo for ranges in day_ranges.values() for lo, _ in ranges)
+        last_day = max(hi for ranges in day_ranges.values() for _, hi in ranges)
+        left_days = left.day_hashes(category, first_day, last_day)
+        right_days = right.day_hashes(category, first_day, last_day)
+        for code, ranges in day_ranges.items():
+            left_code, right_code = left_days.get(code, {}), right_days.get(code, {})
+            for date in left_code:
+                if not any(lo <= date <= hi for lo, hi in ranges):
+                    continue
+                if left_code[date] == right_code.get(date):
+                    result['matched'][(category, code)] = result['matched'].get((category, code), 0) + 1
+                else:
+                    result['dates'].setdefault((category, code), set()).add(date)
+
+    return result
+
+
+def main():
+    """命令行：更新目录的摘要索引；指定两个目录时比较两者的摘要"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='摘要索引')
+    parser.add_argument('base_dirs', nargs='+', help='数据目录（如 ETF周更 ETF日更），两个目录时以第一个为准比较摘要')
+    parser.add_argument('--start', type=int, help='比较的开始日期 YYYYMMDD')
+    parser.add_argument('--end', type=int, help='比较的结束日期 YYYYMMDD')
+    parser.add_argument('--rebuild', action='store_true', help='整体重建索引')
+    args = parser.parse_args()
+
+    indexes = [DigestIndex(base_dir) for base_dir in args.base_dirs[:2]]
+    try:
+        for index in indexes:
+            stats = {'rebuilt': index.rebuild()} if args.rebuild else index.sync(verify=True)
+            print(f"📋 {index.db_path}: {stats}")
+        if len(indexes) == 2:
+            diff = diff_indexes(indexes[0], indexes[1], start=args.start, end=args.end)
+            print(f"🔍 比较 {len(diff['etfs'])} 个ETF，摘要一致 {sum(diff['matched'].values())} 行，"
+                  f"跳过目录: {', '.join(diff['skipped_categories']) or '无'}")
+            for (category, code), dates in sorted(diff['dates'].items())[:20]:
+                print(f"  ⚠️ {category}/{code}: {', '.join(map(str, sorted(dates)))}")
+            for (category, code), months in sorted(diff['months'].items())[:20]:
+                print(f"  ❓ {category}/{code} 需逐行核对月份: {', '.join(map(str, sorted(months)))}")
+    finally:
+        for index in indexes:
+            index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+ETF按代码数据存储模块
+在经典CSV（日期降序、utf-8-sig）之外提供"追加尾段"存储模式：
+1. 日更只把新行追加到 {复权目录}/_tail/{代码}.csv，开销与新增行数成正比
+2. 读取方通过 read_etf_csv 兼容层获得与经典CSV完全一致的数据
+3. 尾段超过阈值或执行 compact 命令时，再压实回经典的日期降序CSV
+"""
+
+import io
+import json
+import os
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+
+import pandas as pd
+
+TAIL_DIR_NAME = "_tail"  # 尾段子目录名
+DEFAULT_COMPACT_ROWS = 60  # 尾段行数达到该值时自动压实
+KEY_FIELDS = ['代码', '日期']
+STORE_MODES = ['classic', 'append']
+
+PathLike = Union[str, Path]
+
+
+def get_store_settings() -> Tuple[str, int]:
+    """
+    从 config/config.json 的 daily_store 配置读取存储模式
+
+    Returns:
+        (存储模式, 自动压实行数)
+    """
+    config_path = Path(__file__).parent / "config.json"
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            store_config = json.load(f).get('daily_store', {})
+    except (IOError, json.JSONDecodeError):
+        store_config = {}
+
+    mode = store_config.get('mode', 'classic')
+    if mode not in STORE_MODES:
+        mode = 'classic'
+    return mode, int(store_config.get('compact_rows', DEFAULT_COMPACT_ROWS))
+
+
+def get_tail_path(etf_file: PathLike) -> Path:
+    """获取ETF文件对应的尾段文件路径"""
+    etf_file = Path(etf_file)
+    return etf_file.parent / TAIL_DIR_NAME / etf_file.name
+
+
+def has_tail(etf_file: PathLike) -> bool:
+    """检查ETF文件是否存在未压实的尾段"""
+    return get_tail_path(etf_file).exists()
+
+
+def get_etf_mtime(etf_file: PathLike) -> float:
+    """
+    ETF数据的修改时间（经典CSV与尾段中较新者），os.path.getmtime 的兼容替代
+    追加模式只写尾段、不改经典CSV的修改时间，按源文件时间判断缓存是否过期的读取方应使用本函数
+
+    Args:
+        etf_file: 经典CSV路径
+
+    Returns:
+        修改时间戳；经典CSV和尾段都不存在时抛出 FileNotFoundError（与 os.path.getmtime 一致）
+    """
+    etf_file = Path(etf_file)
+    tail_path = get_tail_path(etf_file)
+    if not tail_path.exists():
+        return os.path.getmtime(etf_file)
+    if not etf_file.exists():
+        return os.path.getmtime(tail_path)
+    return max(os.path.getmtime(etf_file), os.path.getmtime(tail_path))
+
+
+def merge_with_existing(existing_df: pd.DataFrame, new_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    将新数据合并到已有数据（经典模式的合并规则）
+
+    Args:
+        existing_df: 已有数据
+        new_df: 新数据（同一代码+日期以新数据为准）
+
+    Returns:
+        去重并按日期降序排列的字符串DataFrame
+    """
+    # 确保数据类型一致
+    new_df = new_df.astype(str)
+    existing_df = existing_df.astype(str)
+
+    # 合并数据并去重（按代码+日期组合去重，保留最新数据）
+    combined_df = pd.concat([existing_df, new_df], ignore_index=True)
+    combined_df = combined_df.drop_duplicates(subset=KEY_FIELDS, keep='last')
+
+    # 按日期排序（降序，最新日期在前）
+    combined_df['日期'] = combined_df['日期'].astype(str)
+    return combined_df.sort_values('日期', ascending=False)
+
+
+def write_csv_atomic(df: pd.DataFrame, etf_file: PathLike, encoding: str = 'utf-8-sig'):
+    """
+    原子写入CSV：先写同目录临时文件再替换，中断时不会留下写了一半的文件
+
+    Args:
+        df: 要写入的数据
+        etf_file: 目标CSV路径
+        encoding: 文件编码（经典CSV为 utf-8-sig）
+    """
+    etf_file = Path(etf_file)
+    # 临时文件名带进程号，多进程写不同文件时互不干扰
+    temp_file = etf_file.with_name(f"{etf_file.name}.{os.getpid()}.tmp")
+    try:
+        df.to_csv(temp_file, index=False, encoding=encoding)
+        os.replace(temp_file, etf_file)
+    except BaseException:
+        if temp_file.exists():
+            temp_file.unlink()
+        raise
+
+
+def write_bytes_atomic(data: bytes, etf_file: PathLike):
+    """
+    原子写入已编码的文件内容（规则同 write_csv_atomic）
+
+    Args:
+        data: 完整文件内容
+        etf_file: 目标路径
+    """
+    etf_file = Path(etf_file)
+    temp_file = etf_file.with_name(f"{etf_file.name}.{os.getpid()}.tmp")
+    try:
+        with open(temp_file, 'wb') as f:
+            f.write(data)
+        os.replace(temp_file, etf_file)
+    except BaseException:
+        if temp_file.exists():
+            temp_file.unlink()
+        raise
+
+
+def append_rows(etf_file: PathLike, new_df: pd.DataFrame) -> int:
+    """
+    将新行追加到尾段文件（不读取、不重写经典CSV）
+
+    Args:
+        etf_file: 经典CSV路径
+        new_df: 新数据
+
+    Returns:
+        追加后尾段的总行数
+    """
+    tail_path = get_tail_path(etf_file)
+    tail_path.parent.mkdir(parents=True, exist_ok=True)
+    exists = tail_path.exists()
+
+    # 与经典模式一致：写入前统一转成字符串
+    new_df.astype(str).to_csv(tail_path, mode='a', header=not exists, index=False, encoding='utf-8')
+
+    with open(tail_path, 'rb') as f:
+        return max(sum(1 for _ in f) - 1, 0)
+
+
+def _read_tail(tail_path: Path) -> pd.DataFrame:
+    """读取尾段（保留写入时的字符串原样，如 'nan'）"""
+    return pd.read_csv(tail_path, encoding='utf-8', dtype=str, keep_default_na=False)
+
+
+def read_merged_frame(etf_file: PathLike) -> Optional[pd.DataFrame]:
+    """
+    读取经典CSV与尾段合并后的字符串DataFrame
+
+    Args:
+        etf_file: 经典CSV路径
+
+    Returns:
+        与压实后经典CSV内容一致的DataFrame，文件都不存在时返回None
+    """
+    etf_file = Path(etf_file)
+    tail_path = get_tail_path(etf_file)
+
+    if not tail_path.exists():
+        if not etf_file.exists():
+            return None
+        return pd.read_csv(etf_file, encoding='utf-8', dtype=str)
+
+    tail_df = _read_tail(tail_path)
+    if etf_file.exists():
+        existing_df = pd.read_csv(etf_file, encoding='utf-8', dtype=str)
+        return merge_with_existing(existing_df, tail_df)
+
+    # 只有尾段（新上市ETF）：按经典重建规则去重排序
+    tail_df = tail_df.drop_duplicates(subset=KEY_FIELDS, keep='last')
+    return tail_df.sort_values('日期', ascending=False)
+
+
+def read_etf_csv(etf_file: PathLike, **read_csv_kwargs) -> pd.DataFrame:
+    """
+    pd.read_csv 的兼容替代
+    无尾段时直接读取经典CSV；有尾段时返回与压实后经典CSV解析结果一致的DataFrame
+
+    Args:
+        etf_file: 经典CSV路径
+        **read_csv_kwargs: 透传给 pd.read_csv 的参数
+
+    Returns:
+        DataFrame
+    """
+    if not has_tail(etf_file):
+        return pd.read_csv(etf_file, **read_csv_kwargs)
+
+    merged = read_merged_frame(etf_file)
+    buffer = io.StringIO()
+    merged.to_csv(buffer, index=False)
+    buffer.seek(0)
+
+    read_csv_kwargs.pop('encoding', None)
+    return pd.read_csv(buffer, **read_csv_kwargs)
+
+
+def read_latest_lines(etf_file: PathLike, n: int = 5) -> List[str]:
+    """
+    读取最新的n行数据文本（不含表头），用于快速检查日期是否已写入
+    尾段按追加顺序保存，最新数据在尾段末尾
+
+    Args:
+        etf_file: 经典CSV路径
+        n: 行数
+
+    Returns:
+        数据行文本列表（最新在前）
+    """
+    etf_file = Path(etf_file)
+    lines = []
+
+    tail_path = get_tail_path(etf_file)
+    if tail_path.exists():
+        with open(tail_path, 'r', encoding='utf-8') as f:
+            f.readline()  # 跳过表头
+            lines.extend(reversed([line.strip() for line in f if line.strip()]))
+
+    if len(lines) < n and etf_file.exists():
+        with open(etf_file, 'r', encoding='utf-8-sig') as f:
+            f.readline()  # 跳过表头
+            for _ in range(n - len(lines)):
+                line = f.readline().strip()
+                if not line:
+                    break
+                lines.append(line)
+
+    return lines[:n]
+
+
+def _line_date(line: str) -> Optional[int]:
+    """数据行文本中的日期（第二列），无法解析时返回 None"""
+    parts = line.split(',', 2)
+    try:
+        return int(parts[1])
+    except (IndexError, ValueError):
+        return None
+
+
+def read_lines_since(etf_file: PathLike, min_date: int) -> List[str]:
+    """
+    读取日期不早于 min_date 的数据行文本（不含表头，最新在前），用于只取最近一段数据
+    经典CSV按日期降序，读到更早的日期即停止；尾段中的行覆盖经典CSV中同日期的行
+
+    Args:
+        etf_file: 经典CSV路径
+        min_date: 最早日期 YYYYMMDD
+
+    Returns:
+        数据行文本列表（最新在前）
+    """
+    etf_file = Path(etf_file)
+    rows = {}
+
+    if etf_file.exists():
+        with open(etf_file, 'r', encoding='utf-8-sig') as f:
+            f.readline()  # 跳过表头
+            for line in f:
+                line = line.strip()
+                date = _line_date(line) if line else None
+                if date is None:
+                    continue
+                if date < min_date:
+                    break
+                rows.setdefault(date, line)
+
+    tail_path = get_tail_path(etf_file)
+    if tail_path.exists():
+        with open(tail_path, 'r', encoding='utf-8') as f:
+            f.readline()  # 跳过表头
+            for line in f:
+                line = line.strip()
+                date = _line_date(line) if line else None
+                if date is not None and date >= min_date:
+                    rows[date] = line  # 尾段按追加顺序，后写入的覆盖先写入的
+
+    return [rows[date] for date in sorted(rows, reverse=True)]
+
+
+def read_frame_since(etf_file: PathLike, min_date: int) -> pd.DataFrame:
+    """
+    读取日期不早于 min_date 的数据（只读经典CSV开头和尾段），列与 read_etf_csv 一致
+
+    Args:
+        etf_file: 经典CSV路径
+        min_date: 最早日期 YYYYMMDD
+
+    Returns:
+        DataFrame（最新在前），没有符合的行时为空
+    """
+    lines = read_lines_since(etf_file, min_date)
+    if not lines:
+        return pd.DataFrame()
+
+    etf_file = Path(etf_file)
+    header_file, encoding = (etf_file, 'utf-8-sig') if etf_file.exists() else (get_tail_path(etf_file), 'utf-8')
+    with open(header_file, 'r', encoding=encoding) as f:
+        header = f.readline().strip()
+    return pd.read_csv(io.StringIO("\n".join([header] + lines)))
+
+
+def compact_etf_file(etf_file: PathLike) -> bool:
+    """
+    将尾段压实回经典CSV（日期降序、utf-8-sig），并删除尾段
+
+    Args:
+        etf_file: 经典CSV路径
+
+    Returns:
+        是否执行了压实
+    """
+    etf_file = Path(etf_file)
+    tail_path = get_tail_path(etf_file)
+    if not tail_path.exists():
+        return False
+
+    write_csv_atomic(read_merged_frame(etf_file), etf_file)
+    tail_path.unlink()
+    return True
+
+
+def compact_directory(category_dir: PathLike) -> int:
+    """
+    压实目录下所有ETF的尾段
+
+    Args:
+        category_dir: 复权类型目录
+
+    Returns:
+        压实的文件数
+    """
+    tail_dir = Path(category_dir) / TAIL_DIR_NAME
+    if not tail_dir.is_dir():
+        return 0
+
+    compacted = 0
+    for tail_path in sorted(tail_dir.glob("*.csv")):
+        if compact_etf_file(Path(category_dir) / tail_path.name):
+            compacted += 1
+
+    if not any(tail_dir.iterdir()):
+        tail_dir.rmdir()
+
+    return compacted
+
+
+def remove_tail(etf_file: PathLike):
+    """删除尾段（全量重建后尾段内容已包含在经典CSV中）"""
+    tail_path = get_tail_path(etf_file)
+    if tail_path.exists():
+        tail_path.unlink()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+文件指纹服务
+1. 先比较 (大小, mtime_ns, inode)，与上次记录一致时直接复用已记录的MD5，不读取文件内容
+2. 不一致时才以大缓冲区重新计算内容MD5
+3. 指纹缓存和哈希记录保存在本地 SQLite（WAL 模式），日更、周更和数据库导入进程可同时读取，
+   写入按批在一个事务中提交
+"""
+
+import os
+import sqlite3
+import hashlib
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+from pathlib import Path
+
+FINGERPRINT_DB_NAME = "file_fingerprints.db"
+HASH_BUFFER_SIZE = 4 * 1024 * 1024  # 内容哈希的读取缓冲区
+FLUSH_BATCH_SIZE = 500  # 指纹缓存累计多少条提交一次
+BUSY_TIMEOUT_SECONDS = 30  # 其他进程写入时的等待时间
+RACY_WINDOW_NS = 2 * 10**9  # 刚修改的文件可能在同一时间刻度内再次改写，暂不缓存其指纹
+
+
+def calculate_md5(file_path: str, buffer_size: int = HASH_BUFFER_SIZE) -> str:
+    """以大缓冲区计算文件内容的MD5"""
+    hash_md5 = hashlib.md5()
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+    with open(file_path, "rb", buffering=0) as f:
+        while True:
+            size = f.readinto(view)
+            if not size:
+                break
+            hash_md5.update(view[:size])
+    return hash_md5.hexdigest()
+
+
+class FingerprintStore:
+    """文件指纹与哈希记录的SQLite存储"""
+
+    def __init__(self, db_path: str = None):
+        """
+        初始化指纹存储
+
+        Args:
+            db_path: SQLite文件路径，None时使用项目根目录的 config/file_fingerprints.db
+        """
+        if db_path is None:
+            db_path = Path(__file__).resolve().parent / FINGERPRINT_DB_NAME
+
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._fingerprints = None  # 首次使用时整表载入
+        self._pending = {}
+        self.stats = {"fast_path": 0, "hashed": 0}
+
+        self.conn = sqlite3.connect(str(self.db_path), timeout=BUSY_TIMEOUT_SECONDS, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS fingerprints (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    inode INTEGER NOT NULL,
+                    md5 TEXT NOT NULL,
+                    checked_at TEXT
+                )
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS hash_records (
+                    key TEXT PRIMARY KEY,
+                    md5 TEXT NOT NULL,
+                    updated_at TEXT
+                )
+            """)
+
+    def file_hash(self, file_path: str) -> str:
+        """
+        获取文件内容MD5：大小、mtime_ns、inode 均与缓存一致时直接返回缓存值
+
+        Args:
+            file_path: 文件路径
+
+        Returns:
+            MD5值（文件不存在时抛出 OSError）
+        """
+        path = os.path.abspath(file_path)
+        stat = os.stat(path)
+        signature = (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+        with self._lock:
+            if self._fingerprints is None:
+                rows = self.conn.execute("SELECT path, size, mtime_ns, inode, md5 FROM fingerprints")
+                self._fingerprints = {row[0]: (tuple(row[1:4]), row[4]) for row in rows}
+            cached = self._fingerprints.get(path)
+        if cached and cached[0] == signature:
+            self.stats["fast_path"] += 1
+            return cached[1]
+
+        md5 = calculate_md5(path)
+        self.stats["hashed"] += 1
+        if time.time_ns() - stat.st_mtime_ns < RACY_WINDOW_NS:
+            return md5
+        with self._lock:
+            self._fingerprints[path] = (signature, md5)
+            self._pending[path] = (signature, md5)
+            should_flush = len(self._pending) >= FLUSH_BATCH_SIZE
+        if should_flush:
+            self.flush()
+        return md5
+
+    def flush(self):
+        """把累计的指纹缓存在一个事务中写入"""
+        with self._lock:
+            if not self._pending:
+                return
+            now = datetime.now().isoformat(timespec='seconds')
+            rows = [(path, size, mtime_ns, inode, md5, now)
+                    for path, ((size, mtime_ns, inode), md5) in self._pending.items()]
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO fingerprints (path, size, mtime_ns, inode, md5, checked_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self._pending = {}
+
+    def load_records(self) -> Dict[str, str]:
+        """读取全部哈希记录 {键: MD5}"""
+        with self._lock:
+            return dict(self.conn.execute("SELECT key, md5 FROM hash_records"))
+
+    @contextmanager
+    def locked_records(self):
+        """持有跨进程写锁期间读取全部哈希记录（导出等需要与其他进程的写入串行的操作）"""
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield dict(self.conn.execute("SELECT key, md5 FROM hash_records"))
+            finally:
+                self.conn.commit()
+
+    def write_records(self, upserts: Dict[str, str], deletes: Optional[Iterable[str]] = None):
+        """
+        在一个事务中写入哈希记录的变化
+
+        Args:
+            upserts: 新增或修改的记录 {键: MD5}
+            deletes: 需要删除的键
+        """
+        deletes = list(deletes or [])
+        if not upserts and not deletes:
+            return
+        now = datetime.now().isoformat(timespec='seconds')
+        with self._lock, self.conn:
+            if upserts:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO hash_records (key, md5, updated_at) VALUES (?, ?, ?)",
+                    [(key, md5, now) for key, md5 in upserts.items()])
+            if deletes:
+                self.conn.executemany("DELETE FROM hash_records WHERE key = ?", [(key,) for key in deletes])
+
+    def close(self):
+        """提交未写入的指纹并关闭连接"""
+        if self.conn is None:
+            return
+        self.flush()
+        with self._lock:
+            self.conn.close()
+            self.conn = None
@@ -2,25 +2,35 @@
 """
 文件哈希管理模块
 自动管理ETF数据文件的哈希值，避免重复下载
+哈希记录保存在 config/fingerprint_store.py 的 SQLite 存储中，按变化批量提交；
+config/file_hashes.json 作为可随Git同步的导出副本，删除记录时立即更新，新增记录在同步结束或进程退出时更新
+同一进程内通过 get_hash_manager() 共用一个实例（一条SQLite连接）
 """
 
 import os
 import json
-import hashlib
+import atexit
+import sqlite3
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple
 from pathlib import Path
 
+try:
+    from config.fingerprint_store import FINGERPRINT_DB_NAME, FingerprintStore
+except ImportError:
+    from fingerprint_store import FINGERPRINT_DB_NAME, FingerprintStore  # config目录已在sys.path中
+
 
 class HashManager:
     """文件哈希管理器"""
     
-    def __init__(self, hash_file_path: str = None):
+    def __init__(self, hash_file_path: str = None, db_path: str = None):
         """
         初始化哈希管理器
         
         Args:
-            hash_file_path: 哈希文件存储路径，None时自动查找项目根目录
+            hash_file_path: 哈希导出文件路径，None时自动查找项目根目录
+            db_path: SQLite存储路径，None时与导出文件放在同一目录
         """
         if hash_file_path is None:
             # 自动找到项目根目录的config/file_hashes.json
@@ -29,33 +39,75 @@ class HashManager:
             hash_file_path = project_root / "config" / "file_hashes.json"
         
         self.hash_file_path = Path(hash_file_path)
+        self.store = FingerprintStore(db_path or self.hash_file_path.parent / FINGERPRINT_DB_NAME)
         self.hash_data = self._load_hash_file()
+        self._saved_data = dict(self.hash_data)  # 已写入存储的记录，保存时只提交差异
+        self._export_pending = False
+        atexit.register(self.close)
     
     def _load_hash_file(self) -> Dict[str, str]:
-        """加载哈希文件"""
+        """加载哈希记录（导出文件中存储尚未记录的键一并导入，兼容旧版和从Git同步的记录）"""
+        records = self.store.load_records()
         if self.hash_file_path.exists():
             try:
                 with open(self.hash_file_path, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+                    exported = json.load(f)
             except (json.JSONDecodeError, IOError) as e:
                 print(f"警告：无法加载哈希文件 {self.hash_file_path}: {e}")
-                return {}
-        return {}
+                exported = {}
+            missing = {key: value for key, value in exported.items() if key not in records}
+            if missing:
+                self.store.write_records(missing)
+                records.update(missing)
+        return records
     
     def _save_hash_file(self):
-        """保存哈希文件"""
+        """把 hash_data 相对上次保存的变化在一个事务中写入存储"""
+        upserts = {key: value for key, value in self.hash_data.items() if self._saved_data.get(key) != value}
+        deletes = [key for key in self._saved_data if key not in self.hash_data]
+        try:
+            self.store.write_records(upserts, deletes)
+        except Exception as e:
+            print(f"错误：无法保存哈希记录 {self.store.db_path}: {e}")
+            return
+        self.store.flush()
+        self._saved_data = dict(self.hash_data)
+        if upserts or deletes:
+            self._export_pending = True
+        if deletes:
+            # 立即导出：否则其他实例加载时会把导出文件中仍存在的已删除记录重新导入
+            self.export_hash_file()
+    
+    def export_hash_file(self):
+        """把全部哈希记录导出到 file_hashes.json（临时文件+替换）"""
+        temp_path = self.hash_file_path.with_name(f"{self.hash_file_path.name}.{os.getpid()}.tmp")
         try:
-            # 确保目录存在
             self.hash_file_path.parent.mkdir(parents=True, exist_ok=True)
-            
-            with open(self.hash_file_path, 'w', encoding='utf-8') as f:
-                json.dump(self.hash_data, f, ensure_ascii=False, indent=4)
-        except IOError as e:
-            print(f"错误：无法保存哈希文件 {self.hash_file_path}: {e}")
+            # 导出期间持有写锁，多个进程同时导出时后完成的一定包含最新记录
+            with self.store.locked_records() as records:
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    json.dump(dict(sorted(records.items())), f, ensure_ascii=False, indent=4)
+                os.replace(temp_path, self.hash_file_path)
+            self._export_pending = False
+        except (IOError, sqlite3.Error) as e:
+            print(f"错误：无法导出哈希文件 {self.hash_file_path}: {e}")
+    
+    def export_if_pending(self):
+        """有未导出的变化时导出哈希文件（同步流程结束时调用，常驻进程不必等到退出）"""
+        if self._export_pending and self.store.conn is not None:
+            self.export_hash_file()
+    
+    def close(self):
+        """提交未写入的指纹，有变化时导出哈希文件（进程退出时自动调用）"""
+        if self.store.conn is None:
+            return
+        if self._export_pending:
+            self.export_hash_file()
+        self.store.close()
     
     def calculate_file_hash(self, file_path: str) -> str:
         """
-        计算文件的MD5哈希值
+        计算文件的MD5哈希值（大小、修改时间、inode 未变时复用已记录的值）
         
         Args:
             file_path: 文件路径
@@ -63,13 +115,9 @@ class HashManager:
         Returns:
             文件的MD5哈希值
         """
-        hash_md5 = hashlib.md5()
         try:
-            with open(file_path, "rb") as f:
-                for chunk in iter(lambda: f.read(4096), b""):
-                    hash_md5.update(chunk)
-            return hash_md5.hexdigest()
-        except IOError as e:
+            return self.store.file_hash(file_path)
+        except OSError as e:
             print(f"错误：无法计算文件哈希 {file_path}: {e}")
             return ""
     
@@ -214,9 +262,29 @@ class HashManager:
                 print(f"     - {filename}")
 
 
+_shared_managers: Dict[Tuple[int, str], HashManager] = {}
+
+
+def get_hash_manager(hash_file_path: str = None) -> HashManager:
+    """
+    获取当前进程共用的哈希管理器（同一导出文件只创建一个实例，进程退出时统一关闭）
+
+    Args:
+        hash_file_path: 哈希导出文件路径，None时使用项目根目录的 config/file_hashes.json
+
+    Returns:
+        HashManager
+    """
+    # 按进程号区分：fork 出的子进程不能沿用父进程的SQLite连接
+    key = (os.getpid(), str(Path(hash_file_path).resolve()) if hash_file_path else "")
+    if key not in _shared_managers:
+        _shared_managers[key] = HashManager(hash_file_path)
+    return _shared_managers[key]
+
+
 def auto_update_hashes_for_new_month():
     """自动为新月份更新哈希管理"""
-    hash_manager = HashManager()
+    hash_manager = get_hash_manager()
     
     print("🔄 检查是否需要更新哈希管理...")
     
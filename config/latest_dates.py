@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+按代码数据的最新日期缓存
+1. 按代码CSV按日期降序保存，最新日期只需读取表头和开头两行（第二行用于确认降序）；
+   顺序不符或日期格式无法识别时回退为读取整列取最大值；追加模式下的尾段一并计入
+2. 结果按文件 (大小, mtime_ns)（含尾段）缓存在数据目录的 latest_dates.json，文件未改动时不再打开
+3. 一个目录的扫描在线程池中并行执行；市场状况监控、周更日更校验等需要"每个ETF最新日期"的地方共用同一份缓存
+"""
+
+import csv
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+try:
+    from config.etf_store import get_tail_path, read_etf_csv
+except ImportError:
+    from etf_store import get_tail_path, read_etf_csv  # config目录已在sys.path中
+
+CACHE_FILE_NAME = "latest_dates.json"
+DATE_COLUMNS = ['日期', 'date', 'Date', '交易日期']
+DATE_FORMATS = ['%Y-%m-%d', '%Y/%m/%d', '%Y.%m.%d']
+DEFAULT_SCAN_WORKERS = min(16, (os.cpu_count() or 1) * 4)  # 以文件打开和小块读取为主，线程数可多于CPU核数
+
+PathLike = Union[str, Path]
+
+
+def parse_date(value) -> Optional[int]:
+    """
+    解析日期为 YYYYMMDD 整数
+
+    Args:
+        value: YYYYMMDD 文本或数值，或 YYYY-MM-DD、YYYY/MM/DD、YYYY.MM.DD 文本
+
+    Returns:
+        YYYYMMDD 整数，无法解析时返回 None
+    """
+    text = str(value).strip()
+    if text.endswith('.0'):
+        text = text[:-2]  # 数值类型的日期
+    if len(text) == 8 and text.isdigit():
+        try:
+            datetime.strptime(text, '%Y%m%d')
+        except ValueError:
+            return None
+        return int(text)
+    for fmt in DATE_FORMATS:
+        try:
+            return int(datetime.strptime(text, fmt).strftime('%Y%m%d'))
+        except ValueError:
+            continue
+    return None
+
+
+def _date_column(header: List[str]) -> Optional[int]:
+    """日期列的位置：优先按列名识别，否则假设第二列是日期（第一列通常是代码）"""
+    for name in DATE_COLUMNS:
+        if name in header:
+            return header.index(name)
+    return 1 if len(header) >= 2 else None
+
+
+def _line_date(line: str, column: int) -> Optional[int]:
+    """数据行中日期列的值"""
+    if not line.strip():
+        return None
+    fields = next(csv.reader([line]))
+    return parse_date(fields[column]) if column < len(fields) else None
+
+
+def _scan_full(etf_file: Path, column: str) -> Optional[int]:
+    """读取整列日期取最大值（文件不是按日期降序时使用）"""
+    dates = read_etf_csv(etf_file, encoding='utf-8', usecols=[column], dtype=str)[column]
+    parsed = [parse_date(value) for value in dates.dropna().unique()]
+    parsed = [date for date in parsed if date is not None]
+    return max(parsed) if parsed else None
+
+
+def scan_latest_date(etf_file: PathLike) -> Optional[int]:
+    """
+    读取ETF文件的最新日期（不使用缓存）
+
+    Args:
+        etf_file: 经典CSV路径
+
+    Returns:
+        YYYYMMDD 整数，文件为空或无法识别日期时返回 None
+    """
+    etf_file = Path(etf_file)
+    tail_path = get_tail_path(etf_file)
+    candidates = []
+
+    if etf_file.exists():
+        with open(etf_file, 'r', encoding='utf-8-sig') as f:
+            header = next(csv.reader([f.readline()]), [])
+            column = _date_column(header)
+            if column is None:
+                return None
+            first_line, second_line = f.readline(), f.readline()
+        first, second = _line_date(first_line, column), _line_date(second_line, column)
+        if first_line.strip() and (first is None or (second_line.strip() and (second is None or second > first))):
+            # 开头两行不是按日期降序（或格式无法识别），回退到读取整列
+            if tail_path.exists():
+                return _scan_full(etf_file, header[column])  # 兼容层读取时已包含尾段
+            candidates.append(_scan_full(etf_file, header[column]))
+        else:
+            candidates.append(first)
+
+    if tail_path.exists():
+        # 尾段按追加顺序保存，行数少，直接取全部日期
+        with open(tail_path, 'r', encoding='utf-8') as f:
+            column = _date_column(next(csv.reader([f.readline()]), []))
+            if column is not None:
+                candidates.extend(_line_date(line, column) for line in f)
+
+    candidates = [date for date in candidates if date is not None]
+    return max(candidates) if candidates else None
+
+
+def file_signature(etf_file: PathLike) -> List[int]:
+    """文件及其尾段的 [大小, mtime_ns, 尾段大小, 尾段mtime_ns]，不存在的部分记为 -1"""
+    signature = []
+    for path in (Path(etf_file), get_tail_path(etf_file)):
+        try:
+            stat = os.stat(path)
+            signature.extend([stat.st_size, stat.st_mtime_ns])
+        except OSError:
+            signature.extend([-1, -1])
+    return signature
+
+
+class LatestDateCache:
+    """数据目录的最新日期缓存"""
+
+    def __init__(self, base_dir: PathLike, workers: int = DEFAULT_SCAN_WORKERS):
+        """
+        初始化最新日期缓存
+
+        Args:
+            base_dir: 数据目录（三个复权目录所在目录），缓存保存在该目录的 latest_dates.json
+            workers: 扫描线程数
+        """
+        self.base_dir = Path(base_dir)
+        self.cache_path = self.base_dir / CACHE_FILE_NAME
+        self.workers = max(1, workers)
+        self._lock = threading.Lock()
+        self.entries = self._load()  # {复权目录/文件名: [签名, 最新日期]}
+        self.stats = {"cached": 0, "scanned": 0}
+
+    def _load(self) -> Dict[str, List]:
+        """加载缓存文件"""
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                return json.load(f).get("files", {})
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def save(self):
+        """保存缓存文件（临时文件+替换）"""
+        temp_path = self.cache_path.with_name(f"{self.cache_path.name}.{os.getpid()}.tmp")
+        try:
+            with self._lock:
+                data = {"files": dict(sorted(self.entries.items())),
+                        "last_update": datetime.now().isoformat(timespec='seconds')}
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(temp_path, self.cache_path)
+        except OSError as e:
+            print(f"警告：无法保存最新日期缓存 {self.cache_path}: {e}")
+
+    def _key(self, etf_file: Path) -> str:
+        """缓存键：复权目录/文件名"""
+        return f"{etf_file.parent.name}/{etf_file.name}"
+
+    def latest_date(self, etf_file: PathLike, refresh: bool = False) -> Tuple[Optional[int], bool]:
+        """
+        获取单个文件的最新日期（需调用 save 写入磁盘）
+
+        Args:
+            etf_file: 经典CSV路径
+            refresh: 忽略缓存重新读取
+
+        Returns:
+            (YYYYMMDD 整数或 None, 缓存是否有变化)
+        """
+        etf_file = Path(etf_file)
+        key = self._key(etf_file)
+        signature = file_signature(etf_file)
+        with self._lock:
+            cached = self.entries.get(key)
+        if not refresh and cached and cached[0] == signature:
+            self.stats["cached"] += 1
+            return cached[1], False
+
+        # 读取前取签名：读取期间文件被改写时，下次签名不一致会重新读取
+        latest = scan_latest_date(etf_file)
+        self.stats["scanned"] += 1
+        with self._lock:
+            self.entries[key] = [signature, latest]
+        return latest, True
+
+    def latest_dates(self, category: str, files: Optional[Iterable[PathLike]] = None,
+                     refresh: bool = False) -> Dict[str, Optional[int]]:
+        """
+        并行获取一个复权目录中各ETF的最新日期，缓存有变化时保存
+
+        Args:
+            category: 复权目录名
+            files: 只获取这些文件，None表示目录下全部CSV（同时清理已删除文件的缓存）
+            refresh: 忽略缓存重新读取
+
+        Returns:
+            {文件名（不含.csv）: YYYYMMDD 整数或 None}
+        """
+        category_dir = self.base_dir / category
+        scan_all = files is None
+        files = sorted(category_dir.glob("*.csv")) if scan_all else [Path(path) for path in files]
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            results = list(executor.map(lambda etf_file: self.latest_date(etf_file, refresh), files))
+        changed = any(updated for _, updated in results)
+
+        if scan_all:
+            present = {self._key(etf_file) for etf_file in files}
+            with self._lock:
+                stale = [key for key in self.entries if key.startswith(f"{category}/") and key not in present]
+                for key in stale:
+                    del self.entries[key]
+            changed = changed or bool(stale)
+        if changed:
+            self.save()
+        return {etf_file.stem: latest for etf_file, (latest, _) in zip(files, results)}
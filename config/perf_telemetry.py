@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+性能遥测模块
+记录统一更新器各阶段（以及技术指标系统）每次执行的资源消耗，用于发现变慢的阶段：
+1. ProcessMeter 测量一段执行区间的墙钟时间、CPU时间（含已结束的子进程）、峰值内存、
+   读写的文件数（通过审计钩子统计 open 事件）和读写字节数（Linux 的 /proc/self/io）
+2. PerfHistory 把每个阶段的指标追加写入 JSONL 历史文件（默认 logs/perf/stage_metrics.jsonl）
+3. build_report 以每个阶段此前若干次成功执行的中位数为基线，标记明显变慢/变大的指标
+   （python main.py --mode perf-report 查看）
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import resource  # Windows 上不可用，此时只记录墙钟时间和进程CPU时间
+except ImportError:
+    resource = None
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_HISTORY_FILE = PROJECT_ROOT / "logs" / "perf" / "stage_metrics.jsonl"
+DEFAULT_WINDOW = 10  # 基线取最近N次成功执行
+DEFAULT_REGRESSION_RATIO = 1.5  # 超过基线的倍数视为退化
+MIN_BASELINE_RUNS = 3  # 基线样本不足时不判断退化
+POLL_INTERVAL = 0.2  # run_measured 等待子进程的检查间隔（秒）
+
+# 报告中的指标：(字段, 名称, 单位, 退化判定的最小绝对增量)
+REPORT_METRICS = [
+    ('wall_time', '耗时', '秒', 5.0),
+    ('cpu_time', 'CPU', '秒', 5.0),
+    ('peak_rss_mb', '峰值内存', 'MB', 50.0),
+    ('files_read', '读文件', '个', 50),
+    ('files_written', '写文件', '个', 50),
+    ('bytes_read', '读取', 'MB', 50 * 1024 * 1024),
+    ('bytes_written', '写入', 'MB', 50 * 1024 * 1024),
+]
+MAX_METRICS = {'peak_rss_mb'}  # 合并多段测量时取最大值，其余指标累加
+SKIPPED_SUFFIXES = ('.py', '.pyc', '.pyd', '.so', '.pth')  # 模块导入产生的 open 事件不计入
+
+
+class _FileTracker:
+    """通过审计钩子记录进程内打开过的文件（每个进程只安装一次，钩子无法卸载）"""
+
+    def __init__(self):
+        self.read_paths = set()
+        self.written_paths = set()
+        self._lock = threading.Lock()
+        self._installed = False
+
+    def install(self):
+        if self._installed:
+            return
+        sys.addaudithook(self._hook)
+        self._installed = True
+
+    def _hook(self, event: str, args: Tuple):
+        if event != 'open':
+            return
+        path, mode, flags = args
+        if not isinstance(path, (str, bytes, os.PathLike)):
+            return  # 文件描述符
+        path = os.fsdecode(path)
+        if path.endswith(SKIPPED_SUFFIXES) or path.startswith((sys.prefix, sys.base_prefix)):
+            return
+        if isinstance(mode, str):
+            writing = any(flag in mode for flag in 'wax+')
+        else:
+            writing = bool((flags or 0) & (os.O_WRONLY | os.O_RDWR | os.O_APPEND | os.O_CREAT))
+        with self._lock:
+            (self.written_paths if writing else self.read_paths).add(path)
+
+    def snapshot(self) -> Tuple[frozenset, frozenset]:
+        with self._lock:
+            return frozenset(self.read_paths), frozenset(self.written_paths)
+
+
+_file_tracker = _FileTracker()
+
+
+def _read_proc_io() -> Optional[Dict[str, int]]:
+    """读取 /proc/self/io（仅Linux），不可用时返回 None"""
+    try:
+        with open('/proc/self/io', 'r') as f:
+            return {key: int(value) for key, value in (line.split(':') for line in f if ':' in line)}
+    except (OSError, ValueError):
+        return None
+
+
+def _maxrss_mb(maxrss: int) -> float:
+    """ru_maxrss 换算为MB（Linux 上单位为KB，macOS 上为字节）"""
+    return maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def _rusage() -> Optional[Tuple[float, float]]:
+    """(本进程+已结束子进程的CPU秒数, 峰值内存MB)"""
+    if resource is None:
+        return None
+    usage_self = resource.getrusage(resource.RUSAGE_SELF)
+    usage_children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu = sum([usage_self.ru_utime, usage_self.ru_stime, usage_children.ru_utime, usage_children.ru_stime])
+    return cpu, _maxrss_mb(max(usage_self.ru_maxrss, usage_children.ru_maxrss))
+
+
+class ProcessMeter:
+    """
+    测量当前进程一段执行区间的资源消耗
+    峰值内存是进程生命周期内的峰值，适合在每个阶段独立的子进程中测量
+    """
+
+    def __init__(self, track_files: bool = True):
+        self.track_files = track_files
+        self.metrics = None  # 作为上下文管理器使用时，退出后保存测量结果
+        self._start = None
+
+    def start(self) -> 'ProcessMeter':
+        if self.track_files:
+            _file_tracker.install()
+        self._start = {
+            'wall': time.monotonic(),
+            'process_cpu': time.process_time(),
+            'rusage': _rusage(),
+            'io': _read_proc_io(),
+            'files': _file_tracker.snapshot(),
+        }
+        return self
+
+    def stop(self) -> Dict[str, Any]:
+        """结束测量，返回指标字典（无法测量的指标为 None）"""
+        start = self._start
+        metrics = {'wall_time': round(time.monotonic() - start['wall'], 3)}
+
+        rusage = _rusage()
+        if rusage is not None and start['rusage'] is not None:
+            metrics['cpu_time'] = round(rusage[0] - start['rusage'][0], 3)
+            metrics['peak_rss_mb'] = round(rusage[1], 1)
+        else:
+            metrics['cpu_time'] = round(time.process_time() - start['process_cpu'], 3)
+            metrics['peak_rss_mb'] = None
+
+        if self.track_files:
+            read_paths, written_paths = _file_tracker.snapshot()
+            metrics['files_read'] = len(read_paths - start['files'][0])
+            metrics['files_written'] = len(written_paths - start['files'][1])
+        else:
+            metrics['files_read'] = metrics['files_written'] = None
+
+        io_counters = _read_proc_io()
+        if io_counters is not None and start['io'] is not None:
+            metrics['bytes_read'] = io_counters.get('rchar', 0) - start['io'].get('rchar', 0)
+            metrics['bytes_written'] = io_counters.get('wchar', 0) - start['io'].get('wchar', 0)
+        else:
+            metrics['bytes_read'] = metrics['bytes_written'] = None
+        return metrics
+
+    def __enter__(self) -> 'ProcessMeter':
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics = self.stop()
+        return False
+
+
+def merge_metrics(*parts: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """合并多段测量（峰值内存取最大值，其余累加；各段都缺失的指标保持 None）"""
+    merged: Dict[str, Any] = {}
+    for part in parts:
+        for key, value in (part or {}).items():
+            if value is None:
+                merged.setdefault(key, None)
+            elif merged.get(key) is None:
+                merged[key] = value
+            elif key in MAX_METRICS:
+                merged[key] = max(merged[key], value)
+            else:
+                merged[key] = merged[key] + value
+    return merged
+
+
+def run_measured(cmd: Sequence[str], cwd: str = None, timeout: float = None) -> Tuple[int, Dict[str, Any]]:
+    """
+    执行外部命令并测量该子进程的资源消耗（通过 os.wait4 取得该进程自身的 rusage）
+
+    Returns:
+        (返回码, 指标字典)；文件数和字节数无法从外部测量，记为 None
+
+    Raises:
+        subprocess.TimeoutExpired: 超时（子进程已终止）
+    """
+    start = time.monotonic()
+    process = subprocess.Popen(list(cmd), cwd=cwd)
+    if not hasattr(os, 'wait4'):
+        try:
+            returncode = process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+            raise
+        return returncode, {'wall_time': round(time.monotonic() - start, 3)}
+
+    while True:
+        pid, status, usage = os.wait4(process.pid, os.WNOHANG)
+        if pid:
+            break
+        if timeout is not None and time.monotonic() - start > timeout:
+            process.kill()
+            os.wait4(process.pid, 0)
+            process.returncode = -9
+            raise subprocess.TimeoutExpired(list(cmd), timeout)
+        time.sleep(POLL_INTERVAL)
+
+    process.returncode = os.waitstatus_to_exitcode(status)
+    return process.returncode, {
+        'wall_time': round(time.monotonic() - start, 3),
+        'cpu_time': round(usage.ru_utime + usage.ru_stime, 3),
+        'peak_rss_mb': round(_maxrss_mb(usage.ru_maxrss), 1),
+        'files_read': None,
+        'files_written': None,
+        'bytes_read': None,
+        'bytes_written': None,
+    }
+
+
+def new_run_id() -> str:
+    """按时间排序的执行编号"""
+    return f"{datetime.now():%Y%m%d%H%M%S}_{os.getpid()}"
+
+
+class PerfHistory:
+    """只追加的阶段性能历史（JSONL，每行一个阶段的一次执行）"""
+
+    def __init__(self, history_file: str = None):
+        self.history_file = Path(history_file) if history_file else DEFAULT_HISTORY_FILE
+        if not self.history_file.is_absolute():
+            self.history_file = PROJECT_ROOT / self.history_file
+
+    def append(self, records: Iterable[Dict[str, Any]]):
+        """追加记录（一次写入，多个进程同时追加时各行保持完整）"""
+        lines = ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records)
+        if not lines:
+            return
+        self.history_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.history_file, 'a', encoding='utf-8') as f:
+            f.write(lines)
+
+    def record(self, stage: str, status: str, metrics: Dict[str, Any], run_id: str = None,
+               source: str = 'unified_updater'):
+        """追加单个阶段的一条记录"""
+        self.append([make_record(stage, status, metrics, run_id, source)])
+
+    def load(self) -> List[Dict[str, Any]]:
+        """读取全部记录（跳过损坏的行）"""
+        records = []
+        try:
+            with open(self.history_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        continue
+        except FileNotFoundError:
+            pass
+        return records
+
+
+def make_record(stage: str, status: str, metrics: Dict[str, Any], run_id: str = None,
+                source: str = 'unified_updater') -> Dict[str, Any]:
+    """构造一条历史记录"""
+    record = {
+        'run_id': run_id or new_run_id(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'source': source,
+        'stage': stage,
+        'status': status,
+    }
+    record.update(metrics or {})
+    return record
+
+
+def record_indicator_perf(working_dir: str, status: str, metrics: Dict[str, Any]):
+    """把技术指标系统一次执行的资源消耗追加到性能历史（阶段名 indicator/<大类>/<子系统>）"""
+    stage = f"indicator/{Path(working_dir).parent.name}/{Path(working_dir).name}"
+    try:
+        PerfHistory().record(stage, status, metrics, source='indicator')
+    except OSError as e:
+        print(f"⚠️ 性能历史写入失败: {e}")
+
+
+def build_report(records: List[Dict[str, Any]], window: int = DEFAULT_WINDOW,
+                 regression_ratio: float = DEFAULT_REGRESSION_RATIO) -> Dict[str, Dict[str, Any]]:
+    """
+    按阶段汇总最近一次执行与基线的对比
+
+    Args:
+        records: PerfHistory.load() 的记录
+        window: 基线取最近一次之前的N次成功执行
+        regression_ratio: 超过基线中位数的倍数（且超过最小绝对增量）视为退化
+
+    Returns:
+        {阶段: {'latest': 最近记录, 'runs': 执行次数, 'trend': 最近耗时列表,
+               'metrics': {字段: {'latest', 'baseline', 'ratio', 'regressed'}}, 'regressions': [字段]}}
+    """
+    by_stage: Dict[str, List[Dict[str, Any]]] = {}
+    for record in records:
+        by_stage.setdefault(record.get('stage', '?'), []).append(record)
+
+    report = {}
+    for stage, stage_records in sorted(by_stage.items()):
+        stage_records.sort(key=lambda r: (r.get('timestamp', ''), r.get('run_id', '')))
+        latest = stage_records[-1]
+        previous = [r for r in stage_records[:-1] if r.get('status') == 'success'][-window:]
+
+        metrics = {}
+        regressions = []
+        for key, _, _, min_delta in REPORT_METRICS:
+            value = latest.get(key)
+            samples = [r[key] for r in previous if r.get(key) is not None]
+            baseline = statistics.median(samples) if samples else None
+            ratio = value / baseline if value is not None and baseline else None
+            regressed = (latest.get('status') == 'success' and len(samples) >= MIN_BASELINE_RUNS
+                         and ratio is not None and ratio >= regression_ratio and value - baseline >= min_delta)
+            metrics[key] = {'latest': value, 'baseline': baseline, 'ratio': ratio, 'regressed': regressed}
+            if regressed:
+                regressions.append(key)
+
+        report[stage] = {
+            'latest': latest,
+            'runs': len(stage_records),
+            'trend': [r.get('wall_time') for r in stage_records[-window:]],
+            'metrics': metrics,
+            'regressions': regressions,
+        }
+    return report
+
+
+def _format_value(key: str, value: Optional[float]) -> str:
+    if value is None:
+        return '-'
+    if key.startswith('bytes_'):
+        return f"{value / 1024 / 1024:.1f}"
+    if key.startswith('files_'):
+        return f"{value:.0f}"
+    return f"{value:.1f}"
+
+
+def format_report(report: Dict[str, Dict[str, Any]], window: int = DEFAULT_WINDOW) -> str:
+    """把 build_report 的结果格式化为文本"""
+    if not report:
+        return "ℹ️ 暂无性能历史记录"
+
+    lines = [f"📊 阶段性能报告（基线：此前最近{window}次成功执行的中位数）", "=" * 60]
+    for stage, entry in report.items():
+        latest = entry['latest']
+        flag = '⚠️ 退化' if entry['regressions'] else '✅'
+        lines.append(f"{flag} {stage}  最近: {latest.get('timestamp', '?')} [{latest.get('status', '?')}]  "
+                     f"共{entry['runs']}次")
+        for key, label, unit, _ in REPORT_METRICS:
+            item = entry['metrics'][key]
+            if item['latest'] is None and item['baseline'] is None:
+                continue
+            ratio = f" ({item['ratio']:.2f}x)" if item['ratio'] is not None else ""
+            marker = "  ⬆️" if item['regressed'] else ""
+            lines.append(f"    {label}: {_format_value(key, item['latest'])} {unit}"
+                         f"  基线 {_format_value(key, item['baseline'])}{ratio}{marker}")
+        trend = ' → '.join(_format_value('wall_time', value) for value in entry['trend'])
+        lines.append(f"    耗时趋势(秒): {trend}")
+    regressed = [stage for stage, entry in report.items() if entry['regressions']]
+    lines.append("=" * 60)
+    lines.append(f"⚠️ 发现退化的阶段: {', '.join(regressed)}" if regressed else "✅ 未发现性能退化")
+    return '\n'.join(lines)
@@ -6,6 +6,7 @@ ETF数据系统主启动器
 """
 
 import sys
+import json
 import argparse
 from pathlib import Path
 
@@ -13,7 +14,8 @@ from pathlib import Path
 PROJECT_ROOT = Path(__file__).parent
 sys.path.insert(0, str(PROJECT_ROOT))
 
-from unified_etf_updater import UnifiedETFUpdater
+from unified_etf_updater import ETFDaemon, UnifiedETFUpdater
+from unified_etf_updater.daemon import control_address, send_command
 
 
 def main():
@@ -26,6 +28,12 @@ def main():
   python main.py                    # 执行完整数据更新
   python main.py --mode test        # 系统状态测试
   python main.py --mode validate    # 手动数据校验
+  python main.py --mode validate --fix-dry-run  # 数据校验并生成自动修正计划（不修改文件）
+  python main.py --mode perf-report # 各阶段性能趋势和退化检查
+  python main.py --mode daemon      # 常驻守护进程（定时更新+监视新日期文件）
+  python main.py --mode ctl --command status            # 查询守护进程状态
+  python main.py --mode ctl --command run               # 让守护进程立即执行完整更新
+  python main.py --mode ctl --command window --code 159001  # 查询常驻的最近价格窗口
   python main.py --no-git          # 禁用Git自动提交
   python main.py --no-push         # 禁用Git推送（仅本地提交）
   python main.py --no-screening    # 禁用ETF初筛
@@ -35,9 +43,33 @@ def main():
     
     parser.add_argument(
         '--mode', 
-        choices=['update', 'test', 'validate'], 
+        choices=['update', 'test', 'validate', 'perf-report', 'daemon', 'ctl'], 
         default='update',
-        help='运行模式: update(数据更新), test(系统测试), validate(数据校验)'
+        help='运行模式: update(数据更新), test(系统测试), validate(数据校验), perf-report(性能报告), '
+             'daemon(常驻守护进程), ctl(控制守护进程)'
+    )
+    
+    parser.add_argument(
+        '--fix-dry-run',
+        action='store_true',
+        help='数据校验发现不一致时只生成自动修正计划报告，不修改文件'
+    )
+    
+    parser.add_argument(
+        '--command',
+        choices=['status', 'run', 'latest', 'window', 'stop'],
+        default='status',
+        help='ctl模式发送给守护进程的命令'
+    )
+    
+    parser.add_argument(
+        '--code',
+        help='ctl模式 latest/window 命令的ETF代码'
+    )
+    
+    parser.add_argument(
+        '--category',
+        help='ctl模式 window 命令的复权目录，默认前复权'
     )
     
     parser.add_argument(
@@ -66,6 +98,10 @@ def main():
     
     args = parser.parse_args()
     
+    if args.mode == 'ctl':
+        # 控制模式只连接守护进程，不初始化更新器
+        sys.exit(run_control_command(args))
+    
     try:
         # 初始化统一更新器
         print("🔧 正在初始化ETF数据系统...")
@@ -84,6 +120,9 @@ def main():
         if args.no_validation:
             updater.set_validation_enabled(False)
         
+        if args.fix_dry_run:
+            updater.set_auto_fix_dry_run(True)
+        
         # 执行相应操作
         if args.mode == 'test':
             # 测试模式
@@ -101,6 +140,17 @@ def main():
                 sys.exit(2)  # 使用不同的退出码表示需要用户关注
             else:
                 print(f"✅ 数据校验通过: {result['message']}")
+        elif args.mode == 'perf-report':
+            # 性能报告模式
+            result = updater.perf_report()
+            print(result['text'])
+            if result['regressions']:
+                sys.exit(2)  # 与数据校验一致，用退出码2表示需要关注
+        elif args.mode == 'daemon':
+            # 守护进程模式
+            print("🛰️ 启动常驻守护进程...")
+            if not ETFDaemon(updater).run():
+                sys.exit(1)
         else:
             # 正常更新模式
             print("🚀 开始执行ETF数据更新...")
@@ -185,5 +235,29 @@ def main():
         sys.exit(1)
 
 
+def run_control_command(args) -> int:
+    """向守护进程发送控制命令并打印响应，返回退出码"""
+    try:
+        with open(PROJECT_ROOT / "config" / "config.json", 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        config = {}
+    
+    if args.command in ('latest', 'window') and not args.code:
+        print(f"❌ {args.command} 命令需要 --code")
+        return 1
+    
+    try:
+        response = send_command(control_address(config, PROJECT_ROOT), args.command,
+                                code=args.code, category=args.category)
+    except OSError as e:
+        print(f"❌ 无法连接守护进程: {e}")
+        print("💡 请先运行 'python main.py --mode daemon'")
+        return 1
+    
+    print(json.dumps(response, ensure_ascii=False, indent=2, default=str))
+    return 0 if response.get('ok') else 1
+
+
 if __name__ == "__main__":
     main() 
\ No newline at end of file
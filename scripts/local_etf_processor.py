@@ -6,8 +6,11 @@
 """
 
 import pandas as pd
+import numpy as np
 import os
+import csv
 import glob
+import heapq
 import logging
 from datetime import datetime
 import time
@@ -24,7 +27,7 @@ class LocalETFProcessor:
         
         Args:
             source_dir: 本地数据目录
-            batch_size: 批处理大小
+            batch_size: 批处理大小（每批文件在内存中整理后溢写为一个有序段，决定内存上限）
         """
         self.source_dir = source_dir
         self.batch_size = batch_size
@@ -39,6 +42,10 @@ class LocalETFProcessor:
         # 创建输出目录
         for output_dir in self.output_dirs.values():
             os.makedirs(output_dir, exist_ok=True)
+        
+        # 有序段目录：每批数据按(代码, 日期)排序后溢写到这里，最终统一多路归并
+        self.runs_dir = 'ETF/merged_data/_runs'
+        os.makedirs(self.runs_dir, exist_ok=True)
             
         # 进度文件
         self.progress_file = "local_processing_progress.json"
@@ -49,9 +56,6 @@ class LocalETFProcessor:
             '上日收盘', '涨跌', '涨幅%', '成交量(手数)', '成交额(千元)'
         ]
         
-        # ETF数据缓存
-        self.etf_cache = defaultdict(lambda: defaultdict(list))
-        
     def get_local_file_list(self):
         """获取本地文件列表"""
         logger.info("扫描本地文件...")
@@ -80,13 +84,15 @@ class LocalETFProcessor:
                     return json.load(f)
             except:
                 pass
-        return {"processed_dates": [], "last_update": None}
+        return {"processed_dates": [], "runs": [], "run_seq": 0, "last_update": None}
     
     def save_progress(self, progress):
-        """保存处理进度"""
+        """保存处理进度（临时文件+替换，中断时不会损坏进度文件）"""
         progress["last_update"] = datetime.now().isoformat()
-        with open(self.progress_file, 'w', encoding='utf-8') as f:
+        temp_file = self.progress_file + '.tmp'
+        with open(temp_file, 'w', encoding='utf-8') as f:
             json.dump(progress, f, ensure_ascii=False, indent=2)
+        os.replace(temp_file, self.progress_file)
     
     def normalize_code(self, code):
         """标准化代码格式"""
@@ -105,8 +111,24 @@ class LocalETFProcessor:
             # 默认深交所
             return f"{code}.SZ"
     
-    def process_daily_file(self, file_path, date_str):
-        """处理单个日期文件"""
+    def normalize_codes(self, codes):
+        """标准化代码格式（整列处理，规则与 normalize_code 一致）"""
+        codes = codes.astype(str).str.strip()
+        has_suffix = codes.str.contains('.SZ', regex=False) | codes.str.contains('.SH', regex=False)
+        suffix = np.where(codes.str.startswith(('50', '51', '52', '56', '58')), '.SH', '.SZ')
+        return codes.where(has_suffix, codes + suffix)
+    
+    def base_code(self, code):
+        """去掉交易所后缀的代码（输出文件名）"""
+        return code.replace('.SZ', '').replace('.SH', '')
+    
+    def load_daily_frame(self, file_path, date_str):
+        """
+        读取单个日期文件并整理为标准列（整列构造，不逐行循环）
+        
+        Returns:
+            标准列DataFrame，文件异常时返回None
+        """
         try:
             # 读取数据
             df = pd.read_csv(file_path, encoding='utf-8')
@@ -114,86 +136,149 @@ class LocalETFProcessor:
             # 检查数据格式
             if '代码' not in df.columns:
                 logger.warning(f"文件格式异常: {date_str}.csv")
-                return 0
+                return None
             
-            # 按ETF代码分组并缓存
-            etf_count = 0
-            
-            for _, row in df.iterrows():
-                code = self.normalize_code(row['代码'])
-                base_code = code.replace('.SZ', '').replace('.SH', '')
-                
-                # 构造数据行
-                data_row = {
-                    '代码': code,
-                    '日期': date_str,
-                    '开盘价': row.get('开盘价', ''),
-                    '最高价': row.get('最高价', ''),
-                    '最低价': row.get('最低价', ''),
-                    '收盘价': row.get('收盘价', ''),
-                    '上日收盘': row.get('上日收盘', ''),
-                    '涨跌': row.get('涨跌', ''),
-                    '涨幅%': row.get('涨幅%', ''),
-                    '成交量(手数)': row.get('成交量(手数)', ''),
-                    '成交额(千元)': row.get('成交额(千元)', '')
-                }
-                
-                # 缓存到内存
-                for fuquan_type in self.output_dirs.keys():
-                    self.etf_cache[fuquan_type][base_code].append(data_row)
-                
-                etf_count += 1
-            
-            return etf_count
+            frame = pd.DataFrame({'代码': self.normalize_codes(df['代码']), '日期': date_str})
+            for column in self.standard_columns[2:]:
+                if column in df.columns:
+                    # 按文件转成文本，避免批内拼接时某天的空值把其他日期的整数列变成浮点
+                    frame[column] = df[column].astype(str).where(df[column].notna(), '')
+                else:
+                    frame[column] = ''
+            return frame
             
         except Exception as e:
             logger.error(f"处理文件异常: {date_str}.csv - {e}")
-            return 0
+            return None
     
-    def flush_cache_to_files(self):
-        """将缓存数据写入文件"""
-        logger.info("正在将缓存数据写入文件...")
+    def spill_run(self, batch_frame, progress):
+        """
+        将一批数据按(代码, 日期)排序后溢写为一个有序段
         
-        total_files = 0
+        Args:
+            batch_frame: 本批次所有日期的标准列数据（按日期升序拼接）
+            progress: 进度记录（分配段序号）
         
-        for fuquan_type, output_dir in self.output_dirs.items():
-            logger.info(f"处理{fuquan_type}数据...")
+        Returns:
+            段文件名
+        """
+        base_codes = batch_frame['代码'].str.replace('.SZ', '', regex=False).str.replace('.SH', '', regex=False)
+        batch_frame = batch_frame.assign(_base=base_codes)
+        
+        # 同一ETF同一日期保留最后一条，稳定排序保证段内顺序确定
+        batch_frame = batch_frame.drop_duplicates(subset=['_base', '日期'], keep='last')
+        batch_frame = batch_frame.sort_values(['_base', '日期'], kind='mergesort')
+        
+        progress['run_seq'] = progress.get('run_seq', 0) + 1
+        run_name = f"run_{progress['run_seq']:06d}.csv"
+        run_path = os.path.join(self.runs_dir, run_name)
+        
+        temp_path = run_path + '.tmp'
+        batch_frame.to_csv(temp_path, index=False, encoding='utf-8', columns=self.standard_columns)
+        os.replace(temp_path, run_path)
+        
+        logger.info(f"溢写有序段 {run_name}: {len(batch_frame)} 条记录")
+        return run_name
+    
+    def iter_sorted_rows(self, file_path, rank):
+        """
+        逐行读取按(代码, 日期)有序的CSV
+        
+        Yields:
+            (基础代码, 日期, 来源优先级, 标准列数据行)
+        """
+        with open(file_path, 'r', encoding='utf-8-sig', newline='') as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if not header:
+                return
             
-            for base_code, data_rows in self.etf_cache[fuquan_type].items():
-                if not data_rows:
+            # 列顺序与标准列不同时按列名重排
+            reorder = None
+            if header != self.standard_columns:
+                reorder = [header.index(c) if c in header else None for c in self.standard_columns]
+            
+            for row in reader:
+                if not row:
                     continue
-                
-                file_path = os.path.join(output_dir, f"{base_code}.csv")
-                
-                try:
-                    # 创建DataFrame
-                    df = pd.DataFrame(data_rows)
-                    
-                    # 按日期排序
-                    df['日期'] = df['日期'].astype(str)
-                    df = df.sort_values('日期')
-                    df = df.reset_index(drop=True)
-                    
-                    # 去重（保留最后一条）
-                    df = df.drop_duplicates(subset=['日期'], keep='last')
-                    
-                    # 只保留标准列
-                    df = df[self.standard_columns]
-                    
-                    # 保存文件
-                    df.to_csv(file_path, index=False, encoding='utf-8')
-                    total_files += 1
-                    
-                except Exception as e:
-                    logger.error(f"保存文件失败: {base_code}.csv - {e}")
+                if reorder:
+                    row = [row[i] if i is not None and i < len(row) else '' for i in reorder]
+                yield (self.base_code(row[0]), row[1], rank, row)
+    
+    def iter_existing_rows(self):
+        """逐行读取已有的输出文件（三种类型数据相同，读取第一个目录），作为优先级最低的段"""
+        output_dir = next(iter(self.output_dirs.values()))
+        names = sorted((f for f in os.listdir(output_dir) if f.endswith('.csv')), key=lambda f: f[:-4])
+        for name in names:
+            yield from self.iter_sorted_rows(os.path.join(output_dir, name), 0)
+    
+    def merge_runs(self, run_names):
+        """
+        多路归并已有输出和所有有序段，流式写出每个ETF的最终文件
+        内存占用与段数相关，与数据总量无关；同一ETF同一日期以最新的段为准
         
-        logger.info(f"成功保存 {total_files} 个ETF文件")
+        Returns:
+            写出的ETF文件数
+        """
+        logger.info(f"多路归并 {len(run_names)} 个有序段和已有输出...")
+        
+        streams = [self.iter_existing_rows()]
+        for rank, run_name in enumerate(run_names, 1):
+            streams.append(self.iter_sorted_rows(os.path.join(self.runs_dir, run_name), rank))
+        merged = heapq.merge(*streams, key=lambda item: item[:3])
+        
+        total_files = 0
+        current_base = None
+        handles = []
+        writers = []
+        
+        def close_current():
+            for (handle, temp_path, file_path) in handles:
+                handle.close()
+                os.replace(temp_path, file_path)
+        
+        def emit(item):
+            nonlocal current_base, handles, writers, total_files
+            base_code, _, _, row = item
+            if base_code != current_base:
+                close_current()
+                current_base = base_code
+                handles = []
+                writers = []
+                for output_dir in self.output_dirs.values():
+                    file_path = os.path.join(output_dir, f"{base_code}.csv")
+                    temp_path = file_path + '.tmp'
+                    handle = open(temp_path, 'w', encoding='utf-8', newline='')
+                    writer = csv.writer(handle, lineterminator='\n')
+                    writer.writerow(self.standard_columns)
+                    handles.append((handle, temp_path, file_path))
+                    writers.append(writer)
+                total_files += 1
+                if total_files % 500 == 0:
+                    logger.info(f"  归并进度: {total_files} 个ETF")
+            for writer in writers:
+                writer.writerow(row)
+        
+        # 相同(代码, 日期)按来源优先级相邻排列，只输出最后一条
+        pending = None
+        for item in merged:
+            if pending is not None and item[:2] != pending[:2]:
+                emit(pending)
+            pending = item
+        if pending is not None:
+            emit(pending)
+        close_current()
         
-        # 清空缓存
-        self.etf_cache.clear()
+        logger.info(f"成功保存 {total_files} 个ETF文件")
+        return total_files
     
     def process_batch(self, file_list, start_idx, batch_size):
-        """批量处理文件"""
+        """
+        批量读取文件
+        
+        Returns:
+            (本批次标准列数据或None, 批次统计)
+        """
         end_idx = min(start_idx + batch_size, len(file_list))
         batch_files = file_list[start_idx:end_idx]
         
@@ -202,28 +287,27 @@ class LocalETFProcessor:
         batch_stats = {
             'processed': 0,
             'etf_count': 0,
-            'failed': []
+            'failed': [],
+            'processed_dates': []
         }
+        frames = []
         
         for i, (date_str, file_path) in enumerate(batch_files):
-            try:
-                # 显示进度
-                if i % 50 == 0 and i > 0:
-                    logger.info(f"  批次进度: {i+1}/{len(batch_files)} - {date_str}")
-                
-                # 处理文件
-                etf_count = self.process_daily_file(file_path, date_str)
-                if etf_count > 0:
-                    batch_stats['processed'] += 1
-                    batch_stats['etf_count'] += etf_count
-                else:
-                    batch_stats['failed'].append(date_str)
-                    
-            except Exception as e:
-                logger.error(f"处理 {date_str} 异常: {e}")
+            # 显示进度
+            if i % 50 == 0 and i > 0:
+                logger.info(f"  批次进度: {i+1}/{len(batch_files)} - {date_str}")
+            
+            frame = self.load_daily_frame(file_path, date_str)
+            if frame is not None and len(frame) > 0:
+                frames.append(frame)
+                batch_stats['processed'] += 1
+                batch_stats['etf_count'] += len(frame)
+                batch_stats['processed_dates'].append(date_str)
+            else:
                 batch_stats['failed'].append(date_str)
         
-        return batch_stats
+        batch_frame = pd.concat(frames, ignore_index=True) if frames else None
+        return batch_frame, batch_stats
     
     def process_all_local_data(self):
         """处理所有本地数据"""
@@ -235,9 +319,10 @@ class LocalETFProcessor:
             logger.error("未找到本地数据文件")
             return
         
-        # 加载进度
+        # 加载进度（已溢写但尚未归并的段会在本次继续归并）
         progress = self.load_progress()
         processed_dates = set(progress.get('processed_dates', []))
+        runs = [r for r in progress.get('runs', []) if os.path.exists(os.path.join(self.runs_dir, r))]
         
         # 筛选未处理的文件
         pending_files = [(date_str, file_path) for date_str, file_path in all_files 
@@ -246,8 +331,10 @@ class LocalETFProcessor:
         logger.info(f"总文件数: {len(all_files)}")
         logger.info(f"已处理: {len(processed_dates)}")
         logger.info(f"待处理: {len(pending_files)}")
+        if runs:
+            logger.info(f"待归并有序段: {len(runs)}")
         
-        if not pending_files:
+        if not pending_files and not runs:
             logger.info("所有文件已处理完成！")
             return
         
@@ -257,7 +344,8 @@ class LocalETFProcessor:
             year = date_str[:4]
             year_stats[year] += 1
         
-        logger.info("待处理文件按年份分布:")
+        if year_stats:
+            logger.info("待处理文件按年份分布:")
         for year in sorted(year_stats.keys()):
             logger.info(f"  {year}年: {year_stats[year]} 个文件")
         
@@ -271,33 +359,35 @@ class LocalETFProcessor:
         start_time = datetime.now()
         
         for i in range(0, len(pending_files), self.batch_size):
-            batch_stats = self.process_batch(pending_files, i, self.batch_size)
+            batch_frame, batch_stats = self.process_batch(pending_files, i, self.batch_size)
             
             # 累计统计
             for key in ['processed', 'etf_count']:
                 total_stats[key] += batch_stats[key]
             total_stats['failed'].extend(batch_stats['failed'])
             
-            # 更新进度
-            batch_end = min(i + self.batch_size, len(pending_files))
-            batch_processed = [date_str for date_str, _ in pending_files[i:batch_end]]
-            progress['processed_dates'].extend(batch_processed)
+            # 本批数据溢写为有序段后再记录进度，中断后从下一批继续
+            if batch_frame is not None:
+                runs.append(self.spill_run(batch_frame, progress))
+            progress['processed_dates'].extend(batch_stats['processed_dates'])
+            progress['runs'] = runs
             self.save_progress(progress)
             
             # 显示进度
+            batch_end = min(i + self.batch_size, len(pending_files))
             elapsed = datetime.now() - start_time
             remaining = len(pending_files) - batch_end
             if batch_end > 0:
                 eta = elapsed * remaining / batch_end
                 logger.info(f"批次完成 - 总进度: {batch_end}/{len(pending_files)} ({batch_end/len(pending_files)*100:.1f}%) ETA: {eta}")
-            
-            # 每处理1000个文件就写入一次
-            if batch_end % 1000 == 0 or batch_end == len(pending_files):
-                self.flush_cache_to_files()
         
-        # 最终写入剩余缓存
-        if self.etf_cache:
-            self.flush_cache_to_files()
+        # 多路归并所有有序段，生成最终文件
+        if runs:
+            self.merge_runs(runs)
+            for run_name in runs:
+                os.remove(os.path.join(self.runs_dir, run_name))
+            progress['runs'] = []
+            self.save_progress(progress)
         
         # 最终统计
         elapsed = datetime.now() - start_time
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+批量写入器（ETF_database/bulk_loader.py）测试
+=================
+
+测试覆盖:
+- prepare_frame 整列转换：日期解析、无法解析的行丢弃、数值列转换
+- PostgreSQL 写入器：暂存表数值列为 NUMERIC，COPY 文本保留浮点数的完整位数，每次合并同时更新水位
+- SQLite 写入器：同一代码+日期以最后写入的为准，全精度价格原样保存，水位只前进不后退
+
+运行测试:
+    python -m pytest tests/test_bulk_loader.py
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import pandas as pd
+
+# 添加项目路径（ETF_database 下的模块按顶层模块名互相导入）
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+sys.path.insert(0, str(PROJECT_ROOT / "ETF_database"))
+
+from bulk_loader import COLUMNS, STAGING_TABLE, BulkLoader, create_loader, load_watermarks, prepare_frame
+from importers.daily_importer import DailyDataImporter
+
+HEADER = ['代码', '日期', '开盘价', '最高价', '最低价', '收盘价', '上日收盘', '涨跌', '涨幅%', '成交量(手数)', '成交额(千元)']
+TABLE = 'basic_info_daily.forward_adjusted'
+PRICE = 0.8602290750774405
+
+
+def make_rows(code: str, dates, price: float = PRICE) -> pd.DataFrame:
+    """生成按代码数据"""
+    return pd.DataFrame([[code, date, price, price, price, price, price, 0.002, 0.16, 12345, 1523.4]
+                         for date in dates], columns=HEADER)
+
+
+class RecordingCursor:
+    """记录执行的SQL和COPY内容的 psycopg2 游标替身"""
+
+    def __init__(self):
+        self.statements = []
+        self.copied = []
+        self.rowcount = 0
+
+    def execute(self, sql, params=None):
+        self.statements.append(sql)
+
+    def copy_expert(self, sql, buffer):
+        self.statements.append(sql)
+        self.copied.append(buffer.getvalue())
+        self.rowcount = len(self.copied[-1].splitlines())
+
+    def close(self):
+        pass
+
+
+class RecordingConnection:
+    def __init__(self):
+        self.recorded = RecordingCursor()
+
+    def cursor(self):
+        return self.recorded
+
+
+class TestPrepareFrame(unittest.TestCase):
+    """整列转换"""
+
+    def test_convert_columns(self):
+        df = make_rows('159001.SZ', ['20240105', '20240104.0', 'bad'])
+        df['收盘价'] = df['收盘价'].astype(object)
+        df.loc[1, '收盘价'] = '-'  # 无法转换的数值记为缺失
+        frame = prepare_frame(df)
+        self.assertEqual(frame.columns.tolist(), COLUMNS)
+        self.assertEqual(frame['trade_date'].tolist(), ['2024-01-05', '2024-01-04'])
+        self.assertEqual(frame['open_price'].tolist(), [PRICE, PRICE])
+        self.assertTrue(pd.isna(frame['close_price'].iloc[1]))
+
+
+class TestCopyLoader(unittest.TestCase):
+    """PostgreSQL COPY + 合并写入器（记录发出的SQL，不连接数据库）"""
+
+    def test_staging_keeps_numeric_precision(self):
+        connection = RecordingConnection()
+        loader = BulkLoader(connection, TABLE, verbose=False)
+        loader.add_frame(make_rows('159001.SZ', [20240104, 20240105]))
+        self.assertEqual(loader.flush(), 2)
+
+        statements = connection.recorded.statements
+        staging_ddl = next(sql for sql in statements if 'CREATE TEMP TABLE' in sql)
+        self.assertIn("close_price NUMERIC", staging_ddl)
+        self.assertNotIn("DOUBLE PRECISION", staging_ddl)
+        self.assertIn(repr(PRICE), connection.recorded.copied[0])
+        self.assertTrue(any('import_watermarks' in sql for sql in statements))
+        self.assertEqual(statements[-1], f"TRUNCATE {STAGING_TABLE}")
+
+    def test_flush_threshold(self):
+        """暂存行数达到阈值时自动合并"""
+        connection = RecordingConnection()
+        loader = BulkLoader(connection, TABLE, flush_rows=3, verbose=False)
+        loader.add_frame(make_rows('159001.SZ', [20240104, 20240105]))
+        self.assertEqual(connection.recorded.copied, [])
+        loader.add_frame(make_rows('159003.SZ', [20240105]))
+        self.assertEqual(len(connection.recorded.copied), 1)
+        self.assertEqual(loader.buffered_rows, 0)
+
+
+class TestSQLiteLoader(unittest.TestCase):
+    """嵌入式写入器"""
+
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        env = mock.patch.dict(os.environ, {'DB_BACKEND': 'sqlite', 'DB_PATH': str(self.temp_dir / "etf.sqlite")})
+        env.start()
+        self.addCleanup(env.stop)
+        self.importer = DailyDataImporter(workers=1)
+        self.assertTrue(self.importer.connect())
+        self.importer._ensure_tables_exist()
+
+    def tearDown(self):
+        self.importer.disconnect()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _load(self, *frames):
+        loader = create_loader(self.importer.db_manager, TABLE, verbose=False)
+        for frame in frames:
+            loader.add_frame(frame)
+        loader.close()
+        self.importer.db_manager.connection.commit()
+
+    def _rows(self) -> pd.DataFrame:
+        return self.importer.db_manager.query_frame(
+            f"SELECT etf_code, CAST(trade_date AS VARCHAR(10)) AS trade_date, close_price FROM {TABLE} "
+            f"ORDER BY etf_code, trade_date")
+
+    def test_upsert_last_wins_and_precision(self):
+        self._load(make_rows('159001.SZ', [20240104, 20240105]),
+                   make_rows('159001.SZ', [20240105], price=PRICE * 2))
+        rows = self._rows()
+        self.assertEqual(rows['trade_date'].tolist(), ['2024-01-04', '2024-01-05'])
+        self.assertEqual(rows['close_price'].tolist(), [PRICE, PRICE * 2])
+
+    def test_watermark_only_moves_forward(self):
+        self._load(make_rows('159001.SZ', [20240104, 20240105]))
+        self._load(make_rows('159001.SZ', [20240102]))  # 补写更早的日期
+        self.assertEqual(load_watermarks(self.importer.db_manager, TABLE), {'159001': 20240105})
+        self.assertEqual(len(self._rows()), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
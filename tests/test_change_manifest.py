@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+变更清单（config/change_manifest.py）测试
+=================
+
+测试覆盖:
+- 新消费者需要全量处理，确认后只收到之后发布的变更
+- 多次运行的变更累计合并
+- 处理期间新发布的清单留到下次
+- 全量重建作废清单后所有消费者重新全量处理
+
+运行测试:
+    python -m pytest tests/test_change_manifest.py
+"""
+
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+# 添加项目路径
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from config.change_manifest import ChangeLog, ChangeSet
+
+FORWARD = "0_ETF日K(前复权)"
+BACKWARD = "0_ETF日K(后复权)"
+
+
+class TestChangeLog(unittest.TestCase):
+    """发布、累计和确认"""
+
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.change_log = ChangeLog(self.temp_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _publish(self, categories) -> str:
+        return self.change_log.publish('daily', ChangeSet(categories))
+
+    def test_new_consumer_full_scan(self):
+        """从未确认过的消费者需要全量处理，确认后没有待处理变更"""
+        self._publish({FORWARD: {'159001': [20240105]}})
+        changes = self.change_log.pending('screening')
+        self.assertTrue(changes.full_scan)
+
+        self.change_log.acknowledge('screening', changes)
+        changes = self.change_log.pending('screening')
+        self.assertFalse(changes.full_scan)
+        self.assertTrue(changes.is_empty())
+
+    def test_acknowledge_without_runs(self):
+        """尚无任何清单时确认，之后发布的变更可以增量处理"""
+        self.change_log.acknowledge('screening', self.change_log.pending('screening'))
+        self._publish({FORWARD: {'159001': [20240105]}})
+        changes = self.change_log.pending('screening')
+        self.assertFalse(changes.full_scan)
+        self.assertEqual(changes.codes(), {'159001'})
+
+    def test_pending_accumulates_runs(self):
+        """多次运行的变更合并，各消费者游标互不影响"""
+        self.change_log.acknowledge('screening', self.change_log.pending('screening'))
+        self.change_log.acknowledge('market', self.change_log.pending('market'))
+        first = self._publish({FORWARD: {'159001': [20240105]}})
+        second = self._publish({FORWARD: {'159001': [20240108], '159003': [20240108]},
+                                BACKWARD: {'159003': [20240108]}})
+
+        changes = self.change_log.pending('screening')
+        self.assertEqual(changes.run_ids, [first, second])
+        self.assertEqual(changes.dates(FORWARD, '159001'), [20240105, 20240108])
+        self.assertEqual(changes.codes(BACKWARD), {'159003'})
+        self.assertEqual(changes.latest_date('159003'), 20240108)
+
+        self.change_log.acknowledge('screening', changes)
+        self.assertTrue(self.change_log.pending('screening').is_empty())
+        self.assertEqual(len(self.change_log.pending('market').run_ids), 2)
+
+    def test_runs_published_during_processing(self):
+        """确认的是处理开始前读取的汇总，处理期间新发布的清单留到下次"""
+        self.change_log.acknowledge('screening', self.change_log.pending('screening'))
+        self._publish({FORWARD: {'159001': [20240105]}})
+        changes = self.change_log.pending('screening')
+        late = self._publish({FORWARD: {'159005': [20240108]}})
+        self.change_log.acknowledge('screening', changes)
+
+        changes = self.change_log.pending('screening')
+        self.assertEqual(changes.run_ids, [late])
+        self.assertEqual(changes.codes(), {'159005'})
+
+    def test_empty_changes_not_published(self):
+        """没有变更时不发布清单"""
+        self.assertIsNone(self.change_log.publish('daily', ChangeSet()))
+        self.assertEqual(self.change_log.runs(), [])
+
+    def test_invalidate_forces_full_scan(self):
+        """全量重建作废此前的清单，已确认的消费者也需要全量处理一次"""
+        self.change_log.acknowledge('screening', self.change_log.pending('screening'))
+        self._publish({FORWARD: {'159001': [20240105]}})
+        self.change_log.invalidate('rebuild')
+        self.assertEqual(self.change_log.runs(), [])
+
+        changes = self.change_log.pending('screening')
+        self.assertTrue(changes.full_scan)
+        self.change_log.acknowledge('screening', changes)
+        self.assertFalse(self.change_log.pending('screening').full_scan)
+
+    def test_corrupt_run_forces_full_scan(self):
+        """清单损坏时无法确定变更范围"""
+        self.change_log.acknowledge('screening', self.change_log.pending('screening'))
+        run_id = self._publish({FORWARD: {'159001': [20240105]}})
+        (self.change_log.changes_dir / f"{run_id}.json").write_text("{", encoding='utf-8')
+        self.assertTrue(self.change_log.pending('screening').full_scan)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+日更数据处理（ETF日更/daily_etf_processor.py）测试
+=================
+
+测试覆盖:
+- 列式复权计算与逐行计算（原实现）的结果逐字节一致，包括多文件拼接时按来源文件还原列类型
+- 内存受限的全量重建：每个文件都溢写时的输出与不溢写时逐字节一致，同一代码+日期以较晚的文件为准
+- 并行写入：同一代码的三个复权文件落在同一分片，进程池写入与主进程顺序写入逐字节一致（经典CSV和追加尾段）
+
+运行测试:
+    python -m pytest tests/test_daily_etf_processor.py
+"""
+
+import io
+import shutil
+import sys
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+# 添加项目路径
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+sys.path.insert(0, str(PROJECT_ROOT / "ETF日更"))
+
+import daily_etf_processor as processor
+from config.etf_store import read_etf_csv
+
+CODES = ['159001.SZ', '510300.SH', '512880.SH', '159003.SZ']
+
+
+def make_date_file(date: int, codes=CODES, seed: int = 0) -> pd.DataFrame:
+    """生成一个按日期格式的源数据（复权因子取不整的小数）"""
+    rng = np.random.default_rng(seed + date)
+    rows = []
+    for code in codes:
+        close = round(float(rng.uniform(0.5, 5.0)), 3)
+        rows.append([date, code, f"ETF{code[:6]}", round(close * 0.99, 3), round(close * 1.01, 3),
+                     round(close * 0.98, 3), close, round(close * 0.995, 3), 0.005, 0.5,
+                     int(rng.integers(1000, 100000)), round(float(rng.uniform(100, 9999)), 2),
+                     round(float(rng.uniform(0.8, 3.0)), 6)])
+    return pd.DataFrame(rows, columns=processor.DATE_FORMAT_FIELDS)
+
+
+def rowwise_adjust(df: pd.DataFrame) -> dict:
+    """原逐行实现（iterrows + calculate_adjusted_prices）"""
+    result = {adj_type: {} for adj_type in processor.ADJ_TYPES}
+    for _, row in df.iterrows():
+        etf_code = row['代码']
+        factor = float(row['复权因子'])
+        for adj_type in processor.ADJ_TYPES:
+            row_data = [etf_code, row['日期']]
+            for field in processor.PRICE_FIELDS:
+                row_data.append(processor.calculate_adjusted_prices(float(row[field]), factor)[adj_type])
+            row_data.extend([row['涨跌'], row['涨幅%'], row['成交量(手数)'], row['成交额(千元)']])
+            result[adj_type].setdefault(etf_code, []).append(row_data)
+    return result
+
+
+def csv_text(rows) -> str:
+    frame = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(rows, columns=processor.CODE_FORMAT_FIELDS)
+    return frame[processor.CODE_FORMAT_FIELDS].to_csv(index=False)
+
+
+class TestVectorizedAdjustment(unittest.TestCase):
+    """列式复权与逐行复权一致"""
+
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _write(self, df: pd.DataFrame, date: int) -> str:
+        path = self.temp_dir / f"{date}.csv"
+        df.to_csv(path, index=False, encoding='utf-8')
+        return str(path)
+
+    def assert_matches_rowwise(self, csv_files):
+        vectorized = processor.process_daily_files(csv_files)
+        expected = {adj_type: {} for adj_type in processor.ADJ_TYPES}
+        for csv_file in csv_files:
+            # 原实现逐个文件处理后把各文件的行列表按代码拼接，写入时整体构造DataFrame
+            for adj_type, etfs in rowwise_adjust(processor.read_daily_file(csv_file)).items():
+                for etf_code, rows in etfs.items():
+                    expected[adj_type].setdefault(etf_code, []).extend(rows)
+        for adj_type in processor.ADJ_TYPES:
+            self.assertEqual(list(vectorized[adj_type]), list(expected[adj_type]))
+            for etf_code, rows in expected[adj_type].items():
+                self.assertEqual(csv_text(vectorized[adj_type][etf_code]), csv_text(rows), f"{adj_type} {etf_code}")
+
+    def test_single_file(self):
+        df = make_date_file(20240105)
+        df = pd.concat([df, df.iloc[[1]].assign(收盘价=9.999)], ignore_index=True)  # 文件内重复行保留最后一条
+        self.assert_matches_rowwise([self._write(df, 20240105)])
+
+    def test_adjusted_values(self):
+        df = make_date_file(20240105)
+        frames = processor.process_daily_files([self._write(df, 20240105)])
+        row = df.iloc[0]
+        forward = frames['forward'][row['代码']].iloc[0]
+        backward = frames['backward'][row['代码']].iloc[0]
+        self.assertEqual(forward['收盘价'], row['收盘价'] / row['复权因子'])
+        self.assertEqual(backward['收盘价'], row['收盘价'] * row['复权因子'])
+        self.assertEqual(frames['no_adjust'][row['代码']].iloc[0]['收盘价'], row['收盘价'])
+
+    def test_mixed_dtypes_across_files(self):
+        """某天成交量含空值（浮点列），只在其他日期出现的ETF保持整数输出"""
+        day1 = make_date_file(20240104, CODES[:3])
+        day2 = make_date_file(20240105, CODES[1:])
+        day2.loc[0, '成交量(手数)'] = np.nan
+        files = [self._write(day1, 20240104), self._write(day2, 20240105)]
+        self.assert_matches_rowwise(files)
+
+        no_adjust = processor.process_daily_files(files)['no_adjust']
+        self.assertNotIn('.0', csv_text(no_adjust[CODES[0]]).splitlines()[1].split(',')[9])
+
+    def test_invalid_file_skipped(self):
+        bad = make_date_file(20240104).astype({'收盘价': object})
+        bad.loc[0, '收盘价'] = '停牌'  # 无法转换为数值，整个文件跳过
+        files = [self._write(bad, 20240104), self._write(make_date_file(20240105), 20240105)]
+        frames = processor.process_daily_files(files)
+        self.assertEqual(frames['forward'][CODES[0]]['日期'].tolist(), [20240105])
+
+    def test_buffer_input(self):
+        df = make_date_file(20240105)
+        buffer = io.StringIO(df.to_csv(index=False))
+        buffer.name = "20240105.csv"
+        frames = processor.process_daily_files([buffer])
+        self.assertEqual(list(frames['backward']), CODES)
+
+
+def tree_bytes(base_dir: Path) -> dict:
+    """三个复权目录下所有文件的内容（含列式副本）"""
+    return {str(path.relative_to(base_dir)): path.read_bytes()
+            for category in processor.CATEGORIES for path in sorted((base_dir / category).rglob("*"))
+            if path.is_file()}
+
+
+class OutputTestCase(unittest.TestCase):
+    """在临时目录中写入若干日期文件，输出到两个独立的输出目录"""
+
+    DATES = [20240102, 20240103, 20240104, 20240105]
+
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.csv_files = []
+        for i, date in enumerate(self.DATES):
+            df = make_date_file(date, CODES[i % 2:])
+            path = self.temp_dir / "source" / f"{date}.csv"
+            path.parent.mkdir(exist_ok=True)
+            df.to_csv(path, index=False, encoding='utf-8')
+            self.csv_files.append(str(path))
+        self.outputs = []
+        for name in ("expected", "actual"):
+            output_dir = self.temp_dir / name
+            processor.ensure_output_directories(str(output_dir), quiet=True)
+            self.outputs.append(output_dir)
+
+
+class TestRebuildStreaming(OutputTestCase):
+    """溢写分段合并与一次性重建一致"""
+
+    def test_spilled_rebuild_matches_in_memory(self):
+        # 最后一个文件重发前一天的数据（收盘价修正），合并时后段覆盖前段
+        corrected = make_date_file(20240104, CODES).assign(收盘价=9.876)
+        corrected_file = self.temp_dir / "source" / "20240105_corrected.csv"
+        corrected.to_csv(corrected_file, index=False, encoding='utf-8')
+        csv_files = self.csv_files + [str(corrected_file)]
+
+        expected, actual = self.outputs
+        in_memory = processor.rebuild_streaming(csv_files, memory_limit_mb=1024, output_dir=str(expected))
+        spilled = processor.rebuild_streaming(csv_files, memory_limit_mb=0, output_dir=str(actual))
+
+        self.assertEqual(in_memory['runs'], 0)
+        self.assertEqual(spilled['runs'], len(csv_files))
+        self.assertEqual(spilled['etfs'], in_memory['etfs'])
+        self.assertEqual(tree_bytes(actual), tree_bytes(expected))
+        self.assertEqual(list(actual.glob(".rebuild_spill_*")), [])  # 溢写目录已清理
+
+        frame = pd.read_csv(actual / processor.CATEGORIES[2] / "510300.csv")
+        self.assertEqual(frame['日期'].tolist(), [20240105, 20240104, 20240103, 20240102])
+        self.assertEqual(frame.loc[frame['日期'] == 20240104, '收盘价'].tolist(), [9.876])
+
+
+class TestParallelWrites(OutputTestCase):
+    """按ETF分片的进程池写入"""
+
+    def test_shards_keep_codes_together(self):
+        tasks = [(category, f"{510000 + i}.SH", None) for category in processor.CATEGORIES for i in range(50)]
+        shards = processor.shard_by_etf(tasks, workers=2)
+        self.assertLessEqual(len(shards), 2 * processor.SHARDS_PER_WORKER)
+        self.assertEqual(sorted(task for shard in shards for task in shard), sorted(tasks))
+        owners = {}
+        for i, shard in enumerate(shards):
+            for _, etf_code, _ in shard:
+                self.assertEqual(owners.setdefault(etf_code, i), i)
+
+    def _apply(self, output_dir: Path, workers: int, store: str):
+        """先用前两天重建，再增量写入后两天"""
+        history = processor.process_daily_files(self.csv_files[:2])
+        processor.merge_and_save_etf_data(history, 'rebuild', output_dir=str(output_dir), quiet=True)
+        update = processor.process_daily_files(self.csv_files[2:])
+        with mock.patch.object(processor, 'PARALLEL_MIN_FILES', 1), \
+                mock.patch.object(processor, 'ProcessPoolExecutor', wraps=ProcessPoolExecutor) as pool:
+            processor.merge_and_save_etf_data(update, 'incremental', store=store, compact_rows=100,
+                                              workers=workers, output_dir=str(output_dir), quiet=True)
+        self.assertEqual(pool.called, workers > 1)
+
+    def test_parallel_matches_sequential(self):
+        for store in ('classic', 'append'):
+            with self.subTest(store=store):
+                expected, actual = self.outputs
+                self._apply(expected, 1, store)
+                self._apply(actual, 2, store)
+                self.assertEqual(tree_bytes(actual), tree_bytes(expected))
+                self.assertEqual(list(actual.rglob("*.tmp")), [])
+                written = read_etf_csv(actual / processor.CATEGORIES[0] / "510300.csv")
+                self.assertEqual(written['日期'].astype(int).tolist(), sorted(self.DATES, reverse=True))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+数据库全量校验（ETF_database/data_validator.py）测试
+=================
+
+测试覆盖:
+- CSV有新数据而未导入时校验发现不一致
+- 复权价格的校验精度：大于 5e-9 的差异被发现，逐行比对定位到文件名为6位代码的CSV中的字段差异
+- 小于校验精度的差异不影响结果（精度如文档所述）
+
+运行测试:
+    python -m pytest tests/test_data_validator.py
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import pandas as pd
+
+# 添加项目路径（ETF_database 下的模块按顶层模块名互相导入）
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+sys.path.insert(0, str(PROJECT_ROOT / "ETF_database"))
+
+from data_validator import CATEGORY_TABLES, ETFDataValidator, is_consistent
+from importers.daily_importer import DailyDataImporter
+
+from config.etf_store import append_rows, write_csv_atomic
+
+HEADER = ['代码', '日期', '开盘价', '最高价', '最低价', '收盘价', '上日收盘', '涨跌', '涨幅%', '成交量(手数)', '成交额(千元)']
+DATES = [20231228, 20231229, 20240102, 20240103, 20240104]
+FORWARD = '0_ETF日K(前复权)'
+PRICE = 0.8602290750774405  # 前复权价格为全精度浮点数
+
+
+def make_rows(code: str, dates, price: float = PRICE) -> pd.DataFrame:
+    """生成按代码数据（日期降序）"""
+    return pd.DataFrame([[code, date, price, price * 1.01, price * 0.99, price, price * 0.998, 0.002, 0.16, 12345, 1523.4]
+                         for date in sorted(dates, reverse=True)], columns=HEADER)
+
+
+class TestValidator(unittest.TestCase):
+    """导入后修改CSV，检查校验结果"""
+
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.base_dir = self.temp_dir / "ETF日更"
+        for category in CATEGORY_TABLES:
+            category_dir = self.base_dir / category
+            category_dir.mkdir(parents=True)
+            for code in ['159001.SZ', '159003.SZ']:
+                write_csv_atomic(make_rows(code, DATES), category_dir / f"{code[:6]}.csv")
+
+        env = mock.patch.dict(os.environ, {'DB_BACKEND': 'sqlite', 'DB_PATH': str(self.temp_dir / "etf.sqlite")})
+        env.start()
+        self.addCleanup(env.stop)
+        DailyDataImporter(workers=1).import_daily_directories(str(self.base_dir))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _validate(self) -> dict:
+        return ETFDataValidator(base_dir=str(self.base_dir), workers=1).run_validation()
+
+    def _change_close(self, delta: float):
+        """修改 159001 在 2024-01-03 的前复权收盘价"""
+        csv_file = self.base_dir / FORWARD / "159001.csv"
+        frame = pd.read_csv(csv_file)
+        frame.loc[frame['日期'] == 20240103, '收盘价'] += delta
+        write_csv_atomic(frame, csv_file)
+
+    def test_consistent_after_import(self):
+        """导入后全部一致"""
+        self.assertTrue(all(is_consistent(result) for result in self._validate().values()))
+
+    def test_unimported_rows(self):
+        """CSV中有数据库没有的行时校验不一致"""
+        append_rows(self.base_dir / FORWARD / "159003.csv", make_rows('159003.SZ', [20240105, 20240108]))
+
+        validation = self._validate()
+        self.assertEqual(validation['forward_adjusted']['missing'], 0)  # 2024-01 分桶已存在，统计不一致
+        self.assertEqual(validation['forward_adjusted']['mismatched'], 1)
+        self.assertFalse(is_consistent(validation['forward_adjusted']))
+        self.assertTrue(is_consistent(validation['ex_rights']))
+
+    def test_small_price_difference_drill_down(self):
+        """1e-6 的复权价格差异被发现，逐行比对报告字段差异而不是缺行"""
+        self._change_close(1e-6)
+        with self.assertLogs('data_validator', level='WARNING') as logs:
+            validation = self._validate()
+        self.assertEqual(validation['forward_adjusted']['mismatched'], 1)
+        output = "\n".join(logs.output)
+        self.assertIn("159001.SZ 2024-01: 1 处差异", output)
+        self.assertIn("2024-01-03: close_price CSV=", output)
+        self.assertNotIn("CSV中没有该行", output)
+
+    def test_difference_below_tolerance(self):
+        """小于 0.5e-8 的差异在校验精度以下"""
+        self._change_close(1e-12)
+        self.assertTrue(is_consistent(self._validate()['forward_adjusted']))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+按水位增量导入（SQLite 嵌入式后端）测试
+=================
+
+测试覆盖:
+- 全量导入后校验一致
+- 文件名为6位代码、代码列带交易所后缀时，水位与文件对应
+- 追加尾段后按水位增量导入：水位前进，校验仍一致；没有新数据时不读取任何文件
+
+运行测试:
+    python -m pytest tests/test_database_sqlite.py
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import pandas as pd
+
+# 添加项目路径（ETF_database 下的模块按顶层模块名互相导入）
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+sys.path.insert(0, str(PROJECT_ROOT / "ETF_database"))
+
+from bulk_loader import load_watermarks
+from data_validator import CATEGORY_TABLES, ETFDataValidator, is_consistent
+from db_connection import ETFDatabaseManager
+from importers.daily_importer import DailyDataImporter
+
+from config.etf_store import append_rows, write_csv_atomic
+
+HEADER = ['代码', '日期', '开盘价', '最高价', '最低价', '收盘价', '上日收盘', '涨跌', '涨幅%', '成交量(手数)', '成交额(千元)']
+CODES = ['159001.SZ', '159003.SZ']
+DATES = [20231228, 20231229, 20240102, 20240103, 20240104]
+
+
+def make_rows(code: str, dates, close: float = 1.234) -> pd.DataFrame:
+    """生成按代码数据（日期降序）"""
+    return pd.DataFrame([[code, date, close, close + 0.01, close - 0.01, close, close - 0.002, 0.002, 0.16, 12345, 1523.4]
+                         for date in sorted(dates, reverse=True)], columns=HEADER)
+
+
+class TestSQLiteImportCycle(unittest.TestCase):
+    """导入 -> 水位 -> 校验"""
+
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.base_dir = self.temp_dir / "ETF日更"
+        for category in CATEGORY_TABLES:
+            category_dir = self.base_dir / category
+            category_dir.mkdir(parents=True)
+            for code in CODES:
+                # 与日更输出一致：文件名为6位代码，代码列带交易所后缀
+                write_csv_atomic(make_rows(code, DATES), category_dir / f"{code[:6]}.csv")
+
+        env = mock.patch.dict(os.environ, {'DB_BACKEND': 'sqlite', 'DB_PATH': str(self.temp_dir / "etf.sqlite")})
+        env.start()
+        self.addCleanup(env.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _validate(self) -> dict:
+        return ETFDataValidator(base_dir=str(self.base_dir), workers=1).run_validation()
+
+    def _watermarks(self, table: str) -> dict:
+        db_manager = ETFDatabaseManager()
+        self.assertTrue(db_manager.connect())
+        try:
+            return load_watermarks(db_manager, f"basic_info_daily.{table}")
+        finally:
+            db_manager.disconnect()
+
+    def test_full_import_then_incremental(self):
+        """全量导入后一致；追加新日期后增量导入，水位前进且仍一致"""
+        results = DailyDataImporter(workers=1).import_daily_directories(str(self.base_dir))
+        self.assertTrue(all(results.values()))
+        validation = self._validate()
+        self.assertEqual(set(validation), set(CATEGORY_TABLES.values()))
+        self.assertTrue(all(is_consistent(result) for result in validation.values()))
+        self.assertEqual(self._watermarks('forward_adjusted'), {'159001': 20240104, '159003': 20240104})
+
+        # 只有 159001 有新数据（写入尾段）
+        for category in CATEGORY_TABLES:
+            append_rows(self.base_dir / category / "159001.csv", make_rows('159001.SZ', [20240105], close=1.3))
+
+        results = DailyDataImporter(workers=1).import_latest_data_only(str(self.base_dir))
+        self.assertTrue(all(results.values()))
+        for table in CATEGORY_TABLES.values():
+            self.assertEqual(self._watermarks(table), {'159001': 20240105, '159003': 20240104})
+        validation = self._validate()
+        self.assertTrue(all(is_consistent(result) for result in validation.values()))
+        self.assertEqual(validation['forward_adjusted']['db_rows'], len(CODES) * len(DATES) + 1)
+
+        # 再次增量导入没有新数据，不读取任何文件
+        importer = DailyDataImporter(workers=1)
+        self.assertTrue(importer.connect())
+        try:
+            for category in CATEGORY_TABLES:
+                adj_type = category.split('(')[1].rstrip(')')
+                self.assertEqual(importer._detect_new_rows(str(self.base_dir / category), adj_type), [])
+        finally:
+            importer.disconnect()
+        results = DailyDataImporter(workers=1).import_latest_data_only(str(self.base_dir))
+        self.assertFalse(any(results.values()))
+
+
+if __name__ == '__main__':
+    unittest.main()
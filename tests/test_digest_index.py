@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+摘要索引（config/digest_index.py）测试
+=================
+
+测试覆盖:
+- 按变更清单增量更新（含追加尾段）后的索引与整体重建一致
+- 未发布清单的改写由文件签名核对发现并重建
+- 摘要比较：一致的ETF不深入，不一致和右侧缺少的日期被找出
+
+运行测试:
+    python -m pytest tests/test_digest_index.py
+"""
+
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import pandas as pd
+
+# 添加项目路径
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from config.change_manifest import ChangeLog, ChangeSet
+from config.digest_index import DigestIndex, diff_indexes
+from config.etf_store import append_rows, write_csv_atomic
+
+CATEGORIES = ["0_ETF日K(前复权)", "0_ETF日K(后复权)"]
+HEADER = ['代码', '日期', '开盘价', '最高价', '最低价', '收盘价', '上日收盘', '涨跌', '涨幅%', '成交量(手数)', '成交额(千元)']
+DAY_MONTHS = 600  # 测试数据的日期都在逐日哈希保存期内
+DATES = [20231228, 20231229, 20240102, 20240103, 20240104, 20240105]
+
+
+def make_rows(code: str, dates, close: float = 1.0) -> pd.DataFrame:
+    """生成按代码数据（日期降序）"""
+    return pd.DataFrame([[code, date, close, close, close, close, close, 0.0, 0.0, 100.0, 1000.0]
+                         for date in sorted(dates, reverse=True)], columns=HEADER)
+
+
+def write_etf(base_dir: Path, category: str, code: str, dates, close: float = 1.0):
+    """写入经典CSV"""
+    category_dir = base_dir / category
+    category_dir.mkdir(parents=True, exist_ok=True)
+    write_csv_atomic(make_rows(code, dates, close), category_dir / f"{code}.csv")
+
+
+def snapshot(index: DigestIndex) -> dict:
+    """索引内容（不含文件签名）"""
+    return {category: (index.category_summary(category),
+                       {code: summary for code, summary in index.etf_summaries(category).items()},
+                       index.month_digests(category, 0, 999999),
+                       index.day_hashes(category, 0, 99999999))
+            for category in CATEGORIES}
+
+
+class TestDigestSync(unittest.TestCase):
+    """增量更新与整体重建"""
+
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        for category in CATEGORIES:
+            for code in ['159001', '159003']:
+                write_etf(self.temp_dir, category, code, DATES)
+        self.index = DigestIndex(self.temp_dir, day_months=DAY_MONTHS)
+        self.index.sync(CATEGORIES)  # 首次同步：消费者尚未确认过，整体重建
+
+    def tearDown(self):
+        self.index.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _rebuilt(self) -> dict:
+        """在副本目录整体重建的索引内容"""
+        copy_dir = Path(tempfile.mkdtemp())
+        try:
+            for category in CATEGORIES:
+                shutil.copytree(self.temp_dir / category, copy_dir / category)
+            index = DigestIndex(copy_dir, day_months=DAY_MONTHS)
+            try:
+                index.rebuild(CATEGORIES)
+                return snapshot(index)
+            finally:
+                index.close()
+        finally:
+            shutil.rmtree(copy_dir, ignore_errors=True)
+
+    def test_initial_sync_rebuilds(self):
+        """首次同步整体建立索引"""
+        self.assertEqual(snapshot(self.index), self._rebuilt())
+        self.assertEqual(self.index.category_summary(CATEGORIES[0])[1], 2 * len(DATES))
+
+    def test_incremental_sync_matches_rebuild(self):
+        """发布清单后增量更新（新增日期、修改历史日期、追加尾段、新ETF），结果与整体重建一致"""
+        forward, backward = CATEGORIES
+        write_etf(self.temp_dir, forward, '159001', DATES + [20240108], close=1.0)
+        write_etf(self.temp_dir, backward, '159001', DATES, close=2.0)  # 修改历史日期
+        append_rows(self.temp_dir / forward / "159003.csv", make_rows('159003', [20240108, 20240103], 3.0))
+        write_etf(self.temp_dir, forward, '159005', [20240105, 20240108])
+        ChangeLog(self.temp_dir).publish('daily', ChangeSet({
+            forward: {'159001': [20240108], '159003': [20240103, 20240108], '159005': [20240105, 20240108]},
+            backward: {'159001': DATES},
+        }))
+
+        stats = self.index.sync(CATEGORIES)
+        self.assertEqual(stats['updated'], 4)
+        self.assertEqual(stats['rebuilt'], 0)
+        self.assertEqual(snapshot(self.index), self._rebuilt())
+
+    def test_unpublished_rewrite_found_by_verify(self):
+        """未发布清单直接改写的文件，按签名核对时重建"""
+        write_etf(self.temp_dir, CATEGORIES[0], '159003', DATES, close=5.0)
+        (self.temp_dir / CATEGORIES[1] / "159003.csv").unlink()
+
+        stats = self.index.sync(CATEGORIES, verify=True)
+        self.assertEqual(stats['reindexed'], 1)
+        self.assertEqual(stats['removed'], 1)
+        self.assertNotIn('159003', self.index.etf_summaries(CATEGORIES[1]))
+        self.assertEqual(snapshot(self.index), self._rebuilt())
+
+
+class TestDiffIndexes(unittest.TestCase):
+    """两个目录的摘要比较（左侧为基准）"""
+
+    def setUp(self):
+        self.weekly_dir = Path(tempfile.mkdtemp())
+        self.daily_dir = Path(tempfile.mkdtemp())
+        for category in CATEGORIES:
+            for code in ['159001', '159003', '159007']:
+                write_etf(self.weekly_dir, category, code, DATES)
+            write_etf(self.weekly_dir, category, '159005', [20240104, 20240105])  # 日更没有该ETF
+            write_etf(self.daily_dir, category, '159001', DATES + [20240108])  # 日更多出的日期不比较
+            write_etf(self.daily_dir, category, '159003', [date for date in DATES if date != 20240104])
+        write_etf(self.daily_dir, CATEGORIES[0], '159007', DATES, close=2.0)
+        write_etf(self.daily_dir, CATEGORIES[1], '159007', DATES)
+        self.indexes = [DigestIndex(base_dir, day_months=DAY_MONTHS) for base_dir in (self.weekly_dir, self.daily_dir)]
+        for index in self.indexes:
+            index.rebuild(CATEGORIES)
+
+    def tearDown(self):
+        for index in self.indexes:
+            index.close()
+        shutil.rmtree(self.weekly_dir, ignore_errors=True)
+        shutil.rmtree(self.daily_dir, ignore_errors=True)
+
+    def test_missing_and_changed_dates(self):
+        """值不一致、右侧缺少的日期和右侧缺少的ETF都被找出"""
+        diff = diff_indexes(self.indexes[0], self.indexes[1], CATEGORIES, 20240102, 20240131)
+        forward, backward = CATEGORIES
+        self.assertEqual(diff['dates'], {
+            (forward, '159003'): {20240104},
+            (forward, '159005'): {20240104, 20240105},
+            (forward, '159007'): {20240102, 20240103, 20240104, 20240105},
+            (backward, '159003'): {20240104},
+            (backward, '159005'): {20240104, 20240105},
+        })
+        self.assertEqual(diff['months'], {})
+        self.assertEqual(diff['etfs'], {'159001', '159003', '159005', '159007'})
+        self.assertEqual(diff['matched'][(forward, '159001')], 4)
+        self.assertEqual(diff['matched'][(backward, '159007')], 4)
+
+    def test_identical_directories(self):
+        """两边完全一致时跳过整个复权目录"""
+        diff = diff_indexes(self.indexes[0], self.indexes[0], CATEGORIES)
+        self.assertEqual(diff['skipped_categories'], CATEGORIES)
+        self.assertEqual(diff['dates'], {})
+
+
+if __name__ == '__main__':
+    unittest.main()
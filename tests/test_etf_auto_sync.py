@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+周更同步压缩包流式解压（ETF周更/etf_auto_sync.py）测试
+=================
+
+测试覆盖:
+- unrar v 列表解析：成员大小、CRC32、带空格的名称，只保留类别目录下的非空 csv
+- 每个成员核对字节数和CRC32后立即产出，不等后续成员输出
+- CRC32 不一致时中止，之前已校验的成员已产出、之后的成员不产出
+- 列表中没有CRC32的成员等 unrar 正常退出后才产出
+
+本机不一定装有 unrar，这里记录 unrar v 的输出并替换 unrar p 的管道
+
+运行测试:
+    python -m pytest tests/test_etf_auto_sync.py
+"""
+
+import io
+import subprocess
+import sys
+import unittest
+import zlib
+from pathlib import Path
+from unittest import mock
+
+# 添加项目路径
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+sys.path.insert(0, str(PROJECT_ROOT / "ETF周更"))
+
+import etf_auto_sync
+
+CATEGORY = "0_ETF日K(前复权)"
+FIRST = "代码,日期,收盘价\n159001.SZ,20240105,1.5\n".encode('utf-8')
+SECOND = "代码,日期,收盘价\n159003.SZ,20240105,2.5".encode('utf-8')  # 末尾没有换行
+
+
+def listing_line(name: str, content: bytes, checksum: str = None) -> str:
+    checksum = checksum or f"{zlib.crc32(content):08X}"
+    return f" -rw-r--r--  {len(content):>8}  {len(content):>8} 100%  2024-01-05 16:00  {checksum}  {name}"
+
+
+def unrar_listing(*lines: str) -> str:
+    separator = "----------- ---------  -------- ----- ---------- -----  --------  ----"
+    return "\n".join([
+        "UNRAR 6.24 freeware      Copyright (c) 1993-2023 Alexander Roshal",
+        "",
+        "Archive: test.rar",
+        "Details: RAR 5",
+        "",
+        " Attributes      Size    Packed Ratio    Date    Time   Checksum  Name",
+        separator,
+        *lines,
+        separator,
+        "                   100       100 100%                             2",
+    ])
+
+
+class RecordingStream(io.BytesIO):
+    """记录读到的位置，用于判断产出时后续成员是否已被读取"""
+
+    def __init__(self, data: bytes):
+        super().__init__(data)
+        self.positions = []
+
+    def read(self, size=-1):
+        chunk = super().read(size)
+        self.positions.append(self.tell())
+        return chunk
+
+
+class FakeUnrar:
+    def __init__(self, stream: bytes, returncode: int = 0):
+        self.stdout = RecordingStream(stream)
+        self.returncode = None
+        self._returncode = returncode
+
+    def wait(self):
+        if self.returncode is None:
+            self.returncode = self._returncode
+        return self.returncode
+
+    def poll(self):
+        return self.returncode
+
+    def kill(self):
+        self.returncode = -9
+
+
+class TestIterUnrarMembers(unittest.TestCase):
+
+    def _iter(self, listing: str, stream: bytes, returncode: int = 0):
+        self.proc = FakeUnrar(stream, returncode)
+        listed = subprocess.CompletedProcess(['unrar', 'v'], 0, stdout=listing, stderr='')
+        with mock.patch.object(etf_auto_sync.subprocess, 'run', return_value=listed), \
+                mock.patch.object(etf_auto_sync.subprocess, 'Popen', return_value=self.proc) as popen:
+            yield from etf_auto_sync._iter_unrar_members("test.rar", CATEGORY)
+        self.popen_args = popen.call_args[0][0]
+
+    def test_list_members(self):
+        listing = unrar_listing(
+            listing_line(f"{CATEGORY}/159001.csv", FIRST),
+            listing_line(f"{CATEGORY}/159002 old.csv", b"", "00000000"),
+            listing_line(f"{CATEGORY} 2/159003.csv", SECOND, "BLAKE2"),
+            listing_line(f"0_ETF日K(后复权)/159001.csv", FIRST),
+        )
+        with mock.patch.object(etf_auto_sync.subprocess, 'run', return_value=subprocess.CompletedProcess(
+                ['unrar', 'v'], 0, stdout=listing, stderr='')):
+            members = etf_auto_sync._list_rar_members("test.rar")
+        self.assertEqual(members, [
+            (f"{CATEGORY}/159001.csv", len(FIRST), zlib.crc32(FIRST)),
+            (f"{CATEGORY}/159002 old.csv", 0, 0),
+            (f"{CATEGORY} 2/159003.csv", len(SECOND), None),
+            ("0_ETF日K(后复权)/159001.csv", len(FIRST), zlib.crc32(FIRST)),
+        ])
+
+    def test_members_stream_as_verified(self):
+        listing = unrar_listing(listing_line(f"{CATEGORY}/159001.csv", FIRST),
+                                listing_line(f"{CATEGORY}/159002.csv", b"", "00000000"),
+                                listing_line(f"{CATEGORY}/159003.csv", SECOND))
+        members = self._iter(listing, FIRST + SECOND)
+
+        self.assertEqual(next(members), ("159001.csv", FIRST))
+        self.assertEqual(self.proc.stdout.tell(), len(FIRST))  # 第二个成员尚未读取
+        self.assertEqual(list(members), [("159003.csv", SECOND)])
+        self.assertEqual(self.popen_args[-2:], [f"{CATEGORY}/159001.csv", f"{CATEGORY}/159003.csv"])
+
+    def test_crc_mismatch_stops(self):
+        listing = unrar_listing(listing_line(f"{CATEGORY}/159001.csv", FIRST),
+                                listing_line(f"{CATEGORY}/159003.csv", SECOND),
+                                listing_line(f"{CATEGORY}/159005.csv", FIRST))
+        corrupted = SECOND[:-1] + b"9"
+        members = self._iter(listing, FIRST + corrupted + FIRST)
+
+        self.assertEqual(next(members), ("159001.csv", FIRST))
+        with self.assertRaisesRegex(RuntimeError, "159003.csv CRC32"):
+            next(members)
+        self.assertEqual(self.proc.returncode, -9)
+
+    def test_unverified_members_wait_for_exit(self):
+        listing = unrar_listing(listing_line(f"{CATEGORY}/159001.csv", FIRST, "BLAKE2"),
+                                listing_line(f"{CATEGORY}/159003.csv", SECOND))
+        self.assertEqual(list(self._iter(listing, FIRST + SECOND)),
+                         [("159003.csv", SECOND), ("159001.csv", FIRST)])
+
+        yielded = []
+        with self.assertRaisesRegex(RuntimeError, "错误码"):
+            for member in self._iter(listing, FIRST + SECOND, returncode=3):
+                yielded.append(member)
+        self.assertEqual(yielded, [("159003.csv", SECOND)])  # 未校验的成员不产出
+
+
+if __name__ == '__main__':
+    unittest.main()
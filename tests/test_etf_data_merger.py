@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+周更数据合并（ETF周更/etf_data_merger.py）测试
+=================
+
+测试覆盖:
+- 有序归并与按键去重合并（原实现：新数据优先、按日期去重）的结果逐字节一致：
+  只有更晚日期（快速路径）、修正重叠日期、补齐中间日期、新数据乱序且有重复日期
+- 新数据已全部包含在历史文件中时跳过，不重写文件
+- 变更日期只包含新增和内容改变的日期
+- 没有日期列的文件退回按键去重；历史目录中没有的文件按日期降序写入
+- 合并后列式副本与CSV一致
+
+运行测试:
+    python -m pytest tests/test_etf_data_merger.py
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import pandas as pd
+
+# 添加项目路径
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+sys.path.insert(0, str(PROJECT_ROOT / "ETF周更"))
+
+from config.columnar_store import is_columnar_fresh, read_columnar
+from config.etf_store import write_csv_atomic
+import etf_data_merger as merger
+
+HEADER = ['代码', '日期', '开盘价', '最高价', '最低价', '收盘价', '上日收盘', '涨跌', '涨幅%', '成交量(手数)', '成交额(千元)']
+HISTORY_DATES = [20240110, 20240109, 20240108, 20240105, 20240104, 20240103]
+
+
+def make_rows(dates, close: str = '1.5') -> pd.DataFrame:
+    """按给定顺序生成一个ETF的行（字符串，与合并时的读取方式一致）"""
+    return pd.DataFrame([['159001.SZ', str(date), '1.5', '1.6', '1.4', close, '1.5', '0.0', '0.0', '1000', '150.0']
+                         for date in dates], columns=HEADER)
+
+
+def reference_merge(history: pd.DataFrame, new: pd.DataFrame) -> pd.DataFrame:
+    """原实现：新数据在前拼接，按日期去重保留先出现的行，再按日期降序排列"""
+    combined = pd.concat([new, history], ignore_index=True).drop_duplicates(subset=['日期'], keep='first')
+    return combined.sort_values('日期', ascending=False, kind='stable', key=lambda s: s.astype(int))
+
+
+class TestMergeTwoFolders(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.hist_dir = self.temp_dir / "hist"
+        self.new_dir = self.temp_dir / "new"
+        self.hist_dir.mkdir()
+        self.new_dir.mkdir()
+        self.history = make_rows(HISTORY_DATES)
+        write_csv_atomic(self.history, self.hist_dir / "159001.csv")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _merge(self, new: pd.DataFrame, name: str = "159001.csv") -> dict:
+        new.to_csv(self.new_dir / name, index=False)
+        return merger.merge_two_folders(str(self.hist_dir), str(self.new_dir))
+
+    def _expected_bytes(self, new: pd.DataFrame) -> bytes:
+        expected_path = self.temp_dir / "expected.csv"
+        write_csv_atomic(reference_merge(self.history, new), expected_path)
+        return expected_path.read_bytes()
+
+    def assert_matches_reference(self, new: pd.DataFrame, changed_dates):
+        expected = self._expected_bytes(new)
+        summary = self._merge(new)
+        path = self.hist_dir / "159001.csv"
+        self.assertEqual(path.read_bytes(), expected)
+        self.assertEqual(summary['updated'], 1)
+        self.assertEqual(sorted(summary['changed_dates']['159001.csv']), sorted(changed_dates))
+        self.assertEqual(os.listdir(self.new_dir), [])
+
+        if merger.columnar_enabled():
+            self.assertTrue(is_columnar_fresh(path))
+            self.assertEqual(read_columnar(path)['日期'].astype(int).tolist(),
+                             pd.read_csv(path)['日期'].tolist())
+        return summary
+
+    def test_unchanged_file_skipped(self):
+        path = self.hist_dir / "159001.csv"
+        before = path.read_bytes()
+        summary = self._merge(make_rows(HISTORY_DATES[:3]))
+        self.assertEqual((summary['updated'], summary['skipped']), (0, 1))
+        self.assertEqual(summary['changed_dates'], {})
+        self.assertEqual(path.read_bytes(), before)
+
+    def test_newer_rows_prepended(self):
+        summary = self.assert_matches_reference(make_rows([20240112, 20240111] + HISTORY_DATES[:2]),
+                                                [20240112, 20240111])
+        self.assertEqual(summary['rows_added'], {'159001.csv': 2})
+
+    def test_corrected_overlap(self):
+        new = pd.concat([make_rows([20240111]), make_rows([20240110], close='1.7'), make_rows([20240109])],
+                        ignore_index=True)
+        summary = self.assert_matches_reference(new, [20240111, 20240110])
+        self.assertEqual(summary['rows_added'], {'159001.csv': 1})
+
+    def test_fill_gap(self):
+        summary = self.assert_matches_reference(make_rows([20240109, 20240108, 20240107, 20240105]), [20240107])
+        self.assertEqual(summary['rows_added'], {'159001.csv': 1})
+
+    def test_unsorted_new_rows_with_duplicates(self):
+        new = pd.concat([make_rows([20240102, 20240111]), make_rows([20240104], close='1.8'),
+                         make_rows([20240111], close='9.9')], ignore_index=True)
+        self.assert_matches_reference(new, [20240111, 20240104, 20240102])
+
+    def test_without_date_column(self):
+        history = pd.DataFrame({'time': ['0930', '0931'], 'price': ['1.0', '1.1']})
+        write_csv_atomic(history, self.hist_dir / "tick.csv")
+        self._merge(pd.DataFrame({'time': ['0931', '0932'], 'price': ['1.2', '1.3']}), "tick.csv")
+        merged = pd.read_csv(self.hist_dir / "tick.csv", dtype=str)
+        self.assertEqual(merged.values.tolist(), [['0931', '1.2'], ['0932', '1.3'], ['0930', '1.0']])
+
+    def test_new_listing_written(self):
+        summary = self._merge(make_rows([20240110, 20240111]), "159003.csv")
+        self.assertEqual(pd.read_csv(self.hist_dir / "159003.csv")['日期'].tolist(), [20240111, 20240110])
+        self.assertEqual(summary['changed_dates'], {'159003.csv': [20240111, 20240110]})
+
+
+if __name__ == '__main__':
+    unittest.main()
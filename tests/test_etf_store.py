@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+按代码数据存储（config/etf_store.py）测试
+=================
+
+测试覆盖:
+- 追加尾段后 read_etf_csv 与经典模式合并结果一致
+- 压实前后读取结果一致，压实后尾段删除
+- 只有尾段的新上市ETF
+- read_lines_since / read_frame_since / read_latest_lines 读取尾段
+
+运行测试:
+    python -m pytest tests/test_etf_store.py
+"""
+
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import pandas as pd
+
+# 添加项目路径
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from config.etf_store import (
+    append_rows, compact_directory, compact_etf_file, get_tail_path, has_tail, merge_with_existing,
+    read_etf_csv, read_frame_since, read_latest_lines, read_lines_since, write_csv_atomic
+)
+
+HEADER = ['代码', '日期', '开盘价', '最高价', '最低价', '收盘价', '上日收盘', '涨跌', '涨幅%', '成交量(手数)', '成交额(千元)']
+
+
+def make_rows(code: str, dates, close: float = 1.0) -> pd.DataFrame:
+    """生成按代码数据（日期顺序与传入一致）"""
+    return pd.DataFrame([[code, date, close, close + 0.1, close - 0.1, close, close, 0.0, 0.0, 100.0, 1000.5]
+                         for date in dates], columns=HEADER)
+
+
+class TestAppendStore(unittest.TestCase):
+    """追加尾段与压实"""
+
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.etf_file = self.temp_dir / "159001.SZ.csv"
+        self.classic = make_rows('159001.SZ', [20240105, 20240104, 20240103])
+        write_csv_atomic(self.classic, self.etf_file)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _expected(self, *new_frames) -> pd.DataFrame:
+        """经典模式逐次合并写入后的读取结果"""
+        reference = self.temp_dir / "reference.csv"
+        merged = pd.read_csv(self.etf_file, dtype=str)
+        for frame in new_frames:
+            merged = merge_with_existing(merged, frame)
+        write_csv_atomic(merged, reference)
+        return pd.read_csv(reference)
+
+    def test_append_matches_classic_merge(self):
+        """追加后读取结果与经典模式合并一致（同日期以新数据为准）"""
+        first = make_rows('159001.SZ', [20240108], close=2.0)
+        second = make_rows('159001.SZ', [20240105, 20240109], close=3.0)  # 覆盖已有日期
+        self.assertEqual(append_rows(self.etf_file, first), 1)
+        self.assertEqual(append_rows(self.etf_file, second), 3)
+        self.assertTrue(has_tail(self.etf_file))
+
+        expected = self._expected(first, second)
+        pd.testing.assert_frame_equal(read_etf_csv(self.etf_file), expected)
+        self.assertEqual(read_etf_csv(self.etf_file)['日期'].tolist(),
+                         [20240109, 20240108, 20240105, 20240104, 20240103])
+
+    def test_compact_round_trip(self):
+        """压实后的经典CSV与压实前的读取结果一致，尾段删除"""
+        new_rows = make_rows('159001.SZ', [20240108, 20240104], close=2.5)
+        append_rows(self.etf_file, new_rows)
+        before = read_etf_csv(self.etf_file)
+
+        self.assertTrue(compact_etf_file(self.etf_file))
+        self.assertFalse(has_tail(self.etf_file))
+        self.assertFalse(compact_etf_file(self.etf_file))  # 没有尾段时不重写
+        pd.testing.assert_frame_equal(pd.read_csv(self.etf_file, encoding='utf-8-sig'), before)
+        with open(self.etf_file, 'rb') as f:
+            self.assertEqual(f.read(3), b'\xef\xbb\xbf')  # 经典CSV保持 utf-8-sig
+
+    def test_tail_only_etf(self):
+        """新上市ETF只有尾段：可读取，压实后生成经典CSV"""
+        new_file = self.temp_dir / "159003.SZ.csv"
+        append_rows(new_file, make_rows('159003.SZ', [20240104, 20240105]))
+        append_rows(new_file, make_rows('159003.SZ', [20240105], close=2.0))
+
+        frame = read_etf_csv(new_file)
+        self.assertEqual(frame['日期'].tolist(), [20240105, 20240104])
+        self.assertEqual(frame['收盘价'].tolist(), [2.0, 1.0])
+
+        self.assertEqual(compact_directory(self.temp_dir), 1)
+        self.assertFalse(get_tail_path(new_file).parent.exists())
+        pd.testing.assert_frame_equal(pd.read_csv(new_file), frame)
+
+
+class TestReadSince(unittest.TestCase):
+    """只读取最近一段数据"""
+
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.etf_file = self.temp_dir / "159001.SZ.csv"
+        write_csv_atomic(make_rows('159001.SZ', [20240105, 20240104, 20240103, 20240102]), self.etf_file)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_classic_only(self):
+        """经典CSV读到更早的日期即停止"""
+        lines = read_lines_since(self.etf_file, 20240104)
+        self.assertEqual([int(line.split(',')[1]) for line in lines], [20240105, 20240104])
+
+    def test_tail_overrides_classic(self):
+        """尾段中的行覆盖经典CSV中同日期的行，尾段中早于 min_date 的行不返回"""
+        append_rows(self.etf_file, make_rows('159001.SZ', [20240108, 20240104, 20240102], close=9.0))
+        lines = read_lines_since(self.etf_file, 20240104)
+        self.assertEqual([int(line.split(',')[1]) for line in lines], [20240108, 20240105, 20240104])
+
+        frame = read_frame_since(self.etf_file, 20240104)
+        self.assertEqual(frame.columns.tolist(), HEADER)
+        self.assertEqual(frame['收盘价'].tolist(), [9.0, 1.0, 9.0])
+
+        # 与读取全部数据后按日期过滤的结果一致
+        full = read_etf_csv(self.etf_file)
+        expected = full[full['日期'] >= 20240104].reset_index(drop=True)
+        pd.testing.assert_frame_equal(frame, expected)
+
+    def test_latest_lines_with_tail(self):
+        """最新的行先取尾段（追加顺序的倒序），不足时再取经典CSV开头"""
+        append_rows(self.etf_file, make_rows('159001.SZ', [20240108, 20240109]))
+        dates = [int(line.split(',')[1]) for line in read_latest_lines(self.etf_file, 4)]
+        self.assertEqual(dates, [20240109, 20240108, 20240105, 20240104])
+
+    def test_no_rows_since(self):
+        """没有符合的行时返回空"""
+        self.assertEqual(read_lines_since(self.etf_file, 20250101), [])
+        self.assertTrue(read_frame_since(self.etf_file, 20250101).empty)
+
+
+if __name__ == '__main__':
+    unittest.main()
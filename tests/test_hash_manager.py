@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+哈希管理器（config/hash_manager.py）测试
+=================
+
+测试覆盖:
+- 同一进程内共用一个实例
+- 删除的记录立即导出，之后创建的实例不会从导出文件重新导入
+- 新增记录在 export_if_pending 时导出；哈希按文件内容计算，内容变化后重新计算
+
+运行测试:
+    python -m pytest tests/test_hash_manager.py
+"""
+
+import json
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+# 添加项目路径
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from config.hash_manager import HashManager, get_hash_manager
+
+
+class TestHashManager(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.hash_file = self.temp_dir / "file_hashes.json"
+        self.archive = self.temp_dir / "0_ETF日K(前复权)_2025年1月.rar"
+        self.archive.write_bytes(b"archive v1")
+        self.managers = []
+
+    def tearDown(self):
+        for manager in self.managers:
+            manager.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _manager(self) -> HashManager:
+        manager = HashManager(str(self.hash_file))
+        self.managers.append(manager)
+        return manager
+
+    def _exported(self) -> dict:
+        with open(self.hash_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def test_shared_instance(self):
+        manager = get_hash_manager(str(self.hash_file))
+        self.managers.append(manager)
+        self.assertIs(get_hash_manager(str(self.temp_dir / "." / "file_hashes.json")), manager)
+
+    def test_update_and_export(self):
+        manager = self._manager()
+        manager.update_file_hash(self.archive.name, str(self.archive))
+        self.assertTrue(manager.verify_file_integrity(self.archive.name, str(self.archive)))
+        self.assertFalse(self.hash_file.exists())  # 新增记录不立即导出
+
+        manager.export_if_pending()
+        self.assertEqual(self._exported(), manager.hash_data)
+
+        self.archive.write_bytes(b"archive v2, longer")
+        self.assertFalse(manager.verify_file_integrity(self.archive.name, str(self.archive)))
+
+    def test_deleted_records_not_reimported(self):
+        manager = self._manager()
+        manager.hash_data = {"old_2020年1月.rar": "a" * 32, "kept.rar": "b" * 32}
+        manager._save_hash_file()
+        manager.export_if_pending()
+
+        del manager.hash_data["old_2020年1月.rar"]
+        manager._save_hash_file()
+        self.assertEqual(set(self._exported()), {"kept.rar"})
+
+        # 另一个实例（如另一个进程）加载时不会重新导入已删除的记录
+        self.assertEqual(set(self._manager().hash_data), {"kept.rar"})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+最新日期缓存（config/latest_dates.py）测试
+=================
+
+测试覆盖:
+- 按日期降序的文件只读取开头，结果与读取整列取最大值一致
+- 开头不是降序或日期格式无法识别时回退为整列读取；YYYY-MM-DD 等格式的日期
+- 追加模式下的尾段一并计入
+- 缓存：未改动的文件不再读取，改动（包括追加尾段）后重新读取，新实例从缓存文件加载，已删除文件的缓存被清理
+
+运行测试:
+    python -m pytest tests/test_latest_dates.py
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import pandas as pd
+
+# 添加项目路径
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+import config.latest_dates as latest_dates
+from config.etf_store import append_rows, write_csv_atomic
+from config.latest_dates import CACHE_FILE_NAME, LatestDateCache, scan_latest_date
+
+HEADER = ['代码', '日期', '开盘价', '最高价', '最低价', '收盘价', '上日收盘', '涨跌', '涨幅%', '成交量(手数)', '成交额(千元)']
+CATEGORY = "0_ETF日K(前复权)"
+
+
+def make_rows(code: str, dates) -> pd.DataFrame:
+    """按给定顺序生成数据行"""
+    return pd.DataFrame([[f"{code}.SZ", date, 1.5, 1.6, 1.4, 1.5, 1.5, 0.0, 0.0, 1000, 150.0] for date in dates],
+                        columns=HEADER)
+
+
+class LatestDatesTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.base_dir = Path(tempfile.mkdtemp())
+        (self.base_dir / CATEGORY).mkdir()
+
+    def tearDown(self):
+        shutil.rmtree(self.base_dir, ignore_errors=True)
+
+    def write(self, code: str, dates) -> Path:
+        path = self.base_dir / CATEGORY / f"{code}.csv"
+        write_csv_atomic(make_rows(code, dates), path)
+        return path
+
+
+class TestScanLatestDate(LatestDatesTestCase):
+
+    def test_descending_reads_head_only(self):
+        path = self.write('159001', [20240105, 20240104, 20240103])
+        with mock.patch.object(latest_dates, '_scan_full', side_effect=AssertionError("整列读取")):
+            self.assertEqual(scan_latest_date(path), 20240105)
+
+    def test_matches_full_scan(self):
+        cases = {
+            '159001': [20240105, 20240104, 20240103],
+            '159002': [20240103, 20240104, 20240105],  # 升序
+            '159003': [20240104, 20240105, 20240103],  # 第二行更晚
+            '159004': ['2024-01-05', '2024-01-04'],
+            '159005': ['bad', 20240102, 20240108],  # 开头日期无法识别
+            '159006': [20240105],
+        }
+        for code, dates in cases.items():
+            with self.subTest(code=code):
+                expected = max(latest_dates.parse_date(date) for date in dates
+                               if latest_dates.parse_date(date) is not None)
+                self.assertEqual(scan_latest_date(self.write(code, dates)), expected)
+
+    def test_empty_and_missing(self):
+        path = self.base_dir / CATEGORY / "159001.csv"
+        path.write_text(",".join(HEADER) + "\n", encoding='utf-8-sig')
+        self.assertIsNone(scan_latest_date(path))
+        self.assertIsNone(scan_latest_date(self.base_dir / CATEGORY / "159009.csv"))
+
+    def test_tail_rows(self):
+        path = self.write('159001', [20240105, 20240104])
+        append_rows(path, make_rows('159001', [20240108, 20240109]))
+        self.assertEqual(scan_latest_date(path), 20240109)
+
+        unsorted = self.write('159002', [20240103, 20240105])
+        append_rows(unsorted, make_rows('159002', [20240104]))
+        self.assertEqual(scan_latest_date(unsorted), 20240105)
+
+
+class TestLatestDateCache(LatestDatesTestCase):
+
+    def test_cache_hits_and_invalidation(self):
+        first = self.write('159001', [20240105, 20240104])
+        self.write('159003', [20240103])
+        cache = LatestDateCache(self.base_dir, workers=2)
+        self.assertEqual(cache.latest_dates(CATEGORY), {'159001': 20240105, '159003': 20240103})
+        self.assertEqual(cache.stats, {'cached': 0, 'scanned': 2})
+
+        # 新实例从缓存文件加载，未改动的文件不再打开
+        cache = LatestDateCache(self.base_dir)
+        with mock.patch.object(latest_dates, 'scan_latest_date', side_effect=AssertionError("重新读取")):
+            self.assertEqual(cache.latest_dates(CATEGORY), {'159001': 20240105, '159003': 20240103})
+        self.assertEqual(cache.stats['cached'], 2)
+
+        append_rows(first, make_rows('159001', [20240108]))
+        self.write('159003', [20240109, 20240103])
+        os.utime(self.base_dir / CATEGORY / "159003.csv", ns=(1, 1))  # 大小或mtime任一变化都会重新读取
+        self.assertEqual(cache.latest_dates(CATEGORY), {'159001': 20240108, '159003': 20240109})
+        self.assertEqual(cache.stats['scanned'], 2)
+
+    def test_deleted_files_dropped(self):
+        self.write('159001', [20240105])
+        removed = self.write('159003', [20240103])
+        cache = LatestDateCache(self.base_dir)
+        cache.latest_dates(CATEGORY)
+        removed.unlink()
+
+        self.assertEqual(cache.latest_dates(CATEGORY), {'159001': 20240105})
+        with open(self.base_dir / CACHE_FILE_NAME, 'r', encoding='utf-8') as f:
+            self.assertEqual(list(json.load(f)['files']), [f"{CATEGORY}/159001.csv"])
+
+    def test_selected_files_and_refresh(self):
+        path = self.write('159001', [20240105])
+        self.write('159003', [20240103])
+        cache = LatestDateCache(self.base_dir)
+        self.assertEqual(cache.latest_dates(CATEGORY, [path]), {'159001': 20240105})
+        self.assertEqual(cache.latest_dates(CATEGORY, [path], refresh=True), {'159001': 20240105})
+        self.assertEqual(cache.stats, {'cached': 0, 'scanned': 2})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+本地按日期数据处理器（scripts/local_etf_processor.py）测试
+=================
+
+测试覆盖:
+- 每个文件溢写一个有序段与整批一个段的归并输出逐字节一致
+- 分两次运行（第二次与已有输出归并）与一次处理全部文件的输出一致
+- 重新处理的日期以新的段为准，覆盖已有输出中的同一代码+日期
+- 输出按日期升序，不带后缀的代码按规则补全
+
+运行测试:
+    python -m pytest tests/test_local_etf_processor.py
+"""
+
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import pandas as pd
+
+# 添加项目路径
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "scripts"))
+
+from local_etf_processor import LocalETFProcessor
+
+SOURCE_COLUMNS = ['代码', '名称', '开盘价', '最高价', '最低价', '收盘价', '上日收盘', '涨跌', '涨幅%', '成交量(手数)', '成交额(千元)']
+DATES = ['20240102', '20240103', '20240104', '20240105', '20240108']
+
+
+def make_source(date: str, close: float = None) -> pd.DataFrame:
+    """每个日期文件的ETF不完全相同，510300 不带交易所后缀"""
+    codes = ['159001.SZ', '510300', '512880.SH'] if int(date) % 2 == 0 else ['510300', '159003.SZ']
+    rows = []
+    for i, code in enumerate(codes):
+        price = close if close is not None else round(1 + i + int(date[-2:]) / 100, 3)
+        volume = '' if (code == '159003.SZ' and date == '20240103') else 1000 + i
+        rows.append([code, f"ETF{i}", price, price, price, price, price, 0.01, 0.5, volume, 123.4])
+    return pd.DataFrame(rows, columns=SOURCE_COLUMNS)
+
+
+class TestLocalETFProcessor(unittest.TestCase):
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.temp_dir = Path(tempfile.mkdtemp())
+        logging.getLogger('local_etf_processor').setLevel(logging.WARNING)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _workspace(self, name: str) -> Path:
+        workspace = self.temp_dir / name
+        (workspace / "ETF_按日期").mkdir(parents=True)
+        os.chdir(workspace)
+        return workspace
+
+    def _add_sources(self, workspace: Path, dates, **kwargs):
+        for date in dates:
+            make_source(date, **kwargs).to_csv(workspace / "ETF_按日期" / f"{date}.csv", index=False)
+
+    def _run(self, workspace: Path, batch_size: int):
+        os.chdir(workspace)
+        LocalETFProcessor(batch_size=batch_size).process_all_local_data()
+
+    def _output(self, workspace: Path) -> dict:
+        merged = workspace / "ETF" / "merged_data"
+        return {str(path.relative_to(merged)): path.read_bytes()
+                for path in sorted(merged.rglob("*.csv")) if "_runs" not in path.parts}
+
+    def test_spilled_runs_match_single_run(self):
+        outputs = []
+        for name, batch_size in (("single", 100), ("spilled", 1)):
+            workspace = self._workspace(name)
+            self._add_sources(workspace, DATES)
+            self._run(workspace, batch_size)
+            self.assertEqual(list((workspace / "ETF" / "merged_data" / "_runs").iterdir()), [])
+            outputs.append(self._output(workspace))
+        self.assertEqual(outputs[1], outputs[0])
+        self.assertEqual(sorted({name.split('/')[1] for name in outputs[0]}),
+                         ['159001.csv', '159003.csv', '510300.csv', '512880.csv'])
+
+        frame = pd.read_csv(self.temp_dir / "spilled" / "ETF" / "merged_data" / "前复权" / "510300.csv")
+        self.assertEqual(frame['代码'].unique().tolist(), ['510300.SH'])
+        self.assertEqual(frame['日期'].astype(str).tolist(), DATES)
+
+    def test_resume_with_existing_output(self):
+        once = self._workspace("once")
+        self._add_sources(once, DATES)
+        self._run(once, 2)
+
+        twice = self._workspace("twice")
+        self._add_sources(twice, DATES[:3])
+        self._run(twice, 2)
+        self._add_sources(twice, DATES[3:])
+        self._run(twice, 2)
+
+        self.assertEqual(self._output(twice), self._output(once))
+
+    def test_reprocessed_date_overrides_existing(self):
+        workspace = self._workspace("reprocess")
+        self._add_sources(workspace, DATES)
+        self._run(workspace, 2)
+
+        self._add_sources(workspace, ['20240104'], close=9.99)
+        processor = LocalETFProcessor()
+        progress = processor.load_progress()
+        progress['processed_dates'].remove('20240104')
+        processor.save_progress(progress)
+        self._run(workspace, 2)
+
+        for adjust in ("前复权", "后复权", "除权"):
+            frame = pd.read_csv(workspace / "ETF" / "merged_data" / adjust / "159001.csv")
+            self.assertEqual(frame['日期'].astype(str).tolist(), ['20240102', '20240104', '20240108'])
+            self.assertEqual(frame.loc[frame['日期'] == 20240104, '收盘价'].tolist(), [9.99])
+
+
+if __name__ == '__main__':
+    unittest.main()
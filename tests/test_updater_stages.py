@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+更新阶段依赖图（unified_etf_updater）测试
+=================
+
+测试覆盖:
+- 日更失败、超时时跳过周更后数据校验（不基于不完整的日更数据自动修正）
+- 启用自动修正（非预演）时，市场状况和ETF初筛在校验结束后才开始
+- 调度器按依赖顺序执行，依赖失败时后续阶段仍执行并收到依赖结果
+
+运行测试:
+    python -m pytest tests/test_updater_stages.py
+"""
+
+import logging
+import sys
+import threading
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+# 添加项目路径
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from unified_etf_updater.core import UnifiedETFUpdater
+from unified_etf_updater.scheduler import (
+    STATUS_FAILED, STATUS_SUCCESS, STATUS_TIMEOUT, DAGScheduler, Stage, StageContext, StageResult
+)
+from unified_etf_updater.updaters import ETFUpdaters
+
+LOGGER = logging.getLogger("test_updater_stages")
+
+
+def make_updaters(**validator_config) -> ETFUpdaters:
+    return ETFUpdaters({'weekly_daily_validator': validator_config}, LOGGER, PROJECT_ROOT)
+
+
+def build_stages(updaters: ETFUpdaters) -> dict:
+    """UnifiedETFUpdater._build_stages 的依赖关系 {阶段: 依赖}"""
+    stages = UnifiedETFUpdater._build_stages(SimpleNamespace(config={}, updaters=updaters))
+    return {stage.name: tuple(stage.depends_on) for stage in stages}
+
+
+class TestWeeklyValidationStage(unittest.TestCase):
+    """周更后数据校验阶段"""
+
+    def _run(self, daily_status: str):
+        updaters = make_updaters(auto_fix=True)
+        context = StageContext('weekly_validation', {
+            'daily': StageResult('daily', daily_status, daily_status == STATUS_SUCCESS),
+            'weekly': StageResult('weekly', STATUS_SUCCESS, True),
+        })
+        with mock.patch.object(updaters.validator, 'run_validation_after_weekly_update',
+                               return_value=(False, "一致")) as validate:
+            result = updaters.weekly_validation_stage(context)
+        return result, validate
+
+    def test_skipped_when_daily_failed(self):
+        for status in (STATUS_FAILED, STATUS_TIMEOUT):
+            result, validate = self._run(status)
+            validate.assert_not_called()
+            self.assertEqual(result.reason, "日更未成功")
+
+    def test_runs_after_daily_succeeded(self):
+        result, validate = self._run(STATUS_SUCCESS)
+        validate.assert_called_once()
+        self.assertEqual(result.reason, "校验通过")
+
+
+class TestBuildStages(unittest.TestCase):
+    """阶段依赖关系"""
+
+    def test_readers_wait_for_auto_fix(self):
+        depends = build_stages(make_updaters(auto_fix=True))
+        self.assertEqual(depends['weekly_validation'], ('daily', 'weekly'))
+        self.assertEqual(depends['market_status'], ('daily', 'weekly_validation'))
+        self.assertEqual(depends['etf_screening'], ('daily', 'weekly_validation'))
+        DAGScheduler([Stage(name, None, deps) for name, deps in depends.items()])  # 无循环依赖
+
+    def test_readers_only_wait_for_daily_without_rewrites(self):
+        for validator_config in ({}, {'auto_fix': True, 'auto_fix_dry_run': True},
+                                 {'enabled': False, 'auto_fix': True}):
+            depends = build_stages(make_updaters(**validator_config))
+            self.assertEqual(depends['market_status'], ('daily',))
+            self.assertEqual(depends['etf_screening'], ('daily',))
+
+
+class TestDAGScheduler(unittest.TestCase):
+    """调度顺序"""
+
+    def test_order_and_failed_dependency(self):
+        lock = threading.Lock()
+        events = []
+
+        def stage(name, status=STATUS_SUCCESS):
+            def run(context):
+                with lock:
+                    events.append(('start', name, {dep: result.status for dep, result in context.dependencies.items()}))
+                with lock:
+                    events.append(('end', name))
+                return StageResult(name, status)
+            return run
+
+        results = DAGScheduler([
+            Stage('daily', stage('daily', STATUS_FAILED)),
+            Stage('weekly', stage('weekly')),
+            Stage('weekly_validation', stage('weekly_validation'), ('daily', 'weekly')),
+            Stage('market_status', stage('market_status'), ('daily', 'weekly_validation')),
+        ], LOGGER).run()
+
+        self.assertEqual(list(results), ['daily', 'weekly', 'weekly_validation', 'market_status'])
+        position = {event[:2]: index for index, event in enumerate(events)}
+        self.assertLess(position[('end', 'weekly_validation')], position[('start', 'market_status')])
+        starts = {event[1]: event[2] for event in events if event[0] == 'start'}
+        self.assertEqual(starts['market_status'], {'daily': STATUS_FAILED, 'weekly_validation': STATUS_SUCCESS})
+
+
+if __name__ == '__main__':
+    unittest.main()
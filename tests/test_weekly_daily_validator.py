@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+周更日更校验器（unified_etf_updater/validator.py）测试
+=================
+
+测试覆盖:
+- 全量对账：超出容差的字段差异、容差内的差异、日更缺少的行和ETF、日更多出的日期、按ETF筛选
+- 自动修正：只重写不一致的文件（每个文件一次），修正后对账一致，预演只生成计划不写文件
+
+运行测试:
+    python -m pytest tests/test_weekly_daily_validator.py
+"""
+
+import logging
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import pandas as pd
+
+# 添加项目路径
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from config.change_manifest import ChangeLog
+from config.etf_store import append_rows, has_tail, write_csv_atomic
+from unified_etf_updater.validator import COMPARE_FIELDS, FIX_PLAN_FILE, WeeklyDailyValidator
+
+HEADER = ['代码', '日期', '开盘价', '最高价', '最低价', '收盘价', '上日收盘', '涨跌', '涨幅%', '成交量(手数)', '成交额(千元)']
+CATEGORIES = ["0_ETF日K(前复权)", "0_ETF日K(后复权)", "0_ETF日K(除权)"]
+DATES = [20240102, 20240103, 20240104, 20240105]
+
+
+def make_rows(code: str, dates, close: float = 1.5) -> pd.DataFrame:
+    """生成按代码数据（日期降序）"""
+    return pd.DataFrame([[f"{code}.SZ", date, 1.5, 1.6, 1.4, close, 1.5, 0.0, 0.0, 1000, 150.0]
+                         for date in sorted(dates, reverse=True)], columns=HEADER)
+
+
+class ValidatorTestCase(unittest.TestCase):
+    """周更、日更目录都有 159001、159003 的四天数据"""
+
+    def setUp(self):
+        self.project_root = Path(tempfile.mkdtemp())
+        for side in ("ETF周更", "ETF日更"):
+            for category in CATEGORIES:
+                category_dir = self.project_root / side / category
+                category_dir.mkdir(parents=True)
+                for code in ['159001', '159003']:
+                    write_csv_atomic(make_rows(code, DATES), category_dir / f"{code}.csv")
+        config = {'weekly_daily_validator': {'auto_fix': True, 'max_workers': 2}}
+        self.validator = WeeklyDailyValidator(config, logging.getLogger("test_validator"), self.project_root)
+        self.validator.digest_enabled = False
+        self.validator.columnar_enabled = False
+
+    def tearDown(self):
+        shutil.rmtree(self.project_root, ignore_errors=True)
+
+    def write(self, side: str, category: str, code: str, frame: pd.DataFrame):
+        write_csv_atomic(frame, self.project_root / side / category / f"{code}.csv")
+
+
+class TestReconcile(ValidatorTestCase):
+    """全量对账"""
+
+    def test_identical(self):
+        diff_table, stats = self.validator.reconcile('20240102', '20240105')
+        self.assertTrue(diff_table.empty)
+        self.assertEqual(stats['comparisons'], 2 * len(DATES) * len(CATEGORIES))
+        self.assertEqual(stats['etf_codes'], {'159001', '159003'})
+
+    def test_field_difference_and_tolerance(self):
+        daily = make_rows('159001', DATES)
+        daily.loc[daily['日期'] == 20240103, '收盘价'] = 1.6  # 超出容差
+        daily.loc[daily['日期'] == 20240104, '收盘价'] = 1.5 * (1 + 1e-6)  # 容差内
+        self.write("ETF日更", CATEGORIES[0], '159001', daily)
+
+        diff_table, _ = self.validator.reconcile('20240102', '20240105')
+        self.assertEqual(diff_table[['etf_code', '日期', 'category', 'field']].values.tolist(),
+                         [['159001', 20240103, CATEGORIES[0], '收盘价']])
+        self.assertEqual(diff_table['weekly'].iloc[0], 1.5)
+        self.assertEqual(diff_table['daily'].iloc[0], 1.6)
+
+    def test_rows_missing_from_daily(self):
+        """日更缺少的行和ETF每个字段记一条差异；日更多出的（更晚的）日期不比较"""
+        self.write("ETF日更", CATEGORIES[1], '159003', make_rows('159003', [20240102, 20240103, 20240105, 20240108]))
+        (self.project_root / "ETF日更" / CATEGORIES[2] / "159001.csv").unlink()
+
+        diff_table, _ = self.validator.reconcile('20240102', '20240108')
+        missing = diff_table.groupby(['category', 'etf_code'])['日期'].agg(lambda dates: sorted(set(dates)))
+        self.assertEqual(missing.to_dict(), {(CATEGORIES[1], '159003'): [20240104],
+                                             (CATEGORIES[2], '159001'): DATES})
+        self.assertEqual(len(diff_table), 5 * len(COMPARE_FIELDS))
+        self.assertTrue(diff_table['daily'].isna().all())
+
+    def test_tail_rows_and_codes_filter(self):
+        """日更追加尾段中的行参与对账；只对账指定的ETF"""
+        append_rows(self.project_root / "ETF日更" / CATEGORIES[0] / "159003.csv",
+                    make_rows('159003', [20240105], close=2.0))
+        diff_table, stats = self.validator.reconcile('20240102', '20240105', {CATEGORIES[0]: {'159003'}})
+        self.assertEqual(stats['comparisons'], len(DATES))
+        self.assertEqual(diff_table[['etf_code', '日期', 'field']].values.tolist(), [['159003', 20240105, '收盘价']])
+
+
+class TestAutoFix(ValidatorTestCase):
+    """按差异表批量修正日更文件"""
+
+    def setUp(self):
+        super().setUp()
+        daily = make_rows('159001', DATES + [20240108])  # 日更比周更多一天
+        daily.loc[daily['日期'].isin([20240103, 20240104]), '收盘价'] = 9.9
+        self.write("ETF日更", CATEGORIES[0], '159001', daily)
+        append_rows(self.project_root / "ETF日更" / CATEGORIES[1] / "159003.csv",
+                    make_rows('159003', [20240105], close=8.8))
+        (self.project_root / "ETF日更" / CATEGORIES[2] / "159003.csv").unlink()
+        self.diff_table, _ = self.validator.reconcile('20240102', '20240108')
+        self.dates = sorted({str(date) for date in self.diff_table['日期']})
+
+    def _daily_bytes(self) -> dict:
+        return {path: path.read_bytes() for path in (self.project_root / "ETF日更").rglob("*.csv")}
+
+    def test_plan(self):
+        plan = self.validator.plan_auto_fix(self.diff_table)
+        self.assertEqual(plan, {(CATEGORIES[0], '159001'): [20240103, 20240104],
+                                (CATEGORIES[1], '159003'): [20240105],
+                                (CATEGORIES[2], '159003'): DATES})
+        self.assertEqual(self.validator.plan_auto_fix(self.diff_table, ['20240105']),
+                         {(CATEGORIES[1], '159003'): [20240105], (CATEGORIES[2], '159003'): [20240105]})
+
+    def test_dry_run_writes_nothing(self):
+        before = self._daily_bytes()
+        self.assertTrue(self.validator.auto_fix_inconsistent_data(self.dates, self.diff_table, dry_run=True))
+        self.assertEqual(self._daily_bytes(), before)
+        report = pd.read_csv(self.project_root / FIX_PLAN_FILE, encoding='utf-8-sig')
+        self.assertEqual(len(report), len(self.diff_table))
+
+    def test_fix_matches_weekly(self):
+        untouched = self.project_root / "ETF日更" / CATEGORIES[0] / "159003.csv"
+        untouched_bytes = untouched.read_bytes()
+        change_log = ChangeLog(self.project_root / "ETF日更")
+        change_log.acknowledge('test', change_log.pending('test'))
+
+        self.assertTrue(self.validator.auto_fix_inconsistent_data(self.dates, self.diff_table))
+        diff_table, _ = self.validator.reconcile('20240102', '20240108')
+        self.assertTrue(diff_table.empty)
+
+        self.assertEqual(untouched.read_bytes(), untouched_bytes)  # 一致的文件不重写
+        fixed = pd.read_csv(self.project_root / "ETF日更" / CATEGORIES[0] / "159001.csv")
+        self.assertEqual(fixed['日期'].tolist(), [20240108] + sorted(DATES, reverse=True))  # 日更多出的日期保留
+        self.assertFalse(has_tail(self.project_root / "ETF日更" / CATEGORIES[1] / "159003.csv"))
+
+        changes = change_log.pending('test')
+        self.assertEqual(changes.dates(CATEGORIES[0], '159001'), [20240103, 20240104])
+        self.assertEqual(changes.dates(CATEGORIES[2], '159003'), DATES)
+
+
+if __name__ == '__main__':
+    unittest.main()
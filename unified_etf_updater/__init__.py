@@ -6,8 +6,10 @@
 """
 
 from .core import UnifiedETFUpdater
+from .daemon import ETFDaemon
 from .database import DatabaseManager
 from .git_manager import GitManager
+from .scheduler import DAGScheduler, Stage, StageContext, StageResult
 from .updaters import ETFUpdaters
 from .validator import WeeklyDailyValidator
 
@@ -16,8 +18,13 @@ __author__ = "ETF Data System"
 
 __all__ = [
     'UnifiedETFUpdater',
+    'ETFDaemon',
     'DatabaseManager', 
     'GitManager',
+    'DAGScheduler',
+    'Stage',
+    'StageContext',
+    'StageResult',
     'ETFUpdaters',
     'WeeklyDailyValidator'
 ] 
\ No newline at end of file
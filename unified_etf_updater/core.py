@@ -10,8 +10,11 @@ import logging
 from datetime import datetime
 from pathlib import Path
 
+from config.perf_telemetry import PerfHistory, build_report, format_report, make_record, new_run_id
+
 from .database import DatabaseManager
 from .git_manager import GitManager
+from .scheduler import DAGScheduler, Stage
 from .updaters import ETFUpdaters
 
 
@@ -41,6 +44,9 @@ class UnifiedETFUpdater:
         self.database_manager = DatabaseManager(self.config, self.logger)
         self.git_manager = GitManager(self.config, self.logger, self.project_root)
         self.updaters = ETFUpdaters(self.config, self.logger, self.project_root)
+        self._scheduler = None  # 正在执行的完整更新调度器
+        self.perf_config = self.config.get('perf_telemetry', {})
+        self.perf_history = PerfHistory(self.perf_config.get('history_file'))
         
         self.logger.info("统一ETF更新器初始化完成")
         self._log_status()
@@ -149,58 +155,70 @@ class UnifiedETFUpdater:
         
         self.logger.info("🔍 系统状态测试完成")
     
-    def run_full_update(self) -> dict:
+    def _build_stages(self, only: list = None) -> list:
+        """
+        构建更新阶段依赖图：
+        日更 → 市场状况、ETF初筛（依赖日更结果）；周更与之并发执行；
+        周更后数据校验读取并可能改写日更文件，在日更和周更都结束后执行；
+        启用自动修正（非预演）时，市场状况和ETF初筛还要等校验结束，不与改写日更文件同时读取
+
+        Args:
+            only: 只执行这些阶段（依赖中未选中的阶段忽略），None 表示全部
+        """
+        stage_timeouts = self.config.get('scheduler', {}).get('stage_timeouts', {})
+        readers_depend_on = ('daily',)
+        if self.updaters.validator.rewrites_daily_files():
+            readers_depend_on = ('daily', 'weekly_validation')
+        stages = [
+            Stage('daily', self.updaters.daily_stage, timeout=stage_timeouts.get('daily')),
+            Stage('weekly', self.updaters.weekly_stage, timeout=stage_timeouts.get('weekly')),
+            Stage('market_status', self.updaters.market_status_stage, depends_on=readers_depend_on,
+                  timeout=stage_timeouts.get('market_status')),
+            Stage('etf_screening', self.updaters.screening_stage, depends_on=readers_depend_on,
+                  timeout=stage_timeouts.get('etf_screening')),
+            Stage('weekly_validation', self.updaters.weekly_validation_stage, depends_on=('daily', 'weekly'),
+                  timeout=stage_timeouts.get('weekly_validation')),
+        ]
+        if only is None:
+            return stages
+        selected = [stage for stage in stages if stage.name in only]
+        for stage in selected:
+            stage.depends_on = tuple(dep for dep in stage.depends_on if dep in only)
+        return selected
+
+    def run_full_update(self, only: list = None) -> dict:
         """
         执行完整更新流程（智能跳过无新数据的流程）
-        优化顺序：优先执行快速模块，避免被耗时模块阻塞
+        按依赖关系并发调度：市场状况和ETF初筛在日更之后执行，周更与它们同时进行，
+        周更后数据校验在日更和周更之后执行（启用自动修正时市场状况和ETF初筛等校验结束），总耗时约为最长的一条依赖链
+        
+        Args:
+            only: 只执行这些阶段（如守护进程已在进程内应用日期文件后，只执行下游阶段），None 表示全部
         
         Returns:
-            各模块执行结果字典
+            各模块执行结果字典 {模块: 是否有新数据}
         """
         start_time = datetime.now()
-        self.logger.info("🚀 开始执行完整ETF数据更新流程（优化执行顺序）")
-        
-        results = {
-            'daily': False,
-            'weekly': False,
-            'market_status': False,
-            'etf_screening': False
-        }
-        reasons = {}
-        
-        # 1. 执行日更（快速检查）
-        daily_has_new, daily_reason = self.updaters.run_daily_update()
-        results['daily'] = daily_has_new
-        reasons['daily'] = daily_reason
-        
-        # 2. 优先执行市场状况检查（避免被周更阻塞）
-        market_has_new, market_reason = self.updaters.run_market_status_check(daily_has_new)
-        results['market_status'] = market_has_new
-        reasons['market_status'] = market_reason
-        
-        # 3. 优先执行ETF初筛（避免被周更阻塞）
-        screening_has_new, screening_reason = self.updaters.run_etf_screening(daily_has_new)
-        results['etf_screening'] = screening_has_new
-        reasons['etf_screening'] = screening_reason
+        self.logger.info("🚀 开始执行完整ETF数据更新流程（并发调度）")
         
-        # 4. 最后执行周更（可能耗时很长）
-        weekly_has_new, weekly_reason = self.updaters.run_weekly_update()
-        results['weekly'] = weekly_has_new
-        reasons['weekly'] = weekly_reason
-        
-        # 5. 数据库导入（已禁用）
-        if daily_has_new:
-            self.logger.info("📥 日更有新数据，数据库导入已禁用")
+        self._scheduler = DAGScheduler(self._build_stages(only), self.logger,
+                                       self.config.get('scheduler', {}).get('max_workers'))
+        try:
+            stage_results = self._scheduler.run()
+        finally:
+            self._scheduler = None
         
-        if weekly_has_new:
-            self.logger.info("📥 周更有新数据，数据库导入已禁用")
+        results = {name: result.has_new_data for name, result in stage_results.items()}
+        reasons = {name: result.reason for name, result in stage_results.items()}
         
-        if market_has_new:
-            self.logger.info("📥 市场状况有新数据，数据库导入已禁用")
+        # 数据库导入（已禁用）
+        for name, label in [('daily', '日更'), ('weekly', '周更'), ('market_status', '市场状况')]:
+            if results.get(name):
+                self.logger.info(f"📥 {label}有新数据，数据库导入已禁用")
         
         # 注意：ETF初筛结果是文本文件，不需要数据库导入
         
-        # 6. 只有有新数据才允许Git提交
+        # 只有有新数据才允许Git提交
         total_success = sum(results.values())
         if total_success > 0:
             self.logger.info("")
@@ -213,14 +231,56 @@ class UnifiedETFUpdater:
             self.logger.info("ℹ️ 没有成功的更新，跳过Git提交")
         
         # 总结报告
-        self._log_summary(start_time, results, reasons, total_success)
+        self._log_summary(start_time, results, reasons, total_success,
+                          {name: result.duration for name, result in stage_results.items()},
+                          {name: result.metrics for name, result in stage_results.items()})
+        self._record_perf(start_time, stage_results)
         
         return results
+
+    def _record_perf(self, start_time: datetime, stage_results: dict):
+        """把各阶段和整体流程的资源消耗追加到性能历史"""
+        if not self.perf_config.get('enabled', True):
+            return
+        run_id = new_run_id()
+        records = [make_record(name, result.status, result.metrics, run_id)
+                   for name, result in stage_results.items()]
+        overall_status = 'success' if all(result.succeeded for result in stage_results.values()) else 'failed'
+        records.append(make_record('full_update', overall_status,
+                                   {'wall_time': round((datetime.now() - start_time).total_seconds(), 3)}, run_id))
+        try:
+            self.perf_history.append(records)
+        except OSError as e:
+            self.logger.warning(f"⚠️ 性能历史写入失败: {e}")
+
+    def perf_report(self) -> dict:
+        """
+        生成阶段性能报告：每个阶段最近一次执行与此前若干次成功执行的中位数对比
+
+        Returns:
+            {'report': build_report 结果, 'text': 报告文本, 'regressions': [有退化的阶段]}
+        """
+        window = self.perf_config.get('window', 10)
+        report = build_report(self.perf_history.load(), window,
+                              self.perf_config.get('regression_ratio', 1.5))
+        return {
+            'report': report,
+            'text': format_report(report, window),
+            'regressions': [stage for stage, entry in report.items() if entry['regressions']]
+        }
+    
+    def cancel_update(self):
+        """取消正在执行的完整更新流程（未开始的阶段不再执行，正在执行的阶段被终止）"""
+        if self._scheduler is not None:
+            self._scheduler.cancel()
     
-    def _log_summary(self, start_time: datetime, results: dict, reasons: dict, total_success: int):
+    def _log_summary(self, start_time: datetime, results: dict, reasons: dict, total_success: int,
+                     durations: dict = None, metrics: dict = None):
         """记录总结报告"""
         end_time = datetime.now()
         duration = end_time - start_time
+        durations = durations or {}
+        metrics = metrics or {}
         
         self.logger.info("=" * 60)
         self.logger.info("📊 ETF数据更新完成总结")
@@ -232,8 +292,14 @@ class UnifiedETFUpdater:
         self.logger.info("各模块执行结果:")
         for k in results:
             status = '✅ 有新数据' if results[k] else '⏭️ 跳过/无新数据'
-            self.logger.info(f"  {k}: {status} ({reasons[k]})")
-        self.logger.info(f"整体有新数据模块数: {total_success}/4")
+            elapsed = f", 耗时 {durations[k]:.1f}秒" if k in durations else ""
+            stage_metrics = metrics.get(k, {})
+            if stage_metrics.get('cpu_time') is not None:
+                elapsed += f", CPU {stage_metrics['cpu_time']:.1f}秒"
+            if stage_metrics.get('peak_rss_mb') is not None:
+                elapsed += f", 峰值内存 {stage_metrics['peak_rss_mb']:.0f}MB"
+            self.logger.info(f"  {k}: {status} ({reasons[k]}{elapsed})")
+        self.logger.info(f"整体有新数据模块数: {total_success}/{len(results)}")
     
     def set_git_enabled(self, enabled: bool):
         """设置Git自动提交是否启用"""
@@ -267,6 +333,14 @@ class UnifiedETFUpdater:
         else:
             self.logger.info("🔧 已禁用周更日更数据校验")
     
+    def set_auto_fix_dry_run(self, enabled: bool):
+        """设置自动修正预演（只生成修正计划报告，不修改日更文件）"""
+        self.updaters.set_auto_fix_dry_run(enabled)
+        if enabled:
+            self.logger.info("🔧 已启用自动修正预演")
+        else:
+            self.logger.info("🔧 已禁用自动修正预演")
+    
     def run_weekly_daily_validation(self) -> dict:
         """
         手动运行周更与日更数据校验
@@ -0,0 +1,469 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+常驻调度守护进程
+python main.py 每次冷启动都要重新导入pandas、解析配置、重新读取数据；守护模式只启动一次：
+1. 内存中常驻ETF列表、各复权目录的最新日期索引和最近N个交易日的价格窗口（WarmState），
+   之后只按日更变更清单增量更新，不再整体重新读取
+2. 按 config.json 的 daemon.schedule 定时执行完整更新（schedule库）；监视目录出现新的日期文件时，
+   在进程内直接应用该文件（日更处理模块只加载一次），随后只执行下游阶段；
+   下游阶段（市场状况、ETF初筛）在守护进程内执行，不再启动子进程，市场状况直接使用常驻的最新日期
+3. 本地控制套接字（Unix域套接字，不支持时使用本机TCP端口）接受状态查询和即时运行请求：
+   python main.py --mode ctl --command status|run|latest|window|stop
+"""
+
+import json
+import logging
+import math
+import os
+import re
+import socket
+import socketserver
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from config.change_manifest import ChangeLog
+from config.columnar_store import CODE_FIELD, DATE_FIELD, VALUE_FIELDS
+from config.etf_store import read_latest_lines
+
+from . import stages
+
+try:
+    import schedule
+except ImportError:
+    schedule = None
+
+WARM_CATEGORIES = ["0_ETF日K(前复权)", "0_ETF日K(后复权)", "0_ETF日K(除权)"]
+WARM_STATE_CONSUMER = "daemon_warm_state"  # 在日更变更清单中的消费者名称
+DATE_FILE_PATTERN = re.compile(r'^\d{8}\.csv$')
+DOWNSTREAM_STAGES = ['market_status', 'etf_screening']  # 进程内应用日期文件后需要执行的阶段
+
+DEFAULT_SCHEDULE = ["18:30"]
+DEFAULT_POLL_INTERVAL = 30  # 秒
+DEFAULT_WINDOW_DAYS = 60
+DEFAULT_WATCH_DIR = "ETF日更/_inbox"
+DEFAULT_CONTROL_SOCKET = "logs/etf_daemon.sock"
+DEFAULT_CONTROL_PORT = 47651  # 不支持Unix域套接字时使用的本机端口
+
+
+class WarmState:
+    """常驻内存的日更数据：ETF列表、最新日期索引和最近价格窗口"""
+
+    def __init__(self, daily_dir: Path, window_days: int = DEFAULT_WINDOW_DAYS):
+        """
+        Args:
+            daily_dir: 日更数据目录（三个复权目录所在目录）
+            window_days: 每个ETF保留的最近交易日数
+        """
+        self.daily_dir = Path(daily_dir)
+        self.window_days = window_days
+        self.change_log = ChangeLog(self.daily_dir)
+        # {复权目录: {代码: [(日期, 开盘价, ...)]}}，最新日期在前（与CSV顺序一致）
+        self.windows: Dict[str, Dict[str, List[tuple]]] = {}
+        self.loaded_at = None
+        self.refreshed_at = None
+        self._lock = threading.RLock()
+
+    def _read_window(self, etf_file: Path, n: int) -> List[tuple]:
+        """读取ETF文件最新的n行（含追加尾段）"""
+        rows = []
+        for line in read_latest_lines(etf_file, n):
+            parts = line.split(',')
+            try:
+                values = [float(value) if value else math.nan for value in parts[2:2 + len(VALUE_FIELDS)]]
+                rows.append((int(parts[1]), *values))
+            except (IndexError, ValueError):
+                continue
+        return rows
+
+    def load(self):
+        """全量读取所有ETF的最近窗口（启动时或变更清单无法确定范围时）"""
+        with self._lock:
+            # 先取待处理变更，读取期间新发布的清单留到下次 refresh
+            changes = self.change_log.pending(WARM_STATE_CONSUMER)
+            windows = {}
+            for category in WARM_CATEGORIES:
+                category_dir = self.daily_dir / category
+                if category_dir.is_dir():
+                    windows[category] = {etf_file.stem: self._read_window(etf_file, self.window_days)
+                                         for etf_file in sorted(category_dir.glob('*.csv'))}
+            self.windows = windows
+            self.loaded_at = self.refreshed_at = datetime.now()
+            self.change_log.acknowledge(WARM_STATE_CONSUMER, changes)
+
+    def refresh(self) -> int:
+        """
+        按日更变更清单增量更新：只新增日期的ETF只读取新增的几行，历史日期被修改的ETF重新读取窗口
+
+        Returns:
+            更新的ETF数量（变更清单无法确定范围而全量重新读取时返回全部ETF数量）
+        """
+        with self._lock:
+            changes = self.change_log.pending(WARM_STATE_CONSUMER)
+            if changes.full_scan:
+                self.load()
+                return len(self.codes())
+            if changes.is_empty():
+                return 0
+
+            for category, codes in changes.categories.items():
+                if category not in WARM_CATEGORIES:
+                    continue
+                category_windows = self.windows.setdefault(category, {})
+                for code, dates in codes.items():
+                    etf_file = self.daily_dir / category / f"{code}.csv"
+                    if not etf_file.exists():
+                        category_windows.pop(code, None)
+                        continue
+                    current = category_windows.get(code)
+                    if current and min(dates) > current[0][0]:
+                        new_rows = [row for row in self._read_window(etf_file, len(dates)) if row[0] > current[0][0]]
+                        category_windows[code] = (new_rows + current)[:self.window_days]
+                    else:
+                        category_windows[code] = self._read_window(etf_file, self.window_days)
+
+            self.refreshed_at = datetime.now()
+            self.change_log.acknowledge(WARM_STATE_CONSUMER, changes)
+            return len(changes)
+
+    def codes(self) -> set:
+        """所有复权目录中的ETF代码"""
+        with self._lock:
+            return set().union(*[set(codes) for codes in self.windows.values()])
+
+    def latest_dates(self, category: str = WARM_CATEGORIES[0]) -> Dict[str, Optional[int]]:
+        """某个复权目录中各ETF的最新日期 {代码: YYYYMMDD}（格式与 LatestDateCache.latest_dates 一致）"""
+        with self._lock:
+            return {code: (rows[0][0] if rows else None)
+                    for code, rows in self.windows.get(category, {}).items()}
+
+    def latest(self, code: str) -> Dict[str, Optional[int]]:
+        """某个ETF在各复权目录中的最新日期"""
+        with self._lock:
+            return {category: (codes[code][0][0] if codes.get(code) else None)
+                    for category, codes in self.windows.items()}
+
+    def window(self, code: str, category: str = WARM_CATEGORIES[0], n: int = None) -> List[Dict[str, Any]]:
+        """某个ETF最近n个交易日的数据（最新在前，字段与按代码CSV一致）"""
+        with self._lock:
+            rows = self.windows.get(category, {}).get(code, [])[:n or self.window_days]
+        fields = [DATE_FIELD] + VALUE_FIELDS
+        return [{CODE_FIELD: code, **dict(zip(fields, row))} for row in rows]
+
+    def summary(self) -> Dict[str, Any]:
+        """状态摘要：各目录ETF数量、最新日期及停留在最新日期的ETF数量"""
+        with self._lock:
+            categories = {}
+            for category, codes in self.windows.items():
+                latest_dates = [rows[0][0] for rows in codes.values() if rows]
+                latest = max(latest_dates) if latest_dates else None
+                categories[category] = {
+                    'etfs': len(codes),
+                    'latest_date': latest,
+                    'at_latest': sum(1 for date in latest_dates if date == latest),
+                }
+            return {
+                'etfs': len(self.codes()),
+                'window_days': self.window_days,
+                'categories': categories,
+                'loaded_at': self.loaded_at,
+                'refreshed_at': self.refreshed_at,
+            }
+
+
+class DateFileWatcher:
+    """监视目录中新出现的日期文件（YYYYMMDD.csv），两次轮询大小不变才视为写入完成"""
+
+    def __init__(self, watch_dir: Path):
+        self.watch_dir = Path(watch_dir)
+        self._sizes: Dict[str, int] = {}
+
+    def poll(self) -> List[Path]:
+        """返回已写入完成的日期文件（按日期升序）"""
+        if not self.watch_dir.is_dir():
+            return []
+        sizes = {}
+        ready = []
+        for path in self.watch_dir.iterdir():
+            if not path.is_file() or not DATE_FILE_PATTERN.match(path.name):
+                continue
+            sizes[path.name] = path.stat().st_size
+            if self._sizes.get(path.name) == sizes[path.name]:
+                ready.append(path)
+        self._sizes = sizes
+        return sorted(ready)
+
+    def archive(self, paths: List[Path], success: bool):
+        """处理后把文件移到 applied/（成功）或 failed/（失败），避免重复触发"""
+        target_dir = self.watch_dir / ('applied' if success else 'failed')
+        target_dir.mkdir(parents=True, exist_ok=True)
+        for path in paths:
+            if path.exists():
+                os.replace(path, target_dir / path.name)
+            self._sizes.pop(path.name, None)
+
+
+def control_address(config: dict, project_root: Path):
+    """控制套接字地址：支持Unix域套接字时为文件路径，否则为 (主机, 端口)"""
+    daemon_config = config.get('daemon', {})
+    if hasattr(socket, 'AF_UNIX'):
+        socket_path = Path(daemon_config.get('control_socket', DEFAULT_CONTROL_SOCKET))
+        return str(socket_path if socket_path.is_absolute() else project_root / socket_path)
+    return ('127.0.0.1', daemon_config.get('control_port', DEFAULT_CONTROL_PORT))
+
+
+def send_command(address, command: str, timeout: float = 10, **kwargs) -> Dict[str, Any]:
+    """
+    向守护进程发送一条控制命令
+
+    Args:
+        address: control_address() 返回的地址
+        command: status / run / latest / window / stop
+        kwargs: 命令参数（如 code、category、n、stages）
+
+    Returns:
+        守护进程的响应字典
+    """
+    family = socket.AF_INET if isinstance(address, tuple) else socket.AF_UNIX
+    with socket.socket(family, socket.SOCK_STREAM) as client:
+        client.settimeout(timeout)
+        client.connect(address)
+        client.sendall((json.dumps({'command': command, **kwargs}, ensure_ascii=False) + '\n').encode('utf-8'))
+        with client.makefile('r', encoding='utf-8') as reader:
+            line = reader.readline()
+    if not line:
+        raise ConnectionError("守护进程未返回响应")
+    return json.loads(line)
+
+
+class _ControlHandler(socketserver.StreamRequestHandler):
+    """控制连接：每个连接一行JSON请求、一行JSON响应"""
+
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline().decode('utf-8'))
+            response = self.server.etf_daemon.handle_command(request)
+        except Exception as e:
+            response = {'ok': False, 'error': f"{type(e).__name__}: {e}"}
+        self.wfile.write((json.dumps(response, ensure_ascii=False, default=str) + '\n').encode('utf-8'))
+
+
+if hasattr(socketserver, 'ThreadingUnixStreamServer'):
+    class _UnixControlServer(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+else:
+    _UnixControlServer = None
+
+
+class _TCPControlServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class ETFDaemon:
+    """常驻调度守护进程"""
+
+    def __init__(self, updater):
+        """
+        Args:
+            updater: UnifiedETFUpdater（配置、日志和阶段调度只初始化一次）
+        """
+        self.updater = updater
+        self.logger: logging.Logger = updater.logger
+        self.project_root = Path(updater.project_root)
+        self.daemon_config = updater.config.get('daemon', {})
+
+        self.daily_dir = self.project_root / "ETF日更"
+        self.state = WarmState(self.daily_dir, self.daemon_config.get('window_days', DEFAULT_WINDOW_DAYS))
+        updater.updaters.warm_state = self.state  # 下游阶段在进程内执行并使用常驻数据
+        self.watcher = DateFileWatcher(self.project_root / self.daemon_config.get('watch_dir', DEFAULT_WATCH_DIR))
+        self.address = control_address(updater.config, self.project_root)
+        self.poll_interval = self.daemon_config.get('poll_interval', DEFAULT_POLL_INTERVAL)
+        self.schedule_times = self.daemon_config.get('schedule', DEFAULT_SCHEDULE)
+
+        self.started_at = None
+        self.current_run: Optional[Dict[str, Any]] = None
+        self.last_run: Optional[Dict[str, Any]] = None
+        self._jobs = None
+        self._processor = None  # 日更处理模块，首次应用日期文件时加载
+        self._worker: Optional[threading.Thread] = None
+        self._trigger_lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+    # ------------------------------------------------------------------ 运行
+
+    def is_busy(self) -> bool:
+        return self._worker is not None and self._worker.is_alive()
+
+    def trigger(self, reason: str, only: List[str] = None, files: List[Path] = None) -> bool:
+        """
+        在后台线程中开始一次运行（同一时间只执行一次）
+
+        Args:
+            reason: 触发原因
+            only: 只执行这些阶段，None 表示完整更新
+            files: 先在进程内应用的日期文件（随后只执行下游阶段）
+
+        Returns:
+            是否已开始（已有运行在执行时返回 False）
+        """
+        with self._trigger_lock:
+            if self.is_busy():
+                return False
+            self.current_run = {'reason': reason, 'started_at': datetime.now(),
+                                'stages': only, 'files': [path.name for path in files or []]}
+            self._worker = threading.Thread(target=self._run_job, args=(reason, only, files),
+                                            name="daemon-run", daemon=True)
+            self._worker.start()
+            return True
+
+    def _run_job(self, reason: str, only: Optional[List[str]], files: Optional[List[Path]]):
+        """执行一次运行，结束后增量更新常驻数据"""
+        start = datetime.now()
+        record = {'reason': reason, 'started_at': start, 'files': [path.name for path in files or []]}
+        self.logger.info(f"🔔 守护进程开始运行: {reason}")
+        try:
+            if files:
+                applied = self._apply_date_files(files)
+                record['applied'] = applied
+                if not applied['success']:
+                    record['error'] = applied['error']
+                    return
+                only = DOWNSTREAM_STAGES
+            record['results'] = self.updater.run_full_update(only)
+            record['refreshed_etfs'] = self.state.refresh()
+        except Exception as e:
+            self.logger.error(f"❌ 守护进程运行失败: {e}")
+            record['error'] = str(e)
+        finally:
+            record['finished_at'] = datetime.now()
+            record['duration'] = round((record['finished_at'] - start).total_seconds(), 1)
+            self.last_run = record
+            self.current_run = None
+            self.logger.info(f"🔔 守护进程运行结束: {reason} ({record['duration']}秒)")
+
+    def _apply_date_files(self, files: List[Path]) -> Dict[str, Any]:
+        """在进程内应用日期文件（日更处理模块和pandas只加载一次）"""
+        if self._processor is None:
+            self._processor = stages._load_script("ETF日更/daily_etf_processor.py", "daily_etf_processor")
+        self.logger.info(f"📥 应用新日期文件: {', '.join(path.name for path in files)}")
+        # 处理模块逐个ETF输出合并信息，这里只保留摘要
+        result = self._processor.apply_date_files(
+            [str(path) for path in files], mode='incremental',
+            workers=self._processor.DEFAULT_WRITE_WORKERS, output_dir=str(self.daily_dir), quiet=True)
+        self.watcher.archive(files, result['success'])
+        if result['success']:
+            self.logger.info(f"✅ 应用 {len(result['files'])} 个日期文件，{result['etfs']} 个ETF")
+        else:
+            self.logger.error(f"❌ 日期文件应用失败: {result['error']}")
+        return {key: result[key] for key in ('success', 'files', 'skipped', 'etfs', 'records', 'run_id', 'error')}
+
+    # ------------------------------------------------------------------ 控制
+
+    def status(self) -> Dict[str, Any]:
+        """守护进程状态"""
+        next_run = self._jobs.next_run if self._jobs is not None and self._jobs.jobs else None
+        return {
+            'pid': os.getpid(),
+            'started_at': self.started_at,
+            'schedule': self.schedule_times,
+            'next_run': next_run,
+            'watch_dir': str(self.watcher.watch_dir),
+            'busy': self.is_busy(),
+            'current_run': self.current_run,
+            'last_run': self.last_run,
+            'warm_state': self.state.summary(),
+        }
+
+    def handle_command(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """处理一条控制命令"""
+        command = request.get('command')
+        if command == 'status':
+            return {'ok': True, 'status': self.status()}
+        if command == 'run':
+            started = self.trigger("手动触发", only=request.get('stages'))
+            return {'ok': True, 'started': started,
+                    'message': "已开始运行" if started else "已有运行正在执行"}
+        if command == 'latest':
+            return {'ok': True, 'code': request.get('code'), 'latest': self.state.latest(request.get('code'))}
+        if command == 'window':
+            category = request.get('category') or WARM_CATEGORIES[0]
+            return {'ok': True, 'code': request.get('code'), 'category': category,
+                    'rows': self.state.window(request.get('code'), category, request.get('n'))}
+        if command == 'stop':
+            self.stop()
+            return {'ok': True, 'message': "守护进程正在停止"}
+        return {'ok': False, 'error': f"未知命令: {command}"}
+
+    def _start_control_server(self):
+        """启动控制套接字服务（后台线程）"""
+        if isinstance(self.address, tuple):
+            server = _TCPControlServer(self.address, _ControlHandler)
+        else:
+            socket_path = Path(self.address)
+            if socket_path.exists():
+                try:
+                    send_command(self.address, 'status', timeout=2)
+                    raise RuntimeError(f"已有守护进程在运行: {socket_path}")
+                except OSError:
+                    socket_path.unlink()  # 上次异常退出遗留的套接字文件
+            socket_path.parent.mkdir(parents=True, exist_ok=True)
+            server = _UnixControlServer(str(socket_path), _ControlHandler)
+        server.etf_daemon = self
+        threading.Thread(target=server.serve_forever, name="daemon-control", daemon=True).start()
+        return server
+
+    def stop(self):
+        """停止守护进程（正在执行的运行会被取消）"""
+        self._stop_event.set()
+        self.updater.cancel_update()
+
+    def run(self) -> bool:
+        """
+        启动守护进程并阻塞到收到 stop 命令或中断
+
+        Returns:
+            是否正常启动
+        """
+        if schedule is None:
+            self.logger.error("❌ 缺少schedule依赖，请安装: pip install schedule")
+            return False
+
+        self.started_at = datetime.now()
+        self.logger.info("🛰️ 守护进程启动，加载常驻数据...")
+        self.state.load()
+        summary = self.state.summary()
+        self.logger.info(f"✅ 常驻数据: {summary['etfs']} 个ETF，每个保留最近 {self.state.window_days} 个交易日")
+
+        self._jobs = schedule.Scheduler()
+        for at_time in self.schedule_times:
+            self._jobs.every().day.at(at_time).do(self.trigger, f"定时更新 {at_time}")
+        server = self._start_control_server()
+        self.logger.info(f"🛰️ 控制地址: {self.address}，定时: {', '.join(self.schedule_times)}，"
+                         f"监视目录: {self.watcher.watch_dir}")
+
+        try:
+            while not self._stop_event.is_set():
+                self._jobs.run_pending()
+                files = self.watcher.poll()
+                if files:
+                    # 正在运行时文件留在目录中，下次轮询再触发
+                    self.trigger("新日期文件", files=files)
+                elif not self.is_busy():
+                    # 守护进程之外写入的变更（如手动运行脚本）
+                    self.state.refresh()
+                self._stop_event.wait(self.poll_interval)
+        except KeyboardInterrupt:
+            self.logger.warning("⚠️ 收到中断，停止守护进程")
+            self.stop()
+        finally:
+            server.shutdown()
+            server.server_close()
+            if not isinstance(self.address, tuple):
+                Path(self.address).unlink(missing_ok=True)
+            if self._worker is not None:
+                self._worker.join()
+            self.logger.info("🛰️ 守护进程已停止")
+        return True
@@ -90,8 +90,8 @@ class DatabaseManager:
         importer = self.DailyDataImporter()
         base_dir = base_dir or str(Path(__file__).parent.parent / "ETF日更")
         
-        # 只导入最近1天的数据（高性能批量导入）
-        results = importer.import_latest_data_optimized(base_dir, days_back=1)
+        # 按日更变更清单只导入变更的ETF和日期（没有可用清单时导入最近1天有变化的文件）
+        results = importer.import_changes(base_dir, days_back=1)
         
         success_count = sum(1 for success in results.values() if success)
         total_count = len(results)
@@ -110,8 +110,8 @@ class DatabaseManager:
         importer = self.WeeklyDataImporter()
         base_dir = base_dir or str(Path(__file__).parent.parent / "ETF周更")
         
-        # 只导入最近1周的数据（高性能批量导入）
-        results = importer.import_latest_weekly_data_optimized(base_dir, weeks_back=1)
+        # 按周更变更清单只导入变更的ETF和日期（没有可用清单时导入最近1周有变化的文件）
+        results = importer.import_changes(base_dir, weeks_back=1)
         
         success_count = sum(1 for success in results.values() if success)
         total_count = len(results)
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+更新阶段调度器
+按依赖关系（DAG）并发执行各更新阶段：
+1. 每个阶段是一个接收 StageContext、返回 StageResult 的Python可调用对象，依赖全部结束后才开始
+2. 无依赖关系的阶段并发执行，总耗时约等于最长依赖链
+3. 支持按阶段超时和整体取消；阶段内通过 run_in_subprocess 在独立进程中执行脚本函数，
+   超时或取消时直接终止该进程
+4. 每个阶段的结果附带资源消耗指标（墙钟/CPU时间、峰值内存、读写文件数和字节数），
+   由子进程内的 ProcessMeter 测量后随结果发回
+"""
+
+import io
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import redirect_stderr, redirect_stdout
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from config.perf_telemetry import ProcessMeter, merge_metrics
+
+STATUS_SUCCESS = 'success'
+STATUS_FAILED = 'failed'
+STATUS_TIMEOUT = 'timeout'
+STATUS_CANCELLED = 'cancelled'
+
+POLL_INTERVAL = 0.2  # 等待子进程结果时检查超时/取消的间隔（秒）
+TIMEOUT_GRACE = 5.0  # 阶段超时后等待其自行退出的时间（秒）
+OUTPUT_TAIL_LINES = 200  # 子进程输出只保留最后若干行
+
+
+class StageError(Exception):
+    """阶段执行失败"""
+
+    def __init__(self, message: str, output: str = ""):
+        super().__init__(message)
+        self.output = output
+
+
+class StageTimeout(StageError):
+    """阶段执行超时"""
+
+
+class StageCancelled(StageError):
+    """阶段被取消"""
+
+
+@dataclass
+class StageResult:
+    """单个阶段的执行结果"""
+    name: str
+    status: str
+    has_new_data: bool = False
+    reason: str = ""
+    details: Dict[str, Any] = field(default_factory=dict)
+    duration: float = 0.0
+    metrics: Dict[str, Any] = field(default_factory=dict)  # 资源消耗指标
+
+    @property
+    def succeeded(self) -> bool:
+        return self.status == STATUS_SUCCESS
+
+
+@dataclass
+class StageContext:
+    """阶段执行上下文：依赖阶段的结果、超时时间点和取消信号"""
+    name: str
+    dependencies: Dict[str, StageResult] = field(default_factory=dict)
+    deadline: Optional[float] = None  # time.monotonic() 时间点，None 表示不限时
+    cancel_event: threading.Event = field(default_factory=threading.Event)
+    metrics: Dict[str, Any] = field(default_factory=dict)  # 阶段内各子进程的资源消耗（累加）
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    @property
+    def expired(self) -> bool:
+        return self.deadline is not None and time.monotonic() > self.deadline
+
+    def remaining(self) -> Optional[float]:
+        """距离超时的剩余秒数，不限时返回 None"""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+
+@dataclass
+class Stage:
+    """调度单元"""
+    name: str
+    func: Callable[[StageContext], StageResult]
+    depends_on: Sequence[str] = ()
+    timeout: Optional[float] = None  # 秒，None 表示不限时
+
+
+class DAGScheduler:
+    """按依赖关系并发执行阶段的调度器"""
+
+    def __init__(self, stages: List[Stage], logger: logging.Logger = None, max_workers: int = None):
+        """
+        初始化调度器
+
+        Args:
+            stages: 阶段列表（依赖只决定先后顺序，依赖阶段失败时后续阶段仍会执行）
+            logger: 日志记录器
+            max_workers: 最大并发阶段数，默认等于阶段数
+        """
+        self.stages = {stage.name: stage for stage in stages}
+        if len(self.stages) != len(stages):
+            raise ValueError("阶段名称重复")
+        self.logger = logger or logging.getLogger(__name__)
+        self.max_workers = max_workers or max(1, len(stages))
+        self._cancel_event = threading.Event()
+        self._contexts: Dict[str, StageContext] = {}
+        self._validate()
+
+    def _validate(self):
+        """检查未知依赖和循环依赖"""
+        for stage in self.stages.values():
+            unknown = [dep for dep in stage.depends_on if dep not in self.stages]
+            if unknown:
+                raise ValueError(f"阶段 {stage.name} 依赖未知阶段: {', '.join(unknown)}")
+
+        visiting, visited = set(), set()
+
+        def visit(name: str):
+            if name in visited:
+                return
+            if name in visiting:
+                raise ValueError(f"阶段存在循环依赖: {name}")
+            visiting.add(name)
+            for dep in self.stages[name].depends_on:
+                visit(dep)
+            visiting.discard(name)
+            visited.add(name)
+
+        for name in self.stages:
+            visit(name)
+
+    def cancel(self):
+        """取消整个调度：未开始的阶段不再执行，正在执行的阶段收到取消信号"""
+        self._cancel_event.set()
+        for context in list(self._contexts.values()):
+            context.cancel_event.set()
+
+    def _execute(self, stage: Stage, context: StageContext) -> StageResult:
+        """在工作线程中执行单个阶段"""
+        start = time.monotonic()
+        thread_cpu_start = time.thread_time()
+        if stage.timeout is not None:
+            context.deadline = start + stage.timeout
+        self.logger.info(f"▶️ 阶段开始: {stage.name}")
+        try:
+            result = stage.func(context)
+            if not isinstance(result, StageResult):
+                raise StageError(f"阶段返回值类型错误: {type(result).__name__}")
+        except StageTimeout as e:
+            result = StageResult(stage.name, STATUS_TIMEOUT, reason=f"超时({stage.timeout:g}秒)",
+                                 details={'output': e.output})
+        except StageCancelled as e:
+            result = StageResult(stage.name, STATUS_CANCELLED, reason="已取消", details={'output': e.output})
+        except Exception as e:
+            result = StageResult(stage.name, STATUS_FAILED, reason=f"异常: {e}",
+                                 details={'output': getattr(e, 'output', '')})
+        result.duration = time.monotonic() - start
+        # 子进程的消耗加上本线程（调度进程内执行的部分，如周更后的数据校验）的CPU时间
+        thread_cpu = round(time.thread_time() - thread_cpu_start, 3)
+        result.metrics = merge_metrics(context.metrics, {'cpu_time': thread_cpu})
+        result.metrics['wall_time'] = round(result.duration, 3)
+        self.logger.info(f"⏹️ 阶段结束: {stage.name} [{result.status}] {result.reason} ({result.duration:.1f}秒)")
+        return result
+
+    def _wait_timeout(self, running: Dict) -> float:
+        """下一次需要检查超时的等待时间"""
+        timeout = POLL_INTERVAL * 5
+        for _, context in running.values():
+            if context.deadline is not None:
+                timeout = min(timeout, max(0.0, context.deadline + TIMEOUT_GRACE - time.monotonic()))
+        return timeout
+
+    def run(self) -> Dict[str, StageResult]:
+        """
+        执行全部阶段
+
+        Returns:
+            {阶段名: StageResult}，顺序与传入的阶段列表一致
+        """
+        results: Dict[str, StageResult] = {}
+        pending = dict(self.stages)
+        running = {}  # future -> (stage, context)
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="stage")
+
+        try:
+            while pending or running:
+                # 提交依赖已全部结束的阶段
+                for name, stage in list(pending.items()):
+                    if self._cancel_event.is_set():
+                        results[name] = StageResult(name, STATUS_CANCELLED, reason="已取消")
+                        del pending[name]
+                    elif all(dep in results for dep in stage.depends_on):
+                        context = StageContext(name, {dep: results[dep] for dep in stage.depends_on})
+                        self._contexts[name] = context
+                        running[executor.submit(self._execute, stage, context)] = (stage, context)
+                        del pending[name]
+                if not running:
+                    continue
+
+                done, _ = wait(running, timeout=self._wait_timeout(running), return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, _ = running.pop(future)
+                    results[stage.name] = future.result()
+
+                # 超时后仍未退出的阶段（未响应取消信号）按超时记录，不再阻塞后续阶段
+                now = time.monotonic()
+                for future, (stage, context) in list(running.items()):
+                    if context.deadline is not None and now > context.deadline + TIMEOUT_GRACE:
+                        context.cancel_event.set()
+                        results[stage.name] = StageResult(
+                            stage.name, STATUS_TIMEOUT, reason=f"超时({stage.timeout:g}秒)，未响应取消",
+                            duration=now - context.deadline + stage.timeout)
+                        results[stage.name].metrics = merge_metrics(
+                            context.metrics, {'wall_time': round(results[stage.name].duration, 3)})
+                        self.logger.warning(f"⚠️ 阶段 {stage.name} 超时且未响应取消，继续执行后续阶段")
+                        del running[future]
+        except KeyboardInterrupt:
+            self.logger.warning("⚠️ 收到中断，取消所有阶段")
+            self.cancel()
+            wait(running, timeout=TIMEOUT_GRACE)
+            raise
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+            self._contexts.clear()
+
+        return {name: results[name] for name in self.stages}
+
+
+def _tail(text: str, lines: int = OUTPUT_TAIL_LINES) -> str:
+    """保留文本最后若干行"""
+    return '\n'.join(text.rstrip('\n').split('\n')[-lines:])
+
+
+def _subprocess_entry(conn, target: Callable, kwargs: Dict, cwd: Optional[str]):
+    """子进程入口：执行目标函数，把返回值、输出摘要和资源消耗发回父进程"""
+    output = io.StringIO()
+    meter = ProcessMeter().start()
+    try:
+        if cwd:
+            os.chdir(cwd)
+        with redirect_stdout(output), redirect_stderr(output):
+            value = target(**kwargs)
+        message = {'ok': True, 'value': value, 'output': _tail(output.getvalue())}
+    except BaseException as e:  # 包括脚本导入时的 sys.exit
+        message = {'ok': False, 'error': f"{type(e).__name__}: {e}", 'output': _tail(output.getvalue())}
+    message['metrics'] = meter.stop()
+    try:
+        conn.send(message)
+    finally:
+        conn.close()
+
+
+def run_in_subprocess(target: Callable, kwargs: Dict = None, context: StageContext = None,
+                      cwd: str = None) -> Any:
+    """
+    在独立进程中执行模块级函数（脚本的工作目录、sys.path 和全局状态互不影响，超时或取消时可直接终止）
+
+    Args:
+        target: 可被pickle的模块级函数，返回值需可pickle
+        kwargs: 调用参数
+        context: 阶段上下文，用于检查超时和取消；子进程的资源消耗累加到 context.metrics
+        cwd: 子进程工作目录
+
+    Returns:
+        目标函数返回值
+
+    Raises:
+        StageTimeout / StageCancelled: 超时或被取消（子进程已终止）
+        StageError: 目标函数抛出异常或子进程异常退出
+    """
+    mp_context = multiprocessing.get_context('spawn')
+    receiver, sender = mp_context.Pipe(duplex=False)
+    process = mp_context.Process(target=_subprocess_entry, args=(sender, target, kwargs or {}, cwd))
+    process.start()
+    sender.close()
+
+    try:
+        while not receiver.poll(POLL_INTERVAL):
+            if context is not None and context.cancelled:
+                raise StageCancelled(f"{context.name} 已取消")
+            if context is not None and context.expired:
+                raise StageTimeout(f"{context.name} 执行超时")
+            if not process.is_alive() and not receiver.poll():
+                process.join()
+                raise StageError(f"子进程异常退出（退出码 {process.exitcode}）")
+        try:
+            message = receiver.recv()
+        except EOFError:
+            raise StageError(f"子进程异常退出（退出码 {process.exitcode}）")
+    finally:
+        process.join(timeout=TIMEOUT_GRACE if not (context and (context.cancelled or context.expired)) else 0)
+        if process.is_alive():
+            process.terminate()
+            process.join()
+        receiver.close()
+
+    if context is not None:
+        context.metrics = merge_metrics(context.metrics, message.get('metrics'))
+    if not message['ok']:
+        raise StageError(message['error'], output=message['output'])
+    return message['value']
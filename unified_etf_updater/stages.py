@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+更新阶段的子进程入口
+各函数在 run_in_subprocess 启动的独立进程中执行：按路径加载对应脚本模块并直接调用其函数，
+返回可pickle的结构化结果（不再解析脚本输出文本）
+守护模式下下游阶段直接在守护进程内调用这些函数，已加载的脚本模块复用，不再重复导入
+"""
+
+import argparse
+import importlib.util
+import sys
+from pathlib import Path
+from typing import Dict, Optional
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+
+def _load_script(relative_path: str, module_name: str):
+    """按路径加载脚本模块（脚本所在目录加入 sys.path，与直接运行脚本时一致；同一进程内已加载的直接复用）"""
+    script_path = PROJECT_ROOT / relative_path
+    loaded = sys.modules.get(module_name)
+    if loaded is not None and getattr(loaded, '__file__', None) == str(script_path):
+        return loaded
+    sys.path.insert(0, str(script_path.parent))
+    spec = importlib.util.spec_from_file_location(module_name, script_path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def daily_stage(days_back: int = 7) -> Dict:
+    """日更：智能模式，自动检测最近N天的缺失数据并补漏"""
+    auto_daily_sync = _load_script("ETF日更/auto_daily_sync.py", "auto_daily_sync")
+    return auto_daily_sync.run_smart_update(days_back)
+
+
+def weekly_stage() -> Dict:
+    """周更：同步当月压缩包（无法判断是否更新的文件直接跳过，不等待输入）"""
+    etf_auto_sync = _load_script("ETF周更/etf_auto_sync.py", "etf_auto_sync")
+    return etf_auto_sync.sync_current_month_data(interactive=False)
+
+
+def market_status_stage(changed_only: bool = True, latest_dates: Optional[Dict[str, Optional[int]]] = None) -> Dict:
+    """
+    市场状况监控：生成状况报告（changed_only 时只重新读取日更变更的ETF）
+    latest_dates 为守护进程常驻数据中的各ETF最新日期，提供时不再读取ETF文件
+    """
+    market_status_monitor = _load_script("ETF市场状况/market_status_monitor.py", "market_status_monitor")
+    monitor = market_status_monitor.ETFMarketMonitor()
+    success = monitor.generate_market_status_report(changed_only=changed_only, latest_dates=latest_dates)
+    return {'success': success, 'summary': monitor.last_summary}
+
+
+def screening_stage(fuquan_type: str, days_back: Optional[int] = None, changed_only: bool = True) -> Dict:
+    """ETF初筛：双门槛筛选并保存结果（changed_only 时只重新筛选日更变更的ETF）"""
+    screening_main = _load_script("ETF_初筛/main.py", "etf_screening_main")
+    args = argparse.Namespace(fuquan_type=fuquan_type, days_back=days_back, fast_mode=False,
+                              max_workers=None, output_only=False, changed_only=changed_only)
+    return {'success': bool(screening_main.run_dual_threshold_filter(args))}
@@ -2,15 +2,16 @@
 # -*- coding: utf-8 -*-
 """
 ETF更新器
-处理各种ETF数据更新流程
+处理各种ETF数据更新流程，每个流程是一个返回 StageResult 的调度阶段
 """
 
-import sys
-import subprocess
 import logging
 from pathlib import Path
-from typing import Tuple
+from typing import Dict, Optional, Tuple
 
+from . import stages
+from .scheduler import (STATUS_FAILED, STATUS_SUCCESS, StageCancelled, StageContext, StageError,
+                        StageResult, StageTimeout, run_in_subprocess)
 from .validator import WeeklyDailyValidator
 
 
@@ -31,285 +32,298 @@ class ETFUpdaters:
         self.project_root = project_root
         self.screening_config = config.get('etf_screening', {})
         self.auto_screening_enabled = self.screening_config.get('enabled', True)
+        # 下游阶段只处理变更清单中的ETF
+        self.changed_only = config.get('change_manifest', {}).get('enabled', True)
+        # 守护模式的常驻数据（daemon.WarmState）：设置后下游阶段在当前进程内执行，市场状况直接使用其中的最新日期
+        self.warm_state = None
         
         # 初始化校验器
         self.validator = WeeklyDailyValidator(config, logger, project_root)
     
-    def run_daily_update(self) -> Tuple[bool, str]:
+    def _run_script_stage(self, context: Optional[StageContext], target, cwd: str,
+                          in_process: bool = False, **kwargs) -> Dict:
         """
-        执行日更流程（智能模式：自动检测和补漏）
-        
+        执行脚本阶段，返回脚本函数的结构化结果
+        默认在独立进程中执行；in_process 时直接在当前进程调用（守护模式的下游阶段：脚本模块只加载一次，
+        不再启动子进程重新导入，但超时后无法终止，只能由调度器按超时记录）
+        """
+        if not in_process:
+            return run_in_subprocess(target, kwargs, context or StageContext(target.__name__),
+                                     cwd=str(self.project_root / cwd))
+        if context is not None and context.cancelled:
+            raise StageCancelled(f"{context.name} 已取消")
+        try:
+            return target(**kwargs)
+        except Exception as e:
+            raise StageError(f"{type(e).__name__}: {e}")
+
+    def _log_stage_error(self, result: StageResult, limit: int = 200):
+        """记录失败阶段的输出摘要"""
+        output = result.details.get('output')
+        if output:
+            self.logger.error(f"错误: {output[-limit:]}...")
+
+    def daily_stage(self, context: StageContext = None) -> StageResult:
+        """
+        日更阶段（智能模式：自动检测和补漏）
+
+        Args:
+            context: 调度上下文，None 表示单独执行
+
         Returns:
-            Tuple[是否成功, 原因描述]
+            StageResult
         """
         self.logger.info("=" * 50)
         self.logger.info("开始执行ETF日更流程（智能模式）")
         self.logger.info("=" * 50)
-        
+
+        daily_script = self.project_root / "ETF日更" / "auto_daily_sync.py"
+        if not daily_script.exists():
+            self.logger.error(f"日更脚本不存在: {daily_script}")
+            return StageResult('daily', STATUS_FAILED, reason="脚本不存在")
+
         try:
-            daily_script = self.project_root / "ETF日更" / "auto_daily_sync.py"
-            if not daily_script.exists():
-                self.logger.error(f"日更脚本不存在: {daily_script}")
-                return False, "脚本不存在"
-            
-            daily_dir = self.project_root / "ETF日更"
             # 使用智能更新模式，自动检测最近7天的缺失数据并补漏
-            cmd = [sys.executable, "auto_daily_sync.py", "--mode", "smart-update", "--days-back", "7"]
-            
-            result = subprocess.run(
-                cmd,
-                cwd=str(daily_dir),
-                capture_output=True,
-                text=True,
-                encoding='utf-8'
-            )
-            
-            output = result.stdout + result.stderr
-            
-            # 检查明确的失败情况
-            if result.returncode != 0:
-                self.logger.error("❌ ETF智能日更失败（退出码非0）")
-                if result.stderr:
-                    self.logger.error(f"错误: {result.stderr[:200]}...")
-                return False, "执行失败"
-            
-            if "智能更新部分失败" in output or "智能更新失败" in output:
-                self.logger.info("📅 今天无新数据，智能跳过日更")
-                return False, "无新数据"
-                
-            if "没有找到今天的文件" in output or "未找到任何文件" in output:
-                self.logger.info("📅 今天无新数据，智能跳过日更")
-                return False, "无新数据"
-                
-            if "数据完整，无缺失" in output and "已是最新" in output:
-                # 检查是否包含今天的数据更新
-                from datetime import datetime
-                today_str = datetime.now().strftime('%Y%m%d')
-                if today_str in output or "今日增量更新完成" in output:
-                    self.logger.info("✅ ETF日更数据已是最新，包含今日数据")
-                    return True, "有今日数据"
-                else:
-                    self.logger.info("📅 日更数据已是最新，但无今日新数据")
-                    return False, "已是最新"
-                
-            if "智能更新完全成功" in output or "今日增量更新完成" in output:
-                self.logger.info("✅ ETF智能日更完成（有数据更新）")
-                return True, "有新数据"
-            else:
-                # 默认情况：如果没有明确的成功标志，视为失败
-                self.logger.warning("⚠️ ETF智能日更状态不明确，视为无新数据")
-                return False, "状态不明确"
-                
-        except Exception as e:
-            self.logger.error(f"执行日更时发生异常: {str(e)}")
-            return False, f"异常: {str(e)}"
+            summary = self._run_script_stage(context, stages.daily_stage, "ETF日更", days_back=7)
+        except (StageTimeout, StageCancelled):
+            raise
+        except StageError as e:
+            self.logger.error(f"❌ ETF智能日更失败: {e}")
+            return StageResult('daily', STATUS_FAILED, reason="执行失败", details={'output': e.output})
 
-    def run_weekly_update(self) -> Tuple[bool, str]:
+        if summary['today_success']:
+            self.logger.info("✅ ETF智能日更完成（有数据更新）")
+            return StageResult('daily', STATUS_SUCCESS, True, "有新数据", summary)
+        self.logger.info("📅 今天无新数据，智能跳过日更")
+        return StageResult('daily', STATUS_SUCCESS, False, "无新数据", summary)
+
+    def weekly_stage(self, context: StageContext = None) -> StageResult:
         """
-        执行周更流程（智能跳过）
-        
+        周更阶段（智能跳过），有新数据时随后执行周更日更数据校验
+
+        Args:
+            context: 调度上下文，None 表示单独执行
+
         Returns:
-            Tuple[是否成功, 原因描述]
+            StageResult
         """
         self.logger.info("=" * 50)
         self.logger.info("开始执行ETF周更流程（智能检查）")
         self.logger.info("=" * 50)
-        
+
+        weekly_script = self.project_root / "ETF周更" / "etf_auto_sync.py"
+        if not weekly_script.exists():
+            self.logger.error(f"周更脚本不存在: {weekly_script}")
+            return StageResult('weekly', STATUS_FAILED, reason="脚本不存在")
+
         try:
-            weekly_script = self.project_root / "ETF周更" / "etf_auto_sync.py"
-            if not weekly_script.exists():
-                self.logger.error(f"周更脚本不存在: {weekly_script}")
-                return False, "脚本不存在"
-            
-            weekly_dir = self.project_root / "ETF周更"
-            cmd = [sys.executable, "etf_auto_sync.py"]
-            
-            result = subprocess.run(
-                cmd,
-                cwd=str(weekly_dir),
-                capture_output=True,
-                text=True,
-                encoding='utf-8'
-            )
-            
-            output = result.stdout + result.stderr
-            
-            if "所有文件都已是最新，无需下载" in output:
-                self.logger.info("📊 周更压缩包无变化，智能跳过")
-                return False, "无变化"
-            
-            if "未找到" in output and "月" in output:
-                self.logger.info("📊 未找到当前月份压缩包，智能跳过")
-                return False, "无当月数据"
-            
-            if result.returncode == 0 and ("数据同步完成" in output or "合并完成" in output or "下载完成" in output):
-                self.logger.info("✅ ETF周更完成（有新数据）")
-                
-                # 周更完成后进行数据校验
-                if self.validator.is_enabled():
-                    self.logger.info("🔍 开始周更后数据校验...")
-                    needs_attention, validation_msg = self.validator.run_validation_after_weekly_update()
-                    if needs_attention:
-                        self.logger.warning(f"⚠️ 数据校验发现问题: {validation_msg}")
-                        self.logger.warning("📋 请检查三个复权类型的数据一致性！")
-                    else:
-                        self.logger.info(f"✅ 数据校验通过: {validation_msg}")
-                
-                return True, "有新数据"
-            else:
-                self.logger.error("❌ ETF周更失败")
-                if result.stderr:
-                    self.logger.error(f"错误: {result.stderr[:200]}...")
-                return False, "执行失败"
-                
-        except Exception as e:
-            self.logger.error(f"执行周更时发生异常: {str(e)}")
-            return False, f"异常: {str(e)}"
+            summary = self._run_script_stage(context, stages.weekly_stage, "ETF周更")
+        except (StageTimeout, StageCancelled):
+            raise
+        except StageError as e:
+            self.logger.error(f"❌ ETF周更失败: {e}")
+            return StageResult('weekly', STATUS_FAILED, reason="执行失败", details={'output': e.output})
+
+        if summary['status'] == 'up_to_date':
+            self.logger.info("📊 周更压缩包无变化，智能跳过")
+            return StageResult('weekly', STATUS_SUCCESS, False, "无变化", summary)
+        if summary['status'] in ('no_files', 'no_current_month'):
+            self.logger.info("📊 未找到当前月份压缩包，智能跳过")
+            return StageResult('weekly', STATUS_SUCCESS, False, "无当月数据", summary)
+        if summary['success'] == 0:
+            self.logger.error(f"❌ ETF周更失败：{summary['total']} 个压缩包均未处理成功")
+            return StageResult('weekly', STATUS_FAILED, reason="执行失败", details=summary)
 
-    def run_market_status_check(self, daily_has_new_data: bool) -> Tuple[bool, str]:
+        self.logger.info(f"✅ ETF周更完成（有新数据，成功处理 {summary['success']}/{summary['total']} 个压缩包）")
+        return StageResult('weekly', STATUS_SUCCESS, True, "有新数据", summary)
+
+    def weekly_validation_stage(self, context: StageContext = None) -> StageResult:
         """
-        执行ETF市场状况监控（独立检查，不完全依赖日更）
-        
+        周更后数据校验阶段（在日更和周更都结束后执行：校验读取日更数据，自动修复会改写日更文件，
+        不能与日更阶段同时进行；日更失败、超时或被终止时日更文件可能只写了一部分，跳过校验）
+
         Args:
-            daily_has_new_data: 日更是否有新数据（仅作参考）
-        
+            context: 调度上下文，None 表示单独执行
+
         Returns:
-            Tuple[是否成功, 原因描述]
+            StageResult（校验本身不产生新数据，结果记录在 details 中）
+        """
+        if not self.validator.is_enabled():
+            return StageResult('weekly_validation', STATUS_SUCCESS, False, "校验已禁用")
+
+        daily = context.dependencies.get('daily') if context else None
+        if daily is not None and not daily.succeeded:
+            self.logger.warning(f"⚠️ 日更未成功（{daily.status}），跳过周更后数据校验，避免基于不完整的日更数据修正")
+            return StageResult('weekly_validation', STATUS_SUCCESS, False, "日更未成功")
+
+        weekly = context.dependencies.get('weekly') if context else None
+        if weekly is not None and not (weekly.succeeded and weekly.has_new_data):
+            self.logger.info("📊 周更无新数据，跳过周更后数据校验")
+            return StageResult('weekly_validation', STATUS_SUCCESS, False, "周更无新数据")
+
+        self.logger.info("🔍 开始周更后数据校验...")
+        needs_attention, validation_msg = self.validator.run_validation_after_weekly_update()
+        details = {'needs_attention': needs_attention, 'message': validation_msg}
+        if needs_attention:
+            self.logger.warning(f"⚠️ 数据校验发现问题: {validation_msg}")
+            self.logger.warning("📋 请检查三个复权类型的数据一致性！")
+            return StageResult('weekly_validation', STATUS_SUCCESS, False, "发现问题", details)
+        self.logger.info(f"✅ 数据校验通过: {validation_msg}")
+        return StageResult('weekly_validation', STATUS_SUCCESS, False, "校验通过", details)
+
+    def market_status_stage(self, context: StageContext = None) -> StageResult:
+        """
+        ETF市场状况监控阶段（在日更之后执行，日更无新数据时仍独立检查）
+
+        Args:
+            context: 调度上下文，None 表示单独执行
+
+        Returns:
+            StageResult
         """
         self.logger.info("=" * 50)
         self.logger.info("开始执行ETF市场状况监控（独立检查）")
         self.logger.info("=" * 50)
-        
-        # 优化后的逻辑：即使日更无新数据，也执行市场状况检查
-        if not daily_has_new_data:
+
+        daily = context.dependencies.get('daily') if context else None
+        if daily is not None and not daily.has_new_data:
             self.logger.info("📊 日更无新数据，但仍执行市场状况独立检查")
+
+        market_script = self.project_root / "ETF市场状况" / "market_status_monitor.py"
+        if not market_script.exists():
+            self.logger.error(f"市场状况监控脚本不存在: {market_script}")
+            return StageResult('market_status', STATUS_FAILED, reason="脚本不存在")
+
+        latest_dates = None
+        if self.warm_state is not None:
+            # 先纳入日更阶段或守护进程刚应用的日期文件的变更，再使用常驻的前复权最新日期
+            self.warm_state.refresh()
+            latest_dates = self.warm_state.latest_dates()
         
         try:
-            market_script = self.project_root / "ETF市场状况" / "market_status_monitor.py"
-            if not market_script.exists():
-                self.logger.error(f"市场状况监控脚本不存在: {market_script}")
-                return False, "脚本不存在"
-            
-            market_dir = self.project_root / "ETF市场状况"
-            cmd = [sys.executable, "market_status_monitor.py"]
-            
-            result = subprocess.run(
-                cmd,
-                cwd=str(market_dir),
-                capture_output=True,
-                text=True,
-                encoding='utf-8'
-            )
-            
-            output = result.stdout + result.stderr
-            
-            if result.returncode == 0:
-                if "报告已更新" in output or "监控完成" in output:
-                    self.logger.info("✅ ETF市场状况监控完成（有新数据）")
-                    return True, "有新数据"
-                elif "无变化" in output or "已是最新" in output:
-                    self.logger.info("📊 ETF市场状况无变化，智能跳过")
-                    return False, "无变化"
-                else:
-                    self.logger.info("✅ ETF市场状况监控完成")
-                    return True, "监控完成"
-            else:
-                self.logger.error("❌ ETF市场状况监控失败")
-                if result.stderr:
-                    self.logger.error(f"错误: {result.stderr[:200]}...")
-                return False, "执行失败"
-                
-        except Exception as e:
-            self.logger.error(f"执行市场状况监控时发生异常: {str(e)}")
-            return False, f"异常: {str(e)}"
+            summary = self._run_script_stage(context, stages.market_status_stage, "ETF市场状况",
+                                             in_process=self.warm_state is not None,
+                                             changed_only=self.changed_only, latest_dates=latest_dates)
+        except (StageTimeout, StageCancelled):
+            raise
+        except StageError as e:
+            self.logger.error(f"❌ ETF市场状况监控失败: {e}")
+            return StageResult('market_status', STATUS_FAILED, reason="执行失败", details={'output': e.output})
+
+        if not summary['success']:
+            self.logger.error("❌ ETF市场状况监控失败")
+            return StageResult('market_status', STATUS_FAILED, reason="执行失败", details=summary)
+        self.logger.info("✅ ETF市场状况监控完成（有新数据）")
+        return StageResult('market_status', STATUS_SUCCESS, True, "有新数据", summary)
 
-    def run_etf_screening(self, daily_has_new_data: bool) -> Tuple[bool, str]:
+    def screening_stage(self, context: StageContext = None) -> StageResult:
         """
-        执行ETF初筛流程（独立检查，不完全依赖日更）
-        
+        ETF初筛阶段（在日更之后执行，日更无新数据时仍独立筛选）
+
         Args:
-            daily_has_new_data: 日更是否有新数据（仅作参考）
-        
+            context: 调度上下文，None 表示单独执行
+
         Returns:
-            Tuple[是否成功, 原因描述]
+            StageResult
         """
         self.logger.info("=" * 50)
         self.logger.info("开始执行ETF初筛流程（独立双门槛筛选）")
         self.logger.info("=" * 50)
-        
+
         if not self.auto_screening_enabled:
             self.logger.info("ℹ️ ETF自动初筛已禁用，跳过")
-            return False, "初筛已禁用"
-        
-        # 优化后的逻辑：即使日更无新数据，也可以执行初筛
-        if not daily_has_new_data:
+            return StageResult('etf_screening', STATUS_SUCCESS, False, "初筛已禁用")
+
+        daily = context.dependencies.get('daily') if context else None
+        if daily is not None and not daily.has_new_data:
             self.logger.info("📊 日更无新数据，但仍执行ETF初筛独立检查")
-        
+
+        screening_script = self.project_root / "ETF_初筛" / "main.py"
+        if not screening_script.exists():
+            self.logger.error(f"ETF初筛脚本不存在: {screening_script}")
+            return StageResult('etf_screening', STATUS_FAILED, reason="脚本不存在")
+
+        # 获取初筛配置
+        fuquan_type = self.screening_config.get('fuquan_type', '0_ETF日K(后复权)')
+        days_back = self.screening_config.get('days_back', None)
+        self.logger.info(f"📊 运行ETF初筛: 双门槛筛选 {fuquan_type}")
+
         try:
-            screening_dir = self.project_root / "ETF_初筛"
-            screening_script = screening_dir / "main.py"
-            
-            if not screening_script.exists():
-                self.logger.error(f"ETF初筛脚本不存在: {screening_script}")
-                return False, "脚本不存在"
-            
-            # 获取初筛配置
-            fuquan_type = self.screening_config.get('fuquan_type', '0_ETF日K(后复权)')
-            days_back = self.screening_config.get('days_back', None)
-            
-            # 构建命令
-            cmd = [sys.executable, "main.py", "--mode", "dual", "--fuquan-type", fuquan_type]
-            if days_back:
-                cmd.extend(["--days-back", str(days_back)])
-            
-            self.logger.info(f"📊 运行ETF初筛: {' '.join(cmd)}")
-            
-            result = subprocess.run(
-                cmd,
-                cwd=str(screening_dir),
-                capture_output=True,
-                text=True,
-                encoding='utf-8'
-            )
-            
-            output = result.stdout + result.stderr
-            
-            # 检查执行结果
-            if result.returncode == 0:
-                if "双门槛筛选对比结果" in output or "保存双门槛筛选结果" in output:
-                    self.logger.info("✅ ETF初筛完成（生成新筛选结果）")
-                    
-                    # 从输出中提取统计信息
-                    if "通过筛选ETF" in output:
-                        lines = output.split('\n')
-                        for line in lines:
-                            if "5000万门槛通过筛选ETF" in line or "3000万门槛通过筛选ETF" in line:
-                                self.logger.info(f"  🎯 {line.strip()}")
-                    
-                    return True, "有新筛选结果"
-                elif "无变化" in output or "已是最新" in output:
-                    self.logger.info("📊 ETF筛选结果无变化，智能跳过")
-                    return False, "无变化"
-                else:
-                    self.logger.info("✅ ETF初筛执行完成")
-                    return True, "筛选完成"
-            else:
-                self.logger.error("❌ ETF初筛失败")
-                if result.stderr:
-                    self.logger.error(f"错误: {result.stderr[:300]}...")
-                if "no-parameter tools" in output:
-                    self.logger.error("可能是工具调用问题，但筛选可能已完成")
-                    # 检查是否生成了结果文件
-                    data_dir = screening_dir / "data"
-                    if data_dir.exists() and any(data_dir.rglob("*.txt")):
-                        self.logger.info("🔍 检测到筛选结果文件，视为成功")
-                        return True, "有新筛选结果"
-                return False, "执行失败"
-                
+            summary = self._run_script_stage(context, stages.screening_stage, "ETF_初筛",
+                                             in_process=self.warm_state is not None,
+                                             fuquan_type=fuquan_type, days_back=days_back,
+                                             changed_only=self.changed_only)
+        except (StageTimeout, StageCancelled):
+            raise
+        except StageError as e:
+            self.logger.error(f"❌ ETF初筛失败: {e}")
+            return StageResult('etf_screening', STATUS_FAILED, reason="执行失败", details={'output': e.output})
+
+        if not summary['success']:
+            self.logger.error("❌ ETF初筛失败")
+            return StageResult('etf_screening', STATUS_FAILED, reason="执行失败", details=summary)
+        self.logger.info("✅ ETF初筛完成（生成新筛选结果）")
+        return StageResult('etf_screening', STATUS_SUCCESS, True, "有新筛选结果", summary)
+
+    def run_daily_update(self) -> Tuple[bool, str]:
+        """
+        单独执行日更流程
+
+        Returns:
+            Tuple[是否有新数据, 原因描述]
+        """
+        return self._run_standalone(self.daily_stage)
+
+    def run_weekly_update(self) -> Tuple[bool, str]:
+        """
+        单独执行周更流程（随后执行周更后数据校验）
+
+        Returns:
+            Tuple[是否有新数据, 原因描述]
+        """
+        has_new_data, reason = self._run_standalone(self.weekly_stage)
+        weekly = StageResult('weekly', STATUS_SUCCESS, has_new_data)
+        self._run_standalone(self.weekly_validation_stage, StageContext('weekly_validation', {'weekly': weekly}))
+        return has_new_data, reason
+
+    def run_market_status_check(self, daily_has_new_data: bool = True) -> Tuple[bool, str]:
+        """
+        单独执行ETF市场状况监控
+
+        Args:
+            daily_has_new_data: 日更是否有新数据（仅作参考）
+
+        Returns:
+            Tuple[是否有新数据, 原因描述]
+        """
+        return self._run_standalone(self.market_status_stage, self._after_daily('market_status', daily_has_new_data))
+
+    def run_etf_screening(self, daily_has_new_data: bool = True) -> Tuple[bool, str]:
+        """
+        单独执行ETF初筛流程
+
+        Args:
+            daily_has_new_data: 日更是否有新数据（仅作参考）
+
+        Returns:
+            Tuple[是否有新数据, 原因描述]
+        """
+        return self._run_standalone(self.screening_stage, self._after_daily('etf_screening', daily_has_new_data))
+
+    @staticmethod
+    def _after_daily(name: str, daily_has_new_data: bool) -> StageContext:
+        """构造依赖日更结果的单独执行上下文"""
+        return StageContext(name, {'daily': StageResult('daily', STATUS_SUCCESS, daily_has_new_data)})
+
+    def _run_standalone(self, stage_func, context: StageContext = None) -> Tuple[bool, str]:
+        """不经调度器执行单个阶段，返回 (是否有新数据, 原因描述)"""
+        try:
+            result = stage_func(context)
         except Exception as e:
-            self.logger.error(f"执行ETF初筛时发生异常: {str(e)}")
+            self.logger.error(f"执行阶段时发生异常: {str(e)}")
             return False, f"异常: {str(e)}"
-    
+        return result.has_new_data, result.reason
+
     def set_screening_enabled(self, enabled: bool):
         """设置ETF初筛是否启用"""
         self.auto_screening_enabled = enabled
@@ -357,4 +371,14 @@ class ETFUpdaters:
         if enabled:
             self.logger.info("🔧 已启用周更日更数据校验")
         else:
-            self.logger.info("🔧 已禁用周更日更数据校验")
\ No newline at end of file
+            self.logger.info("🔧 已禁用周更日更数据校验")
+
+    def set_auto_fix_dry_run(self, enabled: bool):
+        """设置自动修正预演（启用时发现不一致只生成修正计划，不修改文件）"""
+        validator_config = self.config.setdefault('weekly_daily_validator', {})
+        if enabled:
+            validator_config['auto_fix'] = True
+        validator_config['auto_fix_dry_run'] = enabled
+        
+        # 重新初始化校验器
+        self.validator = WeeklyDailyValidator(self.config, self.logger, self.project_root)
\ No newline at end of file
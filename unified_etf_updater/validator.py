@@ -3,15 +3,35 @@
 """
 周更与日更数据同步校验器
 集成到unified_etf_updater架构中
+重叠期间对全部ETF对账：每个文件只读取重叠期间的开头几行，以周更为准按 (ETF, 日期) 左连接日更数据后
+对六个关键字段做向量化的相对误差比较，生成逐ETF/日期/字段的差异表（日更缺少的行记为日更值为空的差异）
+启用摘要索引时先自上而下比较两边的摘要，只对摘要不一致的ETF逐行对账
+自动修正先按差异表汇总每个日更文件需要替换的日期，每个文件只重写一次（可只生成预演报告）
 """
 
+import io
 import os
+import numpy as np
 import pandas as pd
 import logging
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Dict, List, Set, Optional, Tuple
 from pathlib import Path
 
+from config.change_manifest import ChangeLog, ChangeSet
+from config.columnar_store import columnar_enabled, write_columnar
+from config.digest_index import DigestIndex, diff_indexes, get_digest_settings, sync_digest_index
+from config.etf_store import compact_etf_file, read_lines_since, write_csv_atomic
+from config.latest_dates import LatestDateCache
+
+COMPARE_FIELDS = ['开盘价', '最高价', '最低价', '收盘价', '成交量(手数)', '成交额(千元)']
+DIFF_COLUMNS = ['etf_code', '日期', 'category', 'field', 'weekly', 'daily', 'rel_diff']
+DIFF_REPORT_FILE = Path("logs") / "validation" / "weekly_daily_diff.csv"  # 相对项目根目录
+FIX_PLAN_FILE = Path("logs") / "validation" / "auto_fix_plan.csv"  # 自动修正预演报告，相对项目根目录
+DIFF_LOG_LIMIT = 20  # 日志中最多列出的差异条数
+
 
 class WeeklyDailyValidator:
     """周更与日更数据同步校验器"""
@@ -38,12 +58,20 @@ class WeeklyDailyValidator:
         validator_config = config.get('weekly_daily_validator', {})
         self.enabled = validator_config.get('enabled', True)
         self.auto_fix = validator_config.get('auto_fix', False)
+        self.auto_fix_dry_run = validator_config.get('auto_fix_dry_run', False)  # 只生成修正计划，不写文件
         self.tolerance = validator_config.get('tolerance', 0.0001)  # 0.01%精度容差
+        self.max_workers = validator_config.get('max_workers', min(6, os.cpu_count() or 1))
+        self.columnar_enabled = columnar_enabled()
+        self.digest_enabled = get_digest_settings()[0]
         
     def is_enabled(self) -> bool:
         """检查校验器是否启用"""
         return self.enabled
     
+    def rewrites_daily_files(self) -> bool:
+        """校验发现不一致时是否会改写日更文件（启用自动修正且不是预演）"""
+        return self.enabled and self.auto_fix and not self.auto_fix_dry_run
+    
     def get_latest_date_from_etf_files(self, base_dir: Path) -> Optional[str]:
         """
         从ETF文件中获取最新的数据日期
@@ -56,6 +84,8 @@ class WeeklyDailyValidator:
         """
         sample_files = ["159001.csv", "159003.csv", "159005.csv"]
         latest_date = None
+        # 与市场状况监控共用最新日期缓存：只读取文件开头，文件未改动时不再打开
+        cache = LatestDateCache(base_dir)
         
         for category in self.categories:
             category_dir = base_dir / category
@@ -66,15 +96,16 @@ class WeeklyDailyValidator:
                 file_path = category_dir / sample_file
                 if file_path.exists():
                     try:
-                        df = pd.read_csv(file_path, encoding='utf-8')
-                        if not df.empty and '日期' in df.columns:
-                            # 获取最新日期（第一行，因为数据按日期降序排列）
-                            file_latest = df.iloc[0]['日期']
-                            if latest_date is None or file_latest > latest_date:
-                                latest_date = file_latest
+                        file_latest, updated = cache.latest_date(file_path)
                     except Exception as e:
                         self.logger.warning(f"读取文件失败 {file_path}: {e}")
                         continue
+                    if updated:
+                        cache.save()
+                    if file_latest is None:
+                        continue
+                    if latest_date is None or file_latest > latest_date:
+                        latest_date = file_latest
                     break  # 找到一个有效文件就够了
         
         return str(latest_date) if latest_date else None
@@ -101,120 +132,219 @@ class WeeklyDailyValidator:
         
         return dates
     
-    def load_etf_data_for_date(self, base_dir: Path, etf_code: str, target_date: str) -> Dict:
+    def load_overlap_frame(self, base_dir: Path, category: str, start_date: int, end_date: int,
+                           codes: Optional[Set[str]] = None) -> pd.DataFrame:
         """
-        加载指定ETF在指定日期的数据
-        
+        读取一个复权目录中全部ETF在 [start_date, end_date] 内的数据
+        每个文件只读取开头日期不早于 start_date 的几行，全部行拼接后一次解析
+
         Args:
-            base_dir: 基础目录
-            etf_code: ETF代码（如159001）
-            target_date: 目标日期 YYYYMMDD
-            
+            base_dir: 周更或日更目录
+            category: 复权目录名
+            start_date: 开始日期 YYYYMMDD
+            end_date: 结束日期 YYYYMMDD
+            codes: 只读取这些ETF，None表示全部
+
         Returns:
-            数据字典，包含三种复权类型的数据
+            DataFrame，ETF 列为文件名中的代码，其余列与按代码CSV一致；没有数据时为空
         """
-        result = {}
-        
-        for category in self.categories:
-            file_path = base_dir / category / f"{etf_code}.csv"
-            
-            if not file_path.exists():
-                result[category] = None
+        category_dir = base_dir / category
+        if not category_dir.exists():
+            return pd.DataFrame()
+
+        header = None
+        lines = []
+        for etf_file in sorted(category_dir.glob('*.csv')):
+            if codes is not None and etf_file.stem not in codes:
                 continue
-                
             try:
-                df = pd.read_csv(file_path, encoding='utf-8')
-                # 转换目标日期为整数进行匹配
-                target_date_int = int(target_date)
-                date_data = df[df['日期'] == target_date_int]
-                
-                if not date_data.empty:
-                    # 转换为字典，便于比较
-                    row_data = date_data.iloc[0].to_dict()
-                    result[category] = row_data
-                else:
-                    result[category] = None
-                    
-            except Exception as e:
-                self.logger.warning(f"读取文件失败 {file_path}: {e}")
-                result[category] = None
-        
-        return result
-    
-    def compare_etf_data(self, weekly_data: Dict, daily_data: Dict) -> bool:
+                etf_lines = read_lines_since(etf_file, start_date)
+                if etf_lines and header is None:
+                    with open(etf_file, 'r', encoding='utf-8-sig') as f:
+                        header = f.readline().strip()
+            except (OSError, UnicodeDecodeError) as e:
+                self.logger.warning(f"读取文件失败 {etf_file}: {e}")
+                continue
+            lines.extend(f"{etf_file.stem},{line}" for line in etf_lines)
+
+        if not lines:
+            return pd.DataFrame()
+        frame = pd.read_csv(io.StringIO(f"ETF,{header}\n" + '\n'.join(lines)), dtype={'ETF': str})
+        return frame[frame['日期'] <= end_date]
+
+    def reconcile(self, start_date: str, end_date: str,
+                  codes: Optional[Dict[str, Set[str]]] = None) -> Tuple[pd.DataFrame, Dict]:
         """
-        比较周更和日更的ETF数据是否一致
-        
+        全量对账：并行读取周更、日更各复权目录的重叠期间数据，按 (ETF, 日期) 左连接后向量化比较关键字段
+        以周更的行为准（周更只有不晚于其最新日期的行）：日更缺少的行每个字段记一条差异，日更值为 NaN，
+        自动修正时与其他差异一样从周更复制；日更有而周更没有的行不比较
+
         Args:
-            weekly_data: 周更数据
-            daily_data: 日更数据
-            
+            start_date: 开始日期 YYYYMMDD
+            end_date: 结束日期 YYYYMMDD
+            codes: {复权目录: ETF代码集合}，只对账这些ETF（摘要不一致的部分），None表示全部
+
         Returns:
-            True表示一致，False表示不一致
+            Tuple[差异表（DIFF_COLUMNS，每行一个ETF/日期/复权类型/字段）,
+                  统计 {'comparisons': 比较的 (ETF, 日期, 复权类型) 数, 'etfs': 参与比较的ETF数}]
         """
-        if not weekly_data or not daily_data:
-            return False
-        
-        # 比较所有复权类型
-        for category in self.categories:
-            weekly_row = weekly_data.get(category)
-            daily_row = daily_data.get(category)
-            
-            if weekly_row is None and daily_row is None:
+        start, end = int(start_date), int(end_date)
+        categories = self.categories if codes is None else [category for category in self.categories if codes.get(category)]
+        tasks = [(side, base_dir, category)
+                 for side, base_dir in (('weekly', self.weekly_dir), ('daily', self.daily_dir))
+                 for category in categories]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            loaded = executor.map(lambda task: self.load_overlap_frame(
+                task[1], task[2], start, end, None if codes is None else codes[task[2]]), tasks)
+            frames = {(side, category): frame for (side, _, category), frame in zip(tasks, loaded)}
+
+        diffs = []
+        comparisons = 0
+        etf_codes = set()
+        for category in categories:
+            weekly, daily = frames[('weekly', category)], frames[('daily', category)]
+            if weekly.empty:
                 continue
-            if weekly_row is None or daily_row is None:
-                return False
-                
-            # 比较关键字段（忽略可能的精度差异）
-            key_fields = ['开盘价', '最高价', '最低价', '收盘价', '成交量(手数)', '成交额(千元)']
-            
-            for field in key_fields:
-                if field in weekly_row and field in daily_row:
-                    try:
-                        weekly_val = float(weekly_row[field])
-                        daily_val = float(daily_row[field])
-                        
-                        # 允许小的精度差异
-                        if abs(weekly_val - daily_val) / max(abs(weekly_val), abs(daily_val), 1e-10) > self.tolerance:
-                            return False
-                    except (ValueError, TypeError):
-                        if str(weekly_row[field]) != str(daily_row[field]):
-                            return False
-        
-        return True
+            if daily.empty:
+                daily = weekly.iloc[0:0]  # 日更在区间内没有任何行：周更的行全部记为缺失
+            merged = weekly.merge(daily, on=['ETF', '日期'], how='left', suffixes=('_weekly', '_daily'),
+                                  indicator=True)
+            missing = (merged.pop('_merge') == 'left_only').to_numpy()
+            comparisons += len(merged)
+            etf_codes.update(merged['ETF'])
+
+            for field in COMPARE_FIELDS:
+                if f"{field}_weekly" not in merged or f"{field}_daily" not in merged:
+                    continue
+                weekly_values = pd.to_numeric(merged[f"{field}_weekly"], errors='coerce').to_numpy(dtype=float)
+                daily_values = pd.to_numeric(merged[f"{field}_daily"], errors='coerce').to_numpy(dtype=float)
+                # 允许小的精度差异：相对误差 |w-d| / max(|w|, |d|, 1e-10)
+                scale = np.maximum(np.maximum(np.abs(weekly_values), np.abs(daily_values)), 1e-10)
+                with np.errstate(invalid='ignore'):
+                    rel_diff = np.abs(weekly_values - daily_values) / scale
+                mismatch = (rel_diff > self.tolerance) | (np.isnan(weekly_values) != np.isnan(daily_values)) | missing
+                if mismatch.any():
+                    diffs.append(pd.DataFrame({
+                        'etf_code': merged['ETF'].to_numpy()[mismatch],
+                        '日期': merged['日期'].to_numpy()[mismatch],
+                        'category': category,
+                        'field': field,
+                        'weekly': weekly_values[mismatch],
+                        'daily': daily_values[mismatch],
+                        'rel_diff': rel_diff[mismatch],
+                    }))
+
+        if diffs:
+            diff_table = pd.concat(diffs, ignore_index=True).sort_values(['日期', 'etf_code', 'category', 'field'])
+            diff_table = diff_table.reset_index(drop=True)
+        else:
+            diff_table = pd.DataFrame(columns=DIFF_COLUMNS)
+        return diff_table, {'comparisons': comparisons, 'etfs': len(etf_codes), 'etf_codes': etf_codes}
+
+    def digest_diff(self, start_date: str, end_date: str) -> Optional[Dict]:
+        """
+        用摘要索引比较周更和日更：先按变更清单和文件签名更新两边的索引，再自上而下比较摘要
+
+        Args:
+            start_date: 开始日期 YYYYMMDD
+            end_date: 结束日期 YYYYMMDD
+
+        Returns:
+            diff_indexes() 的结果，索引不可用时返回 None（调用方回退到全量对账）
+        """
+        indexes = []
+        try:
+            for base_dir in (self.weekly_dir, self.daily_dir):
+                index = DigestIndex(base_dir)
+                indexes.append(index)
+                stats = index.sync(self.categories, verify=True)
+                if any(stats.values()):
+                    self.logger.info(f"📋 摘要索引已更新 {base_dir.name}: {stats}")
+            return diff_indexes(indexes[0], indexes[1], self.categories, int(start_date), int(end_date))
+        except (sqlite3.Error, OSError) as e:
+            self.logger.warning(f"⚠️ 摘要索引不可用，改为全量对账: {e}")
+            return None
+        finally:
+            for index in indexes:
+                index.close()
+
+    def reconcile_with_digests(self, start_date: str, end_date: str) -> Tuple[pd.DataFrame, Dict]:
+        """
+        先比较摘要，只对摘要不一致的ETF逐行对账；两边没有差异时不读取任何数据文件
+
+        Returns:
+            与 reconcile() 相同
+        """
+        digest = self.digest_diff(start_date, end_date) if self.digest_enabled else None
+        if digest is None:
+            return self.reconcile(start_date, end_date)
+
+        suspects = {}
+        for category, etf_code in list(digest['dates']) + list(digest['months']):
+            suspects.setdefault(category, set()).add(etf_code)
+        # 逐行对账会重新比较可疑ETF在区间内的全部日期，摘要一致的行数只统计其余ETF
+        comparisons = sum(rows for (category, etf_code), rows in digest['matched'].items()
+                          if etf_code not in suspects.get(category, ()))
+        self.logger.info(f"🔍 摘要比较: {len(digest['etfs'])} 个ETF，摘要一致 {comparisons} 次比较，"
+                         f"需要逐行对账 {sum(len(codes) for codes in suspects.values())} 个文件")
+        if not suspects:
+            return pd.DataFrame(columns=DIFF_COLUMNS), {'comparisons': comparisons, 'etfs': len(digest['etfs'])}
+
+        diff_table, stats = self.reconcile(start_date, end_date, suspects)
+        return diff_table, {'comparisons': comparisons + stats['comparisons'],
+                            'etfs': len(digest['etfs'] | stats['etf_codes'])}
+
+    def save_diff_table(self, diff_table: pd.DataFrame) -> Path:
+        """保存差异表（覆盖上次的结果）"""
+        diff_file = self.project_root / DIFF_REPORT_FILE
+        diff_file.parent.mkdir(parents=True, exist_ok=True)
+        diff_table.to_csv(diff_file, index=False, encoding='utf-8-sig')
+        return diff_file
     
-    def _compare_single_category(self, weekly_row: Dict, daily_row: Dict) -> bool:
+    def _rewrite_daily_file(self, category: str, etf_code: str, dates: List[int]) -> bool:
         """
-        比较单个复权类型的数据是否一致
-        
+        用周更数据替换一个日更文件中的多个日期（日更缺少的行直接补入），文件只重写一次
+
         Args:
-            weekly_row: 周更数据行
-            daily_row: 日更数据行
-            
+            category: 复权目录名
+            etf_code: ETF代码
+            dates: 需要替换的日期 YYYYMMDD
+
         Returns:
-            True表示一致，False表示不一致
+            是否成功（周更中没有这些日期时返回 False）
         """
-        if weekly_row is None or daily_row is None:
+        weekly_file = self.weekly_dir / category / f"{etf_code}.csv"
+        daily_file = self.daily_dir / category / f"{etf_code}.csv"
+        if not weekly_file.exists() or not daily_file.parent.exists():
             return False
-            
-        # 比较关键字段（忽略可能的精度差异）
-        key_fields = ['开盘价', '最高价', '最低价', '收盘价', '成交量(手数)', '成交额(千元)']
-        
-        for field in key_fields:
-            if field in weekly_row and field in daily_row:
-                try:
-                    weekly_val = float(weekly_row[field])
-                    daily_val = float(daily_row[field])
-                    
-                    # 允许小的精度差异
-                    if abs(weekly_val - daily_val) / max(abs(weekly_val), abs(daily_val), 1e-10) > self.tolerance:
-                        return False
-                except (ValueError, TypeError):
-                    if str(weekly_row[field]) != str(daily_row[field]):
-                        return False
-        
+
+        # 周更只读取开头包含这些日期的几行，全部按字符串处理，未修改的行原样写回
+        weekly_lines = read_lines_since(weekly_file, min(dates))
+        if not weekly_lines:
+            return False
+        with open(weekly_file, 'r', encoding='utf-8-sig') as f:
+            header = f.readline().strip()
+        weekly_rows = pd.read_csv(io.StringIO(header + '\n' + '\n'.join(weekly_lines)), dtype=str)
+        weekly_rows = weekly_rows[weekly_rows['日期'].isin({str(date) for date in dates})]
+        if weekly_rows.empty:
+            return False
+
+        # 先把追加模式的尾段压实，避免重写后被旧尾段覆盖；日更完全缺少该ETF时直接写入周更的行
+        compact_etf_file(daily_file)
+        if daily_file.exists():
+            daily_df = pd.read_csv(daily_file, encoding='utf-8-sig', dtype=str)
+        else:
+            daily_df = pd.DataFrame(columns=weekly_rows.columns)
+        weekly_rows = weekly_rows.reindex(columns=daily_df.columns)
+        daily_df = daily_df[~daily_df['日期'].isin(weekly_rows['日期'])]
+
+        merged = pd.concat([weekly_rows, daily_df], ignore_index=True)
+        merged = merged.sort_values('日期', ascending=False, kind='stable')
+        write_csv_atomic(merged, daily_file)
+        if self.columnar_enabled:
+            write_columnar(merged, daily_file)
         return True
-    
+
     def copy_date_data_from_weekly_to_daily(self, etf_code: str, target_date: str) -> bool:
         """
         将指定日期的数据从周更复制到日更
@@ -227,40 +357,10 @@ class WeeklyDailyValidator:
             是否成功
         """
         success_count = 0
-        
         for category in self.categories:
-            weekly_file = self.weekly_dir / category / f"{etf_code}.csv"
-            daily_file = self.daily_dir / category / f"{etf_code}.csv"
-            
-            if not weekly_file.exists() or not daily_file.exists():
-                continue
-                
             try:
-                # 读取周更数据
-                weekly_df = pd.read_csv(weekly_file, encoding='utf-8')
-                target_date_int = int(target_date)
-                weekly_target = weekly_df[weekly_df['日期'] == target_date_int]
-                
-                if weekly_target.empty:
-                    continue
-                    
-                # 读取日更数据
-                daily_df = pd.read_csv(daily_file, encoding='utf-8')
-                
-                # 删除日更中的目标日期数据
-                daily_df = daily_df[daily_df['日期'] != target_date_int]
-                
-                # 添加周更的目标日期数据
-                daily_df = pd.concat([weekly_target, daily_df], ignore_index=True)
-                
-                # 按日期降序排序
-                daily_df['日期'] = daily_df['日期'].astype(str)
-                daily_df = daily_df.sort_values('日期', ascending=False)
-                
-                # 保存回日更文件
-                daily_df.to_csv(daily_file, index=False, encoding='utf-8-sig')
-                success_count += 1
-                
+                if self._rewrite_daily_file(category, etf_code, [int(target_date)]):
+                    success_count += 1
             except Exception as e:
                 self.logger.error(f"复制数据失败 {category}/{etf_code}.csv: {e}")
         
@@ -294,86 +394,56 @@ class WeeklyDailyValidator:
         overlap_dates = self.get_date_range(weekly_latest, daily_latest)
         self.logger.info(f"🔍 重叠期间: {weekly_latest} 到 {daily_latest} ({len(overlap_dates)} 天)")
         
-        # 3. 获取需要校验的ETF列表（使用样本）
-        sample_etfs = ["159001", "159003", "159005", "159201", "159301"]
-        inconsistent_dates = set()
-        total_comparisons = 0
-        inconsistent_comparisons = 0
-        inconsistent_details = {}
+        # 3. 全量对账（所有ETF × 复权类型 × 重叠日期），启用摘要索引时只对摘要不一致的ETF逐行对账
+        diff_table, stats = self.reconcile_with_digests(weekly_latest, daily_latest)
         
-        # 4. 逐日比较数据
-        for date in overlap_dates:
-            self.logger.info(f"📊 检查 {date}...")
-            date_has_inconsistency = False
-            
-            for etf_code in sample_etfs:
-                weekly_data = self.load_etf_data_for_date(self.weekly_dir, etf_code, date)
-                daily_data = self.load_etf_data_for_date(self.daily_dir, etf_code, date)
-                
-                # 统计每种复权类型的比较次数
-                etf_comparison_count = 0
-                etf_inconsistency_count = 0
-                category_results = {}
-                
-                # 逐个复权类型进行详细比较
-                for category in self.categories:
-                    weekly_row = weekly_data.get(category)
-                    daily_row = daily_data.get(category)
-                    
-                    if weekly_row is not None and daily_row is not None:
-                        etf_comparison_count += 1
-                        total_comparisons += 1
-                        
-                        # 单独比较这个复权类型
-                        category_consistent = self._compare_single_category(weekly_row, daily_row)
-                        category_results[category] = category_consistent
-                        
-                        if not category_consistent:
-                            etf_inconsistency_count += 1
-                            inconsistent_comparisons += 1
-                
-                # 记录ETF级别的结果
-                etf_consistent = etf_inconsistency_count == 0
-                if etf_consistent:
-                    self.logger.debug(f"  ✅ {etf_code} 所有复权类型数据一致 ({etf_comparison_count}个)")
-                else:
-                    self.logger.warning(f"  ⚠️ {etf_code} 有{etf_inconsistency_count}个复权类型数据不一致")
-                    for category, is_consistent in category_results.items():
-                        if not is_consistent:
-                            self.logger.warning(f"    - {category}: 不一致")
-                    
-                    date_has_inconsistency = True
-                    
-                    # 记录不一致详情
-                    if date not in inconsistent_details:
-                        inconsistent_details[date] = []
-                    inconsistent_details[date].append({
-                        'etf_code': etf_code,
-                        'inconsistent_categories': [cat for cat, consistent in category_results.items() if not consistent]
-                    })
-            
-            if date_has_inconsistency:
-                inconsistent_dates.add(date)
+        # 4. 汇总不一致的日期和ETF
+        inconsistent_details = {}
+        inconsistent_comparisons = 0
+        if not diff_table.empty:
+            inconsistent_rows = diff_table.drop_duplicates(['日期', 'etf_code', 'category'])
+            inconsistent_comparisons = len(inconsistent_rows)
+            for (date, etf_code), group in inconsistent_rows.groupby(['日期', 'etf_code'], sort=True):
+                inconsistent_details.setdefault(str(date), []).append({
+                    'etf_code': etf_code,
+                    'inconsistent_categories': group['category'].tolist()
+                })
+        inconsistent_dates = set(inconsistent_details)
         
         # 5. 报告结果
         result = {
             "weekly_latest": weekly_latest,
             "daily_latest": daily_latest,
             "overlap_dates": overlap_dates,
-            "total_comparisons": total_comparisons,
+            "checked_etfs": stats['etfs'],
+            "total_comparisons": stats['comparisons'],
             "inconsistent_comparisons": inconsistent_comparisons,
             "inconsistent_dates": sorted(list(inconsistent_dates)),
-            "inconsistent_details": inconsistent_details
+            "inconsistent_details": inconsistent_details,
+            "diff_table": diff_table
         }
         
         self.logger.info(f"📊 校验结果:")
         self.logger.info(f"   检查天数: {len(overlap_dates)} 天")
-        self.logger.info(f"   检查ETF数: {len(sample_etfs)} 个")
+        self.logger.info(f"   检查ETF数: {stats['etfs']} 个")
         self.logger.info(f"   复权类型: {len(self.categories)} 种 (前复权、后复权、除权)")
-        self.logger.info(f"   总比较次数: {total_comparisons} (天×ETF×复权类型)")
+        self.logger.info(f"   总比较次数: {stats['comparisons']} (天×ETF×复权类型)")
         self.logger.info(f"   不一致次数: {inconsistent_comparisons}")
+        self.logger.info(f"   不一致字段: {len(diff_table)} 个")
         self.logger.info(f"   不一致日期: {len(inconsistent_dates)} 天")
         
+        if not diff_table.empty:
+            for row in diff_table.head(DIFF_LOG_LIMIT).itertuples(index=False):
+                self.logger.warning(f"  ⚠️ {row.etf_code} {row.日期} {row.category} {row.field}: "
+                                    f"周更 {row.weekly} / 日更 {row.daily}")
+            if len(diff_table) > DIFF_LOG_LIMIT:
+                self.logger.warning(f"  ... 另有 {len(diff_table) - DIFF_LOG_LIMIT} 个不一致字段")
+            try:
+                result['diff_file'] = str(self.save_diff_table(diff_table))
+                self.logger.warning(f"📋 差异表已保存: {result['diff_file']}")
+            except OSError as e:
+                self.logger.warning(f"⚠️ 差异表保存失败: {e}")
+        
         if inconsistent_dates:
             self.logger.warning(f"⚠️ 发现数据不一致日期: {sorted(inconsistent_dates)}")
             return True, result
@@ -381,51 +451,95 @@ class WeeklyDailyValidator:
             self.logger.info("🎉 所有数据一致，无需修正！")
             return False, result
     
-    def auto_fix_inconsistent_data(self, inconsistent_dates: List[str]) -> bool:
+    def plan_auto_fix(self, diff_table: pd.DataFrame, dates: List[str] = None) -> Dict[Tuple[str, str], List[int]]:
         """
-        自动修正不一致的数据
+        按差异表汇总需要修正的日更文件，只包含确实不一致的ETF和复权类型
+
+        Args:
+            diff_table: reconcile() 返回的差异表
+            dates: 只修正这些日期，None 表示差异表中的全部日期
+
+        Returns:
+            {(复权目录, ETF代码): [需要用周更数据替换的日期]}
+        """
+        if diff_table.empty:
+            return {}
+        if dates is not None:
+            diff_table = diff_table[diff_table['日期'].astype(str).isin({str(date) for date in dates})]
+        return {(category, etf_code): sorted({int(date) for date in group['日期']})
+                for (category, etf_code), group in diff_table.groupby(['category', 'etf_code'], sort=True)}
+
+    def save_fix_plan(self, plan: Dict[Tuple[str, str], List[int]], diff_table: pd.DataFrame) -> Path:
+        """保存修正预演报告：每个待替换的 文件/日期/字段 的日更现值和周更值"""
+        planned = pd.DataFrame([(category, etf_code, date) for (category, etf_code), dates in plan.items()
+                                for date in dates], columns=['category', 'etf_code', '日期'])
+        report = planned.merge(diff_table, on=['category', 'etf_code', '日期'], how='left')
+        report = report.rename(columns={'daily': 'daily_before', 'weekly': 'daily_after'})
+        report = report[['category', 'etf_code', '日期', 'field', 'daily_before', 'daily_after', 'rel_diff']]
+        plan_file = self.project_root / FIX_PLAN_FILE
+        plan_file.parent.mkdir(parents=True, exist_ok=True)
+        report.to_csv(plan_file, index=False, encoding='utf-8-sig')
+        return plan_file
+
+    def auto_fix_inconsistent_data(self, inconsistent_dates: List[str], diff_table: pd.DataFrame = None,
+                                   dry_run: bool = None) -> bool:
+        """
+        自动修正不一致的数据：先汇总全部不一致的 (ETF, 日期)，每个受影响的日更文件只重写一次
         
         Args:
             inconsistent_dates: 不一致的日期列表
+            diff_table: reconcile() 返回的差异表，None 时重新对账这些日期
+            dry_run: 只生成修正计划报告，不写文件（None 时取配置 auto_fix_dry_run）
             
         Returns:
-            是否成功
+            是否成功（预演时返回是否生成了计划）
         """
         if not inconsistent_dates:
             return True
+        if dry_run is None:
+            dry_run = self.auto_fix_dry_run
+        
+        if diff_table is None:
+            diff_table, _ = self.reconcile(min(inconsistent_dates), max(inconsistent_dates))
+        plan = self.plan_auto_fix(diff_table, inconsistent_dates)
+        if not plan:
+            self.logger.info("ℹ️ 差异表中没有需要修正的文件")
+            return True
         
-        self.logger.info(f"🔄 开始自动修正 {len(inconsistent_dates)} 个不一致日期...")
-        
-        # 获取所有ETF文件列表
-        weekly_category_dir = self.weekly_dir / self.categories[0]
-        if not weekly_category_dir.exists():
-            self.logger.error("❌ 找不到周更数据目录")
-            return False
+        etf_count = len({etf_code for _, etf_code in plan})
+        self.logger.info(f"🔄 修正计划: {len(inconsistent_dates)} 个日期，{etf_count} 个ETF，"
+                         f"{len(plan)} 个日更文件（每个文件重写一次）")
+        for (category, etf_code), dates in list(plan.items())[:DIFF_LOG_LIMIT]:
+            self.logger.info(f"  📝 {category}/{etf_code}.csv: {', '.join(map(str, dates))}")
+        if len(plan) > DIFF_LOG_LIMIT:
+            self.logger.info(f"  ... 另有 {len(plan) - DIFF_LOG_LIMIT} 个文件")
+        
+        if dry_run:
+            plan_file = self.save_fix_plan(plan, diff_table)
+            self.logger.info(f"📋 预演模式，未修改文件，修正计划已保存: {plan_file}")
+            return True
         
-        etf_files = [f for f in weekly_category_dir.iterdir() if f.suffix == '.csv']
-        etf_codes = [f.stem for f in etf_files]
+        changes = ChangeSet()
+        failed = []
+        for (category, etf_code), dates in plan.items():
+            try:
+                if self._rewrite_daily_file(category, etf_code, dates):
+                    changes.add(category, etf_code, dates)
+                else:
+                    failed.append(f"{category}/{etf_code}")
+            except Exception as e:
+                self.logger.error(f"修正失败 {category}/{etf_code}.csv: {e}")
+                failed.append(f"{category}/{etf_code}")
         
-        success_dates = 0
-        for date in sorted(inconsistent_dates):
-            self.logger.info(f"  修正 {date}...")
-            date_success = 0
-            
-            for etf_code in etf_codes:
-                if self.copy_date_data_from_weekly_to_daily(etf_code, date):
-                    date_success += 1
-            
-            if date_success > 0:
-                success_dates += 1
-                self.logger.info(f"  ✅ {date} 修正完成 ({date_success}/{len(etf_codes)} 个ETF)")
-            else:
-                self.logger.error(f"  ❌ {date} 修正失败")
+        # 修正后的日期发布到日更变更清单，下游按变更重新处理
+        ChangeLog(self.daily_dir).publish('validator_fix', changes)
+        sync_digest_index(self.daily_dir, self.categories)
         
-        if success_dates == len(inconsistent_dates):
-            self.logger.info("✅ 所有不一致数据修正完成！")
+        if not failed:
+            self.logger.info(f"✅ 所有不一致数据修正完成！（重写 {len(plan)} 个文件）")
             return True
-        else:
-            self.logger.warning(f"⚠️ 部分数据修正完成 ({success_dates}/{len(inconsistent_dates)})")
-            return False
+        self.logger.warning(f"⚠️ 部分数据修正完成 ({len(plan) - len(failed)}/{len(plan)})，失败: {failed[:DIFF_LOG_LIMIT]}")
+        return False
     
     def run_validation_after_weekly_update(self) -> Tuple[bool, str]:
         """
@@ -454,8 +568,12 @@ class WeeklyDailyValidator:
         
         # 如果启用了自动修正
         if self.auto_fix and inconsistent_dates:
+            if self.auto_fix_dry_run:
+                self.logger.info("🔄 已启用自动修正预演，生成修正计划...")
+                self.auto_fix_inconsistent_data(inconsistent_dates, result.get('diff_table'), dry_run=True)
+                return True, f"自动修正预演完成（未修改文件），请检查修正计划: {inconsistent_dates}"
             self.logger.info("🔄 已启用自动修正，开始修正数据...")
-            if self.auto_fix_inconsistent_data(inconsistent_dates):
+            if self.auto_fix_inconsistent_data(inconsistent_dates, result.get('diff_table')):
                 return False, "自动修正完成"
             else:
                 return True, f"自动修正部分失败，需要人工检查: {inconsistent_dates}"